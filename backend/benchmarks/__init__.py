@@ -0,0 +1,3 @@
+"""
+오프라인 벤치마크 모음 (Confluence/ES/임베딩 서버 없이 실행)
+"""
@@ -0,0 +1,127 @@
+"""
+parse_storage_html 엔진 벤치마크 (bs4 기준 구현 vs fast 단일 패스 구현)
+
+- samples/ 아래의 Storage HTML(.html) 전체를 코퍼스로 사용
+- 먼저 두 엔진의 결과가 완전히 같은지 검증한 뒤, 페이지/초와 속도 향상 배수를 출력
+- --record 옵션으로 실제 Confluence 스페이스의 페이지를 samples/recorded/ 에 저장해 코퍼스를 늘릴 수 있음
+
+사용법 (backend 폴더에서):
+    python -m benchmarks.bench_parser
+    python -m benchmarks.bench_parser --repeat 50
+    python -m benchmarks.bench_parser --record LLOYDK --limit 200   # .env의 Confluence 계정 사용
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from onboarding.app.parser import parse_storage_html
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+
+def load_corpus(samples_dir: str = SAMPLES_DIR):
+    """samples_dir 아래(하위 폴더 포함)의 .html 파일을 (이름, HTML) 목록으로 읽습니다."""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(samples_dir, "**", "*.html"), recursive=True)):
+        with open(path, encoding="utf-8") as f:
+            corpus.append((os.path.relpath(path, samples_dir), f.read()))
+    return corpus
+
+
+def record_space(space_key: str, limit: int, samples_dir: str = SAMPLES_DIR):
+    """실제 Confluence 페이지의 Storage HTML과 페이지 목록(pages.json)을 samples/recorded/{space_key}/ 에 저장합니다."""
+    from dotenv import load_dotenv
+    from onboarding.app.confluence_api import ConfluenceClient
+
+    load_dotenv(os.path.join(BACKEND_DIR, "onboarding", ".env"))
+    client = ConfluenceClient(
+        os.environ["CONFLUENCE_URL"], os.environ["CONFLUENCE_EMAIL"], os.environ["CONFLUENCE_API_TOKEN"]
+    )
+    out_dir = os.path.join(samples_dir, "recorded", space_key)
+    os.makedirs(out_dir, exist_ok=True)
+
+    pages = client.get_pages_with_category(space_key)
+    # 전체 페이지 목록은 bench_suite.py의 pages_to_dataframe/트리 벤치마크 코퍼스로 사용
+    with open(os.path.join(out_dir, "pages.json"), "w", encoding="utf-8") as f:
+        json.dump(pages, f, ensure_ascii=False)
+
+    pages = pages[:limit]
+    for page in pages:
+        content = client.get_page_content(page["id"])
+        if not content:
+            continue
+        with open(os.path.join(out_dir, f"{page['id']}.html"), "w", encoding="utf-8") as f:
+            f.write(content["html"])
+    print(f"💾 {len(pages)}개 페이지를 {out_dir} 에 저장했습니다.")
+
+
+def fake_child_pages(page_id: str):
+    return [{"title": f"하위 문서 {i}", "id": f"{page_id}{i}"} for i in range(3)]
+
+
+def verify(corpus) -> bool:
+    ok = True
+    for name, html in corpus:
+        expected = parse_storage_html(name, html, fake_child_pages, engine="bs4")
+        actual = parse_storage_html(name, html, fake_child_pages, engine="fast")
+        if expected != actual:
+            ok = False
+            diff_keys = [k for k in expected if expected[k] != actual.get(k)]
+            print(f"❌ 결과 불일치: {name} ({', '.join(diff_keys)})")
+    return ok
+
+
+def bench(corpus, engine: str, repeat: int) -> float:
+    """코퍼스 전체를 repeat번 파싱하는 데 걸린 시간(초)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, html in corpus:
+            parse_storage_html(name, html, fake_child_pages, engine=engine)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parse_storage_html 엔진 벤치마크")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--samples", default=SAMPLES_DIR)
+    parser.add_argument("--record", metavar="SPACE_KEY", help="Confluence 스페이스 페이지를 코퍼스로 저장")
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.record:
+        record_space(args.record, args.limit, args.samples)
+
+    corpus = load_corpus(args.samples)
+    if not corpus:
+        print(f"⚠️ {args.samples} 에 샘플(.html)이 없습니다.")
+        return 1
+
+    total_kb = sum(len(html.encode("utf-8")) for _, html in corpus) / 1024
+    print(f"📚 코퍼스: {len(corpus)}개 페이지, {total_kb:.1f} KB")
+
+    if not verify(corpus):
+        return 1
+    print("✅ 두 엔진의 결과가 모든 샘플에서 동일합니다.")
+
+    pages = len(corpus) * args.repeat
+    results = {}
+    for engine in ("bs4", "fast"):
+        bench(corpus, engine, 1)  # 워밍업
+        elapsed = bench(corpus, engine, args.repeat)
+        results[engine] = elapsed
+        print(f"⏱️ {engine:>4}: {elapsed:.3f}s  ({pages / elapsed:,.0f} pages/s, {total_kb * args.repeat / elapsed:,.0f} KB/s)")
+
+    print(f"🚀 속도 향상: {results['bs4'] / results['fast']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""
+오프라인 마이크로 벤치마크 모음 (Confluence/ES/임베딩/LLM 서버 불필요)
+
+대상:
+- parse_storage_html (fast / bs4 엔진)
+- table_to_records
+- EmbeddingManager.chunk_documents, StructureChunker.chunk_parsed
+- pages_to_dataframe (get_pages_dataframe의 변환부)
+- build_structure_tree (/documents/structure 트리 생성부)
+- PageRegistry.from_listing / PageRegistry.tree (위 두 단계를 대체하는 배열 레지스트리)
+- ConfluenceChatbot.format_documents
+
+코퍼스:
+- samples/ 아래의 Storage HTML(.html) + 합성 페이지
+- samples/**/pages.json (bench_parser.py --record로 저장한 실제 페이지 목록) + 합성 페이지 목록
+
+결과는 케이스별 ops/sec와 tracemalloc 피크 메모리를 JSON으로 저장하고,
+--compare로 이전 커밋의 JSON과 비교해 느려진 케이스를 표시합니다.
+
+사용법 (backend 폴더에서):
+    python -m benchmarks.bench_suite --out benchmarks/results/baseline.json
+    python -m benchmarks.bench_suite --compare benchmarks/results/baseline.json
+    python -m benchmarks.bench_suite --only parse --min-time 2
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from onboarding.app.parser import parse_storage_html, table_to_records
+from onboarding.app.chunker import StructureChunker, count_tokens
+from onboarding.app.confluence_api import pages_to_dataframe, build_structure_tree
+from onboarding.app.page_registry import PageRegistry
+from onboarding.app.chatbot import ConfluenceChatbot
+from onboarding.app.embedding import EmbeddingManager
+
+from benchmarks.bench_parser import SAMPLES_DIR, load_corpus, fake_child_pages
+
+
+# =================================================================
+# 합성 데이터
+# =================================================================
+_WORDS = [
+    "온보딩", "계정", "신청", "승인", "배포", "서버", "휴가", "규정", "담당자", "절차",
+    "API", "Jira", "Confluence", "VPN", "2025년", "09:00", "보안", "교육", "문의", "설정",
+]
+
+
+def _sentence(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n_words)) + "."
+
+
+def synthetic_storage_html(rng: random.Random, n_sections: int = 12, n_tables: int = 3, n_rows: int = 25) -> str:
+    """헤딩/문단/목록/링크/매크로/병합 셀이 섞인 Confluence Storage HTML을 만듭니다."""
+    parts: List[str] = ['<ac:structured-macro ac:name="toc"><ac:parameter ac:name="maxLevel">3</ac:parameter></ac:structured-macro>']
+    tables_at = set(rng.sample(range(n_sections), min(n_tables, n_sections)))
+
+    for s in range(n_sections):
+        parts.append(f"<h{2 + s % 2}>섹션 {s} {rng.choice(_WORDS)}</h{2 + s % 2}>")
+        for _ in range(rng.randint(1, 4)):
+            parts.append(f"<p>{_sentence(rng, rng.randint(8, 30))}</p>")
+        parts.append("<ul>" + "".join(f"<li>{_sentence(rng, 5)}</li>" for _ in range(rng.randint(0, 5))) + "</ul>")
+        parts.append(
+            f'<p><ac:link><ri:page ri:content-title="관련 문서 {s}" /><ac:plain-text-link-body>'
+            f"<![CDATA[참고 {s}]]></ac:plain-text-link-body></ac:link></p>"
+        )
+        if s in tables_at:
+            rows = ["<tr><th>구분</th><th>항목</th><th>담당자</th><th>비고</th></tr>"]
+            for r in range(n_rows):
+                first = f'<td rowspan="2">그룹 {r // 2}</td>' if r % 2 == 0 else ""
+                rows.append(
+                    f"<tr>{first}<td>항목 {r}</td><td>담당 {rng.choice(_WORDS)}</td>"
+                    f"<td><p>{_sentence(rng, rng.randint(2, 10))}</p></td></tr>"
+                )
+            parts.append("<table><tbody>" + "".join(rows) + "</tbody></table>")
+
+    parts.append('<ac:structured-macro ac:name="children" />')
+    parts.append('<ac:image><ri:attachment ri:filename="구성도.png" /></ac:image>')
+    return "".join(parts)
+
+
+def synthetic_page_listing(rng: random.Random, n_pages: int = 2000, space: str = "BENCH") -> List[Dict[str, str]]:
+    """get_pages_with_category와 같은 형식의 페이지 목록 (path 깊이 1~5)"""
+    categories = [f"카테고리 {i}" for i in range(8)]
+    subcategories = [f"하위 {i}" for i in range(10)]
+    pages = []
+    for i in range(n_pages):
+        depth = rng.choice([1, 2, 3, 3, 4, 5])
+        titles = ["스페이스 홈"]
+        if depth >= 2:
+            titles.append(rng.choice(categories))
+        if depth >= 3:
+            titles.append(rng.choice(subcategories))
+        titles.extend(f"폴더 {rng.randint(0, 20)}" for _ in range(max(0, depth - 3)))
+        title = f"문서 {i}"
+        page_id = str(100000 + i)
+        pages.append({
+            "id": page_id,
+            "title": title,
+            "path": " / ".join(titles + [title]),
+            "url": f"https://example.atlassian.net/wiki/spaces/{space}/pages/{page_id}",
+        })
+    return pages
+
+
+def load_page_listings(samples_dir: str = SAMPLES_DIR) -> List[Dict[str, str]]:
+    """samples/**/pages.json (녹화된 실제 페이지 목록)을 모두 합쳐 읽습니다."""
+    pages: List[Dict[str, str]] = []
+    for path in sorted(glob.glob(os.path.join(samples_dir, "**", "pages.json"), recursive=True)):
+        with open(path, encoding="utf-8") as f:
+            pages.extend(json.load(f))
+    return pages
+
+
+def synthetic_search_results(rng: random.Random, n_docs: int = 5, n_rows: int = 5) -> List[Dict[str, Any]]:
+    """search_documents 반환 형식의 검색 결과 (청크 + 표 행)"""
+    docs: List[Dict[str, Any]] = []
+    for i in range(n_docs):
+        body = "\n".join(_sentence(rng, rng.randint(10, 30)) for _ in range(12))
+        docs.append({
+            "score": 1.0 - i * 0.1,
+            "title": f"문서 {i}",
+            "content": f"[문서 제목: 문서 {i}]\n{body}",
+            "page_id": str(100000 + i),
+            "url": "#",
+        })
+    for i in range(n_rows):
+        docs.append({
+            "type": "table_row",
+            "score": 5.0 - i,
+            "title": f"문서 {i}",
+            "page_id": str(100000 + i),
+            "url": "#",
+            "section": "휴가 종류",
+            "row": {"구분": "연차", "일수": "15일"},
+            "content": "구분: 연차 | 일수: 15일 | 비고: 입사일 기준",
+        })
+    return docs
+
+
+# =================================================================
+# 측정
+# =================================================================
+class Case:
+    """벤치마크 케이스 하나. setup()이 만든 인자로 func를 반복 호출합니다. ops = 호출 1회당 처리 단위 수"""
+
+    def __init__(self, name: str, setup: Callable[[], Any], func: Callable[[Any], Any], unit: str, ops_per_call: Callable[[Any], int]):
+        self.name = name
+        self.setup = setup
+        self.func = func
+        self.unit = unit
+        self.ops_per_call = ops_per_call
+
+
+def measure(case: Case, min_time: float) -> Dict[str, Any]:
+    """min_time초 이상 반복해 ops/sec를 재고, 별도 1회 실행으로 tracemalloc 피크를 잽니다."""
+    arg = case.setup()
+    ops_per_call = case.ops_per_call(arg)
+
+    # 출력이 있는 함수(chunk_documents 등)가 측정을 방해하지 않도록 stdout을 버림
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        case.func(arg)  # 워밍업 (지연 import, 캐시 생성)
+
+        calls = 0
+        best = float("inf")
+        start = time.perf_counter()
+        while True:
+            t0 = time.perf_counter()
+            case.func(arg)
+            best = min(best, time.perf_counter() - t0)
+            calls += 1
+            sink.seek(0)
+            sink.truncate()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time and calls >= 3:
+                break
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        case.func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "unit": case.unit,
+        "ops_per_call": ops_per_call,
+        "calls": calls,
+        "ops_per_sec": round(calls * ops_per_call / elapsed, 2),
+        "best_call_ms": round(best * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+# =================================================================
+# 케이스 정의
+# =================================================================
+def _chunking_manager() -> EmbeddingManager:
+    """ES/임베딩 서버 연결 없이 chunk_documents만 쓰기 위한 EmbeddingManager (__init__과 같은 분할기 설정)"""
+    manager = EmbeddingManager.__new__(EmbeddingManager)
+    manager.text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=int(os.getenv("CHUNK_TOKENS", "350")),
+        chunk_overlap=int(os.getenv("CHUNK_OVERLAP_TOKENS", "40")),
+        length_function=count_tokens,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    return manager
+
+
+def build_cases(samples_dir: str, seed: int, n_pages: int) -> List[Case]:
+    rng = random.Random(seed)
+    corpus: List[Tuple[str, str]] = load_corpus(samples_dir)
+    corpus += [(f"synthetic_{i}", synthetic_storage_html(rng)) for i in range(5)]
+
+    listing = load_page_listings(samples_dir) or synthetic_page_listing(rng, n_pages)
+    search_results = synthetic_search_results(rng)
+    chunker = StructureChunker(
+        chunk_tokens=int(os.getenv("CHUNK_TOKENS", "350")),
+        overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "40")),
+    )
+    manager = _chunking_manager()
+
+    def parse_all(engine: str):
+        for name, html in corpus:
+            parse_storage_html(name, html, fake_child_pages, engine=engine)
+
+    def parsed_corpus():
+        return [(name, parse_storage_html(name, html, fake_child_pages)) for name, html in corpus]
+
+    def table_tags():
+        tags = []
+        for _, html in corpus:
+            tags.extend(BeautifulSoup(html, "html.parser").find_all("table"))
+        return tags
+
+    def documents():
+        return [
+            Document(page_content=parsed["combined_text"], metadata={"title": name, "page_id": name})
+            for name, parsed in parsed_corpus()
+            if parsed["combined_text"]
+        ]
+
+    def run_chunk_parsed(items):
+        for name, parsed in items:
+            chunker.chunk_parsed(parsed, name)
+
+    return [
+        Case("parse_storage_html[fast]", lambda: corpus, lambda _: parse_all("fast"), "pages", len),
+        Case("parse_storage_html[bs4]", lambda: corpus, lambda _: parse_all("bs4"), "pages", len),
+        Case("table_to_records", table_tags, lambda tags: [table_to_records(t) for t in tags], "tables", len),
+        Case("chunk_documents", documents, manager.chunk_documents, "docs", len),
+        Case("StructureChunker.chunk_parsed", parsed_corpus, run_chunk_parsed, "pages", len),
+        Case("pages_to_dataframe", lambda: listing, pages_to_dataframe, "pages", len),
+        Case(
+            "build_structure_tree",
+            lambda: pages_to_dataframe(listing),
+            # build_structure_tree는 level_1/level_2 컬럼을 정리하며 df를 수정하므로 매번 복사본 사용
+            lambda df: build_structure_tree(df.copy()),
+            "pages", len,
+        ),
+        Case("PageRegistry.from_listing", lambda: listing, PageRegistry.from_listing, "pages", len),
+        Case("PageRegistry.tree", lambda: PageRegistry.from_listing(listing), PageRegistry.tree, "pages", len),
+        Case("format_documents", lambda: search_results, ConfluenceChatbot.format_documents, "results", len),
+    ]
+
+
+# =================================================================
+# 결과 저장/비교
+# =================================================================
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """ops/sec가 threshold 비율 이상 떨어지거나 피크 메모리가 그만큼 늘어난 케이스 이름 목록"""
+    regressions = []
+    print(f"\n📊 기준선 비교 (commit {baseline.get('commit')} → {results.get('commit')}, 허용 {threshold:.0%})")
+    for name, cur in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            print(f"   {name:<32} (기준선 없음)")
+            continue
+        speed = cur["ops_per_sec"] / base["ops_per_sec"] if base["ops_per_sec"] else 1.0
+        memory = cur["peak_kb"] / base["peak_kb"] if base["peak_kb"] else 1.0
+        slow = speed < 1 - threshold
+        fat = memory > 1 + threshold
+        mark = "❌" if slow or fat else "✅"
+        print(f"   {mark} {name:<32} 속도 {speed:6.2f}x   메모리 {memory:6.2f}x")
+        if slow or fat:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="오프라인 마이크로 벤치마크")
+    parser.add_argument("--samples", default=SAMPLES_DIR)
+    parser.add_argument("--min-time", type=float, default=1.0, help="케이스당 최소 측정 시간(초)")
+    parser.add_argument("--pages", type=int, default=2000, help="녹화된 pages.json이 없을 때 합성할 페이지 수")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="이름에 이 문자열이 들어간 케이스만 실행")
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="비교할 기준선 JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="회귀로 볼 성능 저하 비율")
+    args = parser.parse_args()
+
+    cases = build_cases(args.samples, args.seed, args.pages)
+    if args.only:
+        cases = [c for c in cases if args.only in c.name]
+
+    results: Dict[str, Any] = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "min_time": args.min_time,
+        "seed": args.seed,
+        "cases": {},
+    }
+
+    print(f"⏱️ 벤치마크 {len(cases)}개 (케이스당 {args.min_time}s 이상)")
+    for case in cases:
+        r = measure(case, args.min_time)
+        results["cases"][case.name] = r
+        print(f"   {case.name:<32} {r['ops_per_sec']:>12,.1f} {r['unit']}/s   피크 {r['peak_kb']:>10,.1f} KB")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장: {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ 회귀 {len(regressions)}건: {', '.join(regressions)}")
+            return 1
+        print("✅ 회귀 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
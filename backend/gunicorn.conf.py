@@ -0,0 +1,39 @@
+"""
+멀티 워커 실행 설정 (gunicorn + uvicorn 워커)
+
+    gunicorn main:root_app -c gunicorn.conf.py
+
+- 워커 수: WEB_CONCURRENCY (기본 2)
+- 워커끼리 공유하는 상태(캐시/작업 상태/잠금)는 onboarding/app/shared_state.py
+  (기본 /dev/shm SQLite, 여러 호스트면 SHARED_STATE_URL=redis://...)
+- /metrics는 PROMETHEUS_MULTIPROC_DIR에 워커별 지표 파일을 모아 합산
+- preload_app을 끄고 워커마다 앱을 임포트 (ES/임베딩/LLM 클라이언트는 fork 이후 각 워커에서 생성)
+"""
+
+import os
+import shutil
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = False
+# /chat은 LLM 응답까지 수십 초가 걸릴 수 있음
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# 멀티 프로세스 Prometheus 지표 디렉터리 (워커 임포트 전에 환경변수로 넘겨야 함)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/dev/shm/onboarding_metrics" if os.path.isdir("/dev/shm") else "/tmp/onboarding_metrics")
+
+
+def on_starting(server):
+    # 이전 실행의 지표 파일이 남아 있으면 합산이 틀어지므로 비우고 시작
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,3 @@
+"""
+E2E 부하 테스트 (Confluence/임베딩/LLM/ES 대역 서비스 + asyncio 부하 발생기)
+"""
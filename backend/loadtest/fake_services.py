@@ -0,0 +1,725 @@
+"""
+부하 테스트용 로컬 대역(fake) 서비스
+- Confluence REST: 생성된 페이지 트리 (목록/본문/하위 페이지/버전)
+- OpenAI 호환 API: /v1/embeddings (지연 시간 설정 가능), /v1/chat/completions (stream 지원, 토큰 단위 지연)
+- Elasticsearch: 앱이 쓰는 API만 구현한 인메모리 스텁 (인덱스 생성/bulk/search/msearch/count/delete_by_query/PIT)
+
+사용법 (backend 폴더에서):
+    python -m loadtest.fake_services --pages 500 --embed-latency 0.05 --llm-token-delay 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.bench_suite import synthetic_storage_html
+
+ROOT_TITLE = "LLOYDK에 오신 걸 환영합니다!"
+EMBEDDING_DIM = 1024
+
+
+# =================================================================
+# Confluence
+# =================================================================
+def generate_page_tree(n_pages: int, fanout: int = 6, seed: int = 7) -> Dict[str, Dict[str, Any]]:
+    """루트 1개 + 너비 우선으로 fanout개씩 달린 n_pages개의 페이지 트리를 만듭니다."""
+    rng = random.Random(seed)
+    pages: Dict[str, Dict[str, Any]] = {}
+    root_id = "10000"
+    pages[root_id] = {"id": root_id, "title": ROOT_TITLE, "parent": None, "children": []}
+
+    queue = [root_id]
+    next_id = 10001
+    while len(pages) < n_pages and queue:
+        parent_id = queue.pop(0)
+        for _ in range(fanout):
+            if len(pages) >= n_pages:
+                break
+            page_id = str(next_id)
+            next_id += 1
+            pages[page_id] = {"id": page_id, "title": f"문서 {page_id}", "parent": parent_id, "children": []}
+            pages[parent_id]["children"].append(page_id)
+            queue.append(page_id)
+
+    for page in pages.values():
+        page["html"] = synthetic_storage_html(
+            rng, n_sections=rng.randint(3, 10), n_tables=rng.randint(0, 2), n_rows=rng.randint(5, 30)
+        )
+        page["when"] = f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T09:00:00.000Z"
+        page["authors"] = [f"사용자 {rng.randint(1, 30)}" for _ in range(rng.randint(1, 6))]
+
+    # 페이지 간 링크: 앞쪽(상위) 페이지로 갈수록 많이 링크되도록 치우치게 (링크 그래프/PageRank 확인용)
+    ids = list(pages)
+    for page in pages.values():
+        targets = {ids[min(int(rng.paretovariate(1.2)) - 1, len(ids) - 1)] for _ in range(rng.randint(0, 4))}
+        links = "".join(
+            f'<ac:link><ri:page ri:content-title="{pages[t]["title"]}" /><ac:plain-text-link-body>'
+            f'<![CDATA[{pages[t]["title"]}]]></ac:plain-text-link-body></ac:link> '
+            for t in targets if t != page["id"]
+        )
+        if links:
+            page["html"] += f"<p>관련 문서: {links}</p>"
+
+    # 형제 순서(extensions.position)는 목록 순서(id 순)와 다르게 섞어 둠 (child/page 응답은 위치 순)
+    for page in pages.values():
+        rng.shuffle(page["children"])
+        for position, child_id in enumerate(page["children"]):
+            pages[child_id]["position"] = position
+    return pages
+
+
+def create_confluence_app(pages: Dict[str, Dict[str, Any]], space_key: str = "LOAD") -> FastAPI:
+    app = FastAPI(title="Fake Confluence")
+
+    def ancestors(page: Dict[str, Any]) -> List[Dict[str, str]]:
+        chain = []
+        parent_id = page["parent"]
+        while parent_id:
+            parent = pages[parent_id]
+            chain.insert(0, {"id": parent_id, "title": parent["title"]})
+            parent_id = parent["parent"]
+        return chain
+
+    def render(page: Dict[str, Any], expand: str) -> Dict[str, Any]:
+        item: Dict[str, Any] = {
+            "id": page["id"], "type": "page", "status": "current", "title": page["title"],
+            "extensions": {"position": page.get("position", "none")},
+        }
+        if "ancestors" in expand:
+            item["ancestors"] = ancestors(page)
+        if "space" in expand:
+            item["space"] = {"key": space_key}
+        if "body.storage" in expand:
+            item["body"] = {"storage": {"value": page["html"], "representation": "storage"}}
+        if "version" in expand:
+            item["version"] = {"when": page["when"], "number": len(page["authors"])}
+        if "history" in expand:
+            item["history"] = {"createdDate": page["when"]}
+        return item
+
+    def paginate(items: List[Dict[str, Any]], path: str, start: int, limit: int, expand: str) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"results": items[start:start + limit], "start": start, "limit": limit, "_links": {}}
+        if start + limit < len(items):
+            data["_links"]["next"] = f"/wiki{path}?start={start + limit}&limit={limit}&expand={expand}"
+        return data
+
+    @app.get("/wiki/rest/api/content")
+    def list_content(spaceKey: str = space_key, title: Optional[str] = None, start: int = 0, limit: int = 25, expand: str = ""):
+        if title is not None:
+            matched = [render(p, expand) for p in pages.values() if p["title"] == title]
+            return {"results": matched, "start": 0, "limit": limit, "_links": {}}
+        items = [render(p, expand) for p in pages.values()]
+        return paginate(items, "/rest/api/content", start, limit, expand)
+
+    @app.get("/wiki/rest/api/content/{page_id}")
+    def get_content(page_id: str, expand: str = ""):
+        page = pages.get(page_id)
+        if not page:
+            return JSONResponse({"message": "not found"}, status_code=404)
+        return render(page, expand)
+
+    @app.get("/wiki/rest/api/content/{page_id}/child/page")
+    def get_children(page_id: str, start: int = 0, limit: int = 25, expand: str = ""):
+        page = pages.get(page_id)
+        if not page:
+            return JSONResponse({"message": "not found"}, status_code=404)
+        items = [render(pages[c], expand) for c in page["children"]]
+        return paginate(items, f"/rest/api/content/{page_id}/child/page", start, limit, expand)
+
+    # 웹훅 재색인 확인용: 페이지 생성/수정/삭제 (버전 검사 등은 생략)
+    @app.post("/wiki/rest/api/content")
+    async def create_content(request: Request):
+        body = await request.json()
+        parent_id = (body.get("ancestors") or [{}])[-1].get("id")
+        page_id = str(max(int(p) for p in pages) + 1)
+        pages[page_id] = {
+            "id": page_id, "title": body["title"], "parent": parent_id, "children": [],
+            "html": body["body"]["storage"]["value"], "when": time.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "authors": ["웹훅 테스트"],
+        }
+        if parent_id in pages:
+            pages[parent_id]["children"].append(page_id)
+        return render(pages[page_id], "")
+
+    @app.put("/wiki/rest/api/content/{page_id}")
+    async def update_content(page_id: str, request: Request):
+        page = pages.get(page_id)
+        if not page:
+            return JSONResponse({"message": "not found"}, status_code=404)
+        body = await request.json()
+        page["title"] = body.get("title", page["title"])
+        if "body" in body:
+            page["html"] = body["body"]["storage"]["value"]
+        page["when"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return render(page, "")
+
+    @app.delete("/wiki/rest/api/content/{page_id}", status_code=204)
+    def delete_content(page_id: str):
+        page = pages.pop(page_id, None)
+        if not page:
+            return JSONResponse({"message": "not found"}, status_code=404)
+        if page["parent"] in pages:
+            pages[page["parent"]]["children"].remove(page_id)
+        return Response(status_code=204)
+
+    @app.get("/wiki/rest/api/content/{page_id}/version")
+    def get_versions(page_id: str, limit: int = 200):
+        page = pages.get(page_id)
+        if not page:
+            return JSONResponse({"message": "not found"}, status_code=404)
+        return {"results": [{"number": i + 1, "by": {"displayName": a}} for i, a in enumerate(page["authors"])]}
+
+    return app
+
+
+# =================================================================
+# OpenAI 호환 (임베딩 + 채팅)
+# =================================================================
+def fake_vector(text: str) -> List[float]:
+    """텍스트마다 항상 같은 단위 벡터 (같은 질문 → 같은 검색 결과)"""
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    vec = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+    return vec.round(5).tolist()
+
+
+def create_openai_app(
+    embed_latency: float = 0.05,
+    embed_latency_per_text: float = 0.002,
+    embed_error_rate: float = 0.0,
+    llm_ttft: float = 0.3,
+    llm_token_delay: float = 0.02,
+    llm_tokens: int = 80,
+    llm_slow_rate: float = 0.0,
+    llm_slow_ttft: float = 5.0
+) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI-compatible API")
+    seen_prefixes = set()  # 프롬프트 접두사 캐시 흉내 (system 메시지가 전에 온 적 있으면 그만큼 cached_tokens)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(embed_latency + embed_latency_per_text * len(inputs))
+        if embed_error_rate and random.random() < embed_error_rate:
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+        return {
+            "object": "list",
+            "model": body.get("model", "bge-m3"),
+            "data": [{"object": "embedding", "index": i, "embedding": fake_vector(t)} for i, t in enumerate(inputs)],
+        }
+
+    def answer_tokens(messages: List[Dict[str, Any]]) -> List[str]:
+        question = str(messages[-1].get("content", "")) if messages else ""
+        return [f"{question[:20]} 관련 답변 토큰{i} " for i in range(llm_tokens)]
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "gpt-4o-mini")
+        messages = body.get("messages", [])
+        tokens = answer_tokens(messages)
+        created = int(time.time())
+        completion_id = f"chatcmpl-{random.getrandbits(48):x}"
+        ttft = llm_slow_ttft if llm_slow_rate and random.random() < llm_slow_rate else llm_ttft
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 2
+        prefix = str(messages[0].get("content", "")) if messages and messages[0].get("role") == "system" else ""
+        cached_tokens = len(prefix) // 2 if prefix in seen_prefixes else 0
+        seen_prefixes.add(prefix)
+        usage = {
+            "prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + llm_token_delay * len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            for tok in tokens:
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(llm_token_delay)
+            last = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(last)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": usage,
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+# =================================================================
+# Elasticsearch (인메모리 스텁)
+# =================================================================
+_WORD = re.compile(r"\w+")
+
+
+def _tokens(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [t for v in value for t in _tokens(v)]
+    return _WORD.findall(str(value).lower()) if value is not None else []
+
+
+class _FakeIndex:
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[str] = []
+
+    def put(self, doc_id: str, source: Dict[str, Any]):
+        self.docs[doc_id] = source
+        self._matrix = None
+
+    def delete(self, doc_ids: List[str]):
+        for doc_id in doc_ids:
+            self.docs.pop(doc_id, None)
+        self._matrix = None
+
+    def knn_scores(self, field: str, vector: List[float]) -> Dict[str, float]:
+        if self._matrix is None:
+            self._matrix_ids = [i for i, d in self.docs.items() if d.get(field)]
+            self._matrix = np.array([self.docs[i][field] for i in self._matrix_ids], dtype=np.float32) if self._matrix_ids else None
+        if self._matrix is None:
+            return {}
+        sims = self._matrix @ np.asarray(vector, dtype=np.float32)
+        return {doc_id: float((1 + s) / 2) for doc_id, s in zip(self._matrix_ids, sims)}
+
+
+def _field_values(source: Dict[str, Any], field: str) -> List[Any]:
+    field = field.split("^")[0].replace(".keyword", "")
+    value = source.get(field)
+    return value if isinstance(value, list) else [value]
+
+
+def _text_score(source: Dict[str, Any], fields: List[str], query: str) -> float:
+    q = set(_tokens(query))
+    score = 0.0
+    for field in fields:
+        weight = float(field.split("^")[1]) if "^" in field else 1.0
+        score += weight * len(q & set(_tokens(_field_values(source, field))))
+    return score
+
+
+def _evaluate(query: Dict[str, Any], source: Dict[str, Any]) -> Optional[float]:
+    """쿼리 DSL 일부(match_all/term/terms/range/exists/match/multi_match/rank_feature/bool)를 평가합니다. 불일치면 None"""
+    if not query or "match_all" in query:
+        return 1.0
+    if "exists" in query:
+        return 1.0 if any(v not in (None, []) for v in _field_values(source, query["exists"]["field"])) else None
+    if "rank_feature" in query:
+        # saturation: S / (S + pivot)
+        spec = query["rank_feature"]
+        value = source.get(spec["field"])
+        if not isinstance(value, (int, float)) or value <= 0:
+            return None
+        pivot = float((spec.get("saturation") or {}).get("pivot", 1.0))
+        return value / (value + pivot) * float(spec.get("boost", 1.0))
+    if "term" in query:
+        field, value = next(iter(query["term"].items()))
+        value = value.get("value") if isinstance(value, dict) else value
+        return 1.0 if value in _field_values(source, field) else None
+    if "terms" in query:
+        spec = {k: v for k, v in query["terms"].items() if k != "boost"}
+        field, values = next(iter(spec.items()))
+        hits = len(set(values) & set(_field_values(source, field)))
+        return hits * float(query["terms"].get("boost", 1.0)) if hits else None
+    if "range" in query:
+        field, bounds = next(iter(query["range"].items()))
+        values = [v for v in _field_values(source, field) if v is not None]
+        ops = {"gte": lambda v, b: v >= b, "gt": lambda v, b: v > b, "lte": lambda v, b: v <= b, "lt": lambda v, b: v < b}
+        ok = any(all(ops[op](v, b) for op, b in bounds.items() if op in ops) for v in values)
+        return 1.0 if ok else None
+    if "match" in query:
+        field, spec = next(iter(query["match"].items()))
+        text = spec.get("query") if isinstance(spec, dict) else spec
+        score = _text_score(source, [field], text)
+        return score or None
+    if "multi_match" in query:
+        spec = query["multi_match"]
+        score = _text_score(source, spec.get("fields", ["content"]), spec.get("query", ""))
+        return score * float(spec.get("boost", 1.0)) or None
+    if "bool" in query:
+        spec = query["bool"]
+        score = 0.0
+        for clause in _as_list(spec.get("must")):
+            s = _evaluate(clause, source)
+            if s is None:
+                return None
+            score += s
+        for clause in _as_list(spec.get("filter")):
+            if _evaluate(clause, source) is None:
+                return None
+        for clause in _as_list(spec.get("must_not")):
+            if _evaluate(clause, source) is not None:
+                return None
+        should = _as_list(spec.get("should"))
+        matched = [s for s in (_evaluate(c, source) for c in should) if s is not None]
+        required = spec.get("minimum_should_match", 0 if (spec.get("must") or spec.get("filter")) else 1)
+        if should and len(matched) < int(required):
+            return None
+        return score + sum(matched) or 1.0
+    return None
+
+
+def _composite(spec: Dict[str, Any], sources: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """composite 집계 (terms 소스만, 배열 필드는 값마다 버킷, after 페이지 넘김)"""
+    names = [next(iter(src)) for src in spec["sources"]]
+    fields = [src[name]["terms"]["field"] for src, name in zip(spec["sources"], names)]
+    counts: Dict[tuple, int] = {}
+    for source in sources:
+        combos: List[tuple] = [()]
+        for field in fields:
+            values = [v for v in _field_values(source, field) if v is not None]
+            combos = [c + (v,) for c in combos for v in dict.fromkeys(values)]
+        for combo in combos:
+            counts[combo] = counts.get(combo, 0) + 1
+    keys = sorted(counts)
+    if spec.get("after"):
+        after = tuple(spec["after"][name] for name in names)
+        keys = [k for k in keys if k > after]
+    keys = keys[:int(spec.get("size", 10))]
+    buckets = [{"key": dict(zip(names, k)), "doc_count": counts[k]} for k in keys]
+    result: Dict[str, Any] = {"buckets": buckets}
+    if buckets:
+        result["after_key"] = buckets[-1]["key"]
+    return result
+
+
+def _rebase_ancestors(source: Dict[str, Any], params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """hierarchy.rebase_descendants 스크립트와 같은 동작 (조상 체인에서 page_id까지를 새 체인으로)"""
+    ids = source.get("ancestor_ids") or []
+    if params["page_id"] not in ids:
+        return None
+    i = ids.index(params["page_id"])
+    new_ids = params["chain_ids"] + ids[i + 1:]
+    new_titles = params["chain_titles"] + (source.get("ancestor_titles") or [])[i + 1:]
+    return {
+        **source, "ancestor_ids": new_ids, "ancestor_titles": new_titles, "depth": len(new_ids),
+        "category_path": [f"{j}:{t}" for j, t in enumerate(new_titles + [source.get("title")])],
+    }
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _project(source: Dict[str, Any], includes: Any) -> Dict[str, Any]:
+    if not includes or includes is True:
+        return source
+    includes = _as_list(includes)
+    return {k: v for k, v in source.items() if k in includes}
+
+
+def create_es_app() -> FastAPI:
+    app = FastAPI(title="Fake Elasticsearch")
+    indices: Dict[str, _FakeIndex] = {}
+    pits: Dict[str, List[tuple]] = {}  # PIT id → 연 시점의 (인덱스, 문서 id, 원본) 목록
+
+    @app.middleware("http")
+    async def product_header(request: Request, call_next):
+        # elasticsearch-py 8은 이 헤더가 없으면 "Elasticsearch가 아님"으로 거부
+        response = await call_next(request)
+        response.headers["X-Elastic-Product"] = "Elasticsearch"
+        return response
+
+    async def read_json(request: Request) -> Dict[str, Any]:
+        raw = await request.body()
+        return json.loads(raw) if raw else {}
+
+    @app.get("/")
+    def info():
+        return {"name": "fake-es", "cluster_name": "loadtest", "version": {"number": "8.11.0"}, "tagline": "You Know, for Search"}
+
+    @app.api_route("/_bulk", methods=["POST", "PUT"])
+    @app.api_route("/{index}/_bulk", methods=["POST", "PUT"])
+    async def bulk(request: Request, index: Optional[str] = None):
+        lines = [line for line in (await request.body()).decode("utf-8").split("\n") if line.strip()]
+        items = []
+        i = 0
+        while i < len(lines):
+            action = json.loads(lines[i])
+            op, meta = next(iter(action.items()))
+            target = indices.setdefault(meta.get("_index", index), _FakeIndex())
+            doc_id = meta.get("_id") or f"auto_{random.getrandbits(64):x}"
+            if op == "delete":
+                target.delete([doc_id])
+                i += 1
+            else:
+                source = json.loads(lines[i + 1])
+                if op == "update":
+                    source = {**target.docs.get(doc_id, {}), **source.get("doc", {})}  # 부분 업데이트
+                target.put(doc_id, source)
+                i += 2
+            items.append({op: {"_index": meta.get("_index", index), "_id": doc_id, "status": 201, "result": "created"}})
+        return {"took": 1, "errors": False, "items": items}
+
+    @app.api_route("/{index}", methods=["HEAD"])
+    def exists(index: str):
+        return Response(status_code=200 if index in indices else 404)
+
+    @app.put("/{index}")
+    def create(index: str):
+        if index in indices:
+            return JSONResponse({"error": {"type": "resource_already_exists_exception"}, "status": 400}, status_code=400)
+        indices[index] = _FakeIndex()
+        return {"acknowledged": True, "shards_acknowledged": True, "index": index}
+
+    # "/{index}"보다 먼저 등록해야 DELETE /_pit이 인덱스 삭제로 가지 않음
+    @app.delete("/_pit")
+    async def close_pit(request: Request):
+        body = await read_json(request)
+        found = pits.pop(body.get("id", ""), None) is not None
+        return {"succeeded": found, "num_freed": int(found)}
+
+    @app.delete("/{index}")
+    def delete_index(index: str):
+        indices.pop(index, None)
+        return {"acknowledged": True}
+
+    @app.api_route("/{index}/_settings", methods=["GET"])
+    @app.api_route("/{index}/_settings/{name}", methods=["GET"])
+    def get_settings(index: str, name: str = ""):
+        return {index: {"settings": {"index": {}}}}
+
+    @app.api_route("/{index}/_settings", methods=["PUT"])
+    def put_settings(index: str):
+        return {"acknowledged": True}
+
+    @app.api_route("/{index}/_mapping", methods=["PUT", "POST"])
+    def put_mapping(index: str):
+        return {"acknowledged": True}
+
+    @app.post("/{index}/_update_by_query")
+    async def update_by_query(index: str, request: Request):
+        # 스크립트는 실행하지 않고 params 모양으로 어떤 스크립트인지 보고 같은 결과를 만듦
+        # graph: link_graph (page_rank/neighbors), pages: 계층 필드 덮어쓰기, chain_ids: 하위 페이지 조상 체인 교체,
+        # fields: 필드 지우기
+        body = await read_json(request)
+        target = indices.get(index)
+        if target is None:
+            if request.query_params.get("ignore_unavailable") == "true":
+                return {"updated": 0, "failures": []}
+            return JSONResponse({"error": {"type": "index_not_found_exception"}, "status": 404}, status_code=404)
+        params = (body.get("script") or {}).get("params") or {}
+        updated = 0
+        for doc_id, source in list(target.docs.items()):
+            if _evaluate(body.get("query", {}), source) is None:
+                continue
+            new_source = None
+            if "graph" in params and source.get("page_id") in params["graph"]:
+                g = params["graph"][source["page_id"]]
+                new_source = {**source, "page_rank": g["rank"], "neighbors": g["neighbors"]}
+            elif "pages" in params and source.get("page_id") in params["pages"]:
+                new_source = {**source, **params["pages"][source["page_id"]]}
+            elif "chain_ids" in params:
+                new_source = _rebase_ancestors(source, params)
+            elif "fields" in params:
+                new_source = {k: v for k, v in source.items() if k not in params["fields"]}
+            if new_source is not None:
+                target.put(doc_id, new_source)
+                updated += 1
+        return {"updated": updated, "failures": []}
+
+    @app.api_route("/{index}/_refresh", methods=["GET", "POST"])
+    def refresh(index: str):
+        return {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+
+    @app.post("/{index}/_pit")
+    def open_pit(index: str):
+        pit_id = f"pit_{random.getrandbits(64):x}"
+        pits[pit_id] = [
+            (name, doc_id, dict(source))
+            for name in index.split(",") if name in indices
+            for doc_id, source in indices[name].docs.items()
+        ]
+        return {"id": pit_id}
+
+    @app.api_route("/{index}/_count", methods=["GET", "POST"])
+    async def count(index: str, request: Request):
+        body = await read_json(request)
+        target = indices.get(index)
+        if target is None:
+            return JSONResponse({"error": {"type": "index_not_found_exception"}, "status": 404}, status_code=404)
+        n = sum(1 for s in target.docs.values() if _evaluate(body.get("query", {}), s) is not None)
+        return {"count": n}
+
+    @app.post("/{index}/_delete_by_query")
+    async def delete_by_query(index: str, request: Request):
+        body = await read_json(request)
+        target = indices.get(index)
+        if target is None:
+            return JSONResponse({"error": {"type": "index_not_found_exception"}, "status": 404}, status_code=404)
+        doomed = [i for i, s in target.docs.items() if _evaluate(body.get("query", {}), s) is not None]
+        target.delete(doomed)
+        return {"deleted": len(doomed), "failures": []}
+
+    def run_search(index: str, body: Dict[str, Any], size: int, includes: Any, ignore_unavailable: bool) -> Dict[str, Any]:
+        names = index.split(",")
+        missing = [name for name in names if name not in indices]
+        if missing and not ignore_unavailable:
+            return {"error": {"type": "index_not_found_exception", "index": missing[0]}, "status": 404}
+
+        scores: Dict[tuple, float] = {}
+        for name in names:
+            target = indices.get(name)
+            if target is None:
+                continue
+            if "query" in body or "knn" not in body:
+                for doc_id, source in target.docs.items():
+                    s = _evaluate(body.get("query", {}), source)
+                    if s is not None:
+                        scores[(name, doc_id)] = s
+
+            for knn in _as_list(body.get("knn")):
+                ranked = sorted(target.knn_scores(knn["field"], knn["query_vector"]).items(), key=lambda kv: -kv[1])
+                if knn.get("filter"):
+                    ranked = [
+                        (d, s) for d, s in ranked
+                        if all(_evaluate(f, target.docs[d]) is not None for f in _as_list(knn["filter"]))
+                    ]
+                for doc_id, s in ranked[:int(knn.get("k", 10))]:
+                    key = (name, doc_id)
+                    scores[key] = scores.get(key, 0.0) + s * float(knn.get("boost", 1.0))
+
+        top = sorted(scores.items(), key=lambda kv: -kv[1])[:size]
+        hits = [
+            {"_index": name, "_id": doc_id, "_score": s, "_source": _project(indices[name].docs[doc_id], includes)}
+            for (name, doc_id), s in top
+        ]
+        result: Dict[str, Any] = {
+            "took": 1, "timed_out": False,
+            "hits": {"total": {"value": len(scores), "relation": "eq"}, "max_score": top[0][1] if top else None, "hits": hits},
+        }
+        aggs = body.get("aggs") or body.get("aggregations")
+        if aggs:
+            matched = [indices[name].docs[doc_id] for name, doc_id in scores]
+            result["aggregations"] = {
+                agg_name: _composite(spec["composite"], matched) for agg_name, spec in aggs.items() if "composite" in spec
+            }
+        return result
+
+    @app.api_route("/{index}/_search", methods=["GET", "POST"])
+    async def search(index: str, request: Request):
+        body = await read_json(request)
+        params = request.query_params
+        result = run_search(
+            index, body, int(params.get("size", body.get("size", 10))),
+            body.get("_source", params.get("_source_includes")), params.get("ignore_unavailable") == "true"
+        )
+        if "error" in result:
+            return JSONResponse(result, status_code=404)
+        return result
+
+    @app.api_route("/_search", methods=["GET", "POST"])
+    async def pit_search(request: Request):
+        # PIT + search_after (sort는 _shard_doc 순서 = 연 시점의 문서 순서만 지원)
+        body = await read_json(request)
+        snapshot = pits.get((body.get("pit") or {}).get("id", ""))
+        if snapshot is None:
+            return JSONResponse({"error": {"type": "search_context_missing_exception"}, "status": 404}, status_code=404)
+        start = int(body["search_after"][0]) + 1 if body.get("search_after") else 0
+        size = int(body.get("size", 10))
+        hits = [
+            {"_index": name, "_id": doc_id, "_score": None, "_source": _project(source, body.get("_source")), "sort": [pos]}
+            for pos, (name, doc_id, source) in enumerate(snapshot[start:start + size], start=start)
+        ]
+        return {"took": 1, "timed_out": False, "pit_id": body["pit"]["id"], "hits": {"hits": hits}}
+
+    @app.api_route("/_msearch", methods=["GET", "POST"])
+    async def msearch(request: Request):
+        lines = [json.loads(line) for line in (await request.body()).decode("utf-8").split("\n") if line.strip()]
+        responses = []
+        for header, body in zip(lines[0::2], lines[1::2]):
+            responses.append(run_search(
+                header["index"] if isinstance(header["index"], str) else ",".join(header["index"]),
+                body, int(body.get("size", 10)), body.get("_source"), bool(header.get("ignore_unavailable"))
+            ))
+        return {"took": 1, "responses": responses}
+
+    return app
+
+
+# =================================================================
+# 실행
+# =================================================================
+async def serve_all(
+    host: str, ports: Dict[str, int], apps: Dict[str, FastAPI]
+):
+    servers = [
+        uvicorn.Server(uvicorn.Config(apps[name], host=host, port=ports[name], log_level="warning", access_log=False))
+        for name in apps
+    ]
+    for name in apps:
+        print(f"🧪 fake {name}: http://{host}:{ports[name]}")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="부하 테스트용 로컬 대역 서비스")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--confluence-port", type=int, default=9301)
+    parser.add_argument("--openai-port", type=int, default=9302)
+    parser.add_argument("--es-port", type=int, default=9303)
+    parser.add_argument("--no-es", action="store_true", help="실제 로컬 ES를 쓸 때 ES 스텁을 띄우지 않음")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="임베딩 요청당 기본 지연(초)")
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.002, help="입력 텍스트 1개당 추가 지연(초)")
+    parser.add_argument("--embed-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="첫 토큰까지 지연(초)")
+    parser.add_argument("--llm-token-delay", type=float, default=0.02, help="토큰 간 지연(초)")
+    parser.add_argument("--llm-tokens", type=int, default=80)
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="첫 토큰이 느린(꼬리 지연) 요청 비율")
+    parser.add_argument("--llm-slow-ttft", type=float, default=5.0, help="느린 요청의 첫 토큰 지연(초)")
+    args = parser.parse_args()
+
+    apps = {
+        "confluence": create_confluence_app(generate_page_tree(args.pages)),
+        "openai": create_openai_app(
+            args.embed_latency, args.embed_latency_per_text, args.embed_error_rate,
+            args.llm_ttft, args.llm_token_delay, args.llm_tokens, args.llm_slow_rate, args.llm_slow_ttft
+        ),
+    }
+    if not args.no_es:
+        apps["es"] = create_es_app()
+    ports = {"confluence": args.confluence_port, "openai": args.openai_port, "es": args.es_port}
+    asyncio.run(serve_all(args.host, ports, apps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+asyncio 기반 HTTP 부하 발생기
+- closed-loop: 동시 사용자 N명이 응답을 받자마자 다음 요청 (최대 처리량 측정)
+- open-loop(--rate): 초당 R건을 포아송 도착으로 보내고, 예정 시각부터 지연을 잼 (coordinated omission 방지)
+- 엔드포인트별 p50/p95/p99 지연, 처리량, 오류율을 집계
+"""
+
+import asyncio
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+
+class Scenario:
+    """부하 대상 엔드포인트 하나. weight 비율로 섞어서 호출합니다."""
+
+    def __init__(self, name: str, method: str, path: str, weight: float = 1.0, json_factory: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.weight = weight
+        self.json_factory = json_factory
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.status_counts: Dict[str, int] = {}
+
+    def record(self, latency: float, status: str, ok: bool):
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        total = len(self.latencies) + self.errors
+        ordered = sorted(self.latencies)
+        return {
+            "requests": total,
+            "ok": len(ordered),
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "throughput_rps": round(len(ordered) / duration, 2) if duration else 0.0,
+            "p50_ms": _percentile_ms(ordered, 50),
+            "p95_ms": _percentile_ms(ordered, 95),
+            "p99_ms": _percentile_ms(ordered, 99),
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+            "status": self.status_counts,
+        }
+
+
+def _percentile_ms(ordered: List[float], pct: float) -> Optional[float]:
+    """nearest-rank 백분위수 (ms)"""
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[rank] * 1000, 1)
+
+
+async def _send(
+    client: httpx.AsyncClient, scenario: Scenario, stats: Dict[str, EndpointStats], started: float, user: Optional[str] = None
+):
+    try:
+        kwargs: Dict[str, Any] = {"json": scenario.json_factory()} if scenario.json_factory else {}
+        if user:
+            # 가상 사용자마다 브라우저 id처럼 X-User-Id를 붙임 (사용자별 한도가 실제처럼 적용됨)
+            kwargs["headers"] = {"X-User-Id": user}
+        response = await client.request(scenario.method, scenario.path, **kwargs)
+        # 스트리밍 응답도 본문을 끝까지 받은 시점을 완료로 봄
+        await response.aread()
+        ok = response.status_code < 400
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        ok, status = False, type(e).__name__
+    stats[scenario.name].record(time.perf_counter() - started, status, ok)
+
+
+async def run_load(
+    base_url: str,
+    scenarios: List[Scenario],
+    concurrency: int = 16,
+    duration: float = 30.0,
+    rate: Optional[float] = None,
+    timeout: float = 120.0,
+    seed: int = 1
+) -> Dict[str, Any]:
+    """
+    Args:
+        base_url: 대상 서버 (예: http://127.0.0.1:8800)
+        scenarios: 섞어서 보낼 엔드포인트 목록
+        concurrency: closed-loop 동시 사용자 수 / open-loop 최대 동시 요청 수
+        duration: 측정 시간(초)
+        rate: 지정하면 open-loop (초당 요청 수)
+
+    Returns:
+        {"duration": 초, "endpoints": {이름: 요약}, "dropped": open-loop에서 동시 한도로 못 보낸 수}
+    """
+    rng = random.Random(seed)
+    weights = [s.weight for s in scenarios]
+    stats = {s.name: EndpointStats() for s in scenarios}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    dropped = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+
+        if rate is None:
+            async def user(user_id: str):
+                while time.perf_counter() < deadline:
+                    scenario = rng.choices(scenarios, weights)[0]
+                    await _send(client, scenario, stats, time.perf_counter(), user_id)
+
+            await asyncio.gather(*(user(f"load-{i}") for i in range(concurrency)))
+        else:
+            in_flight: set = set()
+            scheduled = start
+            while True:
+                scheduled += rng.expovariate(rate)
+                if scheduled >= deadline:
+                    break
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                if len(in_flight) >= concurrency:
+                    dropped += 1
+                    continue
+                scenario = rng.choices(scenarios, weights)[0]
+                task = asyncio.ensure_future(_send(client, scenario, stats, scheduled))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+
+        elapsed = time.perf_counter() - start
+
+    return {
+        "duration": round(elapsed, 2),
+        "mode": "closed" if rate is None else f"open@{rate}rps",
+        "concurrency": concurrency,
+        "dropped": dropped,
+        "endpoints": {name: s.summary(elapsed) for name, s in stats.items()},
+    }
+
+
+def print_report(title: str, result: Dict[str, Any]):
+    print(f"\n📈 {title}  ({result['mode']}, 동시 {result['concurrency']}, {result['duration']}s)")
+    print(f"   {'endpoint':<14}{'req':>7}{'err%':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for name, s in result["endpoints"].items():
+        fmt = lambda v: f"{v:>9.1f}" if v is not None else f"{'-':>9}"
+        print(
+            f"   {name:<14}{s['requests']:>7}{s['error_rate'] * 100:>6.1f}%{s['throughput_rps']:>9.2f}"
+            f"{fmt(s['p50_ms'])}{fmt(s['p95_ms'])}{fmt(s['p99_ms'])}{fmt(s['max_ms'])}"
+        )
+    if result["dropped"]:
+        print(f"   ⚠️ 동시 요청 한도({result['concurrency']})로 보내지 못한 요청: {result['dropped']}건")
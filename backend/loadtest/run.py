@@ -0,0 +1,253 @@
+"""
+종단 간(E2E) 부하 테스트 실행기
+
+1. 대역 서비스(Confluence/임베딩·LLM/ES 스텁)를 별도 프로세스로 띄움
+2. 대역 Confluence 트리를 실제 수집 경로(ConfluenceClient → EmbeddingManager.upsert_multiple_pages)로 적재하며 단계별 시간 측정
+3. uvicorn main:root_app 을 --workers 값마다 새로 띄우고 /chat, /documents/structure, /documents/embedded 에 부하
+4. 엔드포인트별 p50/p95/p99, 처리량, 오류율 출력 (--out 으로 JSON 저장)
+
+사용법 (backend 폴더에서):
+    python -m loadtest.run --workers 1 2 4 --concurrency 32 --duration 60
+    python -m loadtest.run --rate 20 --duration 120 --llm-token-delay 0.03
+    python -m loadtest.run --es-url http://localhost:9200     # ES 스텁 대신 로컬 ES 사용
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from loadtest.loadgen import Scenario, run_load, print_report
+
+QUERIES = [
+    "연차는 며칠인가요?",
+    "VPN 신청 절차 알려줘",
+    "신규 입사자 온보딩 체크리스트",
+    "배포 승인은 누가 하나요?",
+    "보안 교육 일정",
+    "Jira 계정 설정 방법",
+    "휴가 규정 담당자 문의",
+    "서버 접근 권한 신청",
+]
+
+
+def wait_until_up(url: str, timeout: float = 60.0, proc: Optional[subprocess.Popen] = None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"프로세스가 종료되었습니다 (exit {proc.returncode}): {url}")
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"{url} 가 {timeout}s 안에 응답하지 않습니다.")
+
+
+def stop(proc: Optional[subprocess.Popen]):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def build_env(args) -> Dict[str, str]:
+    host = "127.0.0.1"
+    openai_base = f"http://{host}:{args.openai_port}/v1"
+    env = dict(os.environ)
+    env.update({
+        "EMBEDDING_API_URL": f"{openai_base}/embeddings",
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": openai_base,
+        "OPENAI_API_BASE": openai_base,
+        "ELASTICSEARCH_URL": args.es_url or f"http://{host}:{args.es_port}",
+        "ES_INDEX_NAME": "confluence_docs",
+        "CONFLUENCE_URL": f"http://{host}:{args.confluence_port}/wiki",
+        "CONFLUENCE_EMAIL": "loadtest@example.com",
+        "CONFLUENCE_API_TOKEN": "loadtest",
+        "CONFLUENCE_SPACE_KEY": "LOAD",
+        "PYTHONUNBUFFERED": "1",
+    })
+    return env
+
+
+def start_fakes(args, env: Dict[str, str]) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "loadtest.fake_services",
+        "--confluence-port", str(args.confluence_port),
+        "--openai-port", str(args.openai_port),
+        "--es-port", str(args.es_port),
+        "--pages", str(args.pages),
+        "--embed-latency", str(args.embed_latency),
+        "--embed-latency-per-text", str(args.embed_latency_per_text),
+        "--embed-error-rate", str(args.embed_error_rate),
+        "--llm-ttft", str(args.llm_ttft),
+        "--llm-token-delay", str(args.llm_token_delay),
+        "--llm-tokens", str(args.llm_tokens),
+    ]
+    if args.es_url:
+        cmd.append("--no-es")
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    wait_until_up(f"http://127.0.0.1:{args.confluence_port}/wiki/rest/api/content?limit=1", proc=proc)
+    wait_until_up(f"http://127.0.0.1:{args.openai_port}/docs", proc=proc)
+    if not args.es_url:
+        wait_until_up(f"http://127.0.0.1:{args.es_port}/", proc=proc)
+    return proc
+
+
+def run_ingest(env: Dict[str, str]) -> Dict[str, Any]:
+    """대역 Confluence 전체를 실제 수집 경로로 적재합니다. (fetch → parse/chunk/embed/bulk)"""
+    os.environ.update(env)
+    from onboarding.app.confluence_api import ConfluenceClient
+    from onboarding.app.embedding import EmbeddingManager
+    from onboarding.app.page_registry import ChildPageResolver
+
+    client = ConfluenceClient(env["CONFLUENCE_URL"], env["CONFLUENCE_EMAIL"], env["CONFLUENCE_API_TOKEN"])
+    manager = EmbeddingManager(env["EMBEDDING_API_URL"], env["ELASTICSEARCH_URL"], index_name=env["ES_INDEX_NAME"])
+    manager.ensure_collection_exists()
+
+    t0 = time.perf_counter()
+    registry = client.get_page_registry(env["CONFLUENCE_SPACE_KEY"])
+    contents = [c for c in (client.get_page_content(registry.page_id(row)) for row in registry.iter_pages()) if c]
+    fetch_s = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    result = manager.upsert_multiple_pages(
+        page_ids=[c["id"] for c in contents],
+        titles=[c["title"] for c in contents],
+        contents=None,
+        htmls=[c["html"] for c in contents],
+        get_child_pages_func=ChildPageResolver(registry, client.get_child_pages),
+        base_url=env["CONFLUENCE_URL"],
+        spaces=[env["CONFLUENCE_SPACE_KEY"]] * len(contents),
+        updated_ats=[c["updated_at"] for c in contents],
+        primary_contributors=[c["primary_contributor"] for c in contents],
+        force_update=True,
+    )
+    upsert_s = time.perf_counter() - t1
+
+    summary = {
+        "pages": len(contents),
+        "chunks_indexed": result.get("indexed", 0) if isinstance(result, dict) else None,
+        "chunks_failed": len(result.get("failed", [])) if isinstance(result, dict) else None,
+        "fetch_s": round(fetch_s, 2),
+        "upsert_s": round(upsert_s, 2),
+        "pages_per_s": round(len(contents) / (fetch_s + upsert_s), 2) if contents else 0.0,
+    }
+    print(f"\n📥 수집 경로: {summary}")
+    return summary
+
+
+def start_app(port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:root_app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--no-access-log", "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    wait_until_up(f"http://127.0.0.1:{port}/ready", timeout=120, proc=proc)
+    return proc
+
+
+def build_scenarios(mix: Dict[str, float], top_k: int) -> List[Scenario]:
+    rng = random.Random(3)
+    available = {
+        "chat": lambda w: Scenario(
+            "chat", "POST", "/onboarding/api/chat", w,
+            lambda: {"query": rng.choice(QUERIES), "top_k": top_k, "display_k": 3}
+        ),
+        "structure": lambda w: Scenario("structure", "GET", "/onboarding/api/documents/structure", w),
+        "embedded": lambda w: Scenario("embedded", "GET", "/onboarding/api/documents/embedded", w),
+        "health": lambda w: Scenario("health", "GET", "/onboarding/api/", w),
+    }
+    unknown = set(mix) - set(available)
+    if unknown:
+        raise SystemExit(f"알 수 없는 엔드포인트: {', '.join(sorted(unknown))} (가능: {', '.join(available)})")
+    return [available[name](weight) for name, weight in mix.items() if weight > 0]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """"chat=8,structure=1" → {"chat": 8.0, "structure": 1.0}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="E2E 부하 테스트 (로컬 대역 서비스 사용)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="비교할 uvicorn 워커 수 목록")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--rate", type=float, help="지정하면 open-loop (초당 요청 수)")
+    parser.add_argument("--mix", default="chat=8,structure=1,embedded=1", help="엔드포인트 가중치")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--app-port", type=int, default=8800)
+    parser.add_argument("--confluence-port", type=int, default=9301)
+    parser.add_argument("--openai-port", type=int, default=9302)
+    parser.add_argument("--es-port", type=int, default=9303)
+    parser.add_argument("--es-url", help="ES 스텁 대신 사용할 실제 ES 주소")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--skip-ingest", action="store_true", help="이미 적재된 ES(--es-url)를 그대로 사용")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.002)
+    parser.add_argument("--embed-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-ttft", type=float, default=0.3)
+    parser.add_argument("--llm-token-delay", type=float, default=0.02)
+    parser.add_argument("--llm-tokens", type=int, default=80)
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    scenarios = build_scenarios(parse_mix(args.mix), args.top_k)
+    env = build_env(args)
+    report: Dict[str, Any] = {"args": vars(args), "ingest": None, "runs": []}
+
+    fakes = start_fakes(args, env)
+    app = None
+    try:
+        if not args.skip_ingest:
+            report["ingest"] = run_ingest(env)
+
+        for workers in args.workers:
+            app = start_app(args.app_port, workers, env)
+            try:
+                result = asyncio.run(run_load(
+                    f"http://127.0.0.1:{args.app_port}", scenarios,
+                    concurrency=args.concurrency, duration=args.duration, rate=args.rate
+                ))
+            finally:
+                stop(app)
+                app = None
+            result["workers"] = workers
+            report["runs"].append(result)
+            print_report(f"uvicorn 워커 {workers}개", result)
+    finally:
+        stop(app)
+        stop(fakes)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,15 @@
 """
 LLOYDK 통합 백엔드 메인 서버 (Gateway)
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 # 1. 하위 모듈 앱과 그 앱의 '시작 스위치(startup_event)'를 같이 가져옵니다! 🌟
-from onboarding.main import app as onboarding_app, startup_event as onboarding_startup
+from onboarding.main import app as onboarding_app, startup_event as onboarding_startup, shutdown_event as onboarding_shutdown
+from onboarding.main import readiness_status as onboarding_readiness
+from onboarding.app.metrics import PrometheusMiddleware, render_metrics
 
 root_app = FastAPI(title="LLOYDK Integrated Backend")
 
@@ -19,15 +22,40 @@ root_app.add_middleware(
     allow_headers=["*"],
 )
 
+# 📊 요청 지연/처리 중 요청 수 기록 (하위 앱 라우트까지 포함)
+root_app.add_middleware(PrometheusMiddleware, skip_paths=("/metrics", "/live", "/ready"))
+
 # 🌟 3. 통합 서버가 켜질 때, 하위 앱들의 스위치도 같이 딸깍! 켜줍니다.
 @root_app.on_event("startup")
 async def root_startup_event():
     print("🚀 [Gateway] 통합 메인 서버 시작! 하위 모듈들을 깨웁니다...")
     await onboarding_startup() # 👈 onboarding 앱의 DB 매니저 생성 스위치 ON!
 
+@root_app.on_event("shutdown")
+async def root_shutdown_event():
+    await onboarding_shutdown() # 👈 실행 중인 수집 작업 정리
+
 # 4. 🏠 하위 서비스 마운트 (정거장 연결)
 root_app.mount("/onboarding", onboarding_app)
 
+# 🩺 게이트웨이/오케스트레이터용 프로브
+# /live: 프로세스가 요청을 받을 수 있으면 항상 200 (재시작 판단용)
+# /ready: ES/임베딩/챗봇 준비가 끝났을 때만 200, 아니면 503 (트래픽 투입 판단용)
+@root_app.get("/live", include_in_schema=False)
+def live():
+    return {"status": "alive"}
+
+@root_app.get("/ready", include_in_schema=False)
+def ready():
+    status = {"onboarding": onboarding_readiness()}
+    ok = all(module["ready"] for module in status.values())
+    return JSONResponse({"ready": ok, "modules": status}, status_code=200 if ok else 503)
+
+@root_app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @root_app.get("/")
 def read_root():
     return {
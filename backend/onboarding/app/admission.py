@@ -0,0 +1,276 @@
+"""
+/chat 입장 제어(admission control) + 부하 차단 모듈
+- 동시에 처리하는 /chat 수를 CHAT_MAX_CONCURRENCY로 제한하고, 넘치면 짧은 대기열(CHAT_MAX_QUEUE)에서 대기
+- 대기열은 사용자별 라운드 로빈 (한 사람이 연달아 보낸 요청이 다른 사람을 밀어내지 않음)
+- 사용자당 처리+대기 요청은 CHAT_MAX_PER_USER개까지 (넘으면 429, 사용자를 알 수 없는 요청은 한도 없이 요청마다 따로 줄을 섬)
+- 대기열이 가득 차거나 대기 시간이 끝나면 즉시 503 + Retry-After
+- 요청마다 마감 시각(deadline)을 contextvar로 넘겨, 임베딩/ES/LLM 호출 타임아웃을 남은 시간으로 줄임
+- 백엔드(임베딩/ES/LLM)별 동시 호출 수 제한 (자리가 안 나면 마감 전에 503)
+"""
+
+import asyncio
+import contextvars
+import functools
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+try:
+    from .metrics import ADMISSION_TOTAL, ADMISSION_QUEUE_DEPTH, BACKEND_REJECTED_TOTAL
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from metrics import ADMISSION_TOTAL, ADMISSION_QUEUE_DEPTH, BACKEND_REJECTED_TOTAL
+
+
+class Overloaded(Exception):
+    """과부하로 요청을 거절할 때 던지는 예외 (HTTP 상태 코드와 Retry-After 초를 함께 담음)"""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: int = 1, reason: str = "overloaded"):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, int(retry_after))
+        self.reason = reason
+
+    @property
+    def detail(self) -> Dict[str, Any]:
+        return {"message": str(self), "reason": self.reason, "retry_after": self.retry_after}
+
+
+class DeadlineExceeded(Overloaded):
+    def __init__(self, message: str = "요청 처리 시간이 초과되었습니다."):
+        super().__init__(message, status_code=503, retry_after=1, reason="deadline")
+
+
+class BackendBusy(Overloaded):
+    def __init__(self, backend: str, retry_after: int = 1):
+        super().__init__(f"{backend} 서버가 바쁩니다. 잠시 후 다시 시도해 주세요.", 503, retry_after, f"{backend}_busy")
+        self.backend = backend
+
+
+# =================================================================
+# 마감 시각 전파
+# =================================================================
+_deadline: contextvars.ContextVar = contextvars.ContextVar("chat_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """이 블록(과 여기서 띄운 스레드 작업)에 마감 시각을 겁니다."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left(cap: float) -> float:
+    """cap과 마감까지 남은 시간 중 작은 값. 마감이 지났으면 DeadlineExceeded"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return cap
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(cap, left)
+
+
+# =================================================================
+# 백엔드별 동시 호출 제한 (스레드에서 사용)
+# =================================================================
+class BackendLimiter:
+    def __init__(self, name: str, limit: int, max_wait: float = 2.0):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait
+        self._sem = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def slot(self):
+        """자리가 날 때까지 (max_wait와 남은 시간 중 짧은 만큼) 기다립니다."""
+        try:
+            wait = time_left(self.max_wait)
+        except DeadlineExceeded:
+            BACKEND_REJECTED_TOTAL.labels(self.name).inc()
+            raise
+        if not self._sem.acquire(timeout=wait):
+            BACKEND_REJECTED_TOTAL.labels(self.name).inc()
+            raise BackendBusy(self.name)
+        try:
+            yield
+        finally:
+            self._sem.release()
+
+
+backend_limiters: Dict[str, BackendLimiter] = {
+    "embedding": BackendLimiter("embedding", int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8"))),
+    "elasticsearch": BackendLimiter("elasticsearch", int(os.getenv("ES_MAX_CONCURRENCY", "16"))),
+    "llm": BackendLimiter("llm", int(os.getenv("LLM_MAX_CONCURRENCY", "8"))),
+}
+
+
+def backend_slot(name: str):
+    return backend_limiters[name].slot()
+
+
+# =================================================================
+# /chat 입장 제어 (이벤트 루프에서 사용)
+# =================================================================
+class AdmissionController:
+    """동시 처리 수 + 사용자별 공정 대기열. 한 이벤트 루프(워커 프로세스) 안에서만 씁니다."""
+
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 32, queue_timeout: float = 5.0, per_user: int = 2):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.per_user = max(1, per_user)
+        self._active = 0
+        self._queued = 0
+        self._user_load: Dict[str, int] = {}  # 사용자별 처리+대기 수
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._service_time = 2.0  # 처리 시간 EWMA(초), Retry-After 추정용
+        self._anonymous = itertools.count(1)
+        # ask()는 블로킹이므로 동시 처리 수만큼의 전용 스레드 풀에서 실행
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="chat")
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrency=int(os.getenv("CHAT_MAX_CONCURRENCY", "16")),
+            max_queue=int(os.getenv("CHAT_MAX_QUEUE", "32")),
+            queue_timeout=float(os.getenv("CHAT_QUEUE_TIMEOUT", "5")),
+            per_user=int(os.getenv("CHAT_MAX_PER_USER", "2")),
+        )
+
+    def retry_after(self) -> int:
+        """지금 대기열이 빠지는 데 걸릴 대략적인 시간(초)"""
+        return max(1, math.ceil(self._service_time * (self._queued + 1) / self.max_concurrency))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "users": len(self._user_load),
+            "service_time_s": round(self._service_time, 3),
+        }
+
+    @asynccontextmanager
+    async def admit(self, user: Optional[str]):
+        """
+        처리 자리를 얻을 때까지 기다렸다가 블록을 실행합니다.
+        user가 None이면(사용자를 알 수 없음) 사용자 한도를 적용하지 않고 요청 하나를 한 사람처럼 대기열에 넣습니다.
+        (같은 NAT/프록시 뒤의 여러 사람이 접속 IP 하나로 묶여 429를 받지 않도록)
+
+        Raises:
+            Overloaded: 사용자 한도 초과(429), 대기열 가득 참/대기 시간 초과(503)
+        """
+        if user is None:
+            user = f"anonymous:{next(self._anonymous)}"
+        await self._acquire(user)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._release(user)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """fn을 전용 스레드 풀에서 실행합니다. (마감 시각 등 contextvar를 그대로 넘김)"""
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    # -----------------------------------------------------------------
+    # 내부
+    # -----------------------------------------------------------------
+    async def _acquire(self, user: str):
+        if self._user_load.get(user, 0) >= self.per_user:
+            ADMISSION_TOTAL.labels("user_limit").inc()
+            raise Overloaded(
+                f"동시에 보낼 수 있는 질문은 {self.per_user}개까지입니다.",
+                status_code=429, retry_after=math.ceil(self._service_time), reason="user_limit"
+            )
+
+        if self._active < self.max_concurrency and self._queued == 0:
+            self._active += 1
+            self._user_load[user] = self._user_load.get(user, 0) + 1
+            ADMISSION_TOTAL.labels("admitted").inc()
+            return
+
+        if self._queued >= self.max_queue:
+            ADMISSION_TOTAL.labels("queue_full").inc()
+            raise Overloaded("요청이 많아 잠시 처리할 수 없습니다.", 503, self.retry_after(), "queue_full")
+
+        # 마감까지 남은 시간이 대기 한도보다 짧으면 그만큼만 기다림
+        try:
+            wait = time_left(self.queue_timeout)
+        except DeadlineExceeded:
+            ADMISSION_TOTAL.labels("queue_timeout").inc()
+            raise
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user, deque()).append(future)
+        self._queued += 1
+        self._user_load[user] = self._user_load.get(user, 0) + 1
+        ADMISSION_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.wait_for(future, wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 자리를 받은 직후에 취소됨 → 받은 자리를 돌려줌
+                self._release(user)
+            else:
+                self._forget_waiter(user, future)
+                self._drop_user_load(user)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            ADMISSION_TOTAL.labels("queue_timeout").inc()
+            raise Overloaded("대기 시간이 초과되었습니다.", 503, self.retry_after(), "queue_timeout")
+        ADMISSION_TOTAL.labels("queued").inc()
+
+    def _release(self, user: str):
+        self._active -= 1
+        self._drop_user_load(user)
+        self._grant_next()
+
+    def _grant_next(self):
+        """빈 자리를 대기열 맨 앞 사용자에게 주고, 그 사용자는 맨 뒤로 보냅니다. (라운드 로빈)"""
+        while self._active < self.max_concurrency and self._waiters:
+            user, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            self._queued -= 1
+            ADMISSION_QUEUE_DEPTH.dec()
+            if queue:
+                self._waiters.move_to_end(user)
+            else:
+                del self._waiters[user]
+            if future.done():  # 이미 시간 초과/취소됨
+                continue
+            self._active += 1
+            future.set_result(None)
+
+    def _forget_waiter(self, user: str, future: asyncio.Future):
+        queue = self._waiters.get(user)
+        if queue and future in queue:
+            queue.remove(future)
+            self._queued -= 1
+            ADMISSION_QUEUE_DEPTH.dec()
+            if not queue:
+                del self._waiters[user]
+
+    def _drop_user_load(self, user: str):
+        left = self._user_load.get(user, 0) - 1
+        if left > 0:
+            self._user_load[user] = left
+        else:
+            self._user_load.pop(user, None)
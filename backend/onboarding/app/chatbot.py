@@ -4,16 +4,47 @@ RAG 챗봇 및 검색 모듈 (Docker Native & OpenAI GPT 버전)
 - LLM 기반 답변 생성 (OpenAI GPT)
 """
 
+import hashlib
 import os
-from typing import List, Dict, Any
-from langchain_openai import ChatOpenAI  # 🌟 Upstage 대신 OpenAI 로드!
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import re
+from typing import List, Dict, Any, Iterator, Optional
 
 from .embedding import EmbeddingManager
+from .request_log import RequestTrace, slow_query_log
+from .shared_state import get_shared_state
+from .metrics import record_cache
+from .admission import Overloaded, backend_slot, time_left
+from .sessions import plan_retrieval, render_history
+from .llm_gateway import LLMGateway, build_messages
+from .hierarchy import subtree_filter
+
+CHUNK_SOURCE_FIELDS = [
+    "title", "content", "page_id", "source",
+    "space", "url", "primary_contributor", "tags", "updated_at", "neighbors"
+]
+ROW_SOURCE_FIELDS = ["page_id", "title", "space", "url", "section", "row", "row_text"]
+
+
+def reciprocal_rank_fusion(ranked_lists, k: int = 60) -> List[Any]:
+    """
+    [(가중치, [hit, ...]), ...] 순위 목록들을 RRF(Σ 가중치 / (k + 순위))로 합칩니다.
+    같은 문서(_index, _id)가 여러 목록에 있으면 점수를 더합니다.
+
+    Returns:
+        [(hit, 합친 점수), ...] 점수 내림차순
+    """
+    scores: Dict[Any, float] = {}
+    hits: Dict[Any, Dict[str, Any]] = {}
+    for weight, ranked in ranked_lists:
+        for rank, hit in enumerate(ranked, start=1):
+            key = (hit.get("_index"), hit["_id"])
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+            hits.setdefault(key, hit)
+    return [(hits[key], score) for key, score in sorted(scores.items(), key=lambda kv: -kv[1])]
+
 
 class ConfluenceChatbot:
-    def __init__(self):
+    def __init__(self, embedding_manager: Optional[EmbeddingManager] = None):
         # 1. 환경변수 로드
         self.embedding_api_url = os.getenv("EMBEDDING_API_URL")
         self.openai_api_key = os.getenv("OPENAI_API_KEY") 
@@ -22,16 +53,33 @@ class ConfluenceChatbot:
         self.es_password = os.getenv("ELASTICSEARCH_PASSWORD")
         
         self.index_name = os.getenv("ES_INDEX_NAME", "confluence_docs") 
+        self.tables_index_name = f"{self.index_name}_tables"
+        # 표 행 검색 결과를 몇 개까지 컨텍스트에 넣을지 (0이면 사용 안 함)
+        self.table_rows_k = int(os.getenv("TABLE_ROWS_TOP_K", "5"))
+        # 여러 인덱스 결과를 합칠 때 RRF 상수 (클수록 하위 순위도 비중이 커짐)
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+        # 2단계 검색: 페이지 요약 kNN으로 후보 페이지를 먼저 고르고, 청크 kNN은 그 페이지 안에서만 (0이면 사용 안 함)
+        self.page_prune_top_n = int(os.getenv("PAGE_PRUNE_TOP_N", "30"))
+        # 링크 그래프(link_graph.py): BM25 점수에 더할 PageRank 가중치, 컨텍스트에 붙일 연결 문서 수 (0이면 사용 안 함)
+        self.graph_boost = float(os.getenv("GRAPH_RANK_BOOST", "1.0"))
+        self.linked_pages_k = int(os.getenv("LINKED_PAGES_K", "2"))
         # LLM 모델 기본값을 GPT로 변경
         self.llm_model = os.getenv("LLM_MODEL_NAME", "gpt-4o-mini") 
         self.confluence_base_url = os.getenv("CONFLUENCE_URL")
         self.default_space_key = os.getenv("CONFLUENCE_SPACE_KEY")
+        # 워커 프로세스끼리 공유하는 캐시 TTL(초, 0이면 사용 안 함)
+        self.query_embedding_ttl = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+        self.answer_cache_ttl = float(os.getenv("ANSWER_CACHE_TTL", "600"))
+        self.shared = get_shared_state()
+        # 백엔드별 호출 타임아웃 상한(초). 요청 마감이 더 가까우면 남은 시간으로 줄임
+        self.embedding_timeout = float(os.getenv("CHAT_EMBEDDING_TIMEOUT", "10"))
+        self.es_timeout = float(os.getenv("CHAT_ES_TIMEOUT", "10"))
 
         if not all([self.embedding_api_url, self.es_url, self.openai_api_key]):
             print("⚠️ [경고] 필수 환경변수(OPENAI_API_KEY 등)가 누락되었습니다!")
 
-        # 2. EmbeddingManager 초기화 (사내 모델)
-        self.em = EmbeddingManager(
+        # 2. EmbeddingManager 초기화 (사내 모델) - 넘겨받으면 ES/임베딩 클라이언트를 공유
+        self.em = embedding_manager or EmbeddingManager(
             embedding_api_url=self.embedding_api_url,
             elasticsearch_url=self.es_url,
             elasticsearch_user=self.es_user,
@@ -40,137 +88,552 @@ class ConfluenceChatbot:
         )
 
         # 3. LLM 모델 설정 (🌟 GPT로 교체 완료!)
-        self.llm = ChatOpenAI(
-            model=self.llm_model,
-            api_key=self.openai_api_key,
-            temperature=0.0  # RAG 시스템이므로 상상력(환각)을 억제하기 위해 0으로 세팅
-        )
+        #    마감/헤지/대체 모델/프롬프트 배치(고정 지침 → Context → 질문)는 LLMGateway가 담당
+        self.gateway = LLMGateway.from_env(api_key=self.openai_api_key)
+        self.llm = self.gateway.client()
 
-        # 4. 프롬프트 템플릿 (더 유연하고 친절하게 수정)
-        self.prompt_template = ChatPromptTemplate.from_messages([
-            ("system", """
-            당신은 로이드케이 사내 위키 정보를 바탕으로 직원의 질문에 답변하는 전문가 어시스턴트입니다.
-
-            [지침]
-            1. 제공된 [Context]를 꼼꼼히 읽고, 사용자의 질문에 가장 적합한 내용을 요약하여 답변하세요.
-            2. 문서에 '체크리스트'라는 단어가 명시되지 않았더라도, '절차', '할 일', '주요 내용' 등이 있다면 이를 바탕으로 체크리스트를 만들어 답변해 주세요.
-            3. 답변은 읽기 좋게 불릿 포인트나 번호를 사용하세요.
-            4. 최대한 답변하려고 노력하세요.
-
-            [Context]
-            {context}
-            """),
-            ("human", "{question}"),
-        ])
-        
         print(f"🤖 챗봇 초기화 완료 (Index: {self.index_name} | Model: {self.llm_model})")
 
+    def _page_url(self, payload: Dict[str, Any]) -> str:
+        page_id = payload.get('page_id', '')
+        space_key = payload.get('space') or self.default_space_key
+
+        if self.confluence_base_url and page_id and space_key:
+            base_url = self.confluence_base_url.rstrip('/')
+            return f"{base_url}/spaces/{space_key}/pages/{page_id}"
+        return payload.get('url', '#')
+
+    @staticmethod
+    def _cache_key(*parts: Any) -> str:
+        return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def _embed_remote(self, query: str) -> List[float]:
+        with backend_slot("embedding"):
+            return self.em.embedding(query, timeout=time_left(self.embedding_timeout))
+
+    def _es_search(self, **kwargs) -> Dict[str, Any]:
+        with backend_slot("elasticsearch"):
+            client = self.em.es_client.options(request_timeout=time_left(self.es_timeout))
+            return client.search(**kwargs)
+
+    def embed_query(self, query: str) -> List[float]:
+        """질문 임베딩 (같은 질문은 모든 워커가 공유 캐시에서 재사용)"""
+        if self.query_embedding_ttl <= 0:
+            return self._embed_remote(query)
+        key = self._cache_key(self.em.embedding_api_url, query.strip())
+        vector = self.shared.get("query_embedding", key)
+        record_cache("query_embedding", vector is not None)
+        if vector is None:
+            vector = self._embed_remote(query)
+            if vector:
+                self.shared.set("query_embedding", key, vector, ttl=self.query_embedding_ttl)
+        return vector
+
+    def _row_query(
+        self, query: Optional[str], filters: Optional[Dict[str, str]], scope: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        bool_query: Dict[str, Any] = {}
+        if filters:
+            bool_query["filter"] = [{"term": {"pairs": f"{h}={v}"}} for h, v in filters.items()]
+        if scope and (filters or query):
+            bool_query["filter"] = bool_query.get("filter", []) + [scope]
+        if query:
+            tokens = [t for t in re.split(r"[\s,?!.]+", query) if t]
+            should: List[Dict[str, Any]] = [
+                {"match": {"row_text": {"query": query, "analyzer": "nori_analyzer"}}}
+            ]
+            if tokens:
+                should.append({"terms": {"cell_values": tokens, "boost": 3.0}})
+            bool_query["should"] = should
+            bool_query["minimum_should_match"] = 1
+        return {"bool": bool_query} if bool_query else None
+
+    def _row_result(self, hit: Dict[str, Any], score: Optional[float] = None) -> Dict[str, Any]:
+        payload = hit['_source']
+        return {
+            "type": "table_row",
+            "score": hit['_score'] if score is None else score,
+            "title": payload.get('title', '제목 없음'),
+            "page_id": payload.get('page_id', ''),
+            "url": self._page_url(payload),
+            "section": payload.get('section', ''),
+            "row": payload.get('row', {}),
+            "content": payload.get('row_text', ''),
+        }
+
+    def _chunk_result(self, hit: Dict[str, Any], score: Optional[float] = None) -> Dict[str, Any]:
+        payload = hit['_source']
+        sanitized_url = self._page_url(payload)
+        # 🌟 수정 2: 프론트엔드로 전달할 데이터
+        return {
+            "score": hit['_score'] if score is None else score,
+            "title": payload.get('title', '제목 없음'),
+            "content": payload.get('content', payload.get('text', '내용 없음')),
+            "page_id": payload.get('page_id', ''),
+            "source": sanitized_url,
+            "url": sanitized_url,
+            "updated_at": payload.get('updated_at', ''),                  # 👈 추가!
+            "primary_contributor": payload.get('primary_contributor', ''),# 👈 추가!
+            "tags": payload.get('tags', []),                              # 👈 추가!
+            "neighbors": payload.get('neighbors', [])                     # 링크로 이어진 페이지 (중요도 순)
+        }
+
+    def search_table_rows(
+        self,
+        query: Optional[str] = None,
+        size: int = 5,
+        filters: Optional[Dict[str, str]] = None,
+        indices: Optional[List[str]] = None,
+        scope: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        표 행 인덱스에서 행 단위로 찾습니다.
+
+        Args:
+            query: 자연어 질문. 셀 값과 정확히 같은 단어는 term 쿼리로, 나머지는 row_text 매칭으로 점수화
+            size: 최대 행 수
+            filters: {"헤더": "값"} 정확 일치 조건 (filter 컨텍스트라 점수 계산 없이 캐시됨)
+            indices: 청크 인덱스 목록 (각각의 표 인덱스를 함께 조회, 기본은 self.index_name)
+            scope: 검색 범위 필터 (예: hierarchy.subtree_filter)
+
+        Returns:
+            [{"type": "table_row", "title", "page_id", "url", "section", "row", "content", "score"}, ...]
+        """
+        row_query = self._row_query(query, filters, scope)
+        if row_query is None:
+            return []
+
+        try:
+            response = self._es_search(
+                index=",".join(f"{i}_tables" for i in (indices or [self.index_name])),
+                query=row_query,
+                size=size,
+                _source=ROW_SOURCE_FIELDS,
+                ignore_unavailable=True,
+            )
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"⚠️ 표 행 검색 실패 (표 인덱스 없음?): {e}")
+            return []
+
+        return [self._row_result(hit) for hit in response['hits']['hits']]
+
+    def lookup_table_rows(self, filters: Dict[str, str], size: int = 20, indices: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """{"헤더": "값"} 정확 일치로 표 행을 조회합니다. (벡터/LLM 호출 없음)"""
+        return self.search_table_rows(query=None, size=size, filters=filters, indices=indices)
+
     def search_documents(
         self,
         query: str,
         top_k: int = 5,
+        include_table_rows: bool = False,
+        trace: Optional[RequestTrace] = None,
+        indices: Optional[List[str]] = None,
+        include_linked: bool = False,
+        subtree: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        print(f"🔍 검색어: '{query}'")
+        """
+        하이브리드(kNN + BM25) 청크 검색. BM25 점수에는 페이지 PageRank(rank_feature)를 조금 더합니다.
+        include_table_rows=True면 표 행 검색 결과를 함께 돌려주고,
+        행이 찾아진 페이지의 표 청크는 빼서 컨텍스트를 행 단위로 압축합니다.
+        include_linked=True면 상위 청크가 링크로 이어진 페이지 요약을 linked_page 결과로 덧붙입니다.
+        subtree(page_id)를 주면 그 페이지와 하위 페이지 안에서만 찾습니다. (kNN/BM25/표 행/연결 문서 모두 filter)
+        indices에 인덱스가 여러 개면 _fanout_search로 한꺼번에 찾아 RRF로 합칩니다.
+        kNN은 _candidate_pages가 고른 후보 페이지 안에서만 찾고, BM25는 전체에서 찾습니다.
+        trace를 주면 단계별 시간을 거기에 누적합니다.
+        """
+        trace = trace or RequestTrace(query)
+        indices = indices or [self.index_name]
+        scope = subtree_filter(subtree) if subtree else None
 
-        query_vector = self.em.embedding(query)
+        with trace.stage("embed_query"):
+            query_vector = self.embed_query(query)
         if not query_vector:
             return []
 
-# 🌟 하이브리드 검색 쿼리 (벡터 3 : BM25 2)
-        search_body = {
+        try:
+            with trace.stage("page_prune"):
+                candidates = self._candidate_pages(query_vector, indices, scope)
+            if len(indices) > 1:
+                with trace.stage("es_fanout"):
+                    results, rows = self._fanout_search(
+                        query, query_vector, top_k, indices, include_table_rows, candidates, scope
+                    )
+            else:
+                with trace.stage("es_search"):
+                    response = self._es_search(
+                        index=indices[0],
+                        body=self._hybrid_body(
+                            query, query_vector, top_k, candidates.get(indices[0]), self.graph_boost, scope
+                        )
+                    )
+                results = [self._chunk_result(hit) for hit in response['hits']['hits']]
+                rows = []
+                if include_table_rows and self.table_rows_k > 0:
+                    with trace.stage("es_table_rows"):
+                        rows = self.search_table_rows(query, size=self.table_rows_k, indices=indices, scope=scope)
+
+            if rows:
+                row_pages = {r["page_id"] for r in rows}
+                results = [
+                    r for r in results
+                    if not (r["page_id"] in row_pages and "\n[표]\n" in r["content"])
+                ]
+                results.extend(rows)
+
+            if include_linked and self.linked_pages_k > 0:
+                with trace.stage("linked_pages"):
+                    results.extend(self.linked_pages(results, indices, scope=scope))
+            return results
+
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"❌ 검색 중 오류 발생: {e}")
+            return []
+
+    def _page_summaries_ready(self, index: str) -> bool:
+        """
+        페이지 요약 인덱스가 청크 인덱스의 페이지를 거의 다(99%) 덮는지 확인합니다. (공유 캐시 5분)
+        요약이 없는 페이지는 후보에 못 들어 kNN에서 빠지므로, 덮지 못하면 예전처럼 전체 kNN을 씁니다.
+        """
+        ready = self.shared.get("page_summary_ready", index)
+        if ready is not None:
+            return ready
+        try:
+            with backend_slot("elasticsearch"):
+                client = self.em.es_client.options(request_timeout=time_left(self.es_timeout))
+                pages = client.count(index=f"{index}_pages")["count"]
+                chunked = client.count(index=index, query={"term": {"chunk_id": 0}})["count"]
+            ready = chunked > 0 and pages >= chunked * 0.99
+        except Overloaded:
+            raise
+        except Exception:
+            ready = False  # 요약 인덱스가 아직 없음 (예전에 색인한 인덱스)
+        self.shared.set("page_summary_ready", index, ready, ttl=300)
+        return ready
+
+    def _candidate_pages(
+        self, query_vector: List[float], indices: List[str], scope: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, List[str]]:
+        """
+        1단계: 인덱스마다 페이지 요약 kNN으로 후보 page_id를 page_prune_top_n개 고릅니다. (_msearch 한 번)
+        요약이 준비되지 않았거나 검색이 실패한 인덱스는 결과에서 빠집니다. (→ 그 인덱스는 전체 kNN)
+        """
+        n = self.page_prune_top_n
+        targets = [index for index in indices if n > 0 and self._page_summaries_ready(index)]
+        if not targets:
+            return {}
+
+        searches: List[Dict[str, Any]] = []
+        for index in targets:
+            searches += [
+                {"index": f"{index}_pages", "ignore_unavailable": True},
+                {
+                    "size": n,
+                    "knn": self._knn_clause(query_vector, n, scope=scope, num_candidates=max(100, n * 4)),
+                    "_source": ["page_id"],
+                },
+            ]
+        try:
+            with backend_slot("elasticsearch"):
+                client = self.em.es_client.options(request_timeout=time_left(self.es_timeout))
+                responses = client.msearch(searches=searches)["responses"]
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"⚠️ 후보 페이지 선택 실패 (전체 kNN으로 검색): {e}")
+            return {}
+
+        candidates: Dict[str, List[str]] = {}
+        for index, res in zip(targets, responses):
+            if "error" in res:
+                continue
+            page_ids = [hit["_source"]["page_id"] for hit in res["hits"]["hits"]]
+            if page_ids:
+                candidates[index] = page_ids
+        return candidates
+
+    @staticmethod
+    def _knn_clause(
+        query_vector: List[float], k: int, page_ids: Optional[List[str]] = None,
+        scope: Optional[Dict[str, Any]] = None, **extra
+    ) -> Dict[str, Any]:
+        knn = {"field": "embedding", "query_vector": query_vector, "k": k, "num_candidates": 100, **extra}
+        filters = []
+        if page_ids:
+            # 후보 페이지 청크만 대상으로 (필터에 걸리는 문서가 적으면 ES가 그래프 대신 그 문서들만 직접 비교)
+            filters.append({"terms": {"page_id": page_ids}})
+        if scope:
+            filters.append(scope)
+        if filters:
+            knn["filter"] = filters[0] if len(filters) == 1 else filters
+        return knn
+
+    @staticmethod
+    def _text_query(
+        query: str, graph_boost: float = 0.0, boost: float = 1.0, scope: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        BM25 쿼리. graph_boost > 0이면 page_rank(rank_feature)를 should로 더합니다.
+        saturation pivot 1.0 = 평균 페이지가 graph_boost의 절반을 받음 (링크가 많은 허브 페이지도 graph_boost를 넘지 않음)
+        scope(검색 범위 필터)는 점수에 영향 없는 filter로 붙습니다.
+        """
+        text = {"multi_match": {"query": query, "fields": ["title^2", "content"], "analyzer": "nori_analyzer", "boost": boost}}
+        if graph_boost <= 0 and not scope:
+            return text
+        bool_query: Dict[str, Any] = {"must": [text]}
+        if graph_boost > 0:
+            bool_query["should"] = [
+                {"rank_feature": {"field": "page_rank", "saturation": {"pivot": 1.0}, "boost": graph_boost}}
+            ]
+        if scope:
+            bool_query["filter"] = [scope]
+        return {"bool": bool_query}
+
+    @classmethod
+    def _hybrid_body(
+        cls, query: str, query_vector: List[float], top_k: int, page_ids: Optional[List[str]] = None,
+        graph_boost: float = 0.0, scope: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        # 🌟 하이브리드 검색 쿼리 (벡터 3 : BM25 2)
+        # 후보 페이지 제한은 kNN에만 적용 (BM25는 요약에 안 잡힌 키워드 문서도 찾도록 전체 검색)
+        return {
             "size": top_k,
-            "knn": {
-                "field": "embedding",
-                "query_vector": query_vector,
-                "k": top_k,
-                "num_candidates": 100,
-                "boost": 3.0  
-            },
-            "query": {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title^2", "content"],
-                    "analyzer": "nori_analyzer", 
-                    "boost": 2.0  
-                }
-            },
+            "knn": cls._knn_clause(query_vector, top_k, page_ids, scope, boost=3.0),
+            "query": cls._text_query(query, graph_boost, boost=2.0, scope=scope),
             # 🌟 수정 1: updated_at 확실하게 포함!
-            "_source": [
-                "title", "content", "page_id", "source", 
-                "space", "url", "primary_contributor", "tags", "updated_at" 
-            ]
+            "_source": CHUNK_SOURCE_FIELDS
         }
 
+    def _fanout_search(
+        self,
+        query: str,
+        query_vector: List[float],
+        top_k: int,
+        indices: List[str],
+        include_table_rows: bool,
+        candidates: Optional[Dict[str, List[str]]] = None,
+        scope: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        여러 인덱스(스페이스)를 _msearch 한 번으로 동시에 찾고 순위 기반(RRF)으로 합칩니다.
+        - 인덱스마다 kNN / BM25 / (표 행) 검색을 따로 보냄 (한 인덱스가 없거나 실패해도 나머지는 사용)
+        - kNN 유사도는 같은 임베딩 모델이라 인덱스끼리 비교 가능 → 점수순으로 한 목록으로 합침
+        - BM25 점수는 인덱스마다 통계가 달라 비교할 수 없으므로 인덱스별 순위 목록 그대로 사용
+        - 목록 가중치는 단일 인덱스 하이브리드 검색과 같은 벡터 3 : BM25 2
+        - candidates({인덱스: 후보 page_id})가 있는 인덱스는 kNN을 그 페이지 안에서만 찾음
+        - scope(검색 범위 필터)는 모든 검색에 filter로 붙음
+
+        Returns:
+            (청크 결과 top_k개, 표 행 결과 table_rows_k개)
+        """
+        window = max(top_k * 2, 10)
+        searches: List[Dict[str, Any]] = []
+        plan: List[str] = []
+        for index in indices:
+            searches += [
+                {"index": index, "ignore_unavailable": True},
+                {
+                    "size": window,
+                    "knn": self._knn_clause(query_vector, window, (candidates or {}).get(index), scope),
+                    "_source": CHUNK_SOURCE_FIELDS,
+                },
+                {"index": index, "ignore_unavailable": True},
+                {
+                    "size": window,
+                    "query": self._text_query(query, self.graph_boost, scope=scope),
+                    "_source": CHUNK_SOURCE_FIELDS,
+                },
+            ]
+            plan += ["knn", "bm25"]
+            if include_table_rows and self.table_rows_k > 0:
+                searches += [
+                    {"index": f"{index}_tables", "ignore_unavailable": True},
+                    {"size": self.table_rows_k, "query": self._row_query(query, None, scope), "_source": ROW_SOURCE_FIELDS},
+                ]
+                plan.append("rows")
+
+        with backend_slot("elasticsearch"):
+            client = self.em.es_client.options(request_timeout=time_left(self.es_timeout))
+            responses = client.msearch(searches=searches)["responses"]
+
+        knn_hits: List[Dict[str, Any]] = []
+        text_lists: List[List[Dict[str, Any]]] = []
+        row_lists: List[List[Dict[str, Any]]] = []
+        for kind, res in zip(plan, responses):
+            if "error" in res:
+                print(f"⚠️ 인덱스 검색 일부 실패 ({kind}): {res['error']}")
+                continue
+            hits = res["hits"]["hits"]
+            if kind == "knn":
+                knn_hits.extend(hits)
+            elif kind == "bm25":
+                text_lists.append(hits)
+            else:
+                row_lists.append(hits)
+        knn_hits.sort(key=lambda h: -h["_score"])
+
+        fused = reciprocal_rank_fusion(
+            [(3.0, knn_hits)] + [(2.0, hits) for hits in text_lists], k=self.rrf_k
+        )[:top_k]
+        rows = reciprocal_rank_fusion([(1.0, hits) for hits in row_lists], k=self.rrf_k)[:self.table_rows_k]
+        return (
+            [self._chunk_result(hit, score) for hit, score in fused],
+            [self._row_result(hit, score) for hit, score in rows],
+        )
+
+    def linked_pages(
+        self, docs: List[Dict[str, Any]], indices: List[str], seeds: int = 3, scope: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        상위 seeds개 청크의 neighbors(색인 때 계산해 둔 연결 페이지)에서 아직 결과에 없는 페이지를
+        linked_pages_k개 골라 페이지 요약을 가져옵니다. (임베딩/점수 계산 없는 page_id 조회 한 번)
+        """
+        seen = {d.get("page_id") for d in docs}
+        wanted: List[str] = []
+        for doc in [d for d in docs if "type" not in d][:seeds]:
+            for pid in doc.get("neighbors") or []:
+                if pid not in seen and pid not in wanted:
+                    wanted.append(pid)
+        wanted = wanted[:self.linked_pages_k]
+        if not wanted:
+            return []
         try:
-            response = self.em.es_client.search(
-                index=self.index_name,
-                body=search_body
+            response = self._es_search(
+                index=",".join(f"{index}_pages" for index in indices),
+                query={"bool": {"filter": [{"terms": {"page_id": wanted}}] + ([scope] if scope else [])}},
+                size=len(wanted),
+                _source=["page_id", "title", "space", "url", "summary"],
+                ignore_unavailable=True,
             )
-            
-            hits = response['hits']['hits']
-            results = []
-
-            for hit in hits:
-                score = hit['_score']
-                payload = hit['_source']
-
-                page_id = payload.get('page_id', '')
-                space_key = payload.get('space') or self.default_space_key
-
-                sanitized_url = ""
-                if self.confluence_base_url and page_id and space_key:
-                    base_url = self.confluence_base_url.rstrip('/')
-                    sanitized_url = f"{base_url}/spaces/{space_key}/pages/{page_id}"
-                else:
-                    sanitized_url = payload.get('url', '#')
-
-                main_content = payload.get('content', payload.get('text', '내용 없음'))
-
-                # 🌟 수정 2: 프론트엔드로 전달할 데이터
-                results.append({
-                    "score": score,
-                    "title": payload.get('title', '제목 없음'),
-                    "content": main_content, 
-                    "page_id": page_id,
-                    "source": sanitized_url,
-                    "url": sanitized_url,
-                    "updated_at": payload.get('updated_at', ''),                  # 👈 추가!
-                    "primary_contributor": payload.get('primary_contributor', ''),# 👈 추가!
-                    "tags": payload.get('tags', [])                               # 👈 추가!
-                })
-            
-            return results
-
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"❌ 검색 중 오류 발생: {e}")
+            print(f"⚠️ 연결 문서 조회 실패 (무시): {e}")
             return []
+        by_id = {hit["_source"]["page_id"]: hit["_source"] for hit in response["hits"]["hits"]}
+        return [
+            {
+                "type": "linked_page",
+                "score": None,
+                "title": by_id[pid].get("title", "제목 없음"),
+                "page_id": pid,
+                "url": self._page_url(by_id[pid]),
+                "content": by_id[pid].get("summary", ""),
+            }
+            for pid in wanted if pid in by_id
+        ]
 
-    def format_documents(self, docs: List[Dict[str, Any]]) -> str:
+    @staticmethod
+    def format_documents(docs: List[Dict[str, Any]]) -> str:
         context_text = ""
         for i, doc in enumerate(docs):
+            if doc.get("type") == "table_row":
+                where = f"{doc['title']} > {doc['section']}" if doc.get("section") else doc['title']
+                context_text += f"[표 행 {i+1}]: {where}\n{doc['content']}\n" + "-" * 20 + "\n"
+                continue
+            if doc.get("type") == "linked_page":
+                context_text += f"[연결 문서 {i+1}]: {doc['title']} (요약)\n{doc['content']}\n" + "-" * 20 + "\n"
+                continue
             context_text += f"[문서 {i+1}]: {doc['title']}\n{doc['content']}\n" + "-" * 20 + "\n"
         return context_text
 
-    def ask(self, query: str, top_k: int = 5, display_k: int = 3, verbose: bool = True) -> Dict[str, Any]:
-        # 1. DB에서 5개(top_k)를 긁어옵니다.
-        retrieved_docs = self.search_documents(query, top_k)
+    def ask(
+        self, query: str, top_k: int = 5, display_k: int = 3, verbose: bool = False,
+        indices: Optional[List[str]] = None, session: Optional[Dict[str, Any]] = None, subtree: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        질문에 답합니다. 요청 로그는 slow_query_log(느린 요청 + 표본)에만 남기고,
+        verbose=True일 때만 컨텍스트 전체와 출처를 콘솔에 출력합니다. (로컬 디버깅용)
+        """
+        response: Dict[str, Any] = {}
+        for event in self.ask_stream(query, top_k, display_k, verbose, indices, session, subtree):
+            if event["type"] == "done":
+                response = event["response"]
+        return response
+
+    def ask_stream(
+        self, query: str, top_k: int = 5, display_k: int = 3, verbose: bool = False,
+        indices: Optional[List[str]] = None, session: Optional[Dict[str, Any]] = None, subtree: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        ask()의 스트리밍 버전. indices(기본: self.index_name)에서 찾아 아래 이벤트를 차례로 내보냅니다.
+            {"type": "sources", "sources": [...]}   검색이 끝난 직후 (프론트 노출용 출처)
+            {"type": "token", "text": "..."}        LLM 토큰 조각
+            {"type": "done", "response": {"answer", "sources"}}
+        session(sessions.new_session 형식)을 주면 후속 질문은 직전 검색 결과를 재사용할 수 있고,
+        done 이벤트에 세션에 기록할 "turn": {"docs", "retrieval_query", "scope"}가 붙습니다. (세션 저장은 호출한 쪽에서)
+        subtree(page_id)를 주면 그 페이지와 하위 페이지 문서에서만 찾습니다.
+        """
+        trace = RequestTrace(query)
+        indices = indices or [self.index_name]
+        # 세션의 검색 범위 (범위가 바뀌면 직전 검색 결과를 재사용하지 않음)
+        scope = list(indices) + ([f"subtree:{subtree}"] if subtree else [])
+        history = render_history(session) if session else ""
+
+        # 0. 같은 색인 세대에서 같은 질문이면 공유 답변 캐시를 씁니다. (수집이 끝나면 세대가 바뀌어 자동 무효화)
+        #    세션 질문은 답변이 앞 대화에 따라 달라지고 검색 결과도 세션에 남겨야 하므로 캐시를 쓰지 않음
+        cache_key = None
+        if self.answer_cache_ttl > 0 and session is None:
+            with trace.stage("answer_cache"):
+                cache_key = self._cache_key(
+                    self.shared.index_generation(), ",".join(scope), self.llm_model, top_k, display_k, query.strip()
+                )
+                cached = self.shared.get("answer", cache_key)
+            record_cache("answer", cached is not None)
+            if cached is not None:
+                slow_query_log.record(trace, cached["sources"], top_k=top_k, answered=True, cached=True)
+                yield {"type": "sources", "sources": cached["sources"]}
+                yield {"type": "token", "text": cached["answer"]}
+                yield {"type": "done", "response": cached}
+                return
+
+        # 1. DB에서 5개(top_k)를 긁어옵니다. (세션 후속 질문이 직전 문서로 답할 수 있으면 검색 생략)
+        plan = {"reuse": False, "query": query, "reason": "stateless"}
+        if session is not None:
+            plan = plan_retrieval(session, query, scope)
+            record_cache("session_context", plan["reuse"])
+        if plan["reuse"]:
+            with trace.stage("session_reuse"):
+                retrieved_docs = session["docs"]
+        else:
+            retrieved_docs = self.search_documents(
+                plan["query"], top_k, include_table_rows=True, trace=trace, indices=indices, include_linked=True,
+                subtree=subtree
+            )
 
         if not retrieved_docs:
-            return {"answer": "죄송합니다. 관련 문서를 찾지 못했습니다.", "sources": []}
+            slow_query_log.record(trace, [], top_k=top_k, answered=False)
+            response = {"answer": "죄송합니다. 관련 문서를 찾지 못했습니다.", "sources": []}
+            yield {"type": "sources", "sources": []}
+            yield {"type": "token", "text": response["answer"]}
+            yield self._done_event(response, session, plan, [], scope)
+            return
 
         # 2. GPT에게는 5개 전부를 컨텍스트로 던져줍니다! (최대한 똑똑하게 대답하도록)
-        context_str = self.format_documents(retrieved_docs)
+        with trace.stage("format_context"):
+            context_str = self.format_documents(retrieved_docs)
         if verbose:
             print("\n" + "!"*50)
             print(f"🔍 [DEBUG] GPT가 읽고 있는 컨텍스트 내용 ({len(retrieved_docs)}개):")
             print(context_str)
             print("!"*50 + "\n")
-        
-        chain = self.prompt_template | self.llm | StrOutputParser()
-        answer = chain.invoke({"context": context_str, "question": query})
 
         # 3. 🌟 핵심! 프론트엔드에 내려줄 때는 점수가 제일 높은 상위 display_k개만 자릅니다.
-        display_docs = retrieved_docs[:display_k]
+        with trace.stage("build_response"):
+            display_docs = [d for d in retrieved_docs if "type" not in d][:display_k]  # 표 행/연결 문서 요약 제외
+        yield {"type": "sources", "sources": display_docs}
+
+        pieces: List[str] = []
+        usage: Dict[str, Any] = {}
+        with trace.stage("llm"):
+            for piece in self.gateway.stream(build_messages(context_str, query, history), usage_out=usage):
+                if piece:
+                    pieces.append(piece)
+                    yield {"type": "token", "text": piece}
+        answer = "".join(pieces)
 
         if verbose:
             print("\n📎 검색된 문서 전체(로그용):")
@@ -181,5 +644,33 @@ class ConfluenceChatbot:
             for doc in display_docs:
                 print(f"- {doc['title']} ({doc['url']})")
 
+        slow_query_log.record(
+            trace, retrieved_docs, top_k=top_k, answered=True,
+            context_chars=len(context_str), answer_chars=len(answer), llm=usage
+        )
+
         # 4. 프론트엔드로는 잘라낸 3개만 전달!
-        return {"answer": answer, "sources": display_docs}
\ No newline at end of file
+        response = {"answer": answer, "sources": display_docs}
+        if cache_key and usage.get("model", self.llm_model) == self.llm_model:  # 대체 모델 답변은 캐시하지 않음
+            self.shared.set("answer", cache_key, response, ttl=self.answer_cache_ttl)
+            # 근거 페이지가 웹훅으로 바뀌면 이 답변만 골라 지울 수 있게 기록
+            self.shared.track_answer_pages(
+                cache_key, [d["page_id"] for d in retrieved_docs if d.get("page_id")], ttl=self.answer_cache_ttl
+            )
+        yield self._done_event(response, session, plan, retrieved_docs, scope)
+
+    @staticmethod
+    def _done_event(
+        response: Dict[str, Any], session: Optional[Dict[str, Any]], plan: Dict[str, Any], docs: List[Dict[str, Any]],
+        scope: List[str]
+    ) -> Dict[str, Any]:
+        if session is None:
+            return {"type": "done", "response": response}
+        response = {
+            **response, "session_id": session["session_id"],
+            "retrieval": "reused" if plan["reuse"] else "searched",
+        }
+        return {
+            "type": "done", "response": response,
+            "turn": {"docs": docs, "retrieval_query": plan["query"], "scope": scope},
+        }
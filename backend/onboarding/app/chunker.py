@@ -0,0 +1,290 @@
+"""
+구조 기반 청킹 모듈
+- parse_storage_html 결과(섹션/표/하위 페이지)를 그대로 활용
+- 헤딩(섹션) 경계에서 자르고, 표는 통째로 또는 '헤더 반복 + 행 묶음' 단위로 분할
+- 청크 크기는 문자 수가 아닌 토큰 수 기준
+- 페이지마다 요약 표현(제목 + 목차 + 첫 섹션) 하나를 만들어 페이지 단위 벡터로 사용
+"""
+
+import os
+import re
+from typing import List, Dict, Any, Optional, Callable
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+try:
+    from .parser import table_records_to_markdown
+except ImportError:  # 스크립트(python embedding.py)로 직접 실행하는 경우
+    from parser import table_records_to_markdown
+
+
+# =================================================================
+# 토큰 수 계산
+# =================================================================
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|[0-9]+|[가-힣]+|\S")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    서브워드 토크나이저(BGE-M3/XLM-R 계열) 기준의 근사 토큰 수.
+    영단어는 6자당 1토큰 추가, 숫자는 3자리당, 한글은 2음절당 1토큰으로 계산합니다.
+    """
+    count = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        tok = match.group()
+        first = tok[0]
+        if first.isascii() and first.isalpha():
+            count += 1 + len(tok) // 6
+        elif first.isdigit():
+            count += 1 + len(tok) // 3
+        elif "가" <= first <= "힣":
+            count += (len(tok) + 1) // 2
+        else:
+            count += 1
+    return count
+
+
+_tokenizer_func: Optional[Callable[[str], int]] = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    CHUNK_TOKENIZER=tiktoken 이면 tiktoken(cl100k_base)으로, 아니면 근사치로 토큰 수를 셉니다.
+    (tiktoken은 첫 사용 시 인코딩 파일을 내려받으므로 폐쇄망에서는 기본값 사용)
+    """
+    global _tokenizer_func
+    if _tokenizer_func is None:
+        _tokenizer_func = estimate_tokens
+        if os.getenv("CHUNK_TOKENIZER", "approx") == "tiktoken":
+            try:
+                import tiktoken
+                encoding = tiktoken.get_encoding("cl100k_base")
+                _tokenizer_func = lambda t: len(encoding.encode(t, disallowed_special=()))
+            except Exception as e:
+                print(f"⚠️ tiktoken 로드 실패, 근사 토큰 계산으로 대체합니다: {e}")
+    return _tokenizer_func(text)
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """줄/단어 경계에서 budget 토큰까지만 남깁니다."""
+    kept: List[str] = []
+    used = 0
+    for line in text.split("\n"):
+        words: List[str] = []
+        for word in line.split(" "):
+            t = count_tokens(word)
+            if used + t > budget:
+                if words:
+                    kept.append(" ".join(words))
+                return "\n".join(kept)
+            words.append(word)
+            used += t
+        kept.append(" ".join(words))
+    return "\n".join(kept)
+
+
+def summarize_text(title: str, text: str, budget: int) -> str:
+    """평문 페이지(업로드 파일 등)의 요약 표현: 제목 + 본문 앞부분"""
+    return truncate_tokens(f"[문서 제목: {title}]\n{text.strip()}", budget)
+
+
+# =================================================================
+# 구조 기반 청커
+# =================================================================
+class StructureChunker:
+    """parse_storage_html 결과를 토큰 예산에 맞는 청크 문자열 목록으로 바꿉니다."""
+
+    def __init__(self, chunk_tokens: int = 350, overlap_tokens: int = 40):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk_parsed(self, parsed: Dict[str, Any], title: str) -> List[str]:
+        """
+        Args:
+            parsed: parse_storage_html 반환값
+            title: 문서 제목 (모든 청크 앞에 붙임)
+
+        Returns:
+            청크 문자열 리스트 (본문 → 표 → 하위 페이지 순)
+        """
+        title_line = f"[문서 제목: {title}]"
+        chunks: List[str] = []
+
+        sections = parsed.get("sections") or []
+        if not sections and parsed.get("plain_text"):
+            sections = [{"heading": "", "level": 0, "text": parsed["plain_text"], "tables": []}]
+
+        chunks.extend(self._chunk_sections(sections, title_line))
+
+        table_paths = self.table_heading_paths(parsed)
+        for t_idx, records in enumerate(parsed.get("tables") or []):
+            chunks.extend(self._chunk_table(records, title_line, table_paths.get(t_idx, "")))
+
+        children = parsed.get("child_pages") or []
+        if children:
+            lines = [f"- [{c['title']}](child_id:{c['id']})" for c in children]
+            chunks.extend(self._pack_lines(lines, f"{title_line}\n[하위 페이지 목록]"))
+
+        return chunks
+
+    def summarize(self, parsed: Dict[str, Any], title: str) -> str:
+        """
+        페이지 단위 벡터용 요약 표현 (청크 하나 분량의 토큰 예산)
+        제목 + 헤딩 목록 + 첫 번째 본문 섹션 앞부분
+        """
+        sections = parsed.get("sections") or []
+        lines = [f"[문서 제목: {title}]"]
+        headings = [s["heading"] for s in sections if s.get("heading")]
+        if headings:
+            lines.append("[목차] " + " / ".join(headings))
+        first = next((s["text"] for s in sections if s.get("text", "").strip()), parsed.get("plain_text", ""))
+        lines.append(first.strip())
+        return truncate_tokens("\n".join(lines), self.chunk_tokens)
+
+    def table_heading_paths(self, parsed: Dict[str, Any]) -> Dict[int, str]:
+        """표 번호 → 그 표가 속한 헤딩 경로("A > B")"""
+        sections = parsed.get("sections") or []
+        table_paths: Dict[int, str] = {}
+        for section, path in zip(sections, self._heading_paths(sections)):
+            for t_idx in section.get("tables", []):
+                table_paths[t_idx] = path
+        return table_paths
+
+    # -----------------------------------------------------------------
+    # 본문 섹션
+    # -----------------------------------------------------------------
+    @staticmethod
+    def _heading_paths(sections: List[Dict[str, Any]]) -> List[str]:
+        """각 섹션의 상위 헤딩 경로("A > B > C")를 계산합니다."""
+        stack: List[Any] = []
+        paths: List[str] = []
+        for section in sections:
+            level, heading = section.get("level", 0), section.get("heading", "")
+            if heading:
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, heading))
+            paths.append(" > ".join(h for _, h in stack))
+        return paths
+
+    def _chunk_sections(self, sections: List[Dict[str, Any]], title_line: str) -> List[str]:
+        chunks: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+        header_tokens = count_tokens(title_line)
+
+        def flush():
+            nonlocal current, current_tokens
+            if current:
+                chunks.append("\n".join([title_line] + current))
+            current, current_tokens = [], 0
+
+        for section, path in zip(sections, self._heading_paths(sections)):
+            heading, text = section.get("heading", ""), section.get("text", "")
+            if not text:
+                continue
+
+            # 어떻게 묶이든 섹션은 항상 같은 모양으로 나감: [섹션: 경로] → # 헤딩 → 본문
+            section_line = f"[섹션: {path}]" if path else ""
+            body = ([f"{'#' * section.get('level', 1)} {heading}"] if heading else []) + text.split("\n")
+            block = ([section_line] if section_line else []) + body
+            block_tokens = sum(count_tokens(line) for line in block)
+
+            # 1) 작은 섹션은 현재 청크에 이어 붙임
+            if current_tokens + block_tokens + header_tokens <= self.chunk_tokens:
+                current.extend(block)
+                current_tokens += block_tokens
+                continue
+
+            # 2) 새 청크에서 시작
+            flush()
+            if block_tokens + header_tokens <= self.chunk_tokens:
+                current, current_tokens = block, block_tokens
+                continue
+
+            # 3) 섹션 하나가 예산보다 크면 줄 단위로 분할 (섹션 경로는 조각마다 머리말로 반복)
+            prefix = f"{title_line}\n{section_line}" if section_line else title_line
+            chunks.extend(self._pack_lines(body, prefix))
+
+        flush()
+        return chunks
+
+    def _pack_lines(self, lines: List[str], prefix: str) -> List[str]:
+        """줄들을 토큰 예산에 맞게 묶고, 청크 사이에 overlap_tokens 만큼 앞 줄을 겹칩니다."""
+        budget = max(1, self.chunk_tokens - count_tokens(prefix))
+        chunks: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+
+        pieces: List[str] = []
+        line_splitter = None
+        for line in lines:
+            if count_tokens(line) > budget:
+                # 한 줄이 예산을 넘는 경우에만 문장 단위 보조 분할
+                if line_splitter is None:
+                    line_splitter = RecursiveCharacterTextSplitter(
+                        chunk_size=budget,
+                        chunk_overlap=min(self.overlap_tokens, budget // 2),
+                        length_function=count_tokens,
+                        separators=[". ", ", ", " ", ""],
+                        keep_separator="end"
+                    )
+                pieces.extend(line_splitter.split_text(line))
+            else:
+                pieces.append(line)
+
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > budget:
+                chunks.append("\n".join([prefix] + current))
+                # overlap: 직전 청크의 마지막 줄들을 예산 안에서 이어받음
+                carried: List[str] = []
+                carried_tokens = 0
+                for prev in reversed(current):
+                    t = count_tokens(prev)
+                    if carried_tokens + t > self.overlap_tokens:
+                        break
+                    carried.insert(0, prev)
+                    carried_tokens += t
+                # 겹친 줄 때문에 예산을 넘으면 앞에서부터 덜어냄
+                while carried and carried_tokens + piece_tokens > budget:
+                    carried_tokens -= count_tokens(carried.pop(0))
+                current, current_tokens = carried, carried_tokens
+            current.append(piece)
+            current_tokens += piece_tokens
+
+        if current:
+            chunks.append("\n".join([prefix] + current))
+        return chunks
+
+    # -----------------------------------------------------------------
+    # 표
+    # -----------------------------------------------------------------
+    def _chunk_table(self, records: List[Dict[str, str]], title_line: str, path: str) -> List[str]:
+        """표는 통째로 넣되, 예산을 넘으면 행 묶음으로 나누고 헤더를 매번 반복합니다."""
+        markdown = table_records_to_markdown(records)
+        if not markdown:
+            return []
+
+        lines = markdown.split("\n")
+        header, rows = lines[:2], lines[2:]
+        prefix_lines = [title_line] + ([f"[섹션: {path}]"] if path else []) + ["[표]"] + header
+        prefix = "\n".join(prefix_lines)
+        prefix_tokens = count_tokens(prefix)
+
+        chunks: List[str] = []
+        current: List[str] = []
+        current_tokens = prefix_tokens
+
+        for row in rows:
+            row_tokens = count_tokens(row)
+            if current and current_tokens + row_tokens > self.chunk_tokens:
+                chunks.append("\n".join([prefix] + current))
+                current, current_tokens = [], prefix_tokens
+            # 행은 절대 중간에서 자르지 않음 (한 행이 예산보다 커도 한 청크)
+            current.append(row)
+            current_tokens += row_tokens
+
+        if current:
+            chunks.append("\n".join([prefix] + current))
+        return chunks
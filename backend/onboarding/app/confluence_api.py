@@ -4,6 +4,7 @@ Confluence API 관련 기능 모듈
 - 페이지 목록 및 완성된 URL 가져오기
 - 하위 페이지 조회
 - 최다 수정자(SME) 탐색 기능 추가
+- 스페이스 페이지 계층은 PageRegistry(정수 배열 + 제목 문자열 표)로 보관 (카테고리/필터/트리)
 """
 
 import requests
@@ -11,6 +12,102 @@ import pandas as pd
 from typing import List, Dict, Any, Optional
 from collections import Counter
 
+try:
+    from .metrics import INGEST_STAGE_SECONDS
+    from .page_registry import PageRegistry, PageRegistryBuilder, page_position
+except ImportError:  # 스크립트(python embedding.py)로 직접 실행하는 경우
+    from metrics import INGEST_STAGE_SECONDS
+    from page_registry import PageRegistry, PageRegistryBuilder, page_position
+
+def pages_to_dataframe(pages: List[Dict[str, str]]) -> pd.DataFrame:
+    """
+    get_pages_with_category 결과를 path 기준 level_0, level_1 ... 컬럼이 붙은 DataFrame으로 변환합니다.
+    (네트워크 호출이 없어 벤치마크/테스트에서 바로 사용 가능)
+    """
+    df = pd.DataFrame(pages)
+
+    if df.empty:
+        return df
+
+    def split_path(path: str) -> List[str]:
+        return [p.strip() for p in path.split("/") if p.strip()]
+
+    df["parts"] = df["path"].apply(split_path)
+    max_level = df["parts"].apply(len).max()
+
+    for i in range(max_level):
+        df[f"level_{i}"] = df["parts"].apply(
+            lambda x, i=i: x[i] if len(x) > i else None
+        )
+
+    df = df.drop(columns=["parts"])
+    cols = [c for c in df.columns if c != "path"] + ["path"]
+    df = df[cols]
+
+    return df
+
+
+def build_structure_tree(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    pages_to_dataframe 결과를 프론트엔드용 폴더/페이지 트리로 만듭니다.
+    level_1 → 1단 폴더, level_2 → 2단 폴더, 그 아래는 페이지 노드입니다.
+    """
+    if df.empty:
+        return []
+
+    tree_structure = []
+
+    if 'level_1' not in df.columns:
+        df['level_1'] = '전체 문서'
+    else:
+        df['level_1'] = df['level_1'].fillna('미분류').replace('', '미분류')
+
+    if 'level_2' not in df.columns:
+        df['level_2'] = ''
+    else:
+        df['level_2'] = df['level_2'].fillna('').astype(str)
+
+    for l1_title, l1_group in df.groupby('level_1'):
+        l1_node = {
+            "id": f"folder_l1_{l1_title}",
+            "title": l1_title,
+            "type": "folder",
+            "children": []
+        }
+
+        for l2_title, l2_df in l1_group.groupby('level_2'):
+            if not l2_title: continue
+
+            l2_node = {
+                "id": f"folder_l2_{l1_title}_{l2_title}",
+                "title": l2_title,
+                "type": "folder",
+                "children": []
+            }
+
+            for _, row in l2_df.iterrows():
+                l2_node["children"].append({
+                    "id": str(row['id']),
+                    "title": row['title'],
+                    "type": "page",
+                    "children": []
+                })
+            l1_node["children"].append(l2_node)
+
+        direct_pages = l1_group[l1_group['level_2'] == '']
+        for _, row in direct_pages.iterrows():
+            l1_node["children"].append({
+                "id": str(row['id']),
+                "title": row['title'],
+                "type": "page",
+                "children": []
+            })
+
+        tree_structure.append(l1_node)
+
+    return tree_structure
+
+
 class ConfluenceClient:
     """Confluence API 클라이언트"""
 
@@ -32,9 +129,8 @@ class ConfluenceClient:
         """요청하신 형식의 전체 URL을 생성합니다."""
         return f"{self.base_url}/spaces/{space_key}/pages/{page_id}"
 
-    def get_pages_with_category(self, space_key: str) -> List[Dict[str, str]]:
-        """Space의 모든 페이지를 카테고리 정보 및 '완성된 URL'과 함께 가져옵니다."""
-        page_infos = []
+    def _iter_space_pages(self, space_key: str):
+        """스페이스의 모든 페이지(expand=ancestors)를 목록 API 페이지 단위로 넘기며 돌려줍니다."""
         start = 0
         limit = 200
 
@@ -59,98 +155,92 @@ class ConfluenceClient:
             results = data.get("results", [])
             if not results:
                 break
+            yield from results
 
-            for p in results:
-                ancestors = p.get("ancestors", [])
-                titles = [a["title"] for a in ancestors] + [p["title"]]
-                path = " / ".join(titles)
-
-                page_infos.append({
-                    "id": p["id"],
-                    "title": p["title"],
-                    "path": path,
-                    "url": self.get_page_url(space_key, p["id"])
-                })
-
+            # 서버가 limit보다 적게 줄 수 있으므로(페이지 크기 상한) 받은 개수만큼 넘김
             if "_links" in data and "next" in data["_links"]:
-                start += limit
+                start += len(results)
             else:
                 break
 
+    def get_pages_with_category(self, space_key: str) -> List[Dict[str, str]]:
+        """Space의 모든 페이지를 카테고리 정보 및 '완성된 URL'과 함께 가져옵니다."""
+        page_infos = []
+        for p in self._iter_space_pages(space_key):
+            ancestors = p.get("ancestors", [])
+            titles = [a["title"] for a in ancestors] + [p["title"]]
+            path = " / ".join(titles)
+
+            page_infos.append({
+                "id": p["id"],
+                "title": p["title"],
+                "path": path,
+                "url": self.get_page_url(space_key, p["id"])
+            })
+
         return page_infos
 
+    def get_page_registry(self, space_key: str) -> PageRegistry:
+        """
+        Space의 모든 페이지를 PageRegistry로 가져옵니다. (목록 응답을 dict 목록/DataFrame 없이 바로 배열로)
+        형제 위치(extensions.position)도 넣어 자식 목록이 child/page 응답과 같은 순서가 되게 합니다.
+        URL은 필요할 때 get_page_url로 만듭니다.
+        """
+        builder = PageRegistryBuilder()
+        for p in self._iter_space_pages(space_key):
+            builder.add(p["id"], p["title"], p.get("ancestors", []), page_position(p))
+        return builder.build()
+
     def get_pages_dataframe(self, space_key: str) -> pd.DataFrame:
         """페이지 정보를 DataFrame으로 변환하여 계층 구조를 분석합니다."""
-        pages = self.get_pages_with_category(space_key)
-        df = pd.DataFrame(pages)
-
-        if df.empty:
-            return df
-
-        def split_path(path: str) -> List[str]:
-            return [p.strip() for p in path.split("/") if p.strip()]
-
-        df["parts"] = df["path"].apply(split_path)
-        max_level = df["parts"].apply(len).max()
-
-        for i in range(max_level):
-            df[f"level_{i}"] = df["parts"].apply(
-                lambda x, i=i: x[i] if len(x) > i else None
-            )
-
-        df = df.drop(columns=["parts"])
-        cols = [c for c in df.columns if c != "path"] + ["path"]
-        df = df[cols]
-
-        return df
+        return pages_to_dataframe(self.get_pages_with_category(space_key))
 
     def get_categories(self, space_key: str) -> Dict[str, List[str]]:
-        """Space의 카테고리 계층 구조를 반환합니다."""
-        df = self.get_pages_dataframe(space_key)
-        if df.empty:
-            return {}
-
-        categories = {}
-        level_cols = [col for col in df.columns if col.startswith("level_")]
-        for col in level_cols:
-            unique_values = df[col].dropna().unique().tolist()
-            categories[col] = sorted(unique_values)
-
-        return categories
+        """
+        Space의 카테고리 계층 구조를 반환합니다. (스페이스 전체를 크롤링)
+        색인된 스페이스는 hierarchy.categories가 ES 집계로 같은 결과를 바로 돌려줍니다.
+        """
+        return self.get_page_registry(space_key).categories()
 
     def get_child_pages(self, page_id: str) -> List[Dict[str, str]]:
-        """특정 페이지의 하위 페이지 목록을 조회합니다."""
+        """특정 페이지의 하위 페이지 목록을 조회합니다. (다음 페이지가 없을 때까지 끝까지 넘김)"""
         url = f"{self.base_url}/rest/api/content/{page_id}/child/page"
-        params = {"limit": 100}
+        children: List[Dict[str, str]] = []
+        start = 0
+        limit = 200
 
-        try:
-            response = requests.get(url, auth=self.auth, headers=self.headers, params=params)
-            response.raise_for_status()
-            data = response.json()
+        while True:
+            try:
+                response = requests.get(
+                    url, auth=self.auth, headers=self.headers, params={"limit": limit, "start": start}
+                )
+                response.raise_for_status()
+                data = response.json()
+            except Exception as e:
+                print(f"하위 페이지 조회 실패: {e}")
+                break
 
-            children: List[Dict[str, str]] = []
-            for item in data.get("results", []):
+            results = data.get("results", [])
+            for item in results:
                 children.append({
                     "title": item.get("title", ""),
                     "id": item.get("id", ""),
                 })
-            return children
-        except Exception as e:
-            print(f"하위 페이지 조회 실패: {e}")
-            return []
 
-    def filter_pages_by_category(self, space_key: str, filters: Dict[str, str]) -> List[str]:
-        """카테고리 필터를 적용하여 페이지 ID 목록(String)을 반환합니다."""
-        df = self.get_pages_dataframe(space_key)
-        if df.empty:
-            return []
+            # 서버가 limit보다 적게 줄 수 있으므로(페이지 크기 상한) 받은 개수만큼 넘김
+            if results and "_links" in data and "next" in data["_links"]:
+                start += len(results)
+            else:
+                break
 
-        filtered = df
-        for level, value in filters.items():
-            if level in df.columns:
-                filtered = filtered[filtered[level] == value]
+        return children
 
-        return filtered['id'].astype(str).tolist()
+    def filter_pages_by_category(self, space_key: str, filters: Dict[str, str]) -> List[str]:
+        """
+        카테고리 필터를 적용하여 페이지 ID 목록(String)을 반환합니다. (스페이스 전체를 크롤링)
+        색인된 스페이스는 hierarchy.filter_pages가 ES 필터로 같은 결과를 바로 돌려줍니다.
+        """
+        return self.get_page_registry(space_key).filter(filters)
 
     # ==========================================
     # 🌟 신규 추가: 최다 수정자 찾는 함수
@@ -199,9 +289,26 @@ class ConfluenceClient:
     # ==========================================
     # 🌟 수정됨: 본문과 함께 최다 수정자, 생성/수정일시도 같이 가져옴!
     # ==========================================
+    @INGEST_STAGE_SECONDS.labels("fetch").time()
+    def get_page_status(self, page_id: str) -> Optional[str]:
+        """
+        페이지 상태 ("current", "trashed", "draft" 등, 없는 페이지는 "missing")
+        네트워크 오류/권한 오류 등으로 알 수 없으면 None
+        """
+        url = f"{self.base_url}/rest/api/content/{page_id}"
+        try:
+            response = requests.get(url, auth=self.auth, headers=self.headers, params={"status": "any"})
+            if response.status_code == 404:
+                return "missing"
+            response.raise_for_status()
+            return response.json().get("status", "current")
+        except Exception as e:
+            print(f"페이지 상태 조회 실패 (ID: {page_id}): {e}")
+            return None
+
     def get_page_content(self, page_id: str) -> Optional[Dict[str, Any]]:
-        """특정 페이지의 HTML 내용 및 부가 메타데이터를 가져옵니다."""
-        url = f"{self.base_url}/rest/api/content/{page_id}?expand=body.storage,history,version"
+        """특정 페이지의 HTML 내용 및 부가 메타데이터(스페이스, 부모 페이지 포함)를 가져옵니다."""
+        url = f"{self.base_url}/rest/api/content/{page_id}?expand=body.storage,history,version,space,ancestors"
 
         try:
             response = requests.get(url, auth=self.auth, headers=self.headers)
@@ -214,6 +321,7 @@ class ConfluenceClient:
             
             created_at = data.get("history", {}).get("createdDate", "")
             updated_at = data.get("version", {}).get("when", "")
+            ancestors = data.get("ancestors") or []
             
             primary_contributor = self.get_primary_contributor(page_id)
 
@@ -223,7 +331,10 @@ class ConfluenceClient:
                 "html": html_content,
                 "created_at": created_at,
                 "updated_at": updated_at,
-                "primary_contributor": primary_contributor
+                "primary_contributor": primary_contributor,
+                "space": data.get("space", {}).get("key", ""),
+                "parent_id": ancestors[-1]["id"] if ancestors else None,
+                "ancestors": [{"id": a["id"], "title": a.get("title", "")} for a in ancestors]
             }
         except Exception as e:
             print(f"❌ 페이지 내용 조회 실패 (ID: {page_id}): {e}")
@@ -1,17 +1,33 @@
 """
 임베딩 및 Elasticsearch 관리 모듈 (사내 임베딩 서버 BGE-M3 연동 버전)
 - 데이터 정의서 표준화: 불필요한 필드(text, created_at) 제거 및 타입 안정화
+- 대량 임베딩은 AdaptiveEmbeddingClient(동시 전송 + 배치 자동 조절 + 실패 격리) 사용
+- Storage HTML은 parse_storage_html + StructureChunker(섹션/표 단위, 토큰 기준)로 청킹
+- 페이지마다 요약 벡터 하나를 {index}_pages에 저장 (검색 때 후보 페이지를 먼저 고르는 용도)
 """
 
+import copy
 import os
-import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Callable
 from datetime import datetime
 from elasticsearch import Elasticsearch, helpers
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import urllib3
 
+try:
+    from .embedding_client import AdaptiveEmbeddingClient, EmbeddingRequestError
+    from .chunker import StructureChunker, count_tokens, summarize_text
+    from .ingest_pool import chunk_page_record, iter_chunked_pages, resolve_worker_count
+    from .metrics import INGEST_STAGE_SECONDS, INGEST_ITEMS
+    from .hierarchy import HIERARCHY_FIELDS, HIERARCHY_MAPPING, ancestor_fields
+except ImportError:  # 스크립트(python embedding.py)로 직접 실행하는 경우
+    from embedding_client import AdaptiveEmbeddingClient, EmbeddingRequestError
+    from chunker import StructureChunker, count_tokens, summarize_text
+    from ingest_pool import chunk_page_record, iter_chunked_pages, resolve_worker_count
+    from metrics import INGEST_STAGE_SECONDS, INGEST_ITEMS
+    from hierarchy import HIERARCHY_FIELDS, HIERARCHY_MAPPING, ancestor_fields
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class EmbeddingManager:
@@ -24,6 +40,10 @@ class EmbeddingManager:
         index_name: str = "confluence_docs"
     ):
         self.index_name = index_name
+        # 📊 표 행 단위 문서는 벡터 없이 별도 인덱스에 저장 (kNN 대상과 분리)
+        self.tables_index_name = f"{index_name}_tables"
+        # 🗂️ 페이지 요약 벡터 (페이지당 문서 하나, 2단계 검색의 1단계)
+        self.pages_index_name = f"{index_name}_pages"
         self.embedding_api_url = embedding_api_url
 
         print(f"🔒 [보안점검] ES 접속 시도 URL: {elasticsearch_url}")
@@ -41,51 +61,66 @@ class EmbeddingManager:
 
         self.es_client = Elasticsearch(**es_config)
 
+        # 🧠 대량 임베딩용 클라이언트 (동시 배치 수/배치 크기는 환경변수로 조절)
+        self.embedding_client = AdaptiveEmbeddingClient(
+            embedding_api_url,
+            max_in_flight=int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4")),
+            initial_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "128")),
+            max_batch_chars=int(os.getenv("EMBEDDING_MAX_BATCH_CHARS", "120000")),
+            target_latency=float(os.getenv("EMBEDDING_TARGET_LATENCY", "4.0")),
+        )
+
         try:
             info = self.es_client.info()
             print(f"✅ Elasticsearch 연결 성공! (버전: {info['version']['number']})")
         except Exception as e:
             print(f"❌ Elasticsearch 연결 실패 (초기화 중): {e}")
 
+        # ✂️ 청크 크기는 토큰 기준 (HTML 경로는 구조 기반 청커, 평문 경로는 재귀 분할기)
+        chunk_tokens = int(os.getenv("CHUNK_TOKENS", "350"))
+        overlap_tokens = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+        self.chunker = StructureChunker(chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=3000,
-            chunk_overlap=200,
+            chunk_size=chunk_tokens,
+            chunk_overlap=overlap_tokens,
+            length_function=count_tokens,
             separators=["\n\n", "\n", " ", ""]
         )
+
+        # 🧵 파싱/청킹 프로세스 수 (0: 수집 스레드에서 직접 처리, auto: 코어 수 - 1)
+        self.parse_workers = resolve_worker_count()
     
-    def embedding(self, text: str) -> List[float]:
+    def for_index(self, index_name: str) -> "EmbeddingManager":
+        """ES/임베딩 클라이언트와 청커는 그대로 공유하고 대상 인덱스만 바꾼 매니저 (스페이스별 인덱스용)"""
+        if index_name == self.index_name:
+            return self
+        other = copy.copy(self)
+        other.index_name = index_name
+        other.tables_index_name = f"{index_name}_tables"
+        other.pages_index_name = f"{index_name}_pages"
+        return other
+
+    def embedding(self, text: str, timeout: float = 30) -> List[float]:
         try:
-            response = requests.post(
-                self.embedding_api_url,
-                json={"input": text},
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()['data'][0]['embedding']
-        except Exception as e:
+            return self.embedding_client.post([text], timeout=timeout)[0]
+        except EmbeddingRequestError as e:
             print(f"❌ 임베딩 생성 실패: {e}")
             return []
 
-    def embedding_batch(self, texts: List[str]) -> List[List[float]]:
-        try:
-            print(f" 🧠 {len(texts)}개 텍스트 청크를 사내 임베딩 API로 전송 중...")
-            response = requests.post(
-                self.embedding_api_url,
-                json={"input": texts},
-                headers={"Content-Type": "application/json"},
-                timeout=60
-            )
-            response.raise_for_status()
-            data = response.json()['data']
-            sorted_data = sorted(data, key=lambda x: x['index'])
-            return [item['embedding'] for item in sorted_data]
-        except Exception as e:
-            print(f"❌ 대량 임베딩 생성 실패 (폴백 가동): {e}")
-            return [self.embedding(t) for t in texts]
+    def embedding_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """texts를 임베딩합니다. 실패한 텍스트 자리에는 빈 벡터 대신 None이 들어갑니다."""
+        print(f" 🧠 {len(texts)}개 텍스트 청크를 사내 임베딩 API로 전송 중...")
+        result = self.embedding_client.embed_many(texts)
+        for f in result["failed"]:
+            print(f"❌ 임베딩 실패 (#{f['index']}): {f['error']}")
+        return result["vectors"]
 
     def ensure_collection_exists(self):
+        self.ensure_tables_index_exists()
+        self.ensure_pages_index_exists()
         if self.es_client.indices.exists(index=self.index_name):
+            self._ensure_added_fields()
             return
 
         # 🌟 데이터 정의서 100% 반영: page_id는 keyword로, 불필요한 필드는 제외
@@ -104,6 +139,7 @@ class EmbeddingManager:
             "mappings": {
                 "properties": {
                     "chunk_id": { "type": "integer" },
+                    "content_hash": { "type": "keyword" },
                     "content": {
                         "type": "text",
                         "analyzer": "nori_analyzer",
@@ -124,6 +160,8 @@ class EmbeddingManager:
                         }
                     },
                     "page_id": { "type": "keyword" }, # 🌟 keyword로 변경
+                    "page_rank": { "type": "rank_feature" },  # 링크 그래프 PageRank (link_graph.py)
+                    "neighbors": { "type": "keyword" },       # 링크로 이어진 page_id (중요도 순)
                     "primary_contributor": { "type": "keyword" },
                     "source": { "type": "keyword" },
                     "space": { "type": "keyword" },
@@ -136,7 +174,8 @@ class EmbeddingManager:
                         }
                     },
                     "updated_at": { "type": "date" },
-                    "url": { "type": "keyword" }
+                    "url": { "type": "keyword" },
+                    **HIERARCHY_MAPPING  # 조상 체인/카테고리 경로 (hierarchy.py)
                 }
             }
         }
@@ -147,6 +186,130 @@ class EmbeddingManager:
         except Exception as e:
             print(f"❌ 인덱스 생성 오류: {e}")
 
+    def _ensure_added_fields(self):
+        """링크 그래프/계층 필드가 생기기 전에 만든 인덱스에 필드를 추가합니다. (이미 있으면 변화 없음)"""
+        added_fields = {
+            self.index_name: {
+                "page_rank": {"type": "rank_feature"}, "neighbors": {"type": "keyword"}, **HIERARCHY_MAPPING
+            },
+            self.pages_index_name: {
+                "links": {"type": "keyword"}, "page_rank": {"type": "float"}, "neighbors": {"type": "keyword"},
+                **HIERARCHY_MAPPING
+            },
+            self.tables_index_name: dict(HIERARCHY_MAPPING),
+        }
+        for index, properties in added_fields.items():
+            try:
+                self.es_client.indices.put_mapping(index=index, properties=properties)
+            except Exception as e:
+                print(f" ⚠️ 필드 추가 실패 ({index}): {e}")
+
+    def ensure_tables_index_exists(self):
+        """표 행 인덱스: 헤더=값 쌍을 keyword로 저장해 term 쿼리 한 번으로 조회할 수 있게 합니다."""
+        if self.es_client.indices.exists(index=self.tables_index_name):
+            return
+
+        mapping_body = {
+            "settings": {
+                "number_of_shards": 1,
+                "number_of_replicas": 0,
+                "analysis": {
+                    "analyzer": {
+                        "nori_analyzer": {
+                            "tokenizer": "nori_tokenizer"
+                        }
+                    }
+                }
+            },
+            "mappings": {
+                "properties": {
+                    "page_id": { "type": "keyword" },
+                    "title": {
+                        "type": "text",
+                        "analyzer": "nori_analyzer",
+                        "fields": {
+                            "keyword": { "type": "keyword" }
+                        }
+                    },
+                    "space": { "type": "keyword" },
+                    "url": { "type": "keyword" },
+                    "updated_at": { "type": "date" },
+                    "section": { "type": "keyword" },
+                    "table_index": { "type": "integer" },
+                    "row_index": { "type": "integer" },
+                    "headers": { "type": "keyword" },
+                    "cell_values": { "type": "keyword", "ignore_above": 256 },
+                    "pairs": { "type": "keyword", "ignore_above": 512 },
+                    "row": { "type": "flattened", "ignore_above": 256 },
+                    "row_text": { "type": "text", "analyzer": "nori_analyzer" },
+                    **HIERARCHY_MAPPING
+                }
+            }
+        }
+
+        try:
+            self.es_client.indices.create(index=self.tables_index_name, body=mapping_body)
+            print(f"📦 표 인덱스 '{self.tables_index_name}' 생성 완료")
+        except Exception as e:
+            print(f"❌ 표 인덱스 생성 오류: {e}")
+
+    def ensure_pages_index_exists(self):
+        """페이지 요약 인덱스: 페이지당 (제목 + 목차 + 첫 섹션) 벡터 하나"""
+        if self.es_client.indices.exists(index=self.pages_index_name):
+            return
+
+        mapping_body = {
+            "settings": {
+                "number_of_shards": 1,
+                "number_of_replicas": 0,
+                "analysis": {
+                    "analyzer": {
+                        "nori_analyzer": {
+                            "tokenizer": "nori_tokenizer"
+                        }
+                    }
+                }
+            },
+            "mappings": {
+                "properties": {
+                    "page_id": { "type": "keyword" },
+                    "title": {
+                        "type": "text",
+                        "analyzer": "nori_analyzer",
+                        "fields": {
+                            "keyword": { "type": "keyword" }
+                        }
+                    },
+                    "space": { "type": "keyword" },
+                    "url": { "type": "keyword" },
+                    "updated_at": { "type": "date" },
+                    "primary_contributor": { "type": "keyword" },
+                    "summary": { "type": "text", "analyzer": "nori_analyzer" },
+                    "links": { "type": "keyword" },           # 본문이 링크한 페이지 제목
+                    "page_rank": { "type": "float" },
+                    "neighbors": { "type": "keyword" },
+                    **HIERARCHY_MAPPING,
+                    "embedding": {
+                        "type": "dense_vector",
+                        "dims": 1024,
+                        "index": True,
+                        "similarity": "cosine",
+                        "index_options": {
+                            "type": "int8_hnsw",
+                            "m": 16,
+                            "ef_construction": 100
+                        }
+                    }
+                }
+            }
+        }
+
+        try:
+            self.es_client.indices.create(index=self.pages_index_name, body=mapping_body)
+            print(f"📦 페이지 요약 인덱스 '{self.pages_index_name}' 생성 완료")
+        except Exception as e:
+            print(f"❌ 페이지 요약 인덱스 생성 오류: {e}")
+
     def is_page_indexed(self, page_id: str) -> bool:
         if not self.es_client.indices.exists(index=self.index_name):
             return False
@@ -158,44 +321,157 @@ class EmbeddingManager:
             print(f"⚠️ 페이지 확인 중 오류: {e}")
             return False
 
+    def is_content_indexed(self, page_id: str, content_hash: str) -> bool:
+        """page_id의 청크가 모두 같은 content_hash로 색인돼 있으면 True (일부만 바뀐 경우는 False)"""
+        if not self.es_client.indices.exists(index=self.index_name):
+            return False
+        try:
+            page = {"term": {"page_id": str(page_id)}}
+            total = self.es_client.count(index=self.index_name, query=page)["count"]
+            if total == 0:
+                return False
+            stale = self.es_client.count(
+                index=self.index_name,
+                query={"bool": {"filter": [page], "must_not": [{"term": {"content_hash": content_hash}}]}}
+            )["count"]
+            return stale == 0
+        except Exception as e:
+            print(f"⚠️ 콘텐츠 해시 확인 중 오류: {e}")
+            return False
+
     def delete_page_vectors(self, page_id: str):
         if not self.es_client.indices.exists(index=self.index_name):
             return
         try:
             query = {"term": {"page_id": str(page_id)}}
             self.es_client.delete_by_query(index=self.index_name, query=query, refresh=True)
+            for index in (self.tables_index_name, self.pages_index_name):
+                if self.es_client.indices.exists(index=index):
+                    self.es_client.delete_by_query(index=index, query=query, refresh=True)
         except Exception as e:
             print(f" ⚠️ 삭제 중 오류 (무시 가능): {e}")
 
-    def create_documents(self, titles, page_ids, contents, base_url, spaces=None, updated_ats=None, primary_contributors=None) -> List[Document]:
+    def create_documents(self, titles, page_ids, contents, base_url, spaces=None, updated_ats=None, primary_contributors=None, ancestors=None) -> List[Document]:
         documents = []
         if not spaces: spaces = ["UNKNOWN"] * len(titles)
         if not updated_ats: updated_ats = [datetime.now().isoformat()] * len(titles)
         if not primary_contributors: primary_contributors = ["알 수 없음"] * len(titles)
+        if not ancestors: ancestors = [None] * len(titles)
 
-        for title, page_id, content, space, updated_at, contributor in zip(titles, page_ids, contents, spaces, updated_ats, primary_contributors):
+        for title, page_id, content, space, updated_at, contributor, chain in zip(titles, page_ids, contents, spaces, updated_ats, primary_contributors, ancestors):
             if not content or not content.strip():
                 continue
 
-            clean_base_url = base_url.rstrip('/')
-            final_url = f"{clean_base_url}/spaces/{space}/pages/{page_id}"
-
-            metadata = {
-                "title": title,
-                "page_id": str(page_id),
-                "source": "confluence",
-                "url": final_url,
-                "space": space,
-                "updated_at": updated_at,
-                "primary_contributor": contributor 
-            }
-            
+            metadata = self._page_metadata(title, page_id, base_url, space, updated_at, contributor, chain)
             doc = Document(page_content=content, metadata=metadata)
             documents.append(doc)
         return documents
 
+    def create_structured_chunks(self, titles, page_ids, htmls, base_url, spaces=None, updated_ats=None, primary_contributors=None, get_child_pages_func=None, ancestors=None, table_rows_out: Optional[List[Dict[str, Any]]] = None, summaries_out: Optional[Dict[str, str]] = None, links_out: Optional[Dict[str, List[str]]] = None, progress_callback: Optional[Callable[[str, int, int], None]] = None) -> List[Document]:
+        """
+        Storage HTML을 파싱해 섹션/표 경계를 지키는 청크 Document 리스트를 만듭니다.
+        parse_workers가 2 이상이고 페이지가 충분히 많으면 프로세스 풀에서 병렬로 처리합니다.
+        table_rows_out을 주면 표 행 인덱스용 Bulk action을, summaries_out을 주면 {page_id: 페이지 요약}을,
+        links_out을 주면 {page_id: [링크한 페이지 제목]}을 채웁니다.
+        ancestors(페이지별 Confluence 조상 목록)를 주면 청크마다 계층 필드(hierarchy.py)를 붙입니다.
+        progress_callback("chunk", done, total)은 페이지 하나가 끝날 때마다 불리며, 예외를 던지면 남은 페이지를 취소합니다.
+        """
+        if not spaces: spaces = ["UNKNOWN"] * len(titles)
+        if not updated_ats: updated_ats = [datetime.now().isoformat()] * len(titles)
+        if not primary_contributors: primary_contributors = ["알 수 없음"] * len(titles)
+        if not ancestors: ancestors = [None] * len(titles)
+
+        records = [(str(pid), title, html) for pid, title, html in zip(page_ids, titles, htmls)]
+        chunk_tokens, overlap_tokens = self.chunker.chunk_tokens, self.chunker.overlap_tokens
+
+        if self.parse_workers > 1 and len(records) >= self.parse_workers * 2:
+            results = iter_chunked_pages(
+                records, self.parse_workers, chunk_tokens, overlap_tokens, get_child_pages_func
+            )
+        else:
+            results = (chunk_page_record(rec, self.chunker, get_child_pages_func) for rec in records)
+
+        # 결과가 도착하는 대로 페이지 하나씩 Document로 조립 (전체 결과를 모아 두지 않음)
+        page_meta = {
+            str(page_id): (i, (title, page_id, base_url, space, updated_at, contributor, chain))
+            for i, (title, page_id, space, updated_at, contributor, chain)
+            in enumerate(zip(titles, page_ids, spaces, updated_ats, primary_contributors, ancestors))
+        }
+        page_docs: Dict[int, List[Document]] = {}
+        for done, (pid, texts, tables, paths, summary, links) in enumerate(results, 1):
+            if texts and pid in page_meta:
+                order, meta_args = page_meta[pid]
+                if summaries_out is not None:
+                    summaries_out[pid] = summary
+                if links_out is not None:
+                    links_out[pid] = links
+                metadata = self._page_metadata(*meta_args)
+                page_docs[order] = [Document(page_content=text, metadata=dict(metadata)) for text in texts]
+                if table_rows_out is not None:
+                    table_rows_out.extend(self._build_table_row_actions(metadata, tables, paths))
+            if progress_callback:
+                progress_callback("chunk", done, len(records))
+
+        # 청크 순서는 입력 순서로 고정 (완료 순서와 무관하게 같은 결과)
+        chunks = [doc for order in sorted(page_docs) for doc in page_docs[order]]
+
+        print(f"✂️ 구조 기반 청킹 완료! 문서 {len(htmls)}개 → 청크 {len(chunks)}개 (섹션/표 단위)")
+        return chunks
+
+    def _build_table_row_actions(self, metadata: Dict[str, Any], tables: List[List[Dict[str, str]]], paths: Dict[int, str]) -> List[Dict[str, Any]]:
+        """표 레코드를 행 하나당 문서 하나로 바꿉니다. (헤더=값 쌍은 keyword로 정확 일치 조회)"""
+        actions = []
+        pid = metadata["page_id"]
+        for t_idx, records in enumerate(tables):
+            for r_idx, record in enumerate(records):
+                actions.append({
+                    "_index": self.tables_index_name,
+                    "_id": f"{pid}_t{t_idx}_r{r_idx}",
+                    "_source": {
+                        "page_id": pid,
+                        "title": metadata.get("title"),
+                        "space": metadata.get("space"),
+                        "url": metadata.get("url"),
+                        "updated_at": metadata.get("updated_at"),
+                        "section": paths.get(t_idx, ""),
+                        "table_index": t_idx,
+                        "row_index": r_idx,
+                        "headers": list(record.keys()),
+                        "cell_values": list(record.values()),
+                        "pairs": [f"{h}={v}" for h, v in record.items()],
+                        "row": record,
+                        "row_text": " | ".join(f"{h}: {v}" for h, v in record.items()),
+                        **self._hierarchy_source(metadata)
+                    }
+                })
+        return actions
+
+    @staticmethod
+    def _page_metadata(title, page_id, base_url, space, updated_at, contributor, ancestors=None) -> Dict[str, Any]:
+        clean_base_url = base_url.rstrip('/')
+        final_url = f"{clean_base_url}/spaces/{space}/pages/{page_id}"
+
+        metadata = {
+            "title": title,
+            "page_id": str(page_id),
+            "source": "confluence",
+            "url": final_url,
+            "space": space,
+            "updated_at": updated_at,
+            "primary_contributor": contributor 
+        }
+        if ancestors is not None:
+            # 업로드 파일처럼 조상 정보가 없는 문서는 계층 필드 없이 (트리/카테고리에서 빠짐)
+            metadata.update(ancestor_fields(ancestors, title))
+        return metadata
+
+    @staticmethod
+    def _hierarchy_source(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: metadata[field] for field in HIERARCHY_FIELDS if field in metadata}
+
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
-            split_docs = self.text_splitter.split_documents(documents)
+            with INGEST_STAGE_SECONDS.labels("chunk").time():
+                split_docs = self.text_splitter.split_documents(documents)
             for doc in split_docs:
                 title = doc.metadata.get("title", "제목 없음")
                 doc.page_content = f"[문서 제목: {title}]\n{doc.page_content}"
@@ -207,121 +483,466 @@ class EmbeddingManager:
         self,
         page_ids: List[str],
         titles: List[str],
-        contents: List[str],
+        contents: Optional[List[str]],
         base_url: str,
         spaces: List[str] = None,
         updated_ats: List[str] = None,
         primary_contributors: List[str] = None,
         batch_size: int = 50,
-        force_update: bool = False
+        force_update: bool = False,
+        htmls: List[str] = None,
+        get_child_pages_func=None,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+        content_hashes: List[str] = None,
+        ancestors: List[Optional[List[Dict[str, Any]]]] = None
     ):
+        """
+        페이지들을 청킹 → 임베딩 → Bulk 저장합니다.
+        htmls(Storage HTML)를 주면 구조 기반 청킹을, 아니면 contents(평문)를 토큰 기준으로 분할합니다.
+        progress_callback(stage, done, total)은 단계마다 호출되며, 예외를 던지면 그 지점에서 중단합니다.
+        content_hashes를 주면 청크마다 원본 해시를 저장하고, force_update가 아니면
+        "이미 색인됨" 대신 "같은 해시로 색인됨"일 때만 건너뜁니다. (바뀐 페이지만 다시 임베딩)
+        ancestors(페이지별 조상 목록)를 주면 계층 필드를 저장하고, 건너뛴 페이지도 위치가 바뀌었으면 필드만 고칩니다.
+        """
+        def notify(stage: str, done: int, total: int):
+            if progress_callback:
+                progress_callback(stage, done, total)
+
         target_indices = []
         skipped_count = 0
 
         print(f"🧐 중복 문서 확인 중... (총 {len(page_ids)}개)")
 
         for i, pid in enumerate(page_ids):
-            if not force_update and self.is_page_indexed(pid):
-                skipped_count += 1
-                continue
+            notify("check", i, len(page_ids))
+            if not force_update:
+                unchanged = (
+                    self.is_content_indexed(pid, content_hashes[i]) if content_hashes
+                    else self.is_page_indexed(pid)
+                )
+                if unchanged:
+                    skipped_count += 1
+                    continue
             target_indices.append(i)
 
         if skipped_count > 0:
             print(f"⏩ {skipped_count}개 문서는 이미 최신 상태라 건너뛰었습니다.")
+            if ancestors:
+                targets = set(target_indices)
+                self._sync_hierarchy({
+                    str(page_ids[i]): ancestor_fields(ancestors[i], titles[i])
+                    for i in range(len(page_ids)) if i not in targets and ancestors[i] is not None
+                })
 
         if not target_indices:
             print("🎉 모든 문서가 이미 임베딩되어 있습니다!")
-            return
+            return {"indexed": 0, "failed": []}
 
         print(f"🚀 {len(target_indices)}개 신규 문서 임베딩 시작...")
+        INGEST_ITEMS.labels("pages").inc(len(target_indices))
 
         t_page_ids = [page_ids[i] for i in target_indices]
         t_titles = [titles[i] for i in target_indices]
-        t_contents = [contents[i] for i in target_indices]
+        t_contents = [contents[i] for i in target_indices] if contents else None
+        t_htmls = [htmls[i] for i in target_indices] if htmls else None
         t_spaces = [spaces[i] for i in target_indices] if spaces else None
         t_updated_ats = [updated_ats[i] for i in target_indices] if updated_ats else None
         t_contributors = [primary_contributors[i] for i in target_indices] if primary_contributors else None
+        t_ancestors = [ancestors[i] for i in target_indices] if ancestors else None
+        hash_by_page = {str(page_ids[i]): content_hashes[i] for i in target_indices} if content_hashes else {}
+
+        # 기존 청크는 미리 지우지 않고 같은 _id로 덮어쓴 뒤 남는 청크만 정리합니다.
+        # (재수집 중에도 검색이 끊기지 않고, 작업이 취소돼도 페이지가 통째로 사라지지 않음)
+        notify("chunk", 0, len(t_page_ids))
+        table_row_actions: List[Dict[str, Any]] = []
+        summaries: Dict[str, str] = {}
+        links: Dict[str, List[str]] = {}
+        if t_htmls is not None:
+            split_docs = self.create_structured_chunks(
+                t_titles, t_page_ids, t_htmls, base_url, t_spaces,
+                t_updated_ats, t_contributors, get_child_pages_func, t_ancestors,
+                table_rows_out=table_row_actions, summaries_out=summaries, links_out=links,
+                progress_callback=progress_callback
+            )
+        else:
+            documents = self.create_documents(
+                t_titles, t_page_ids, t_contents, base_url, t_spaces, 
+                t_updated_ats, t_contributors, t_ancestors
+            )
+            split_docs = self.chunk_documents(documents)
+            summaries = {
+                str(pid): summarize_text(title, text, self.chunker.chunk_tokens)
+                for pid, title, text in zip(t_page_ids, t_titles, t_contents) if text and text.strip()
+            }
 
-        for pid in t_page_ids:
-            self.delete_page_vectors(pid)
+        self._delete_table_rows(t_page_ids)
+        if table_row_actions:
+            # 📊 표 행은 임베딩이 필요 없으므로 바로 저장
+            saved_rows = self._bulk_actions(table_row_actions)
+            INGEST_ITEMS.labels("table_rows").inc(saved_rows)
+            print(f"📊 표 행 {saved_rows}개를 '{self.tables_index_name}'에 저장했습니다.")
 
-        documents = self.create_documents(
-            t_titles, t_page_ids, t_contents, base_url, t_spaces, 
-            t_updated_ats, t_contributors
-        )
-        split_docs = self.chunk_documents(documents)
+        page_chunk_counts = {str(pid): 0 for pid in t_page_ids}
+        for doc in split_docs:
+            pid = doc.metadata["page_id"]
+            doc.metadata["chunk_id"] = page_chunk_counts.get(pid, 0)
+            page_chunk_counts[pid] = doc.metadata["chunk_id"] + 1
+            if pid in hash_by_page:
+                doc.metadata["content_hash"] = hash_by_page[pid]
 
         total_chunks = len(split_docs)
         if total_chunks == 0:
-            return
+            self._prune_stale_chunks(page_chunk_counts)
+            self._index_page_summaries({}, split_docs, list(page_chunk_counts))
+            return {"indexed": 0, "failed": []}
 
-        page_chunk_counts = {}
-        for doc in split_docs:
-            pid = doc.metadata["page_id"]
-            if pid not in page_chunk_counts:
-                page_chunk_counts[pid] = 0
-            doc.metadata["chunk_id"] = page_chunk_counts[pid]
-            page_chunk_counts[pid] += 1
-
-        print(f"📦 총 {total_chunks}개 청크를 {batch_size}개씩 묶어서 API로 전송합니다!")
-
-        for i in range(0, total_chunks, batch_size):
-            batch_docs = split_docs[i : i + batch_size]
-            batch_texts = [doc.page_content for doc in batch_docs]
-            
-            batch_vectors = self.embedding_batch(batch_texts)
-
-            actions = []
-            for doc, vector in zip(batch_docs, batch_vectors):
-                pid = doc.metadata["page_id"]
-                cid = doc.metadata["chunk_id"]
-                
-                # 🌟 데이터 정의서 100% 매칭! (text, created_at 필드 삭제)
-                action = {
-                    "_index": self.index_name,
-                    "_id": f"{pid}_{cid}",
-                    "_source": {
-                        "doc_id": f"{pid}_{cid}",
-                        "chunk_id": cid,
-                        "page_id": str(pid),
+        print(f"📦 총 {total_chunks}개 청크를 임베딩 API로 전송합니다! "
+              f"(동시 {self.embedding_client.max_in_flight}배치, 시작 배치 {self.embedding_client.batch_size}개)")
+
+        notify("embed", 0, total_chunks)
+        indexed_count, failed_chunks = self._embed_and_store(
+            split_docs, batch_size, lambda done: notify("embed", done, total_chunks)
+        )
+
+        self._prune_stale_chunks(page_chunk_counts)
+        self._drop_failed_chunks(failed_chunks)
+        notify("summarize", 0, len(summaries))
+        self._index_page_summaries(summaries, split_docs, list(page_chunk_counts), links)
+        notify("summarize", len(summaries), len(summaries))
+        INGEST_ITEMS.labels("chunks_indexed").inc(indexed_count)
+        INGEST_ITEMS.labels("chunks_failed").inc(len(failed_chunks))
+
+        self._report_failed_chunks(failed_chunks)
+
+        print("🎉 모든 임베딩 및 DB 저장 완료!")
+        return {"indexed": indexed_count, "failed": failed_chunks}
+
+    def upsert_text_stream(
+        self,
+        page_id: str,
+        title: str,
+        sections: Iterable[str],
+        base_url: str,
+        space: str,
+        content_hash: Optional[str] = None,
+        batch_size: int = 50,
+        window_chunks: int = 512,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        평문 문서 하나(업로드 파일 등)를 섹션 단위로 받아 청킹 → 임베딩 → Bulk 저장합니다.
+        섹션을 이어 붙이지 않고 청크 window_chunks개가 모일 때마다 바로 임베딩하므로,
+        파일이 커도 메모리에는 섹션 하나 + 청크 한 묶음만 올라갑니다. (기존 청크는 같은 _id로 덮어쓰고 남는 꼬리만 정리)
+        progress_callback("embed", 처리한 청크 수, 0)은 배치마다 불리며 예외를 던지면 그 지점에서 중단합니다.
+
+        Returns:
+            {"indexed": 색인 청크 수, "failed": [...]}
+        """
+        page_id = str(page_id)
+        metadata = self._page_metadata(title, page_id, base_url, space, datetime.now().isoformat(), "알 수 없음")
+        if content_hash:
+            metadata["content_hash"] = content_hash
+
+        window: List[Document] = []
+        chunk_count = 0
+        indexed_count = 0
+        failed_chunks: List[Dict[str, Any]] = []
+        summary = ""
+
+        def flush():
+            nonlocal window, indexed_count
+            if not window:
+                return
+            done_before = window[0].metadata["chunk_id"]
+            indexed, failed = self._embed_and_store(
+                window, batch_size,
+                lambda done: progress_callback("embed", done_before + done, 0) if progress_callback else None
+            )
+            indexed_count += indexed
+            failed_chunks.extend(failed)
+            window = []
+
+        for section in sections:
+            if not section.strip():
+                continue
+            if not summary:
+                summary = summarize_text(title, section, self.chunker.chunk_tokens)
+            with INGEST_STAGE_SECONDS.labels("chunk").time():
+                pieces = self.text_splitter.split_text(section)
+            for piece in pieces:
+                doc_meta = dict(metadata, chunk_id=chunk_count)
+                window.append(Document(page_content=f"[문서 제목: {title}]\n{piece}", metadata=doc_meta))
+                chunk_count += 1
+            if len(window) >= window_chunks:
+                flush()
+        flush()
+
+        self._prune_stale_chunks({page_id: chunk_count})
+        self._drop_failed_chunks(failed_chunks)
+        first = [Document(page_content="", metadata=metadata)] if chunk_count else []
+        self._index_page_summaries({page_id: summary} if summary else {}, first, [page_id])
+        INGEST_ITEMS.labels("chunks_indexed").inc(indexed_count)
+        INGEST_ITEMS.labels("chunks_failed").inc(len(failed_chunks))
+        self._report_failed_chunks(failed_chunks)
+
+        print(f"🎉 '{title}' 색인 완료! 청크 {indexed_count}/{chunk_count}개")
+        return {"indexed": indexed_count, "failed": failed_chunks}
+
+    @staticmethod
+    def _report_failed_chunks(failed_chunks: List[Dict[str, Any]]):
+        if failed_chunks:
+            print(f"⚠️ 임베딩 실패로 {len(failed_chunks)}개 청크를 색인하지 못했습니다:")
+            for f in failed_chunks:
+                print(f"   - [{f['page_id']}#{f['chunk_id']}] {f['title']} ({f['chars']}자): {f['error']}")
+
+    def _embed_and_store(
+        self,
+        docs: List[Document],
+        batch_size: int,
+        on_progress: Optional[Callable[[int], None]] = None
+    ):
+        """
+        docs를 임베딩해 batch_size개씩 Bulk 저장합니다.
+        on_progress(처리한 청크 수)는 배치가 끝날 때마다 불리며, 예외를 던지면 그 지점에서 중단합니다.
+
+        Returns:
+            (저장한 청크 수, [실패한 청크 정보, ...])
+        """
+        actions = []
+        indexed_count = 0
+        processed = 0
+        failed_chunks: List[Dict[str, Any]] = []
+
+        for result in self.embedding_client.iter_embeddings([doc.page_content for doc in docs]):
+            processed += len(result["indices"])
+            if on_progress:
+                on_progress(processed)
+            if "error" in result:
+                # 🚫 실패한 청크는 빈 벡터로 색인하지 않고 보고만 합니다.
+                for idx in result["indices"]:
+                    doc = docs[idx]
+                    failed_chunks.append({
+                        "page_id": doc.metadata["page_id"],
+                        "chunk_id": doc.metadata["chunk_id"],
                         "title": doc.metadata.get("title"),
-                        "space": doc.metadata.get("space", "UNKNOWN"),
-                        "url": doc.metadata.get("url"),
-                        "source": doc.metadata.get("source"),
-                        "content": doc.page_content,
-                        "embedding": vector,
-                        "updated_at": doc.metadata.get("updated_at"),
-                        "primary_contributor": doc.metadata.get("primary_contributor"),
-                        "tags": []
-                    }
-                }
-                actions.append(action)
+                        "chars": len(doc.page_content),
+                        "error": result["error"],
+                    })
+                continue
 
-            if actions:
+            for idx, vector in zip(result["indices"], result["vectors"]):
+                actions.append(self._build_chunk_action(docs[idx], vector))
+
+            if len(actions) >= batch_size:
+                indexed_count += self._bulk_actions(actions)
+                print(f" ✅ {indexed_count}/{len(docs)} 청크 DB 저장 완료 (현재 배치 크기: {self.embedding_client.batch_size})")
+                actions = []
+
+        if actions:
+            indexed_count += self._bulk_actions(actions)
+            print(f" ✅ {indexed_count}/{len(docs)} 청크 DB 저장 완료")
+        return indexed_count, failed_chunks
+
+    def _build_chunk_action(self, doc: Document, vector: List[float]) -> Dict[str, Any]:
+        pid = doc.metadata["page_id"]
+        cid = doc.metadata["chunk_id"]
+
+        # 🌟 데이터 정의서 100% 매칭! (text, created_at 필드 삭제)
+        return {
+            "_index": self.index_name,
+            "_id": f"{pid}_{cid}",
+            "_source": {
+                "doc_id": f"{pid}_{cid}",
+                "chunk_id": cid,
+                "page_id": str(pid),
+                "title": doc.metadata.get("title"),
+                "space": doc.metadata.get("space", "UNKNOWN"),
+                "url": doc.metadata.get("url"),
+                "source": doc.metadata.get("source"),
+                "content": doc.page_content,
+                "embedding": vector,
+                "updated_at": doc.metadata.get("updated_at"),
+                "primary_contributor": doc.metadata.get("primary_contributor"),
+                "content_hash": doc.metadata.get("content_hash"),
+                "tags": [],
+                **self._hierarchy_source(doc.metadata)
+            }
+        }
+
+    def _index_page_summaries(self, summaries: Dict[str, str], split_docs: List[Document], page_ids: List[str], links: Optional[Dict[str, List[str]]] = None) -> int:
+        """
+        페이지 요약을 임베딩해 페이지 인덱스에 저장합니다. (링크 목록도 함께 저장해 링크 그래프 계산에 사용)
+        이번에 청크가 하나도 없는 페이지(본문 삭제 등)는 요약도 지웁니다.
+        """
+        metadata = {}
+        for doc in split_docs:
+            metadata.setdefault(doc.metadata["page_id"], doc.metadata)
+        targets = [pid for pid in summaries if pid in metadata]
+
+        empty = [pid for pid in page_ids if pid not in metadata]
+        if empty and self.es_client.indices.exists(index=self.pages_index_name):
+            try:
+                self.es_client.delete_by_query(
+                    index=self.pages_index_name, query={"terms": {"page_id": empty}}, refresh=True
+                )
+            except Exception as e:
+                print(f" ⚠️ 페이지 요약 삭제 중 오류 (무시 가능): {e}")
+        if not targets:
+            return 0
+
+        vectors = self.embedding_batch([summaries[pid] for pid in targets])
+        actions = []
+        for pid, vector in zip(targets, vectors):
+            if not vector:
+                continue  # 실패한 요약은 건너뜀 (그 페이지는 후보 선택 없이도 BM25로는 찾힘)
+            meta = metadata[pid]
+            actions.append({
+                "_index": self.pages_index_name,
+                "_id": pid,
+                "_source": {
+                    "page_id": pid,
+                    "title": meta.get("title"),
+                    "space": meta.get("space", "UNKNOWN"),
+                    "url": meta.get("url"),
+                    "updated_at": meta.get("updated_at"),
+                    "primary_contributor": meta.get("primary_contributor"),
+                    "summary": summaries[pid],
+                    "links": (links or {}).get(pid, []),
+                    **self._hierarchy_source(meta),
+                    "embedding": vector,
+                }
+            })
+        saved = self._bulk_actions(actions)
+        INGEST_ITEMS.labels("page_summaries").inc(saved)
+        print(f"🗂️ 페이지 요약 {saved}개를 '{self.pages_index_name}'에 저장했습니다.")
+        return saved
+
+    def _sync_hierarchy(self, fields_by_page: Dict[str, Dict[str, Any]], group_size: int = 500) -> int:
+        """
+        본문은 그대로인데 위치(조상)가 바뀐 페이지의 계층 필드만 고칩니다. (다시 임베딩하지 않음)
+        첫 청크의 저장값과 비교해 다른 페이지만 청크/페이지 요약/표 행 인덱스에서 update_by_query로 바꿉니다.
+        """
+        items = list(fields_by_page.items())
+        changed: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(items), group_size):
+            group = dict(items[start:start + group_size])
+            try:
+                res = self.es_client.search(
+                    index=self.index_name,
+                    query={"bool": {"filter": [{"terms": {"page_id": list(group)}}, {"term": {"chunk_id": 0}}]}},
+                    size=len(group),
+                    _source=["page_id"] + HIERARCHY_FIELDS,
+                )
+            except Exception as e:
+                print(f" ⚠️ 계층 필드 확인 실패 (무시 가능): {e}")
+                continue
+            for hit in res["hits"]["hits"]:
+                stored = hit["_source"]
+                wanted = group.get(stored.get("page_id"))
+                if wanted and any(stored.get(f) != wanted[f] for f in HIERARCHY_FIELDS):
+                    changed[stored["page_id"]] = wanted
+        if not changed:
+            return 0
+
+        script = "def f = params.pages[ctx._source.page_id]; if (f == null) { ctx.op = 'noop'; } else { ctx._source.putAll(f); }"
+        moved = list(changed.items())
+        for start in range(0, len(moved), group_size):
+            group = dict(moved[start:start + group_size])
+            for index in (self.index_name, self.pages_index_name, self.tables_index_name):
                 try:
-                    helpers.bulk(self.es_client, actions, stats_only=True)
-                    print(f" ✅ {i+1} ~ {min(i+batch_size, total_chunks)} 번째 청크 DB 저장 완료")
+                    self.es_client.update_by_query(
+                        index=index,
+                        query={"terms": {"page_id": list(group)}},
+                        script={"source": script, "lang": "painless", "params": {"pages": group}},
+                        conflicts="proceed",
+                        refresh=True,
+                        ignore_unavailable=True,
+                    )
                 except Exception as e:
-                    print(f"❌ Bulk 업로드 실패: {e}")
+                    print(f" ⚠️ 계층 필드 갱신 실패 ({index}): {e}")
+        print(f"🌳 위치가 바뀐 페이지 {len(changed)}개의 계층 필드를 고쳤습니다.")
+        return len(changed)
+
+    def _prune_stale_chunks(self, page_chunk_counts: Dict[str, int], group_size: int = 200):
+        """페이지별로 이번에 만든 청크 수 이상의 chunk_id(이전 수집의 남은 꼬리)를 지웁니다."""
+        items = list(page_chunk_counts.items())
+        for start in range(0, len(items), group_size):
+            should = [
+                {"bool": {"filter": [
+                    {"term": {"page_id": pid}},
+                    {"range": {"chunk_id": {"gte": count}}}
+                ]}}
+                for pid, count in items[start:start + group_size]
+            ]
+            try:
+                self.es_client.delete_by_query(
+                    index=self.index_name,
+                    query={"bool": {"should": should, "minimum_should_match": 1}},
+                    refresh=True
+                )
+            except Exception as e:
+                print(f" ⚠️ 남은 청크 정리 중 오류 (무시 가능): {e}")
+
+    def _drop_failed_chunks(self, failed_chunks: List[Dict[str, Any]]):
+        """
+        임베딩에 실패한 청크 자리에 남은 이전 수집의 청크(예전 내용/벡터)를 지우고,
+        그 페이지 청크들의 content_hash를 비워 다음 동기화 때 is_content_indexed가 False가 되게 합니다. (다시 시도)
+        """
+        if not failed_chunks:
+            return
+        ids = [f"{f['page_id']}_{f['chunk_id']}" for f in failed_chunks]
+        pages = list(dict.fromkeys(str(f["page_id"]) for f in failed_chunks))
+        try:
+            self.es_client.delete_by_query(index=self.index_name, query={"terms": {"doc_id": ids}}, refresh=True)
+            self.es_client.update_by_query(
+                index=self.index_name,
+                query={"terms": {"page_id": pages}},
+                script={
+                    "source": "for (f in params.fields) { ctx._source.remove(f); }",
+                    "lang": "painless", "params": {"fields": ["content_hash"]},
+                },
+                conflicts="proceed",
+                refresh=True,
+            )
+        except Exception as e:
+            print(f" ⚠️ 실패한 청크 정리 중 오류 (다음 강제 동기화 때 다시 색인): {e}")
 
-        print("🎉 모든 임베딩 및 DB 저장 완료!")
+    def _delete_table_rows(self, page_ids: List[str]):
+        """표 행은 페이지마다 행 수가 바뀌므로 다시 저장하기 전에 해당 페이지 행을 지웁니다."""
+        if not page_ids or not self.es_client.indices.exists(index=self.tables_index_name):
+            return
+        try:
+            self.es_client.delete_by_query(
+                index=self.tables_index_name,
+                query={"terms": {"page_id": [str(pid) for pid in page_ids]}},
+                refresh=True
+            )
+        except Exception as e:
+            print(f" ⚠️ 표 행 삭제 중 오류 (무시 가능): {e}")
+
+    def _bulk_actions(self, actions: List[Dict[str, Any]]) -> int:
+        try:
+            with INGEST_STAGE_SECONDS.labels("bulk").time():
+                success, _ = helpers.bulk(self.es_client, actions, stats_only=True)
+            return success
+        except Exception as e:
+            print(f"❌ Bulk 업로드 실패: {e}")
+            return 0
 
 
 # =====================================================================
 # 🚀 리얼 Confluence 문서 연동 (트리 순회 알고리즘 적용 - 누락 방지!)
 # =====================================================================
 if __name__ == "__main__":
-    import requests
-    from requests.auth import HTTPBasicAuth
-    from bs4 import BeautifulSoup
-    from datetime import datetime
     import os
-    
+
     try:
         from confluence_api import ConfluenceClient
+        from ingest import sync_space
     except ImportError:
         try:
             from app.confluence_api import ConfluenceClient
+            from app.ingest import sync_space
         except ImportError:
             print("⚠️ ConfluenceClient 모듈을 찾을 수 없어 스크립트를 종료합니다.")
             exit(1)
@@ -344,114 +965,17 @@ if __name__ == "__main__":
 
     client = ConfluenceClient(CONFLUENCE_BASE_URL, CONFLUENCE_EMAIL, CONFLUENCE_API_TOKEN)
 
-    def fetch_tree_pages(base_url, email, api_token, space_key, root_title):
-        auth = HTTPBasicAuth(email, api_token)
-        base_api_url = f"{base_url.rstrip('/')}/rest/api/content"
-        domain = base_url.split('/wiki')[0] 
-
-        # 🌟 created_ats 리스트 완전 삭제
-        page_ids, titles, contents, updated_ats, primary_contributors = [], [], [], [], []
-
-        def safe_date(date_str):
-            """연도가 잘리는 버그 방지용 안전 함수"""
-            if not date_str: return datetime.now().isoformat()
-            # 만약 025- 처럼 맨 앞 2가 잘려있다면 복구
-            if date_str.startswith("025-"): 
-                return "2" + date_str
-            return date_str
-
-        print(f"🔍 루트 카테고리 '{root_title}' 검색 중...")
-        res = requests.get(base_api_url, params={"spaceKey": space_key, "title": root_title, "expand": "body.storage,version,history"}, auth=auth)
-        
-        if res.status_code != 200 or not res.json().get("results"):
-            print("❌ 루트 페이지를 찾을 수 없습니다.")
-            return [], [], [], [], []
-
-        root_page = res.json()["results"][0]
-        root_id = root_page["id"]
-        print(f"✅ 루트 페이지 ID: {root_id}")
-
-        if "body" in root_page and "storage" in root_page["body"]:
-            page_ids.append(root_id)
-            titles.append(root_page["title"])
-            html_content = root_page["body"]["storage"]["value"]
-            contents.append(BeautifulSoup(html_content, "html.parser").get_text(separator=" ", strip=True))
-            
-            # 🌟 created_at 수집 삭제, updated_at 포맷 안전 처리
-            raw_date = root_page.get("version", {}).get("when", "")
-            updated_ats.append(safe_date(raw_date))
-            primary_contributors.append(client.get_primary_contributor(root_id))
-
-        def fetch_children(parent_id):
-            url = f"{base_api_url}/{parent_id}/child/page"
-            params = {"expand": "body.storage,version,history", "limit": 100}
-
-            while url:
-                resp = requests.get(url, params=params, auth=auth)
-                if resp.status_code != 200:
-                    break
-                data = resp.json()
-                pages = data.get("results", [])
-
-                for page in pages:
-                    if "body" in page and "storage" in page["body"]:
-                        page_id = page["id"]
-                        page_ids.append(page_id)
-                        titles.append(page["title"])
-                        html = page["body"]["storage"]["value"]
-                        contents.append(BeautifulSoup(html, "html.parser").get_text(separator=" ", strip=True))
-                        
-                        raw_date = page.get("version", {}).get("when", "")
-                        updated_ats.append(safe_date(raw_date))
-                        primary_contributors.append(client.get_primary_contributor(page_id))
-                    
-                    fetch_children(page["id"])
-
-                if "_links" in data and "next" in data["_links"]:
-                    url = domain + data["_links"]["next"]
-                    params = {} 
-                else:
-                    url = None
-
-        print("📡 트리 구조를 따라 모든 하위 문서를 순회하며 싹쓸이 수집합니다...")
-        fetch_children(root_id)
-        
-        print(f"✅ 트리 순회 완료! 꼼꼼하게 총 {len(page_ids)}개의 문서를 찾아냈습니다.")
-        return page_ids, titles, contents, updated_ats, primary_contributors
-
     manager = EmbeddingManager(
         embedding_api_url=EMBEDDING_API_URL,
         elasticsearch_url=ES_URL,
         elasticsearch_user=ES_USER,
         elasticsearch_password=ES_PASSWORD
     )
-    
-    manager.ensure_collection_exists()
-
-    real_ids, real_titles, real_contents, real_dates, real_contributors = fetch_tree_pages(
-        base_url=CONFLUENCE_BASE_URL,
-        email=CONFLUENCE_EMAIL,
-        api_token=CONFLUENCE_API_TOKEN,
-        space_key=TARGET_SPACE_KEY,
-        root_title=TARGET_CATEGORY
-    )
 
-    if real_ids:
-        print("--------------------------------------------------")
-        print(f"🚀 [TEST] 수집된 {len(real_ids)}개 문서 임베딩 시작...")
-        print("--------------------------------------------------")
-        
-        spaces = [TARGET_SPACE_KEY] * len(real_ids)
-
-        manager.upsert_multiple_pages(
-            page_ids=real_ids,
-            titles=real_titles,
-            contents=real_contents,
-            base_url=CONFLUENCE_BASE_URL,
-            spaces=spaces,
-            updated_ats=real_dates,
-            primary_contributors=real_contributors,
-            force_update=True 
-        )
-        print("--------------------------------------------------")
-        print("🎉 사내 임베딩 및 Graph DB용 메타데이터 연동 완료!")
\ No newline at end of file
+    # 🌟 트리 순회 수집 → 구조 기반 청킹 → 임베딩/저장 (API의 /sync 작업과 같은 경로)
+    print("--------------------------------------------------")
+    print(f"🚀 [TEST] '{TARGET_CATEGORY}' 하위 문서 수집 및 임베딩 시작...")
+    print("--------------------------------------------------")
+    result = sync_space(manager, client, TARGET_SPACE_KEY, root_title=TARGET_CATEGORY, force_update=True)
+    print("--------------------------------------------------")
+    print(f"🎉 사내 임베딩 및 Graph DB용 메타데이터 연동 완료! (페이지 {result['pages']}개, 청크 {result['indexed']}개)")
@@ -0,0 +1,223 @@
+"""
+사내 임베딩 서버(OpenAI 호환 /v1/embeddings) 클라이언트 모듈
+- 여러 배치를 동시에 전송 (in-flight 배치 수 제한)
+- 관측된 지연시간/페이로드 크기에 맞춰 배치 크기 자동 조절 (AIMD)
+- 실패한 배치는 반으로 쪼개(bisection) 문제 입력만 골라내고, 빈 벡터 대신 실패 목록으로 보고
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Iterator, Optional
+
+import requests
+
+try:
+    from .metrics import INGEST_STAGE_SECONDS
+except ImportError:  # 스크립트(python embedding.py)로 직접 실행하는 경우
+    from metrics import INGEST_STAGE_SECONDS
+
+
+class EmbeddingRequestError(Exception):
+    """임베딩 API 호출 실패 (HTTP 오류, 타임아웃, 응답 형식 불일치 등)"""
+
+    def __init__(self, message: str, transient: bool = False):
+        super().__init__(message)
+        # 타임아웃/연결 오류/5xx/429처럼 서버 부하를 뜻하는 실패인지 (4xx 입력 거부는 False)
+        self.transient = transient
+
+
+class AdaptiveEmbeddingClient:
+    """배치 크기를 스스로 조절하며 여러 요청을 동시에 보내는 임베딩 클라이언트"""
+
+    def __init__(
+        self,
+        api_url: str,
+        max_in_flight: int = 4,
+        initial_batch_size: int = 32,
+        min_batch_size: int = 1,
+        max_batch_size: int = 128,
+        max_batch_chars: int = 120_000,
+        target_latency: float = 4.0,
+        timeout: float = 60.0,
+        single_retries: int = 1,
+    ):
+        self.api_url = api_url
+        self.max_in_flight = max(1, max_in_flight)
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.max_batch_chars = max_batch_chars
+        self.target_latency = target_latency
+        self.timeout = timeout
+        self.single_retries = single_retries
+
+        self._batch_size = min(max(initial_batch_size, self.min_batch_size), self.max_batch_size)
+        self._lock = threading.Lock()
+
+        # 커넥션 재사용 (배치마다 TCP/TLS 핸드셰이크 반복 방지)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight + 1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    # -----------------------------------------------------------------
+    # 단일 HTTP 호출
+    # -----------------------------------------------------------------
+    def post(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """texts를 한 번의 요청으로 임베딩합니다. 실패 시 EmbeddingRequestError를 던집니다."""
+        try:
+            response = self.session.post(
+                self.api_url,
+                json={"input": texts},
+                headers={"Content-Type": "application/json"},
+                timeout=timeout or self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()["data"]
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise EmbeddingRequestError(str(e), transient=True) from e
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            raise EmbeddingRequestError(str(e), transient=status >= 500 or status == 429) from e
+        except Exception as e:
+            raise EmbeddingRequestError(str(e)) from e
+
+        if len(data) != len(texts):
+            raise EmbeddingRequestError(f"응답 개수 불일치 (요청 {len(texts)}개, 응답 {len(data)}개)")
+
+        sorted_data = sorted(data, key=lambda x: x.get("index", 0))
+        vectors = [item.get("embedding") or [] for item in sorted_data]
+        if any(not v for v in vectors):
+            raise EmbeddingRequestError("빈 임베딩 벡터가 포함된 응답")
+        return vectors
+
+    # -----------------------------------------------------------------
+    # 배치 크기 조절 (AIMD)
+    # -----------------------------------------------------------------
+    def _on_success(self, size: int, latency: float):
+        with self._lock:
+            if size < self._batch_size:
+                # 꼬리 배치/재시도 배치는 크기 판단 근거로 쓰지 않음
+                return
+            if latency > self.target_latency:
+                self._batch_size = max(self.min_batch_size, self._batch_size // 2)
+            elif latency < self.target_latency * 0.5:
+                self._batch_size = min(self.max_batch_size, self._batch_size + max(1, self._batch_size // 4))
+
+    def _on_failure(self, size: int, original: bool, transient: bool):
+        """
+        배치 크기를 줄일 실패인지 판단합니다.
+        - 타임아웃/5xx: 서버 부하 신호이므로 항상 축소
+        - 그 외(4xx 등): 현재 크기로 잘라 보낸 원본 배치가 실패했을 때만 축소
+          (bisection으로 쪼갠 배치나 단건 재시도의 입력 거부는 크기와 무관하므로 무시)
+        """
+        with self._lock:
+            if not transient and (not original or size < self._batch_size):
+                return
+            self._batch_size = max(self.min_batch_size, self._batch_size // 2)
+
+    def _take_batch(self, texts: List[str], cursor: int) -> List[int]:
+        """cursor부터 현재 배치 크기와 페이로드 상한(문자 수) 안에서 인덱스를 묶습니다."""
+        limit = self._batch_size
+        indices: List[int] = []
+        payload = 0
+        i = cursor
+        while i < len(texts) and len(indices) < limit:
+            size = len(texts[i])
+            if indices and payload + size > self.max_batch_chars:
+                break
+            indices.append(i)
+            payload += size
+            i += 1
+        return indices
+
+    # -----------------------------------------------------------------
+    # 대량 임베딩
+    # -----------------------------------------------------------------
+    def iter_embeddings(self, texts: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        texts 전체를 임베딩하며 배치가 끝나는 대로 결과를 내보냅니다. (완료 순서, 입력 순서 아님)
+
+        Yields:
+            성공: {"indices": [..], "vectors": [[..], ..]}
+            실패: {"indices": [i], "error": "사유"}  (bisection으로 좁혀진 단일 입력)
+        """
+        cursor = 0
+        retry_queue: deque = deque()  # (indices, 남은 단건 재시도 횟수)
+        # in_flight: future -> (indices, 남은 재시도 횟수, 원본 배치 여부)
+        in_flight: Dict[Any, Any] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed") as pool:
+            while cursor < len(texts) or retry_queue or in_flight:
+                # 1. 빈 슬롯만큼 배치 투입 (재시도 배치 우선)
+                while len(in_flight) < self.max_in_flight:
+                    if retry_queue:
+                        indices, retries = retry_queue.popleft()
+                        original = False
+                    elif cursor < len(texts):
+                        indices = self._take_batch(texts, cursor)
+                        cursor += len(indices)
+                        retries = self.single_retries
+                        original = True
+                    else:
+                        break
+                    batch = [texts[i] for i in indices]
+                    future = pool.submit(self._timed_post, batch)
+                    in_flight[future] = (indices, retries, original)
+
+                # 2. 하나라도 끝나면 처리
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    indices, retries, original = in_flight.pop(future)
+                    try:
+                        vectors, latency = future.result()
+                    except EmbeddingRequestError as e:
+                        self._on_failure(len(indices), original, e.transient)
+                        if len(indices) > 1:
+                            # 🔪 반으로 쪼개서 문제 입력만 격리
+                            mid = len(indices) // 2
+                            retry_queue.appendleft((indices[mid:], self.single_retries))
+                            retry_queue.appendleft((indices[:mid], self.single_retries))
+                        elif retries > 0:
+                            retry_queue.append((indices, retries - 1))
+                        else:
+                            yield {"indices": indices, "error": str(e)}
+                        continue
+
+                    self._on_success(len(indices), latency)
+                    INGEST_STAGE_SECONDS.labels("embed").observe(latency)
+                    yield {"indices": indices, "vectors": vectors}
+
+    def embed_many(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        texts 전체를 임베딩해 입력 순서대로 돌려줍니다.
+
+        Returns:
+            {
+                "vectors": [벡터 또는 None(실패), ...],
+                "failed": [{"index": i, "error": "사유"}, ...]
+            }
+        """
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        failed: List[Dict[str, Any]] = []
+
+        for result in self.iter_embeddings(texts):
+            if "error" in result:
+                for i in result["indices"]:
+                    failed.append({"index": i, "error": result["error"]})
+                continue
+            for i, vec in zip(result["indices"], result["vectors"]):
+                vectors[i] = vec
+
+        failed.sort(key=lambda f: f["index"])
+        return {"vectors": vectors, "failed": failed}
+
+    def _timed_post(self, batch: List[str]):
+        start = time.perf_counter()
+        vectors = self.post(batch)
+        return vectors, time.perf_counter() - start
@@ -0,0 +1,325 @@
+"""
+Confluence Storage HTML 단일 패스 파서 (이벤트 기반 스트리밍)
+- parser._parse_storage_html_bs4 와 결과가 100% 같도록 설계 (benchmarks/bench_parser.py로 검증)
+- BeautifulSoup 트리를 만들지 않고 html.parser 이벤트를 한 번만 훑으면서
+  잡음 태그 제거 / 첨부 / ac:link 치환 / 표 평탄화 / 본문·섹션 추출을 동시에 처리
+- 표 내부만 작은 트리로 모았다가 표가 닫힐 때 한 번에 레코드로 변환
+"""
+
+import os
+from html.parser import HTMLParser
+from typing import Dict, List, Any, Optional
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+
+try:
+    from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+    _dereference_charref = BeautifulSoupHTMLParser._dereference_numeric_character_reference
+except (ImportError, AttributeError):  # 구버전 bs4
+    _dereference_charref = None
+
+try:
+    from .parser import HEADING_TAGS, NOISE_TAGS, rows_to_records, build_sections, build_parse_result, _parse_storage_html_bs4
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from parser import HEADING_TAGS, NOISE_TAGS, rows_to_records, build_sections, build_parse_result, _parse_storage_html_bs4
+
+
+_NOISE = frozenset(NOISE_TAGS)
+_HEADINGS = frozenset(HEADING_TAGS)
+# html.parser 트리빌더와 같은 기준: 빈 요소(br, img ...)와 문자열 컨테이너(script, template ...)
+_EMPTY_ELEMENTS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+_STRING_CONTAINERS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+_ENTITIES = EntitySubstitution.HTML_ENTITY_TO_CHARACTER
+
+
+class _UnsupportedMarkup(Exception):
+    """단일 패스로 기준 구현과 같은 결과를 보장할 수 없는 구조 (중첩 ac:link 등)"""
+
+
+class _Frame:
+    """열린 태그 하나. kind: None / noise / link / table / heading"""
+    __slots__ = ("name", "kind", "node", "data")
+
+    def __init__(self, name: str, kind: Optional[str] = None, node: Optional[list] = None, data: Any = None):
+        self.name = name
+        self.kind = kind
+        self.node = node      # 표 내부라면 이 태그에 해당하는 미니 트리 노드
+        self.data = data      # link: [본문 조각들, 대상 제목], heading: 섹션 dict
+
+
+class _StorageEventParser(HTMLParser):
+    """BeautifulSoup(html.parser)의 트리 구성 규칙을 그대로 따르는 이벤트 핸들러"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack: List[_Frame] = []
+        self.pending: List[str] = []
+        self.already_closed_empty: List[str] = []
+
+        self.noise_depth = 0
+        self.container_depth = 0
+        self.link: Optional[_Frame] = None
+        self.table_root: Optional[list] = None
+        self.open_headings: List[dict] = []
+
+        self.has_children_macro = False
+        self.attachments: List[str] = []
+        self.links: List[str] = []
+        self.tables: List[List[Dict[str, str]]] = []
+        self.table_section_indices: List[int] = []
+        self.text_lines: List[str] = []
+        self.raw_sections: List[Dict[str, Any]] = [{"heading": "", "level": 0, "lines": []}]
+
+    # -----------------------------------------------------------------
+    # 문자열 라우팅
+    # -----------------------------------------------------------------
+    def _flush(self):
+        if self.pending:
+            text = "".join(self.pending)
+            self.pending = []
+            # script/style/template/rt/rp 안의 일반 문자열은 get_text() 대상이 아님
+            if self.container_depth == 0:
+                self._route(text)
+
+    def _route(self, text: str):
+        if self.noise_depth:
+            return
+        if self.link is not None:
+            stripped = text.strip()
+            if stripped:
+                self.link.data[0].append(stripped)
+            return
+        if self.table_root is not None:
+            self.stack[-1].node[2].append(text)
+            return
+
+        lines = [line.strip() for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        if not lines:
+            return
+        self.text_lines.extend(lines)
+        if self.open_headings:
+            stripped = text.strip()
+            for section in self.open_headings:
+                section["parts"].append(stripped)
+        else:
+            self.raw_sections[-1]["lines"].extend(lines)
+
+    # -----------------------------------------------------------------
+    # 태그 열기/닫기
+    # -----------------------------------------------------------------
+    def _push(self, name: str, attrs: Dict[str, str]):
+        if name == "ac:structured-macro" and attrs.get("ac:name") == "children":
+            self.has_children_macro = True
+
+        if name in _STRING_CONTAINERS:
+            self.container_depth += 1
+
+        if self.noise_depth or name in _NOISE:
+            self.noise_depth += 1
+            self.stack.append(_Frame(name, "noise"))
+            return
+
+        if name == "ri:attachment":
+            fname = attrs.get("ri:filename") or attrs.get("filename")
+            if fname:
+                self.attachments.append(os.path.splitext(fname)[0])
+
+        if self.link is not None:
+            if name == "ac:link":
+                raise _UnsupportedMarkup("nested ac:link")
+            if name == "ri:page" and self.link.data[1] is None:
+                self.link.data[1] = attrs.get("ri:content-title", "")
+            self.stack.append(_Frame(name))
+            return
+
+        if name == "ac:link":
+            frame = _Frame(name, "link", data=[[], None])
+            self.link = frame
+            self.stack.append(frame)
+            return
+
+        if self.table_root is not None:
+            node = [name, attrs, []]
+            self.stack[-1].node[2].append(node)
+            self.stack.append(_Frame(name, node=node))
+            return
+
+        if name == "table":
+            node = [name, attrs, []]
+            self.table_root = node
+            # 표 앞에 나온 헤딩 개수 = 표가 속한 섹션 번호
+            self.stack.append(_Frame(name, "table", node=node, data=len(self.raw_sections) - 1))
+            return
+
+        if name in _HEADINGS:
+            section = {"heading": "", "level": int(name[1]), "lines": [], "parts": []}
+            self.raw_sections.append(section)
+            self.open_headings.append(section)
+            self.stack.append(_Frame(name, "heading", data=section))
+            return
+
+        self.stack.append(_Frame(name))
+
+    def _pop(self):
+        frame = self.stack.pop()
+        if frame.name in _STRING_CONTAINERS:
+            self.container_depth -= 1
+
+        kind = frame.kind
+        if kind == "noise":
+            self.noise_depth -= 1
+        elif kind == "link":
+            self.link = None
+            body_text = "".join(frame.data[0])
+            target_title = frame.data[1] or ""
+            if target_title:
+                self.links.append(target_title)
+                self._route(f"[{body_text}](관련문서: {target_title})")
+            else:
+                self._route(body_text)
+        elif kind == "table":
+            self.table_root = None
+            records = rows_to_records(_table_rows(frame.node))
+            if records:
+                self.tables.append(records)
+                self.table_section_indices.append(frame.data)
+        elif kind == "heading":
+            self.open_headings.pop()
+
+    def _pop_to(self, name: str):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i].name == name:
+                while len(self.stack) > i:
+                    self._pop()
+                return
+
+    # -----------------------------------------------------------------
+    # HTMLParser 이벤트 (BeautifulSoupHTMLParser와 같은 규칙)
+    # -----------------------------------------------------------------
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self._flush()
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = "" if value is None else value
+        self._push(tag, attr_dict)
+        if handle_empty_element and tag in _EMPTY_ELEMENTS:
+            self._pop_to(tag)
+            self.already_closed_empty.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self.already_closed_empty:
+            self.already_closed_empty.remove(tag)
+            return
+        self._flush()
+        self._pop_to(tag)
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    def handle_charref(self, name):
+        if _dereference_charref is not None:
+            dereferenced, _, extra_data = _dereference_charref(name)
+        else:
+            import html
+            dereferenced, extra_data = html.unescape(f"&#{name};"), ""
+        if dereferenced is not None:
+            self.pending.append(dereferenced)
+        if extra_data is not None:
+            self.pending.append(extra_data)
+
+    def handle_entityref(self, name):
+        character = _ENTITIES.get(name)
+        self.pending.append(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            # CDATA는 문자열 컨테이너 안에서도 get_text() 대상
+            self._route(data[len("CDATA["):])
+
+    def finish(self):
+        self.close()
+        self._flush()
+        while self.stack:
+            self._pop()
+
+
+def _table_rows(table_node: list) -> List[Any]:
+    """표 미니 트리를 rows_to_records 입력 형식으로 바꿉니다. (find_all과 같은 하위 전체 탐색)"""
+    rows = []
+    for tr in _iter_nodes(table_node, ("tr",)):
+        cells = []
+        has_th = False
+        for cell in _iter_nodes(tr, ("td", "th")):
+            if cell[0] == "th":
+                has_th = True
+            attrs = cell[1]
+            cells.append((_node_text(cell), attrs.get("rowspan", 1), attrs.get("colspan", 1)))
+        rows.append((cells, has_th))
+    return rows
+
+
+def _iter_nodes(node: list, names: tuple):
+    for child in node[2]:
+        if isinstance(child, list):
+            if child[0] in names:
+                yield child
+            yield from _iter_nodes(child, names)
+
+
+def _node_text(node: list) -> str:
+    """cell.get_text(" ", strip=True)와 같은 결과"""
+    parts: List[str] = []
+    stack = [iter(node[2])]
+    while stack:
+        for child in stack[-1]:
+            if isinstance(child, list):
+                stack.append(iter(child[2]))
+                break
+            stripped = child.strip()
+            if stripped:
+                parts.append(stripped)
+        else:
+            stack.pop()
+    return " ".join(parts)
+
+
+def parse_storage_html_fast(
+    page_id: str,
+    html: str,
+    get_child_pages_func=None
+) -> Dict[str, Any]:
+    """
+    parse_storage_html의 단일 패스 구현입니다. (반환 형식 동일)
+    기준 구현과 결과를 맞출 수 없는 드문 구조를 만나면 BeautifulSoup 구현으로 처리합니다.
+    """
+    parser = _StorageEventParser()
+    try:
+        parser.feed(html)
+        parser.finish()
+    except _UnsupportedMarkup:
+        return _parse_storage_html_bs4(page_id, html, get_child_pages_func)
+
+    for section in parser.raw_sections[1:]:
+        section["heading"] = " ".join(section.pop("parts"))
+    sections = build_sections(parser.raw_sections, parser.table_section_indices)
+
+    return build_parse_result(
+        page_id, parser.text_lines, parser.tables, parser.links, parser.attachments,
+        sections, parser.has_children_macro, get_child_pages_func
+    )
@@ -0,0 +1,182 @@
+"""
+페이지 계층(카테고리) 모듈 (Confluence 크롤링 대신 ES 집계로)
+- 수집 때 페이지마다 조상 체인을 청크/페이지 요약/표 행 문서에 함께 저장
+  ancestor_ids / ancestor_titles(루트부터 순서대로), depth(조상 수), category_path(["0:루트", "1:A", ..., "depth:자기 제목"])
+- category_path는 "레벨:제목" keyword라 배열 안 순서가 없어도 레벨별 값으로 집계/필터할 수 있음
+  → 문서 트리(/documents/structure), 레벨별 카테고리, 카테고리 필터를 composite 집계/필터 한 번으로 계산
+- subtree_filter(page_id)로 /chat 검색을 한 페이지와 그 하위 페이지로 제한
+- 페이지가 옮겨지거나 제목이 바뀌면 하위 페이지 문서의 조상 체인을 update_by_query로 고침
+"""
+
+from typing import Any, Dict, Iterator, List, Optional
+
+HIERARCHY_FIELDS = ["ancestor_ids", "ancestor_titles", "depth", "category_path"]
+HIERARCHY_MAPPING = {
+    "ancestor_ids": {"type": "keyword"},
+    "ancestor_titles": {"type": "keyword"},
+    "depth": {"type": "integer"},
+    "category_path": {"type": "keyword"},
+}
+
+# 하위 페이지 문서의 조상 체인에서 page_id까지를 params.chain_*(새 조상 + 자기 자신)으로 바꾸는 스크립트
+_REBASE_SCRIPT = """
+def ids = ctx._source.ancestor_ids;
+int i = ids == null ? -1 : ids.indexOf(params.page_id);
+if (i < 0) {
+  ctx.op = 'noop';
+} else {
+  List newIds = new ArrayList(params.chain_ids);
+  newIds.addAll(ids.subList(i + 1, ids.size()));
+  List newTitles = new ArrayList(params.chain_titles);
+  newTitles.addAll(ctx._source.ancestor_titles.subList(i + 1, ids.size()));
+  List path = new ArrayList();
+  for (int j = 0; j < newTitles.size(); j++) { path.add(j + ':' + newTitles.get(j)); }
+  path.add(newIds.size() + ':' + ctx._source.title);
+  ctx._source.ancestor_ids = newIds;
+  ctx._source.ancestor_titles = newTitles;
+  ctx._source.depth = newIds.size();
+  ctx._source.category_path = path;
+}
+"""
+
+
+def ancestor_fields(ancestors: List[Dict[str, Any]], title: str) -> Dict[str, Any]:
+    """Confluence ancestors([{"id", "title"}, ...], 루트부터) → 색인 필드"""
+    titles = [a.get("title", "") for a in ancestors]
+    return {
+        "ancestor_ids": [str(a["id"]) for a in ancestors],
+        "ancestor_titles": titles,
+        "depth": len(ancestors),
+        "category_path": [f"{level}:{t}" for level, t in enumerate(titles + [title])],
+    }
+
+
+def subtree_filter(page_id: str) -> Dict[str, Any]:
+    """page_id 페이지와 그 하위 페이지 (계층 필드가 없는 예전 문서는 page_id 자신만 걸림)"""
+    return {"bool": {"should": [
+        {"term": {"page_id": str(page_id)}},
+        {"term": {"ancestor_ids": str(page_id)}},
+    ], "minimum_should_match": 1}}
+
+
+def _split_level(value: str):
+    level, _, title = value.partition(":")
+    return int(level), title
+
+
+def _iter_composite(es_client, index: str, sources: List[Dict[str, Any]], query: Dict[str, Any], page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """composite 집계 버킷을 after_key로 끝까지 넘기며 돌려줍니다. (문서 본문은 읽지 않음)"""
+    after = None
+    while True:
+        composite: Dict[str, Any] = {"size": page_size, "sources": sources}
+        if after is not None:
+            composite["after"] = after
+        res = es_client.search(
+            index=index, size=0, query=query, aggs={"pages": {"composite": composite}}, ignore_unavailable=True
+        )
+        agg = (res.get("aggregations") or {}).get("pages") or {}
+        buckets = agg.get("buckets", [])
+        yield from buckets
+        after = agg.get("after_key")
+        if not buckets or after is None:
+            break
+
+
+def _confluence_pages(filters: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    # 페이지마다 첫 청크 하나만 (계층 필드가 있는 Confluence 페이지만, 업로드 파일 제외)
+    return {"bool": {"filter": [{"term": {"chunk_id": 0}}, {"exists": {"field": "category_path"}}] + (filters or [])}}
+
+
+def page_levels(es_client, index: str) -> List[Dict[str, Any]]:
+    """
+    (page_id, category_path) composite 집계로 페이지별 경로를 복원합니다.
+    Returns:
+        [{"id", "title", "parts": [루트 제목, ..., 자기 제목]}, ...] page_id 순
+    """
+    levels: Dict[str, Dict[int, str]] = {}
+    sources = [{"page_id": {"terms": {"field": "page_id"}}}, {"path": {"terms": {"field": "category_path"}}}]
+    for bucket in _iter_composite(es_client, index, sources, _confluence_pages()):
+        level, title = _split_level(bucket["key"]["path"])
+        levels.setdefault(bucket["key"]["page_id"], {})[level] = title
+    pages = []
+    for page_id, by_level in levels.items():
+        parts = [by_level.get(i, "") for i in range(max(by_level) + 1)]
+        pages.append({"id": page_id, "title": parts[-1], "parts": parts})
+    return pages
+
+
+def build_tree(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    page_levels 결과 → 프론트엔드용 폴더/페이지 트리 (confluence_api.build_structure_tree와 같은 모양)
+    경로 2번째 → 1단 폴더, 3번째 → 2단 폴더, 그보다 얕은 페이지는 1단 폴더 바로 아래 페이지 노드입니다.
+    """
+    if not pages:
+        return []
+    has_level_1 = any(len(p["parts"]) > 1 for p in pages)
+    groups: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    for p in pages:
+        parts = p["parts"]
+        l1 = (parts[1] if len(parts) > 1 else "") or ("미분류" if has_level_1 else "전체 문서")
+        l2 = parts[2] if len(parts) > 2 else ""
+        groups.setdefault(l1, {}).setdefault(l2, []).append(
+            {"id": str(p["id"]), "title": p["title"], "type": "page", "children": []}
+        )
+
+    tree = []
+    for l1 in sorted(groups):
+        l1_node = {"id": f"folder_l1_{l1}", "title": l1, "type": "folder", "children": []}
+        for l2 in sorted(t for t in groups[l1] if t):
+            l1_node["children"].append({
+                "id": f"folder_l2_{l1}_{l2}", "title": l2, "type": "folder", "children": groups[l1][l2],
+            })
+        l1_node["children"].extend(groups[l1].get("", []))
+        tree.append(l1_node)
+    return tree
+
+
+def categories(es_client, index: str) -> Dict[str, List[str]]:
+    """레벨별 카테고리 값 {"level_0": [...], "level_1": [...], ...} (category_path composite 집계 한 번)"""
+    by_level: Dict[int, List[str]] = {}
+    sources = [{"path": {"terms": {"field": "category_path"}}}]
+    for bucket in _iter_composite(es_client, index, sources, _confluence_pages()):
+        level, title = _split_level(bucket["key"]["path"])
+        by_level.setdefault(level, []).append(title)
+    return {f"level_{level}": sorted(by_level[level]) for level in sorted(by_level)}
+
+
+def filter_pages(es_client, index: str, filters: Dict[str, str]) -> List[str]:
+    """{"level_1": "인사", ...} 조건을 모두 만족하는 page_id 목록 (모르는 키는 무시)"""
+    clauses = [
+        {"term": {"category_path": f"{key[len('level_'):]}:{value}"}}
+        for key, value in filters.items() if key.startswith("level_") and key[len("level_"):].isdigit()
+    ]
+    sources = [{"page_id": {"terms": {"field": "page_id"}}}]
+    return [b["key"]["page_id"] for b in _iter_composite(es_client, index, sources, _confluence_pages(clauses))]
+
+
+def rebase_descendants(manager, page_id: str, ancestors: List[Dict[str, Any]], title: str) -> int:
+    """
+    옮겨졌거나 제목이 바뀐 페이지의 하위 페이지 문서에서 조상 체인을 새 값으로 바꿉니다.
+    (하위 페이지는 다시 수집하지 않고 청크/페이지 요약/표 행 인덱스를 스크립트로 고침)
+    """
+    chain = ancestor_fields(ancestors, title)
+    params = {
+        "page_id": str(page_id),
+        "chain_ids": chain["ancestor_ids"] + [str(page_id)],
+        "chain_titles": chain["ancestor_titles"] + [title],
+    }
+    updated = 0
+    for index in (manager.index_name, manager.pages_index_name, manager.tables_index_name):
+        if not manager.es_client.indices.exists(index=index):
+            continue
+        res = manager.es_client.update_by_query(
+            index=index,
+            query={"term": {"ancestor_ids": str(page_id)}},
+            script={"source": _REBASE_SCRIPT, "lang": "painless", "params": params},
+            conflicts="proceed",
+            refresh=True,
+        )
+        updated += res.get("updated", 0)
+    if updated:
+        print(f"🌳 페이지 {page_id} 하위 문서 {updated}개의 조상 경로를 고쳤습니다.")
+    return updated
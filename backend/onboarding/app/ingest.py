@@ -0,0 +1,418 @@
+"""
+수집(ingestion) 작업 모듈
+- Confluence 스페이스/트리 수집 → EmbeddingManager.upsert_multiple_pages
+- 업로드 파일(txt/md/csv/pdf/xlsx/docx) 텍스트 추출 → 같은 색인 경로 (추출은 uploads.py)
+- 웹훅으로 들어온 페이지 한 건 재색인/삭제 (디바운스는 webhooks.py)
+- 페이지마다 조상 목록(ancestors)을 함께 넘겨 계층 필드를 색인 (트리/카테고리/하위 트리 검색용, hierarchy.py)
+- children 매크로는 수집한 페이지 트리로 풀고, 수집 범위 밖 페이지만 HTTP로 조회 (page_registry.ChildPageResolver)
+- 색인이 바뀌면 링크 그래프(PageRank/연결 문서)를 다시 계산 (link_graph.py, 웹훅은 LINK_GRAPH_MIN_INTERVAL초에 한 번)
+- 모든 함수는 progress_callback(stage, done, total)을 받아 진행률을 알리고,
+  콜백이 예외(예: JobCancelled)를 던지면 그 지점에서 중단됩니다.
+"""
+
+import hashlib
+import os
+import re
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+import requests
+
+try:
+    from .confluence_api import ConfluenceClient
+    from .embedding import EmbeddingManager
+    from .ingest_pool import resolve_worker_count
+    from .link_graph import update_link_graph
+    from .hierarchy import rebase_descendants
+    from .page_registry import ChildPageResolver, PageRegistry, page_position
+    from .uploads import SUPPORTED_EXTENSIONS, SpooledUpload, iter_extracted, iter_spooled_sections, remove_spool
+    from .shared_state import get_shared_state
+    from .spaces import UPLOAD_SPACE
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from confluence_api import ConfluenceClient
+    from embedding import EmbeddingManager
+    from ingest_pool import resolve_worker_count
+    from link_graph import update_link_graph
+    from hierarchy import rebase_descendants
+    from page_registry import ChildPageResolver, PageRegistry, page_position
+    from uploads import SUPPORTED_EXTENSIONS, SpooledUpload, iter_extracted, iter_spooled_sections, remove_spool
+    from shared_state import get_shared_state
+    from spaces import UPLOAD_SPACE
+
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _notify(progress_callback: Optional[ProgressCallback], stage: str, done: int, total: int):
+    if progress_callback:
+        progress_callback(stage, done, total)
+
+
+def _refresh_link_graph(
+    manager: EmbeddingManager,
+    throttle: bool = False,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    링크 그래프를 다시 계산합니다. 실패해도 수집 결과에는 영향 없음 (검색 가산점/연결 문서만 예전 값).
+    throttle=True(웹훅)면 인덱스마다 LINK_GRAPH_MIN_INTERVAL초에 한 워커만 계산하고,
+    그 사이 바뀐 페이지는 다음 계산(다음 웹훅이나 동기화) 때 반영됩니다.
+    """
+    if throttle:
+        interval = float(os.getenv("LINK_GRAPH_MIN_INTERVAL", "300"))
+        if get_shared_state().add("once", f"link_graph:{manager.index_name}", os.getpid(), ttl=interval) is False:
+            return None
+    try:
+        return update_link_graph(manager, progress_callback=progress_callback)
+    except Exception as e:
+        print(f"⚠️ 링크 그래프 갱신 실패 ({manager.index_name}): {e}")
+        return None
+
+
+def _html_hash(html: str) -> str:
+    """본문 해시 (재동기화 때 바뀌지 않은 페이지는 임베딩을 건너뜀)"""
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def _safe_date(date_str: str) -> str:
+    """연도가 잘리는 버그 방지용 안전 함수"""
+    if not date_str:
+        return datetime.now().isoformat()
+    # 만약 025- 처럼 맨 앞 2가 잘려있다면 복구
+    if date_str.startswith("025-"):
+        return "2" + date_str
+    return date_str
+
+
+# =================================================================
+# Confluence 수집
+# =================================================================
+def fetch_tree_pages(
+    client: ConfluenceClient,
+    space_key: str,
+    root_title: str,
+    progress_callback: Optional[ProgressCallback] = None,
+    listing_out: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    루트 페이지(root_title)부터 하위 트리를 따라가며 본문(Storage HTML)까지 수집합니다.
+    하위 페이지 목록 조회 시 body.storage를 함께 받아 페이지당 추가 요청을 줄입니다.
+    listing_out을 주면 본문이 없는 페이지까지 방문한 모든 페이지를 {"id", "title", "ancestors", "position"}으로 채웁니다.
+    (ChildPageResolver.from_pages용)
+
+    Returns:
+        [{"id", "title", "html", "updated_at", "primary_contributor", "ancestors"}, ...]
+    """
+    base_api_url = f"{client.base_url}/rest/api/content"
+    domain = client.base_url.split('/wiki')[0]
+    pages: List[Dict[str, Any]] = []
+
+    def collect(page: Dict[str, Any]):
+        chain = [{"id": a["id"], "title": a.get("title", "")} for a in page.get("ancestors") or []]
+        if listing_out is not None:
+            listing_out.append({"id": page["id"], "title": page["title"], "ancestors": chain, "position": page_position(page)})
+        if "body" in page and "storage" in page["body"]:
+            pages.append({
+                "id": page["id"],
+                "title": page["title"],
+                "html": page["body"]["storage"]["value"],
+                "updated_at": _safe_date(page.get("version", {}).get("when", "")),
+                "primary_contributor": client.get_primary_contributor(page["id"]),
+                "ancestors": chain,
+            })
+            _notify(progress_callback, "fetch", len(pages), 0)
+
+    print(f"🔍 루트 카테고리 '{root_title}' 검색 중...")
+    res = requests.get(
+        base_api_url,
+        params={"spaceKey": space_key, "title": root_title, "expand": "body.storage,version,history,ancestors"},
+        auth=client.auth, headers=client.headers
+    )
+    if res.status_code != 200 or not res.json().get("results"):
+        print("❌ 루트 페이지를 찾을 수 없습니다.")
+        return []
+
+    root_page = res.json()["results"][0]
+    print(f"✅ 루트 페이지 ID: {root_page['id']}")
+    collect(root_page)
+
+    # 재귀 대신 스택으로 순회 (깊은 트리에서도 재귀 한도에 걸리지 않음)
+    stack = [root_page["id"]]
+    while stack:
+        parent_id = stack.pop()
+        url: Optional[str] = f"{base_api_url}/{parent_id}/child/page"
+        params: Dict[str, Any] = {"expand": "body.storage,version,history,ancestors", "limit": 100}
+        children: List[str] = []
+
+        while url:
+            resp = requests.get(url, params=params, auth=client.auth, headers=client.headers)
+            if resp.status_code != 200:
+                break
+            data = resp.json()
+            for page in data.get("results", []):
+                collect(page)
+                children.append(page["id"])
+
+            if "_links" in data and "next" in data["_links"]:
+                url = domain + data["_links"]["next"]
+                params = {}
+            else:
+                url = None
+
+        # 형제 목록을 먼저 받은 뒤 앞 형제부터 깊이 우선으로 내려감
+        stack.extend(reversed(children))
+
+    print(f"✅ 트리 순회 완료! 총 {len(pages)}개의 문서를 찾아냈습니다.")
+    return pages
+
+
+def fetch_space_pages(
+    client: ConfluenceClient,
+    space_key: str,
+    progress_callback: Optional[ProgressCallback] = None,
+    registry: Optional[PageRegistry] = None
+) -> List[Dict[str, Any]]:
+    """스페이스 전체 페이지를 목록 조회(PageRegistry, 이미 받아 둔 것이 있으면 재사용) 후 페이지별 본문 조회로 수집합니다."""
+    registry = registry or client.get_page_registry(space_key)
+    pages: List[Dict[str, Any]] = []
+    for i, row in enumerate(registry.iter_pages()):
+        content = client.get_page_content(registry.page_id(row))
+        if content:
+            content["updated_at"] = _safe_date(content.get("updated_at", ""))
+            pages.append(content)
+        _notify(progress_callback, "fetch", i + 1, len(registry))
+    print(f"✅ 스페이스 '{space_key}' 수집 완료: {len(pages)}/{len(registry)}개 페이지")
+    return pages
+
+
+def sync_space(
+    manager: EmbeddingManager,
+    client: ConfluenceClient,
+    space_key: str,
+    root_title: Optional[str] = None,
+    force_update: bool = False,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    Confluence 스페이스(또는 root_title 아래 트리)를 수집해 색인합니다.
+
+    Returns:
+        {"space": ..., "pages": 수집 페이지 수, "indexed": 색인 청크 수, "failed": [...]}
+    """
+    # 수집 범위(스페이스 전체 / 루트 아래 트리 전체) 안의 children 매크로는 목록으로 만든 트리로 풂
+    # (본문 조회에 실패한 페이지도 부모의 하위 페이지 목록에는 남도록 본문 수집 결과가 아닌 목록 전체를 씀)
+    if root_title:
+        listing: List[Dict[str, Any]] = []
+        pages = fetch_tree_pages(client, space_key, root_title, progress_callback, listing_out=listing)
+        child_pages = ChildPageResolver.from_pages(listing, client.get_child_pages)
+    else:
+        registry = client.get_page_registry(space_key)
+        pages = fetch_space_pages(client, space_key, progress_callback, registry=registry)
+        child_pages = ChildPageResolver(registry, client.get_child_pages)
+
+    if not pages:
+        return {"space": space_key, "pages": 0, "indexed": 0, "failed": []}
+
+    manager.ensure_collection_exists()
+    result = manager.upsert_multiple_pages(
+        page_ids=[p["id"] for p in pages],
+        titles=[p["title"] for p in pages],
+        contents=None,
+        htmls=[p["html"] for p in pages],
+        get_child_pages_func=child_pages,
+        base_url=client.base_url,
+        spaces=[space_key] * len(pages),
+        updated_ats=[p["updated_at"] for p in pages],
+        primary_contributors=[p["primary_contributor"] for p in pages],
+        force_update=force_update,
+        progress_callback=progress_callback,
+        content_hashes=[_html_hash(p["html"]) for p in pages],
+        ancestors=[p.get("ancestors") for p in pages],
+    )
+    graph = _refresh_link_graph(manager, progress_callback=progress_callback)
+    shared = get_shared_state()
+    # 답변/문서 구조 캐시 무효화 (모든 워커 공통)
+    shared.bump_index_generation()
+    # 스페이스별 주기 동기화(spaces.py) 기준 시각
+    shared.set("space_sync", space_key, {"finished_at": time.time(), "pages": len(pages), "indexed": result.get("indexed", 0)})
+    return {"space": space_key, "pages": len(pages), **result, "link_graph": graph}
+
+
+# =================================================================
+# 페이지 단위 재색인 (웹훅)
+# =================================================================
+def _invalidate_page_caches(page_ids: List[str], new_page: bool):
+    """
+    바뀐 페이지를 근거로 한 답변 캐시와 문서 구조 캐시를 지웁니다.
+    새 페이지는 어느 질문의 답이 될지 모르므로 세대 번호를 올려 답변 캐시 전체를 무효화합니다.
+    """
+    shared = get_shared_state()
+    if new_page:
+        shared.bump_index_generation()
+        return
+    dropped = sum(shared.invalidate_page_answers(pid) for pid in page_ids)
+    shared.clear("structure")
+    if dropped:
+        print(f"🧹 페이지 {page_ids} 관련 캐시 답변 {dropped}개 무효화")
+
+
+def reindex_page(
+    manager: EmbeddingManager,
+    client: ConfluenceClient,
+    page_id: str,
+    space_key: Optional[str] = None,
+    relink: bool = False,
+    new_page: bool = False,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    페이지 한 건을 다시 수집(fetch → parse → embed → upsert)합니다.
+    페이지를 더 이상 조회할 수 없으면(삭제/권한 없음) 색인에서 지웁니다.
+    relink=True(생성/이동)면 하위 페이지 목록이 바뀐 부모 페이지도 함께 다시 색인합니다.
+    """
+    _notify(progress_callback, "fetch", 0, 1)
+    content = client.get_page_content(page_id)
+    if not content:
+        return remove_page(manager, client, page_id, progress_callback)
+
+    pages = [content]
+    parent_id = content.get("parent_id")
+    if relink and parent_id and manager.is_page_indexed(parent_id):
+        parent = client.get_page_content(parent_id)
+        if parent:
+            pages.append(parent)
+    _notify(progress_callback, "fetch", 1, 1)
+
+    space_key = content.get("space") or space_key or os.getenv("CONFLUENCE_SPACE_KEY", "UNKNOWN")
+    manager.ensure_collection_exists()
+    result = manager.upsert_multiple_pages(
+        page_ids=[p["id"] for p in pages],
+        titles=[p["title"] for p in pages],
+        contents=None,
+        htmls=[p["html"] for p in pages],
+        get_child_pages_func=client.get_child_pages,
+        base_url=client.base_url,
+        spaces=[space_key] * len(pages),
+        updated_ats=[_safe_date(p.get("updated_at", "")) for p in pages],
+        primary_contributors=[p["primary_contributor"] for p in pages],
+        force_update=True,
+        progress_callback=progress_callback,
+        content_hashes=[_html_hash(p["html"]) for p in pages],
+        ancestors=[p.get("ancestors") for p in pages],
+    )
+    try:
+        # 옮겨지거나 제목이 바뀐 페이지면 하위 페이지의 조상 경로도 바뀜 (하위 페이지가 없으면 아무것도 안 함)
+        rebase_descendants(manager, content["id"], content.get("ancestors") or [], content["title"])
+    except Exception as e:
+        print(f"⚠️ 하위 페이지 경로 갱신 실패 ({content['id']}): {e}")
+    _refresh_link_graph(manager, throttle=True)
+    _invalidate_page_caches([p["id"] for p in pages], new_page)
+    return {"page_id": page_id, "action": "reindex", "pages": [p["id"] for p in pages], **result}
+
+
+def remove_page(
+    manager: EmbeddingManager,
+    client: ConfluenceClient,
+    page_id: str,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    삭제(휴지통 이동 포함)된 페이지의 청크/표 행을 색인에서 지웁니다.
+    웹훅 본문만 믿지 않고 Confluence에 페이지 상태를 다시 물어, 없거나 휴지통에 있을 때만 지웁니다.
+    """
+    _notify(progress_callback, "delete", 0, 1)
+    status = client.get_page_status(page_id)
+    if status is None:
+        raise RuntimeError(f"페이지 {page_id} 상태를 확인하지 못해 삭제를 보류합니다.")
+    if status not in ("missing", "trashed"):
+        print(f"⚠️ 페이지 {page_id}가 아직 존재합니다(status={status}). 색인에서 지우지 않습니다.")
+        _notify(progress_callback, "delete", 1, 1)
+        return {"page_id": page_id, "action": "skip", "status": status}
+    manager.delete_page_vectors(page_id)
+    _notify(progress_callback, "delete", 1, 1)
+    _refresh_link_graph(manager, throttle=True)
+    _invalidate_page_caches([page_id], new_page=False)
+    return {"page_id": page_id, "action": "delete"}
+
+
+# =================================================================
+# 업로드 파일 수집
+# =================================================================
+def upload_page_id(filename: str) -> str:
+    """업로드 파일의 page_id (같은 파일명을 다시 올리면 기존 청크를 교체)"""
+    return "upload-" + re.sub(r"[^0-9A-Za-z가-힣._-]+", "_", filename)
+
+
+def ingest_files(
+    manager: EmbeddingManager,
+    uploads: List[SpooledUpload],
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    스풀링된 업로드 파일들을 섹션 단위로 추출해 청킹 → 임베딩 → Bulk 저장합니다.
+    파일 하나의 추출이 끝나는 대로 그 파일의 섹션 스풀을 한 섹션씩 읽어 색인하므로 본문 전체를 메모리에 올리지 않습니다.
+    같은 파일명 + 같은 내용(SHA-256)이 이미 색인돼 있으면 추출부터 건너뜁니다.
+    임시 파일 정리는 호출한 쪽(작업 함수)이 맡습니다.
+
+    Returns:
+        {"files": 색인한 파일 수, "unchanged": [파일명], "indexed": 색인 청크 수, "failed": [...],
+         "rejected": [{"filename", "error"}]}
+    """
+    rejected: List[Dict[str, str]] = []
+    unchanged: List[str] = []
+    targets: List[SpooledUpload] = []
+
+    # 한 요청에 같은 파일명이 여러 번 오면 마지막 것만 색인
+    latest: Dict[str, SpooledUpload] = {}
+    for upload in uploads:
+        ext = os.path.splitext(upload.filename)[1].lower()
+        if ext not in SUPPORTED_EXTENSIONS:
+            rejected.append({"filename": upload.filename, "error": f"지원하지 않는 파일 형식입니다: {ext or upload.filename}"})
+            continue
+        latest[upload_page_id(upload.filename)] = upload
+
+    for i, (page_id, upload) in enumerate(latest.items()):
+        _notify(progress_callback, "check", i, len(latest))
+        if manager.is_content_indexed(page_id, upload.sha256):
+            unchanged.append(upload.filename)
+            continue
+        targets.append(upload)
+
+    if unchanged:
+        print(f"⏩ 내용이 바뀌지 않은 파일 {len(unchanged)}개는 건너뜁니다: {unchanged}")
+
+    if not targets:
+        return {"files": 0, "unchanged": unchanged, "indexed": 0, "failed": [], "rejected": rejected}
+
+    manager.ensure_collection_exists()
+    files, indexed = 0, 0
+    failed: List[Dict[str, Any]] = []
+    for done, (i, spool, count, error) in enumerate(iter_extracted(targets, resolve_worker_count()), start=1):
+        _notify(progress_callback, "extract", done, len(targets))
+        upload = targets[i]
+        try:
+            if error:
+                rejected.append({"filename": upload.filename, "error": error})
+                continue
+            if not count:
+                rejected.append({"filename": upload.filename, "error": "추출된 텍스트가 없습니다."})
+                continue
+            result = manager.upsert_text_stream(
+                page_id=upload_page_id(upload.filename),
+                title=os.path.splitext(upload.filename)[0],
+                sections=iter_spooled_sections(spool),
+                base_url=os.getenv("CONFLUENCE_URL", ""),
+                space=UPLOAD_SPACE,
+                content_hash=upload.sha256,
+                progress_callback=progress_callback,
+            )
+        finally:
+            remove_spool(spool)
+        files += 1
+        indexed += result["indexed"]
+        failed.extend(result["failed"])
+
+    if files:
+        get_shared_state().bump_index_generation()
+    return {"files": files, "unchanged": unchanged, "indexed": indexed, "failed": failed, "rejected": rejected}
@@ -0,0 +1,137 @@
+"""
+멀티 프로세스 파싱/청킹 모듈 (대형 스페이스 수집용)
+- parse_storage_html + StructureChunker는 CPU 바운드라 수집 스레드 하나로는 코어 1개만 사용
+- ProcessPoolExecutor로 (page_id, title, html) 묶음을 보내고 (page_id, [청크 텍스트], [표], {표: 섹션}, 요약, [링크 제목]) 튜플만 돌려받음
+- 큰 페이지부터 배분(LPT)하고 작은 페이지는 묶어 보내 IPC 오버헤드를 줄임
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Iterator, Optional, Callable
+
+try:
+    from .parser import parse_storage_html
+    from .chunker import StructureChunker
+    from .metrics import INGEST_STAGE_SECONDS
+except ImportError:  # 스크립트(python embedding.py)로 직접 실행하는 경우
+    from parser import parse_storage_html
+    from chunker import StructureChunker
+    from metrics import INGEST_STAGE_SECONDS
+
+
+# (page_id, title, storage_html)
+PageRecord = Tuple[str, str, str]
+# (page_id, [청크 텍스트, ...], [표 레코드, ...], {표 번호: 헤딩 경로}, 페이지 요약, [링크한 페이지 제목, ...])
+ChunkResult = Tuple[str, List[str], List[List[Dict[str, str]]], Dict[int, str], str, List[str]]
+
+
+def resolve_worker_count(value: Optional[str] = None) -> int:
+    """INGEST_PARSE_WORKERS 값("auto", 숫자, 비어 있음)을 워커 수로 바꿉니다. 0이면 단일 프로세스."""
+    value = value if value is not None else os.getenv("INGEST_PARSE_WORKERS", "0")
+    if value == "auto":
+        return max(1, (os.cpu_count() or 2) - 1)
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return 0
+
+
+# -----------------------------------------------------------------
+# 워커 프로세스 쪽 상태 (initializer에서 한 번만 생성)
+# -----------------------------------------------------------------
+_worker_chunker: Optional[StructureChunker] = None
+_worker_child_pages_func: Optional[Callable] = None
+
+
+def _init_worker(chunk_tokens: int, overlap_tokens: int, get_child_pages_func: Optional[Callable]):
+    global _worker_chunker, _worker_child_pages_func
+    _worker_chunker = StructureChunker(chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    _worker_child_pages_func = get_child_pages_func
+
+
+def chunk_page_record(record: PageRecord, chunker: StructureChunker, get_child_pages_func=None) -> ChunkResult:
+    """
+    페이지 하나를 파싱해 청크 텍스트, 표 레코드, 페이지 요약, 링크 목록으로 바꿉니다. (단일/멀티 프로세스 공용)
+    워커 프로세스의 parse/chunk 지표는 PROMETHEUS_MULTIPROC_DIR가 설정된 경우에만 합산됩니다.
+    """
+    page_id, title, html = record
+    with INGEST_STAGE_SECONDS.labels("parse").time():
+        parsed = parse_storage_html(str(page_id), html, get_child_pages_func)
+    if not parsed["combined_text"].strip():
+        return str(page_id), [], [], {}, "", []
+    with INGEST_STAGE_SECONDS.labels("chunk").time():
+        texts = chunker.chunk_parsed(parsed, title)
+        paths = chunker.table_heading_paths(parsed)
+        summary = chunker.summarize(parsed, title)
+    return str(page_id), texts, parsed["tables"], paths, summary, list(dict.fromkeys(parsed["links"]))
+
+
+def _process_bundle(bundle: List[PageRecord]) -> List[ChunkResult]:
+    return [chunk_page_record(rec, _worker_chunker, _worker_child_pages_func) for rec in bundle]
+
+
+# -----------------------------------------------------------------
+# 스케줄링
+# -----------------------------------------------------------------
+def make_bundles(records: List[PageRecord], bundle_bytes: int) -> List[List[PageRecord]]:
+    """
+    HTML 크기 기준으로 작업 묶음을 만듭니다.
+    큰 페이지는 단독 작업으로 먼저 내보내고(LPT), 작은 페이지는 bundle_bytes까지 묶습니다.
+    """
+    ordered = sorted(records, key=lambda r: len(r[2] or ""), reverse=True)
+    bundles: List[List[PageRecord]] = []
+    current: List[PageRecord] = []
+    current_bytes = 0
+
+    for rec in ordered:
+        size = len(rec[2] or "")
+        if size >= bundle_bytes:
+            bundles.append([rec])
+            continue
+        if current and current_bytes + size > bundle_bytes:
+            bundles.append(current)
+            current, current_bytes = [], 0
+        current.append(rec)
+        current_bytes += size
+
+    if current:
+        bundles.append(current)
+    return bundles
+
+
+def iter_chunked_pages(
+    records: List[PageRecord],
+    workers: int,
+    chunk_tokens: int,
+    overlap_tokens: int,
+    get_child_pages_func: Optional[Callable] = None,
+    bundle_bytes: int = 64 * 1024
+) -> Iterator[ChunkResult]:
+    """
+    records를 워커 프로세스들에서 파싱/청킹하고 끝나는 대로 ChunkResult를 내보냅니다.
+    get_child_pages_func는 워커로 전달되므로 pickle 가능한 함수여야 합니다.
+    소비하는 쪽이 중간에 멈추면(작업 취소 예외 등) 아직 시작하지 않은 묶음은 취소합니다.
+    """
+    if not records:
+        return
+
+    bundles = make_bundles(records, bundle_bytes)
+    workers = max(1, min(workers, len(bundles)))
+    print(f"🧵 파싱/청킹 프로세스 풀 가동: 워커 {workers}개, 작업 {len(bundles)}개 (페이지 {len(records)}개)")
+
+    # 수집 스레드/ES 클라이언트가 떠 있는 프로세스에서 fork하지 않도록 spawn 사용
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(chunk_tokens, overlap_tokens, get_child_pages_func)
+    ) as pool:
+        futures = [pool.submit(_process_bundle, bundle) for bundle in bundles]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,385 @@
+"""
+백그라운드 작업(Job) 관리 모듈
+- 요청 핸들러는 작업을 큐에 넣고 job_id만 즉시 돌려줌 (수집은 이벤트 루프 밖의 워커 스레드에서 실행)
+- 워커 수(JOB_WORKERS)와 대기열 크기(JOB_QUEUE_SIZE)를 제한
+- 진행률(stage, done, total) 보고, 취소, 같은 스페이스 동기화 중복 방지(스페이스별 잠금)
+- 끝난 작업은 최근 JOB_HISTORY개만 보관
+- 공유 상태 저장소를 주면 작업 상태/스페이스 잠금/취소 요청을 워커 프로세스끼리 공유
+  (다른 워커가 받은 작업도 조회·취소 가능, 같은 스페이스는 전체 워커 통틀어 하나만 실행)
+- 공유 잠금은 짧은 TTL로 잡고 진행률 보고 때마다 연장 (워커가 죽으면 잠금이 곧 풀림)
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .shared_state import SharedState, get_shared_state
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from shared_state import SharedState, get_shared_state
+
+# 공유 저장소에 남기는 작업 상태의 수명
+JOB_STATE_TTL = 24 * 3600
+# 공유 잠금의 기본 수명. 살아 있는 작업은 진행률 보고 때 연장하므로 짧게 둠 (워커가 죽으면 이 시간 뒤 풀림)
+JOB_LOCK_TTL = 120
+
+
+class JobCancelled(Exception):
+    """취소 요청을 받은 작업이 진행률 보고 지점에서 던지는 예외"""
+
+
+class JobQueueFull(Exception):
+    """대기열이 가득 차 작업을 받을 수 없음"""
+
+
+class JobConflict(Exception):
+    """같은 잠금 키(스페이스)의 작업이 이미 대기/실행 중"""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"이미 진행 중인 작업이 있습니다: {job_id}")
+        self.job_id = job_id
+
+
+class Job:
+    """작업 하나의 상태. fn(progress_callback)을 실행하고 반환값을 result로 보관합니다."""
+
+    def __init__(
+        self,
+        kind: str,
+        fn: Callable[[Callable[[str, int, int], None]], Any],
+        lock_key: Optional[str],
+        params: Dict[str, Any],
+        on_finish: Optional[Callable[[], None]] = None
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.fn = fn
+        # 어떻게 끝나든(성공/실패/대기 중 취소/종료 시 취소) 한 번 불리는 정리 함수 (예: 업로드 임시 파일 삭제)
+        self.on_finish = on_finish
+        self.lock_key = lock_key
+        self.params = params
+        self.status = "queued"  # queued → running → succeeded | failed | cancelled
+        self.stage = ""
+        self.done = 0
+        self.total = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.cancel_event = threading.Event()
+        # 진행률 보고 때마다 불리는 훅 (JobManager가 공유 상태 반영/원격 취소 확인에 사용)
+        self.listener: Optional[Callable[["Job"], None]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def progress(self, stage: str, done: int, total: int):
+        """작업 함수에 넘기는 진행률 콜백. 취소 요청이 있으면 여기서 중단시킵니다."""
+        self.stage, self.done, self.total = stage, done, total
+        if self.listener:
+            self.listener(self)
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "pid": os.getpid(),
+            "params": self.params,
+            "status": self.status,
+            "cancel_requested": self.cancel_event.is_set() and not self.finished,
+            "progress": {"stage": self.stage, "done": self.done, "total": self.total},
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """고정 크기 워커 스레드 풀 + 제한된 대기열로 작업을 실행합니다."""
+
+    def __init__(
+        self,
+        workers: int = 1,
+        queue_size: int = 20,
+        history: int = 200,
+        shared: Optional[SharedState] = None,
+        lock_ttl: float = JOB_LOCK_TTL,
+        publish_interval: float = 1.0
+    ):
+        self.workers = max(1, workers)
+        self.history = history
+        self.shared = shared
+        self.lock_ttl = lock_ttl
+        self.publish_interval = publish_interval
+        self._last_publish: Dict[str, float] = {}
+        self._last_heartbeat = 0.0
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=queue_size)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._locks: Dict[str, str] = {}  # lock_key → job_id
+        self._mutex = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._counter = itertools.count(1)
+
+    @classmethod
+    def from_env(cls, shared: Optional[SharedState] = None) -> "JobManager":
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "1")),
+            queue_size=int(os.getenv("JOB_QUEUE_SIZE", "20")),
+            history=int(os.getenv("JOB_HISTORY", "200")),
+            shared=shared or get_shared_state(),
+            lock_ttl=float(os.getenv("JOB_LOCK_TTL", str(JOB_LOCK_TTL))),
+        )
+
+    # -----------------------------------------------------------------
+    # 수명 주기
+    # -----------------------------------------------------------------
+    def start(self):
+        if self._threads:
+            return
+        for _ in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{next(self._counter)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"🧰 작업 관리자 시작: 워커 {self.workers}개, 대기열 {self._queue.maxsize}개")
+
+    def shutdown(self, cancel_running: bool = True, timeout: float = 10.0):
+        """대기 작업은 취소하고, 실행 중 작업은 (cancel_running이면) 취소 요청 후 워커 종료를 기다립니다."""
+        with self._mutex:
+            for job in self._jobs.values():
+                if job.status == "queued":
+                    job.cancel_event.set()
+                    self._finish(job, "cancelled")
+                elif cancel_running and job.status == "running":
+                    job.cancel_event.set()
+        deadline = time.time() + timeout
+        for _ in self._threads:
+            try:
+                # 취소된 대기 작업은 워커가 바로 건너뛰므로 곧 자리가 남
+                self._queue.put(None, timeout=max(0.1, deadline - time.time()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.time()))
+        self._threads = []
+
+    # -----------------------------------------------------------------
+    # 작업 제출/조회/취소
+    # -----------------------------------------------------------------
+    def submit(self, kind: str, fn: Callable, lock_key: Optional[str] = None, on_finish: Optional[Callable[[], None]] = None, **params) -> Job:
+        """
+        작업을 대기열에 넣습니다.
+
+        Args:
+            kind: 작업 종류 ("confluence_sync", "file_ingest" 등)
+            fn: fn(progress_callback) 형태의 실행 함수
+            lock_key: 같은 키의 작업은 동시에 하나만 (예: "space:LLOYDK")
+            on_finish: 작업이 끝나면(실행 전에 취소돼도) 한 번 부를 정리 함수. 등록에 실패하면 불리지 않음
+            params: 조회용으로 보관할 요청 파라미터
+
+        Raises:
+            JobConflict: 같은 lock_key 작업이 대기/실행 중
+            JobQueueFull: 대기열이 가득 참
+        """
+        job = Job(kind, fn, lock_key, params, on_finish)
+        job.listener = self._on_progress
+        with self._mutex:
+            if lock_key and lock_key in self._locks:
+                raise JobConflict(self._locks[lock_key])
+            # 다른 워커 프로세스가 같은 잠금을 잡고 있는지 (저장소 오류면 로컬 잠금만 사용)
+            if lock_key and self.shared and not self._acquire_shared_lock(lock_key, job.id):
+                raise JobConflict(self.shared.get("locks", lock_key) or "unknown")
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                if lock_key and self.shared:
+                    self.shared.delete("locks", lock_key, only_if=job.id)
+                raise JobQueueFull(f"대기 중인 작업이 너무 많습니다. (최대 {self._queue.maxsize}개)")
+            if lock_key:
+                self._locks[lock_key] = job.id
+            self._jobs[job.id] = job
+            self._trim_history()
+            self._publish(job)
+        print(f"📥 작업 등록: {job.kind} ({job.id}) {params}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._mutex:
+            return self._jobs.get(job_id)
+
+    def get_dict(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """이 프로세스의 작업이면 현재 상태를, 아니면 공유 저장소의 마지막 상태를 돌려줍니다."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.shared.get("jobs", job_id) if self.shared else None
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """최신순 작업 목록 (공유 저장소가 있으면 다른 워커의 작업도 포함)"""
+        with self._mutex:
+            local = {j.id: j.to_dict() for j in self._jobs.values()}
+        merged = self.shared.items("jobs") if self.shared else {}
+        merged.update(local)
+        jobs = sorted(merged.values(), key=lambda d: d.get("created_at") or "", reverse=True)
+        return jobs[:limit]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        대기 중이면 바로 취소, 실행 중이면 다음 진행률 보고 지점에서 중단됩니다.
+        다른 워커의 작업이면 공유 저장소에 취소 요청을 남기고, 그 워커가 다음 보고 때 확인합니다.
+        """
+        with self._mutex:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if not job.finished:
+                    job.cancel_event.set()
+                    if job.status == "queued":
+                        self._finish(job, "cancelled")
+                return job.to_dict()
+
+        state = self.shared.get("jobs", job_id) if self.shared else None
+        if state is None or state["status"] in ("succeeded", "failed", "cancelled"):
+            return state
+        self.shared.set("cancel", job_id, True, ttl=JOB_STATE_TTL)
+        state["cancel_requested"] = True
+        return state
+
+    # -----------------------------------------------------------------
+    # 내부
+    # -----------------------------------------------------------------
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._check_remote_cancel(job)
+            with self._mutex:
+                if job.finished:  # 대기 중에 취소됨
+                    continue
+                if job.cancel_event.is_set():  # 대기 중에 다른 워커로 취소 요청이 들어옴
+                    self._finish(job, "cancelled")
+                    continue
+                if job.lock_key and self.shared and self.shared.replace(
+                    "locks", job.lock_key, job.id, job.id, ttl=self.lock_ttl
+                ) is False:
+                    # 대기하는 동안 잠금이 만료돼 다른 워커가 같은 스페이스 작업을 시작함
+                    job.error = "대기 중에 잠금을 잃었습니다 (다른 워커가 같은 작업을 실행 중)"
+                    self._finish(job, "cancelled")
+                    continue
+                job.status = "running"
+                job.started_at = datetime.now().isoformat(timespec="seconds")
+                self._publish(job)
+
+            status, result, error = "succeeded", None, None
+            try:
+                result = job.fn(job.progress)
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                status, error = "failed", f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+
+            with self._mutex:
+                job.result = result
+                job.error = error
+                self._finish(job, status)
+            print(f"🏁 작업 종료: {job.kind} ({job.id}) → {status}")
+
+    def _finish(self, job: Job, status: str):
+        """self._mutex를 잡은 상태에서 호출"""
+        job.status = status
+        job.finished_at = datetime.now().isoformat(timespec="seconds")
+        if job.lock_key and self._locks.get(job.lock_key) == job.id:
+            del self._locks[job.lock_key]
+        if self.shared:
+            if job.lock_key:
+                self.shared.delete("locks", job.lock_key, only_if=job.id)
+            self.shared.delete("cancel", job.id)
+        self._last_publish.pop(job.id, None)
+        self._publish(job)
+        cleanup, job.on_finish = job.on_finish, None
+        if cleanup:
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"⚠️ 작업 정리 실패 ({job.id}): {e}")
+
+    def _publish(self, job: Job):
+        """작업 상태를 공유 저장소에 씁니다. (published_at: 다른 워커가 멈춘 작업을 알아보는 기준)"""
+        if self.shared:
+            state = job.to_dict()
+            state["published_at"] = time.time()
+            self.shared.set("jobs", job.id, state, ttl=JOB_STATE_TTL)
+
+    def _acquire_shared_lock(self, lock_key: str, job_id: str) -> bool:
+        """
+        공유 잠금을 잡습니다. 이미 잡혀 있어도 주인 작업이 끝났거나(해제 실패로 남은 잠금)
+        상태 보고가 lock_ttl 넘게 끊긴 경우(멈추거나 죽은 워커)면 잠금을 넘겨받습니다.
+        저장소 오류면 로컬 잠금만 믿고 True를 돌려줍니다.
+        """
+        acquired = self.shared.add("locks", lock_key, job_id, ttl=self.lock_ttl)
+        if acquired is not False:
+            return True
+        owner = self.shared.get("locks", lock_key)
+        if owner is None:  # 확인하는 사이 풀림
+            return self.shared.add("locks", lock_key, job_id, ttl=self.lock_ttl) is not False
+        state = self.shared.get("jobs", owner)
+        if state is not None and state.get("status") not in ("succeeded", "failed", "cancelled"):
+            if state.get("status") != "running" or time.time() - state.get("published_at", 0) <= self.lock_ttl:
+                return False
+        if self.shared.replace("locks", lock_key, owner, job_id, ttl=self.lock_ttl) is False:
+            return False
+        print(f"🔓 남아 있던 잠금 인수: {lock_key} ({owner} → {job_id})")
+        return True
+
+    def _heartbeat(self):
+        """이 프로세스가 잡은 공유 잠금(대기/실행 중 작업 전부)을 lock_ttl/3마다 연장합니다."""
+        now = time.time()
+        if now - self._last_heartbeat < self.lock_ttl / 3:
+            return
+        self._last_heartbeat = now
+        with self._mutex:
+            held = list(self._locks.items())
+        for lock_key, job_id in held:
+            if self.shared.replace("locks", lock_key, job_id, job_id, ttl=self.lock_ttl) is False:
+                job = self.get(job_id)
+                if job is not None and job.status == "running" and not job.cancel_event.is_set():
+                    # 잠금이 만료돼 다른 작업이 넘겨받음 → 같은 스페이스를 동시에 돌리지 않도록 중단
+                    print(f"⚠️ 작업 잠금을 잃어 중단합니다: {lock_key} ({job_id})")
+                    job.cancel_event.set()
+
+    def _check_remote_cancel(self, job: Job):
+        if self.shared and not job.cancel_event.is_set() and self.shared.get("cancel", job.id):
+            job.cancel_event.set()
+
+    def _on_progress(self, job: Job):
+        """진행률 보고 훅. 저장소 접근은 publish_interval마다 한 번으로 제한합니다."""
+        if not self.shared:
+            return
+        self._heartbeat()
+        now = time.time()
+        if now - self._last_publish.get(job.id, 0.0) < self.publish_interval:
+            return
+        self._last_publish[job.id] = now
+        self._check_remote_cancel(job)
+        self._publish(job)
+
+    def _trim_history(self):
+        """self._mutex를 잡은 상태에서 호출. 끝난 작업부터 오래된 순으로 지웁니다."""
+        overflow = len(self._jobs) - self.history
+        if overflow <= 0:
+            return
+        for job_id in [jid for jid, j in self._jobs.items() if j.finished][:overflow]:
+            del self._jobs[job_id]
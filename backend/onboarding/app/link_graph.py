@@ -0,0 +1,188 @@
+"""
+페이지 링크 그래프 모듈 (오프라인 계산 → 색인 필드)
+- parse_storage_html이 뽑은 링크(대상 페이지 제목)를 페이지 요약 인덱스({index}_pages)의 links 필드에 저장해 두고,
+  수집이 끝나면 인덱스 안에서 제목 → page_id로 풀어 방향 그래프를 만듦 (다른 스페이스/없는 페이지로 가는 링크는 버림)
+- PageRank(감쇠 0.85, 링크 없는 페이지의 점수는 전체에 고르게 분배)를 numpy 거듭제곱법으로 계산하고
+  평균이 1이 되도록 페이지 수를 곱해 저장 → 청크 인덱스의 page_rank(rank_feature)로 검색 점수에 가볍게 더함
+- 페이지마다 들어오고 나가는 링크 중 PageRank가 높은 LINK_NEIGHBORS_K개를 neighbors로 저장
+  → 검색 때 추가 검색 없이 연결 문서 요약을 컨텍스트로 가져옴 (chatbot.linked_pages)
+- 값이 바뀐 페이지(또는 막 다시 색인돼 값이 없는 페이지)의 청크만 update_by_query로 고침
+"""
+
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .metrics import INGEST_STAGE_SECONDS
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from metrics import INGEST_STAGE_SECONDS
+
+
+ProgressCallback = Callable[[str, int, int], None]
+
+GRAPH_FIELDS = ["page_id", "title", "links", "page_rank", "neighbors"]
+
+# 청크 문서에 page_rank/neighbors를 써 넣는 스크립트 (params.graph: {page_id: {rank, neighbors}})
+_APPLY_SCRIPT = (
+    "def g = params.graph[ctx._source.page_id];"
+    " if (g != null) { ctx._source.page_rank = g.rank; ctx._source.neighbors = g.neighbors; }"
+)
+
+
+def iter_pages(es_client, index: str, batch_size: int = 1000, keep_alive: str = "2m"):
+    """페이지 요약 인덱스를 PIT + search_after로 끝까지 읽습니다. (그래프 필드만)"""
+    pit_id = es_client.open_point_in_time(index=index, keep_alive=keep_alive)["id"]
+    try:
+        search_after = None
+        while True:
+            body: Dict[str, Any] = {
+                "size": batch_size,
+                "pit": {"id": pit_id, "keep_alive": keep_alive},
+                "sort": [{"_shard_doc": "asc"}],
+                "_source": GRAPH_FIELDS,
+                "track_total_hits": False,
+            }
+            if search_after is not None:
+                body["search_after"] = search_after
+            res = es_client.search(body=body)
+            pit_id = res.get("pit_id", pit_id)
+            hits = res["hits"]["hits"]
+            if not hits:
+                break
+            for hit in hits:
+                yield hit["_source"]
+            search_after = hits[-1]["sort"]
+    finally:
+        try:
+            es_client.close_point_in_time(id=pit_id)
+        except Exception as e:
+            print(f"⚠️ PIT 닫기 실패 (만료되면 자동 정리): {e}")
+
+
+def build_link_graph(pages: List[Dict[str, Any]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    페이지 목록 → (page_id 목록, 간선 출발 번호, 간선 도착 번호)
+    링크는 제목으로 풀고, 같은 제목이 여럿이면 먼저 나온 페이지로, 자기 자신과 중복 링크는 뺍니다.
+    """
+    page_ids = [str(p["page_id"]) for p in pages]
+    by_title: Dict[str, int] = {}
+    for i, p in enumerate(pages):
+        by_title.setdefault((p.get("title") or "").strip(), i)
+
+    edges = set()
+    for i, p in enumerate(pages):
+        for title in p.get("links") or []:
+            j = by_title.get(title.strip())
+            if j is not None and j != i:
+                edges.add((i, j))
+    if not edges:
+        return page_ids, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    src, dst = (np.array(side, dtype=np.int64) for side in zip(*sorted(edges)))
+    return page_ids, src, dst
+
+
+def pagerank(n: int, src: np.ndarray, dst: np.ndarray, damping: float = 0.85, tol: float = 1e-9, max_iter: int = 100) -> Tuple[np.ndarray, int]:
+    """거듭제곱법 PageRank. 평균이 1이 되도록 n을 곱해 돌려줍니다. (반환: 점수, 반복 횟수)"""
+    if n == 0:
+        return np.zeros(0), 0
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    safe_degree = np.where(dangling, 1.0, out_degree)
+    rank = np.full(n, 1.0 / n)
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        flow = np.bincount(dst, weights=rank[src] / safe_degree[src], minlength=n)
+        new_rank = (1.0 - damping) / n + damping * (flow + rank[dangling].sum() / n)
+        delta = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if delta < tol:
+            break
+    return rank * n, iterations
+
+
+def neighbor_lists(n: int, src: np.ndarray, dst: np.ndarray, rank: np.ndarray, k: int) -> List[List[int]]:
+    """페이지마다 들어오고 나가는 링크 상대를 PageRank 높은 순으로 k개"""
+    linked: List[set] = [set() for _ in range(n)]
+    for a, b in zip(src.tolist(), dst.tolist()):
+        linked[a].add(b)
+        linked[b].add(a)
+    return [sorted(others, key=lambda j: (-rank[j], j))[:k] for others in linked]
+
+
+def update_link_graph(
+    manager,
+    neighbors_k: Optional[int] = None,
+    tolerance: Optional[float] = None,
+    group_size: int = 500,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    manager의 인덱스에 대해 링크 그래프를 다시 계산해 페이지/청크 문서에 반영합니다.
+    PageRank가 tolerance(상대 오차)보다 적게 움직이고 neighbors도 같은 페이지는 건너뜁니다.
+
+    Returns:
+        {"pages", "edges", "iterations", "updated_pages", "seconds"}
+    """
+    neighbors_k = neighbors_k if neighbors_k is not None else int(os.getenv("LINK_NEIGHBORS_K", "8"))
+    tolerance = tolerance if tolerance is not None else float(os.getenv("LINK_RANK_TOLERANCE", "0.05"))
+    es = manager.es_client
+    if not es.indices.exists(index=manager.pages_index_name):
+        return {"pages": 0, "edges": 0, "iterations": 0, "updated_pages": 0, "seconds": 0.0}
+
+    started = time.time()
+    with INGEST_STAGE_SECONDS.labels("link_graph").time():
+        pages = list(iter_pages(es, manager.pages_index_name))
+        page_ids, src, dst = build_link_graph(pages)
+        rank, iterations = pagerank(len(page_ids), src, dst)
+        neighbors = neighbor_lists(len(page_ids), src, dst, rank, neighbors_k)
+
+        graph: Dict[str, Dict[str, Any]] = {}
+        for i, page in enumerate(pages):
+            entry = {"rank": round(float(rank[i]), 4), "neighbors": [page_ids[j] for j in neighbors[i]]}
+            old_rank = page.get("page_rank")
+            moved = old_rank is None or abs(entry["rank"] - old_rank) > tolerance * max(old_rank, 1e-6)
+            if moved or (page.get("neighbors") or []) != entry["neighbors"]:
+                graph[page_ids[i]] = entry
+
+        changed = list(graph)
+        if progress_callback:
+            progress_callback("link_graph", 0, len(changed))
+        for start in range(0, len(changed), group_size):
+            group = {pid: graph[pid] for pid in changed[start:start + group_size]}
+            _apply_graph(manager, group)
+            if progress_callback:
+                progress_callback("link_graph", min(start + group_size, len(changed)), len(changed))
+
+    result = {
+        "pages": len(page_ids), "edges": int(len(src)), "iterations": iterations,
+        "updated_pages": len(changed), "seconds": round(time.time() - started, 2),
+    }
+    print(f"🕸️ 링크 그래프 갱신 ({manager.index_name}): 페이지 {result['pages']}개, 링크 {result['edges']}개, "
+          f"반복 {iterations}회, 바뀐 페이지 {result['updated_pages']}개")
+    return result
+
+
+def _apply_graph(manager, group: Dict[str, Dict[str, Any]]):
+    """
+    청크 문서는 update_by_query 스크립트로, 페이지 문서는 부분 업데이트(bulk update)로 고칩니다.
+    청크 쪽이 실패하면 페이지 문서도 그대로 둬서 다음 갱신 때 다시 바뀐 페이지로 잡히게 합니다.
+    """
+    try:
+        manager.es_client.update_by_query(
+            index=manager.index_name,
+            query={"terms": {"page_id": list(group)}},
+            script={"source": _APPLY_SCRIPT, "lang": "painless", "params": {"graph": group}},
+            conflicts="proceed",
+            refresh=True,
+        )
+    except Exception as e:
+        print(f" ⚠️ 청크 링크 그래프 필드 갱신 실패 (다음 갱신 때 다시 시도): {e}")
+        return
+    manager._bulk_actions([
+        {"_op_type": "update", "_index": manager.pages_index_name, "_id": pid,
+         "doc": {"page_rank": g["rank"], "neighbors": g["neighbors"]}}
+        for pid, g in group.items()
+    ])
@@ -0,0 +1,291 @@
+"""
+답변 생성용 LLM 호출 계층
+- 호출마다 요청 마감(deadline)까지 남은 시간 안에서만 기다림 (첫 토큰 전 실패는 남은 시간 안에서 재시도)
+- 헤지(hedged) 요청: 첫 토큰이 최근 첫 토큰 지연의 p95(LLM_HEDGE_QUANTILE)보다 늦으면 같은 요청을 하나 더 보내
+  먼저 토큰을 내는 쪽을 쓰고 나머지는 끊음 (헤지도 LLM 동시 호출 한도 안에서만)
+- 마감이 LLM_FALLBACK_BELOW_SECONDS보다 가까우면 빠른 모델(LLM_FALLBACK_MODEL)로 보냄
+- 프롬프트는 [고정 지침(system)] → [Context] → [이전 대화] → [질문] 순으로 보내
+  바뀌지 않는 앞부분이 제공자 쪽 프롬프트 접두사 캐시에 걸리게 함 (캐시된/안 된 입력 토큰 수를 지표로 기록)
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+try:
+    from .admission import DeadlineExceeded, Overloaded, backend_slot, time_left
+    from .metrics import LLM_CALLS_TOTAL, LLM_FIRST_TOKEN_SECONDS, LLM_TOKENS_TOTAL
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from admission import DeadlineExceeded, Overloaded, backend_slot, time_left
+    from metrics import LLM_CALLS_TOTAL, LLM_FIRST_TOKEN_SECONDS, LLM_TOKENS_TOTAL
+
+
+# 🌟 고정 지침: 질문/문서와 상관없이 항상 같은 앞부분 (프롬프트 접두사 캐시 대상)
+SYSTEM_PROMPT = """당신은 로이드케이 사내 위키 정보를 바탕으로 직원의 질문에 답변하는 전문가 어시스턴트입니다.
+
+[지침]
+1. 제공된 [Context]를 꼼꼼히 읽고, 사용자의 질문에 가장 적합한 내용을 요약하여 답변하세요.
+2. 문서에 '체크리스트'라는 단어가 명시되지 않았더라도, '절차', '할 일', '주요 내용' 등이 있다면 이를 바탕으로 체크리스트를 만들어 답변해 주세요.
+3. 답변은 읽기 좋게 불릿 포인트나 번호를 사용하세요.
+4. 최대한 답변하려고 노력하세요.
+5. [이전 대화]가 있으면 "그건", "거기" 같은 말이 무엇을 가리키는지 참고하세요."""
+
+
+def build_messages(context: str, question: str, history: str = "") -> List[BaseMessage]:
+    """
+    고정 지침은 system 메시지로, 매번 바뀌는 부분은 뒤쪽 human 메시지 하나로 보냅니다.
+    세션 후속 질문은 Context가 직전 턴과 같아 [Context]까지 캐시에 걸릴 수 있도록 질문을 맨 뒤에 둡니다.
+    """
+    parts = [f"[Context]\n{context}"]
+    if history:
+        parts.append(f"[이전 대화]\n{history}")
+    parts.append(f"[질문]\n{question}")
+    return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content="\n\n".join(parts))]
+
+
+class _Attempt:
+    """LLM 스트리밍 호출 한 번 (전용 스레드에서 토큰을 큐로 넘김)"""
+
+    def __init__(self, attempt_id: int, model: str, kind: str):
+        self.id = attempt_id
+        self.model = model
+        self.kind = kind  # primary / hedge / retry
+        self.started = time.monotonic()
+        self.stop = threading.Event()
+        self.finished = False
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        model: str,
+        api_key: Optional[str] = None,
+        fallback_model: Optional[str] = None,
+        timeout: float = 60.0,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 1.0,
+        hedge_default_delay: float = 5.0,
+        fallback_below: float = 10.0,
+        max_attempts: int = 3,
+        temperature: float = 0.0
+    ):
+        self.model = model
+        self.api_key = api_key
+        self.fallback_model = fallback_model or None
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.fallback_below = fallback_below
+        self.max_attempts = max(1, max_attempts)
+        self.temperature = temperature
+        self._clients: Dict[str, ChatOpenAI] = {}
+        self._clients_lock = threading.Lock()
+        self._ttft: Deque[float] = deque(maxlen=200)  # 최근 첫 토큰 지연(초)
+        self._ttft_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None) -> "LLMGateway":
+        return cls(
+            model=os.getenv("LLM_MODEL_NAME", "gpt-4o-mini"),
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            fallback_model=os.getenv("LLM_FALLBACK_MODEL", ""),
+            timeout=float(os.getenv("CHAT_LLM_TIMEOUT", "60")),
+            hedge=os.getenv("LLM_HEDGE", "true").lower() in ("1", "true", "yes"),
+            hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+            hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0")),
+            hedge_default_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "5.0")),
+            fallback_below=float(os.getenv("LLM_FALLBACK_BELOW_SECONDS", "10")),
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+        )
+
+    def client(self, model: Optional[str] = None) -> ChatOpenAI:
+        """모델별 ChatOpenAI (연결 풀 재사용). 재시도는 이 계층에서 하므로 SDK 재시도는 끔"""
+        model = model or self.model
+        with self._clients_lock:
+            llm = self._clients.get(model)
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=model,
+                    api_key=self.api_key,
+                    temperature=self.temperature,  # RAG 시스템이므로 상상력(환각)을 억제하기 위해 0으로 세팅
+                    max_retries=0,
+                    stream_usage=True,
+                )
+                self._clients[model] = llm
+        return llm
+
+    # -----------------------------------------------------------------
+    # 헤지 지연 / 모델 선택
+    # -----------------------------------------------------------------
+    def hedge_delay(self) -> float:
+        """최근 첫 토큰 지연의 p95 (표본이 20개 미만이면 기본값)"""
+        with self._ttft_lock:
+            samples = sorted(self._ttft)
+        if len(samples) < 20:
+            return self.hedge_default_delay
+        value = samples[min(len(samples) - 1, int(len(samples) * self.hedge_quantile))]
+        return max(self.hedge_min_delay, value)
+
+    def pick_model(self, remaining: float) -> str:
+        if self.fallback_model and remaining < self.fallback_below:
+            return self.fallback_model
+        return self.model
+
+    def stats(self) -> Dict[str, Any]:
+        with self._ttft_lock:
+            samples = len(self._ttft)
+        return {
+            "model": self.model, "fallback_model": self.fallback_model,
+            "hedge": self.hedge, "hedge_delay_s": round(self.hedge_delay(), 3), "ttft_samples": samples,
+        }
+
+    # -----------------------------------------------------------------
+    # 호출
+    # -----------------------------------------------------------------
+    def stream(self, messages: List[BaseMessage], usage_out: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        답변 토큰을 내보냅니다. 첫 토큰을 낸 호출 하나만 끝까지 쓰고, 나머지는 끊습니다.
+        첫 토큰 전에는 실패해도 남은 시간/시도 횟수 안에서 다시 보내고, 첫 토큰 이후 실패는 그대로 올립니다.
+        usage_out을 주면 {"model", "attempt", "prompt_tokens", "cached_tokens", "completion_tokens"}를 채웁니다.
+        """
+        events: "queue.Queue" = queue.Queue()
+        attempts: Dict[int, _Attempt] = {}
+        winner: Optional[_Attempt] = None
+        started = time.monotonic()
+        hedge_at = started + self.hedge_delay() if self.hedge else None
+        last_error: Optional[BaseException] = None
+
+        def launch(kind: str) -> _Attempt:
+            remaining = time_left(self.timeout)
+            attempt = _Attempt(len(attempts) + 1, self.pick_model(remaining), kind)
+            attempts[attempt.id] = attempt
+            ctx = contextvars.copy_context()  # 마감 시각(contextvar)을 스레드로 넘김
+            threading.Thread(
+                target=ctx.run, args=(self._run_attempt, attempt, messages, remaining, events),
+                name=f"llm-{kind}", daemon=True,
+            ).start()
+            return attempt
+
+        try:
+            launch("primary")
+            while True:
+                wait = time_left(self.timeout)
+                if winner is None and hedge_at is not None:
+                    wait = min(wait, hedge_at - time.monotonic())
+                try:
+                    kind, attempt_id, payload = events.get(timeout=max(0.01, wait))
+                except queue.Empty:
+                    if winner is None and hedge_at is not None and time.monotonic() >= hedge_at:
+                        hedge_at = None  # 헤지는 한 번만
+                        if len(attempts) < self.max_attempts:
+                            launch("hedge")
+                    else:
+                        time_left(self.timeout)  # 마감이 지났으면 DeadlineExceeded
+                    continue
+
+                attempt = attempts[attempt_id]
+                if winner is not None and attempt is not winner:
+                    continue  # 진 호출의 남은 이벤트
+
+                if kind == "token":
+                    if winner is None:
+                        winner = attempt
+                        self._on_first_token(attempt, usage_out)
+                        for other in attempts.values():
+                            if other is not attempt:
+                                other.stop.set()
+                    yield payload
+                elif kind == "usage":
+                    usage = self._record_usage(attempt.model, payload)
+                    if usage_out is not None:
+                        usage_out.update(usage)
+                elif kind == "end":
+                    attempt.finished = True
+                    if winner is None:
+                        winner = attempt  # 빈 답변
+                        self._on_first_token(attempt, usage_out)
+                    LLM_CALLS_TOTAL.labels(self._outcome(winner)).inc()
+                    return
+                else:  # error
+                    attempt.finished = True
+                    last_error = payload
+                    if winner is not None:
+                        LLM_CALLS_TOTAL.labels("error").inc()
+                        raise payload
+                    if isinstance(payload, Overloaded) and not isinstance(payload, DeadlineExceeded):
+                        # 헤지/재시도가 LLM 동시 호출 한도에 걸림 → 다른 호출이 없으면 그대로 거절
+                        if any(not a.finished for a in attempts.values()):
+                            continue
+                        raise payload
+                    if any(not a.finished for a in attempts.values()):
+                        continue  # 아직 돌고 있는 호출(헤지)이 있음
+                    if len(attempts) >= self.max_attempts:
+                        LLM_CALLS_TOTAL.labels("error").inc()
+                        raise payload
+                    print(f"⚠️ [LLM] 첫 토큰 전 실패, 다시 보냅니다: {type(payload).__name__}: {payload}")
+                    launch("retry")
+        except DeadlineExceeded:
+            LLM_CALLS_TOTAL.labels("deadline").inc()
+            if last_error is not None:
+                print(f"⚠️ [LLM] 마감 초과 (마지막 오류: {type(last_error).__name__})")
+            raise
+        finally:
+            for attempt in attempts.values():
+                attempt.stop.set()
+
+    def _run_attempt(self, attempt: _Attempt, messages: List[BaseMessage], timeout: float, events: "queue.Queue"):
+        try:
+            with backend_slot("llm"):
+                if attempt.stop.is_set():
+                    return
+                llm = self.client(attempt.model).bind(timeout=timeout)
+                chunks = llm.stream(messages)
+                try:
+                    for chunk in chunks:
+                        if attempt.stop.is_set():
+                            return  # 다른 호출이 이김 → 스트림을 닫아 연결을 끊음
+                        if chunk.content:
+                            events.put(("token", attempt.id, chunk.content))
+                        if chunk.usage_metadata:
+                            events.put(("usage", attempt.id, chunk.usage_metadata))
+                finally:
+                    chunks.close()
+            events.put(("end", attempt.id, None))
+        except Exception as e:
+            events.put(("error", attempt.id, e))
+
+    def _on_first_token(self, attempt: _Attempt, usage_out: Optional[Dict[str, Any]]):
+        ttft = time.monotonic() - attempt.started
+        LLM_FIRST_TOKEN_SECONDS.labels(attempt.model).observe(ttft)
+        if usage_out is not None:
+            usage_out.update(model=attempt.model, attempt=attempt.kind, ttft_ms=round(ttft * 1000, 1))
+        if attempt.kind == "primary" and attempt.model == self.model:
+            # 헤지 지연은 주 모델의 첫 시도 기준으로만 잡음 (헤지/대체 모델 표본이 섞이면 p95가 왜곡됨)
+            with self._ttft_lock:
+                self._ttft.append(ttft)
+
+    def _outcome(self, attempt: _Attempt) -> str:
+        if attempt.model != self.model:
+            return "fallback"
+        return attempt.kind  # primary / hedge / retry
+
+    @staticmethod
+    def _record_usage(model: str, usage: Dict[str, Any]) -> Dict[str, int]:
+        """입력 토큰을 캐시 적중분과 나머지로 나눠 기록합니다."""
+        prompt = int(usage.get("input_tokens") or 0)
+        cached = int((usage.get("input_token_details") or {}).get("cache_read") or 0)
+        completion = int(usage.get("output_tokens") or 0)
+        LLM_TOKENS_TOTAL.labels(model, "prompt_cached").inc(cached)
+        LLM_TOKENS_TOTAL.labels(model, "prompt_uncached").inc(max(0, prompt - cached))
+        LLM_TOKENS_TOTAL.labels(model, "completion").inc(completion)
+        return {"prompt_tokens": prompt, "cached_tokens": cached, "completion_tokens": completion}
@@ -0,0 +1,170 @@
+"""
+Prometheus 지표 모듈
+- /chat 단계별 지연: 질문 임베딩 / ES 검색 / 컨텍스트 구성 / LLM 생성 / 응답 조립
+- 수집 단계별 지연: fetch / parse / chunk / embed / bulk
+- 캐시 적중률, HTTP 요청 지연, 처리 중 요청 수
+- /chat 입장 제어 결과, 대기열 길이, 백엔드별 거절 수, 같은 질문 합치기
+- LLM 첫 토큰 지연, 호출 결과(헤지/재시도/대체 모델), 입력 토큰 중 프롬프트 캐시 적중분
+- uvicorn --workers 등 멀티 프로세스 환경에서는 PROMETHEUS_MULTIPROC_DIR를 지정하면 워커 지표를 합산
+"""
+
+import os
+import time
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    REGISTRY,
+)
+
+# 임베딩 한 건(수십 ms) ~ LLM 생성(수십 초)까지 덮는 버킷
+_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+CHAT_STAGE_SECONDS = Histogram(
+    "onboarding_chat_stage_seconds",
+    "ConfluenceChatbot.ask 단계별 소요 시간",
+    ["stage"],
+    buckets=_STAGE_BUCKETS,
+)
+
+INGEST_STAGE_SECONDS = Histogram(
+    "onboarding_ingest_stage_seconds",
+    "수집 단계별 소요 시간 (fetch는 페이지당, parse/chunk는 페이지당, embed/bulk는 배치당)",
+    ["stage"],
+    buckets=_STAGE_BUCKETS,
+)
+
+INGEST_ITEMS = Counter(
+    "onboarding_ingest_items_total",
+    "수집 처리 건수 (pages, chunks_indexed, chunks_failed, table_rows)",
+    ["kind"],
+)
+
+CACHE_REQUESTS = Counter(
+    "onboarding_cache_requests_total",
+    "캐시 조회 수 (result=hit|miss, 적중률 = hit / (hit + miss))",
+    ["cache", "result"],
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "onboarding_http_request_seconds",
+    "HTTP 요청 처리 시간",
+    ["method", "route", "status"],
+    buckets=_STAGE_BUCKETS,
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "onboarding_http_requests_in_flight",
+    "처리 중인 HTTP 요청 수",
+    multiprocess_mode="livesum",
+)
+
+
+ADMISSION_TOTAL = Counter(
+    "onboarding_chat_admission_total",
+    "/chat 입장 제어 결과 (admitted, queued, user_limit, queue_full, queue_timeout)",
+    ["outcome"],
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "onboarding_chat_admission_queue_depth",
+    "/chat 대기열에서 기다리는 요청 수",
+    multiprocess_mode="livesum",
+)
+
+BACKEND_REJECTED_TOTAL = Counter(
+    "onboarding_backend_rejected_total",
+    "백엔드 동시 호출 한도/마감 초과로 거절한 호출 수",
+    ["backend"],
+)
+
+
+SINGLEFLIGHT_TOTAL = Counter(
+    "onboarding_singleflight_total",
+    "같은 질문 합치기 결과 (role=leader: 새로 실행, follower: 처리 중인 요청에 합류)",
+    ["flight", "role"],
+)
+
+
+WEBHOOK_EVENTS_TOTAL = Counter(
+    "onboarding_webhook_events_total",
+    "Confluence 웹훅 이벤트 처리 결과 (accepted, ignored, rejected, dispatched, retried, dropped)",
+    ["outcome"],
+)
+
+
+LLM_CALLS_TOTAL = Counter(
+    "onboarding_llm_calls_total",
+    "답변 생성 호출 결과 (primary, hedge, retry, fallback, error, deadline)",
+    ["outcome"],
+)
+
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "onboarding_llm_first_token_seconds",
+    "LLM 호출 한 번의 첫 토큰까지 걸린 시간",
+    ["model"],
+    buckets=_STAGE_BUCKETS,
+)
+
+LLM_TOKENS_TOTAL = Counter(
+    "onboarding_llm_tokens_total",
+    "LLM 토큰 수 (kind=prompt_cached|prompt_uncached|completion, 캐시 적중률 = cached / (cached + uncached))",
+    ["model", "kind"],
+)
+
+
+def record_cache(cache: str, hit: bool):
+    """캐시 조회 결과를 기록합니다."""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """/metrics 응답 본문과 Content-Type"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class PrometheusMiddleware:
+    """
+    요청 지연과 처리 중 요청 수를 기록하는 ASGI 미들웨어.
+    route 라벨은 실제 경로가 아닌 라우트 템플릿(/onboarding/api/chat 등)을 써서 라벨 수를 제한합니다.
+    """
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            # 마운트된 하위 앱의 라우트는 root_path(/onboarding)를 앞에 붙여 전체 경로로 표시
+            route_path = f"{scope.get('root_path', '')}{route.path}" if route is not None else "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path, str(status["code"])).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,324 @@
+"""
+페이지 레지스트리 모듈 (스페이스 페이지 목록을 작은 배열로)
+- 페이지 dict 목록/DataFrame(level_i 문자열 열) 대신 numpy 배열 몇 개로 계층을 보관
+  ids(int64), title_idx(int32, 제목은 중복 없는 문자열 표 하나), parent(int32, 없으면 -1), depth(int16)
+- 자식 목록은 CSR(child_offsets + children)로 형제 위치(extensions.position) 순서대로, 하위 트리는 전위 순회 순서(order) + 구간(start/end)으로 보관
+  → 하위 트리 조회는 배열 슬라이스 한 번, 카테고리 필터는 "깊이 i에서 제목이 v인 노드들의 하위 트리" 합집합
+- 목록에 없는 조상(다른 사람만 볼 수 있는 페이지 등)은 제목만 아는 외부 노드로 넣고 결과에서는 뺌
+- page_id 조회는 정렬된 id 배열의 searchsorted (dict 없이)
+- ChildPageResolver: 수집한 페이지들의 레지스트리로 children 매크로를 HTTP 호출 없이 풀고,
+  수집 범위 밖 페이지만 get_child_pages(HTTP)로 한 번씩 조회해 기억
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .hierarchy import build_tree
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from hierarchy import build_tree
+
+# 외부 노드(목록에 없는 조상)의 id 자리 값
+EXTERNAL_ID = -1
+# 형제 위치를 모르는 페이지 (위치가 있는 형제 뒤에, 목록 순서대로)
+NO_POSITION = np.iinfo(np.int32).max
+
+
+def page_position(page: Dict[str, Any]) -> Optional[int]:
+    """Confluence 페이지의 형제 위치(extensions.position). 없거나 "none"이면 None"""
+    value = (page.get("extensions") or {}).get("position")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PageRegistryBuilder:
+    """목록을 한 페이지씩 받아 PageRegistry를 만듭니다. (만드는 동안만 dict를 씀)"""
+
+    def __init__(self):
+        self._rows: Dict[Any, int] = {}      # page_id(int) 또는 ("path", 제목 경로) → 행 번호
+        self._ids: List[int] = []
+        self._titles: List[int] = []
+        self._parents: List[int] = []
+        self._positions: List[int] = []
+        self._listed: List[bool] = []
+        self._pages: List[int] = []          # 목록에 나온 순서대로의 행 번호
+        self._strings: Dict[str, int] = {}
+
+    def _intern(self, title: str) -> int:
+        return self._strings.setdefault(title, len(self._strings))
+
+    def _node(self, key: Any, page_id: int, title: str, parent: int, listed: bool, position: Optional[int] = None) -> int:
+        row = self._rows.get(key)
+        position = NO_POSITION if position is None else position
+        if row is None:
+            row = len(self._ids)
+            self._rows[key] = row
+            self._ids.append(page_id)
+            self._titles.append(self._intern(title))
+            self._parents.append(parent)
+            self._positions.append(position)
+            self._listed.append(listed)
+            if listed:
+                self._pages.append(row)
+        elif listed and not self._listed[row]:
+            # 다른 페이지의 조상으로 먼저 들어온 페이지가 목록에 나타남
+            self._titles[row] = self._intern(title)
+            self._parents[row] = parent
+            self._positions[row] = position
+            self._listed[row] = True
+            self._pages.append(row)
+        return row
+
+    def add(self, page_id: str, title: str, ancestors: Iterable[Dict[str, Any]] = (), position: Optional[int] = None) -> int:
+        """
+        페이지 하나를 추가합니다. ancestors는 루트부터 [{"id", "title"}, ...] (Confluence expand=ancestors)
+        id가 없는 조상(제목 경로만 아는 경우)은 경로로 구분되는 외부 노드가 됩니다.
+        position은 형제 사이 위치(extensions.position, page_position)로, 자식 목록 순서를 정합니다.
+        """
+        parent = -1
+        path: Tuple[str, ...] = ()
+        for a in ancestors:
+            path = path + (a.get("title", ""),)
+            if a.get("id"):
+                aid = int(a["id"])
+                parent = self._node(aid, aid, a.get("title", ""), parent, listed=False)
+            else:
+                parent = self._node(("path", path), EXTERNAL_ID, path[-1], parent, listed=False)
+        pid = int(page_id)
+        return self._node(pid, pid, title, parent, listed=True, position=position)
+
+    def add_path(self, page_id: str, title: str, path: str) -> int:
+        """get_pages_with_category 형식("A / B / 제목")의 경로로 추가합니다. (조상 id를 모를 때)"""
+        parts = [p.strip() for p in path.split("/") if p.strip()]
+        return self.add(page_id, title, [{"title": t} for t in parts[:-1]])
+
+    def build(self) -> "PageRegistry":
+        return PageRegistry(
+            np.array(self._ids, dtype=np.int64),
+            np.array(self._titles, dtype=np.int32),
+            np.array(self._parents, dtype=np.int32),
+            np.array(self._listed, dtype=bool),
+            np.array(self._pages, dtype=np.int32),
+            [s for s, _ in sorted(self._strings.items(), key=lambda kv: kv[1])],
+            np.array(self._positions, dtype=np.int32),
+        )
+
+
+class PageRegistry:
+    def __init__(
+        self,
+        ids: np.ndarray,
+        title_idx: np.ndarray,
+        parent: np.ndarray,
+        listed: np.ndarray,
+        pages: np.ndarray,
+        strings: List[str],
+        position: Optional[np.ndarray] = None
+    ):
+        n = len(ids)
+        self.ids = ids
+        self.title_idx = title_idx
+        self.parent = parent
+        self.listed = listed
+        self.pages = pages
+        self.strings = strings
+        self.position = position if position is not None else np.full(n, NO_POSITION, dtype=np.int32)
+
+        # CSR 자식 목록 (자식 순서 = 형제 위치, 같으면 목록에 들어온 순서: Confluence child/page 응답과 같은 순서)
+        has_parent = parent >= 0
+        counts = np.bincount(parent[has_parent], minlength=n) if n else np.zeros(0, dtype=np.int64)
+        self.child_offsets = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.child_offsets[1:])
+        child_rows = np.nonzero(has_parent)[0].astype(np.int32)
+        self.children = child_rows[np.lexsort((child_rows, self.position[child_rows], parent[child_rows]))]
+
+        # 전위 순회 순서 + 행마다 하위 트리 구간 [start, end), 깊이
+        self.order = np.empty(n, dtype=np.int32)
+        self.start = np.empty(n, dtype=np.int32)
+        self.end = np.empty(n, dtype=np.int32)
+        self.depth = np.zeros(n, dtype=np.int16)
+        pos = 0
+        for root in np.nonzero(~has_parent)[0]:
+            stack = [(int(root), False)]
+            while stack:
+                row, closing = stack.pop()
+                if closing:
+                    self.end[row] = pos
+                    continue
+                self.order[pos] = row
+                self.start[row] = pos
+                pos += 1
+                stack.append((row, True))
+                kids = self.children[self.child_offsets[row]:self.child_offsets[row + 1]]
+                if len(kids):
+                    self.depth[kids] = self.depth[row] + 1
+                    stack.extend((int(k), False) for k in kids[::-1])
+
+        # page_id → 행 (외부 노드 제외, 정렬된 id 배열에서 이분 탐색)
+        page_rows = np.nonzero(ids != EXTERNAL_ID)[0]
+        sort = np.argsort(ids[page_rows], kind="stable")
+        self._sorted_ids = ids[page_rows][sort]
+        self._sorted_rows = page_rows[sort].astype(np.int32)
+
+    @classmethod
+    def from_listing(cls, pages: Iterable[Dict[str, Any]]) -> "PageRegistry":
+        """[{"id", "title", "ancestors"}] 또는 [{"id", "title", "path"}] 목록에서 만듭니다."""
+        builder = PageRegistryBuilder()
+        for p in pages:
+            if "ancestors" in p:
+                builder.add(p["id"], p["title"], p["ancestors"], page_position(p))
+            else:
+                builder.add_path(p["id"], p["title"], p.get("path", p["title"]))
+        return builder.build()
+
+    # -----------------------------------------------------------------
+    # 조회
+    # -----------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def __contains__(self, page_id: Any) -> bool:
+        return self.row_of(page_id) is not None
+
+    def row_of(self, page_id: Any) -> Optional[int]:
+        try:
+            key = int(page_id)
+        except (TypeError, ValueError):
+            return None
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            row = int(self._sorted_rows[i])
+            return row if self.listed[row] else None
+        return None
+
+    def title(self, row: int) -> str:
+        return self.strings[self.title_idx[row]]
+
+    def page_id(self, row: int) -> str:
+        return str(int(self.ids[row]))
+
+    def path(self, row: int) -> List[str]:
+        """루트부터 자기 자신까지의 제목"""
+        titles = []
+        while row >= 0:
+            titles.append(self.title(row))
+            row = int(self.parent[row])
+        return titles[::-1]
+
+    def ancestors(self, page_id: Any) -> List[Dict[str, str]]:
+        """Confluence ancestors와 같은 모양 [{"id", "title"}] (외부 노드는 id가 빈 문자열)"""
+        row = self.row_of(page_id)
+        chain = []
+        row = int(self.parent[row]) if row is not None else -1
+        while row >= 0:
+            chain.append({"id": self.page_id(row) if self.ids[row] != EXTERNAL_ID else "", "title": self.title(row)})
+            row = int(self.parent[row])
+        return chain[::-1]
+
+    def children_of(self, page_id: Any) -> List[Dict[str, str]]:
+        """바로 아래 자식 페이지 [{"id", "title"}] (get_child_pages와 같은 모양)"""
+        row = self.row_of(page_id)
+        if row is None:
+            return []
+        kids = self.children[self.child_offsets[row]:self.child_offsets[row + 1]]
+        return [{"id": self.page_id(k), "title": self.title(k)} for k in kids if self.listed[k]]
+
+    def subtree_rows(self, row: int, include_self: bool = True) -> np.ndarray:
+        rows = self.order[self.start[row] + (0 if include_self else 1):self.end[row]]
+        return rows[self.listed[rows]]
+
+    def subtree(self, page_id: Any, include_self: bool = True) -> List[str]:
+        """page_id 아래 모든 페이지 id (전위 순회 순서)"""
+        row = self.row_of(page_id)
+        if row is None:
+            return []
+        return [self.page_id(r) for r in self.subtree_rows(row, include_self)]
+
+    def iter_pages(self) -> Iterator[int]:
+        """목록에 있던 페이지 행 (목록 순서)"""
+        return iter(self.pages.tolist())
+
+    # -----------------------------------------------------------------
+    # 카테고리 (예전 level_i 열과 같은 뜻: 경로의 i번째 제목)
+    # -----------------------------------------------------------------
+    def categories(self) -> Dict[str, List[str]]:
+        """{"level_0": [...], "level_1": [...], ...} 깊이별 제목 (목록 페이지의 경로에 나오는 것만)"""
+        on_path = np.zeros(len(self.ids), dtype=bool)
+        for row in self.pages.tolist():
+            while row >= 0 and not on_path[row]:
+                on_path[row] = True
+                row = int(self.parent[row])
+        rows = np.nonzero(on_path)[0]
+        result = {}
+        for level in np.unique(self.depth[rows]):
+            at_level = rows[self.depth[rows] == level]
+            result[f"level_{int(level)}"] = sorted({self.strings[i] for i in self.title_idx[at_level].tolist()})
+        return result
+
+    def filter(self, filters: Dict[str, str]) -> List[str]:
+        """{"level_1": "인사", ...}를 모두 만족하는 페이지 id (목록 순서, 모르는 키/없는 레벨은 무시)"""
+        selected = self.listed.copy()
+        max_depth = int(self.depth[self.listed].max()) if selected.any() else -1
+        for key, value in filters.items():
+            if not key.startswith("level_") or not key[len("level_"):].isdigit():
+                continue
+            level = int(key[len("level_"):])
+            if level > max_depth:
+                continue
+            try:
+                string = self.strings.index(value)
+            except ValueError:
+                return []
+            matched = np.zeros(len(self.ids), dtype=bool)
+            for row in np.nonzero((self.depth == level) & (self.title_idx == string))[0]:
+                matched[self.order[self.start[row]:self.end[row]]] = True
+            selected &= matched
+        return [self.page_id(r) for r in self.pages[selected[self.pages]]]
+
+    def tree(self) -> List[Dict[str, Any]]:
+        """프론트엔드용 폴더/페이지 트리 (build_structure_tree와 같은 모양)"""
+        return build_tree([
+            {"id": self.page_id(row), "title": self.title(row), "parts": self.path(row)[:3]}
+            for row in self.iter_pages()
+        ])
+
+    def nbytes(self) -> int:
+        """배열이 차지하는 바이트 수 (문자열 표 제외)"""
+        arrays = [self.ids, self.title_idx, self.parent, self.position, self.listed, self.pages, self.child_offsets, self.children,
+                  self.order, self.start, self.end, self.depth, self._sorted_ids, self._sorted_rows]
+        return int(sum(a.nbytes for a in arrays))
+
+
+class ChildPageResolver:
+    """
+    parse_storage_html의 get_child_pages_func 자리에 넣는 하위 페이지 조회기
+    registry에 있는 페이지(이번에 수집한 페이지)는 레지스트리의 자식 목록을, 없는 페이지는 fallback(HTTP) 결과를 돌려줍니다.
+    registry는 수집 범위의 모든 하위 페이지를 본문 유무와 관계없이 담고 있어야 하며(스페이스 전체 또는 루트 아래 트리 전체),
+    형제 위치를 함께 넣어야 자식 순서가 child/page 응답과 같아집니다.
+    워커 프로세스로 pickle되어 전달되므로 fallback 캐시는 프로세스마다 따로 쌓입니다.
+    """
+
+    def __init__(self, registry: Optional[PageRegistry], fallback: Optional[Callable[[str], List[Dict[str, str]]]] = None):
+        self.registry = registry
+        self.fallback = fallback
+        self._cache: Dict[str, List[Dict[str, str]]] = {}
+
+    @classmethod
+    def from_pages(cls, pages: List[Dict[str, Any]], fallback: Optional[Callable] = None) -> "ChildPageResolver":
+        """목록 [{"id", "title", "ancestors", "position"(선택)}, ...]으로 만듭니다. (본문 없는 페이지도 포함해서 넘김)"""
+        builder = PageRegistryBuilder()
+        for p in pages:
+            position = p["position"] if "position" in p else page_position(p)
+            builder.add(p["id"], p["title"], p.get("ancestors") or [], position)
+        return cls(builder.build(), fallback)
+
+    def __call__(self, page_id: str) -> List[Dict[str, str]]:
+        if self.registry is not None and page_id in self.registry:
+            return self.registry.children_of(page_id)
+        key = str(page_id)
+        if key not in self._cache:
+            self._cache[key] = (self.fallback(key) or []) if self.fallback else []
+        return self._cache[key]
@@ -7,10 +7,13 @@ Confluence HTML 파싱 및 문서 추출 모듈
 
 import os
 from typing import Dict, List, Any
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, Tag, NavigableString, CData
 import requests
 
 
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+
+
 def table_to_records(table_tag: Tag) -> List[Dict[str, str]]:
     """
     <table> 태그를 행 단위 레코드(List[Dict])로 변환합니다.
@@ -22,18 +25,36 @@ def table_to_records(table_tag: Tag) -> List[Dict[str, str]]:
     Returns:
         [{"컬럼1": "값1", "컬럼2": "값2"}, ...] 형태의 레코드 리스트
     """
-    rows_tag = table_tag.find_all("tr")
-    if not rows_tag:
+    rows = []
+    for tr in table_tag.find_all("tr"):
+        cells = [
+            (cell.get_text(" ", strip=True) or "", cell.get("rowspan", 1), cell.get("colspan", 1))
+            for cell in tr.find_all(["td", "th"])
+        ]
+        rows.append((cells, tr.find("th") is not None))
+    return rows_to_records(rows)
+
+
+def rows_to_records(rows: List[Any]) -> List[Dict[str, str]]:
+    """
+    파서 엔진과 무관한 표 평탄화 로직.
+
+    Args:
+        rows: [([(셀 텍스트, rowspan, colspan), ...], th 포함 여부), ...]
+
+    Returns:
+        table_to_records와 같은 형식의 레코드 리스트
+    """
+    if not rows:
         return []
 
     grid: List[List[str]] = []
     rowspan_map: Dict[int, List[Any]] = {}
 
-    for tr in rows_tag:
+    for cells, _ in rows:
         row: List[str] = []
         col_idx = 0
 
-        cells = tr.find_all(["td", "th"])
         cell_iter = iter(cells)
 
         while True:
@@ -50,13 +71,12 @@ def table_to_records(table_tag: Tag) -> List[Dict[str, str]]:
                 continue
 
             try:
-                cell = next(cell_iter)
+                text, rowspan, colspan = next(cell_iter)
             except StopIteration:
                 break
 
-            text = cell.get_text(" ", strip=True) or ""
-            rowspan = int(cell.get("rowspan", 1))
-            colspan = int(cell.get("colspan", 1))
+            rowspan = int(rowspan)
+            colspan = int(colspan)
 
             for _ in range(colspan):
                 row.append(text)
@@ -77,8 +97,8 @@ def table_to_records(table_tag: Tag) -> List[Dict[str, str]]:
         r.extend([""] * (max_len - len(r)))
 
     header_idx = 0
-    for i, tr in enumerate(rows_tag):
-        if tr.find("th"):
+    for i, (_, has_th) in enumerate(rows):
+        if has_th:
             header_idx = i
             break
 
@@ -144,10 +164,21 @@ def table_records_to_markdown(records: List[Dict[str, str]]) -> str:
     return "\n".join(lines)
 
 
+NOISE_TAGS = [
+    "ac:parameter",
+    "ac:schema-version",
+    "ac:macro-id",
+    "ri:url",
+    "script",
+    "style",
+]
+
+
 def parse_storage_html(
     page_id: str,
     html: str,
-    get_child_pages_func=None
+    get_child_pages_func=None,
+    engine: str = None
 ) -> Dict[str, Any]:
     """
     Confluence storage HTML을 텍스트/표/링크/첨부 메타데이터로 정리합니다.
@@ -156,6 +187,8 @@ def parse_storage_html(
         page_id: 페이지 ID (하위 페이지 조회용)
         html: Storage HTML 문자열
         get_child_pages_func: 하위 페이지를 가져오는 함수 (선택사항)
+        engine: "fast"(단일 패스 스트리밍 파서, 기본값) 또는 "bs4"(BeautifulSoup 트리 기준 구현).
+            지정하지 않으면 PARSER_ENGINE 환경변수를 따릅니다. 두 엔진의 결과는 동일합니다.
 
     Returns:
         {
@@ -164,7 +197,9 @@ def parse_storage_html(
             "links": ["관련문서1", "관련문서2", ...],
             "attachments": ["파일1", "파일2", ...],
             "combined_text": "plain_text + 표 + 하위페이지",
-            "tables_markdown": "마크다운 형식의 표"
+            "tables_markdown": "마크다운 형식의 표",
+            "sections": [{"heading": "제목", "level": 2, "text": "본문", "tables": [0]}, ...],
+            "child_pages": [{"title": "하위문서", "id": "123"}, ...]
         }
     """
     if not html:
@@ -174,22 +209,29 @@ def parse_storage_html(
             "links": [],
             "attachments": [],
             "combined_text": "",
-            "tables_markdown": ""
+            "tables_markdown": "",
+            "sections": [],
+            "child_pages": []
         }
 
+    engine = engine or os.getenv("PARSER_ENGINE", "fast")
+    if engine == "fast":
+        try:
+            from .fast_parser import parse_storage_html_fast
+        except ImportError:  # 스크립트로 직접 실행하는 경우
+            from fast_parser import parse_storage_html_fast
+        return parse_storage_html_fast(page_id, html, get_child_pages_func)
+
+    return _parse_storage_html_bs4(page_id, html, get_child_pages_func)
+
+
+def _parse_storage_html_bs4(page_id: str, html: str, get_child_pages_func=None) -> Dict[str, Any]:
+    """BeautifulSoup 트리를 여러 번 순회하는 기준(reference) 구현입니다."""
     soup = BeautifulSoup(html, "html.parser")
 
     has_children_macro = soup.find("ac:structured-macro", {"ac:name": "children"}) is not None
 
-    noise_tags = [
-        "ac:parameter",
-        "ac:schema-version",
-        "ac:macro-id",
-        "ri:url",
-        "script",
-        "style",
-    ]
-    for tag in soup.find_all(noise_tags):
+    for tag in soup.find_all(NOISE_TAGS):
         tag.decompose()
 
     attachment_titles: List[str] = []
@@ -212,17 +254,16 @@ def parse_storage_html(
             link.replace_with(body_text)
 
     tables_records: List[List[Dict[str, str]]] = []
-    table_markdown_blocks: List[str] = []
+    table_section_indices: List[int] = []
 
     for table in soup.find_all("table"):
         records = table_to_records(table)
         if records:
             tables_records.append(records)
-            table_markdown_blocks.append(table_records_to_markdown(records))
+            # 표 앞에 나온 헤딩 개수 = 표가 속한 섹션 번호 (0은 첫 헤딩 이전 영역)
+            table_section_indices.append(len(table.find_all_previous(HEADING_TAGS)))
         table.decompose()
 
-    tables_text = "\n\n".join(table_markdown_blocks)
-
     for tag in soup.find_all():
         if tag.name and ":" in tag.name:
             tag.unwrap()
@@ -232,11 +273,33 @@ def parse_storage_html(
         cleaned = line.strip()
         if cleaned:
             text_lines.append(cleaned)
+
+    sections = _collect_sections(soup, table_section_indices)
+
+    return build_parse_result(
+        page_id, text_lines, tables_records, extracted_links, attachment_titles,
+        sections, has_children_macro, get_child_pages_func
+    )
+
+
+def build_parse_result(
+    page_id: str,
+    text_lines: List[str],
+    tables_records: List[List[Dict[str, str]]],
+    extracted_links: List[str],
+    attachment_titles: List[str],
+    sections: List[Dict[str, Any]],
+    has_children_macro: bool,
+    get_child_pages_func=None
+) -> Dict[str, Any]:
+    """파서 엔진이 뽑아낸 요소들로 parse_storage_html 반환값을 조립합니다."""
     plain_text = "\n".join(text_lines)
+    tables_text = "\n\n".join(table_records_to_markdown(records) for records in tables_records)
 
     child_pages_text = ""
+    children: List[Dict[str, str]] = []
     if has_children_macro and get_child_pages_func:
-        children = get_child_pages_func(page_id)
+        children = get_child_pages_func(page_id) or []
         if children:
             child_pages_text = "\n".join(
                 [f"- [{c['title']}](child_id:{c['id']})" for c in children]
@@ -259,4 +322,52 @@ def parse_storage_html(
         "attachments": attachment_titles,
         "combined_text": combined_text,
         "tables_markdown": tables_text,
+        "sections": sections,
+        "child_pages": children,
     }
+
+
+def _collect_sections(soup: BeautifulSoup, table_section_indices: List[int]) -> List[Dict[str, Any]]:
+    """
+    헤딩(h1~h6) 경계로 본문을 섹션 단위로 나눕니다.
+    헤딩 문자열은 섹션 제목으로만 쓰고 본문 줄에는 넣지 않습니다.
+    """
+    raw_sections: List[Dict[str, Any]] = [{"heading": "", "level": 0, "lines": []}]
+
+    for el in soup.descendants:
+        if isinstance(el, Tag):
+            if el.name in HEADING_TAGS:
+                raw_sections.append({
+                    "heading": el.get_text(" ", strip=True),
+                    "level": int(el.name[1]),
+                    "lines": []
+                })
+            continue
+
+        # get_text()와 같은 기준: 일반 문자열과 CDATA만 본문으로 취급
+        if type(el) not in (NavigableString, CData):
+            continue
+        if el.find_parent(HEADING_TAGS) is not None:
+            continue
+        raw_sections[-1]["lines"].extend(line.strip() for line in el.splitlines() if line.strip())
+
+    return build_sections(raw_sections, table_section_indices)
+
+
+def build_sections(raw_sections: List[Dict[str, Any]], table_section_indices: List[int]) -> List[Dict[str, Any]]:
+    """
+    {"heading", "level", "lines"} 목록을 최종 섹션 형식으로 정리합니다.
+    내용이 없는 머리말(첫 헤딩 이전 영역)은 제외합니다.
+    """
+    sections: List[Dict[str, Any]] = []
+    for idx, raw in enumerate(raw_sections):
+        tables = [t for t, s_idx in enumerate(table_section_indices) if s_idx == idx]
+        if idx == 0 and not raw["lines"] and not tables:
+            continue
+        sections.append({
+            "heading": raw["heading"],
+            "level": raw["level"],
+            "text": "\n".join(raw["lines"]),
+            "tables": tables,
+        })
+    return sections
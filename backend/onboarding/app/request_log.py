@@ -0,0 +1,115 @@
+"""
+/chat 요청 로그 (느린 요청 + 표본 추출)
+- 요청마다 RequestTrace로 단계별 시간을 재고, 같은 값을 Prometheus 히스토그램에도 기록
+- SLOW_QUERY_THRESHOLD(초) 이상 걸린 요청은 항상, 나머지는 REQUEST_LOG_SAMPLE_RATE 비율로만 기록
+- 기록은 메모리 링 버퍼(REQUEST_LOG_SIZE개)에 보관하고 관리자 API로 조회 (워커 프로세스별로 따로 보관)
+- 느린 요청은 한 줄 JSON으로도 출력 (일반 요청은 출력 없음)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from .metrics import CHAT_STAGE_SECONDS
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from metrics import CHAT_STAGE_SECONDS
+
+
+class RequestTrace:
+    """요청 하나의 단계별 소요 시간(ms)"""
+
+    __slots__ = ("query", "started", "stages")
+
+    def __init__(self, query: str = ""):
+        self.query = query
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            CHAT_STAGE_SECONDS.labels(name).observe(elapsed)
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed * 1000
+
+    @property
+    def elapsed(self) -> float:
+        """요청 시작부터 지금까지(초)"""
+        return time.perf_counter() - self.started
+
+
+class SlowQueryLog:
+    """느린 요청은 전부, 나머지는 표본만 담는 스레드 안전 링 버퍼"""
+
+    def __init__(self, threshold: float = 3.0, sample_rate: float = 0.01, size: int = 500):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SlowQueryLog":
+        return cls(
+            threshold=float(os.getenv("SLOW_QUERY_THRESHOLD", "3.0")),
+            sample_rate=float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01")),
+            size=int(os.getenv("REQUEST_LOG_SIZE", "500")),
+        )
+
+    def record(self, trace: RequestTrace, docs: List[Dict[str, Any]], **extra) -> Optional[Dict[str, Any]]:
+        """
+        기록 대상이면 항목을 만들어 버퍼에 넣고 돌려줍니다. 대상이 아니면 아무것도 만들지 않습니다.
+
+        Args:
+            trace: 요청의 RequestTrace
+            docs: 검색 결과 (page_id/score/type만 남김)
+            extra: top_k, answer_chars 등 추가 필드
+        """
+        elapsed = trace.elapsed
+        slow = elapsed >= self.threshold
+        if not slow and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+
+        entry = {
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "slow": slow,
+            "total_ms": round(elapsed * 1000, 1),
+            "stages_ms": {k: round(v, 1) for k, v in trace.stages.items()},
+            "query": trace.query[:200],
+            "hits": [
+                {"page_id": d.get("page_id"), "score": d.get("score"), "type": d.get("type", "chunk")}
+                for d in docs
+            ],
+        }
+        entry.update(extra)
+
+        with self._lock:
+            self._entries.append(entry)
+        if slow:
+            print(f"🐢 [SlowQuery] {json.dumps(entry, ensure_ascii=False)}")
+        return entry
+
+    def entries(self, limit: int = 50, slow_only: bool = False) -> List[Dict[str, Any]]:
+        """최신순 항목 목록"""
+        with self._lock:
+            items = list(self._entries)
+        if slow_only:
+            items = [e for e in items if e["slow"]]
+        return items[::-1][:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 프로세스 전역 로그 (챗봇과 관리자 API가 공유)
+slow_query_log = SlowQueryLog.from_env()
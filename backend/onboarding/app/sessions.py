@@ -0,0 +1,201 @@
+"""
+멀티턴 대화 세션 모듈
+- 세션마다 직전 검색 결과(docs)와 짧은 대화 요약만 보관 (최근 SESSION_MAX_TURNS턴 + 그 이전 질문 목록)
+- 후속 질문이 직전 검색 결과로 답할 수 있는지 가벼운 규칙으로 판단해, 가능하면 임베딩/ES 검색을 건너뜀
+  (질문의 핵심 단어가 모두 직전 문서/질문에 있으면 재사용, 새 단어가 나오면 직전 검색어를 붙여 다시 검색)
+- 세션은 워커마다 LRU(SESSION_MAX_COUNT개) + TTL(SESSION_TTL_SECONDS)로 관리하고,
+  공유 상태에도 같은 TTL로 써 두어 다음 턴이 다른 워커로 가도 이어짐
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    from .shared_state import SharedState, get_shared_state
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from shared_state import SharedState, get_shared_state
+
+
+# 앞 대화를 가리키는 말 (있으면 후속 질문으로 봄)
+FOLLOWUP_MARKERS = (
+    "그럼", "그러면", "그건", "그거", "그게", "그것", "거기", "이거", "이건", "이것", "저거",
+    "방금", "아까", "위에", "위의", "더", "자세히", "또", "그리고", "그래서",
+)
+# 질문에 흔한 말 (검색어로 의미가 없음)
+STOPWORDS = {
+    "어디", "어디서", "어디에", "언제", "며칠", "몇", "누구", "누가", "무엇", "뭐", "뭐야", "뭔가요", "어떻게", "어떤", "왜", "얼마",
+    "알려줘", "알려주세요", "알려", "해줘", "해주세요", "설명", "설명해줘", "있어", "있나요", "있어요", "인가요",
+    "하나요", "하면", "되나요", "돼", "되", "해요", "합니다", "해야", "하는", "방법", "다시", "좀", "정리",
+}
+_JOSA = ("에서는", "으로는", "에서", "으로", "이랑", "이야", "인가", "까지", "부터", "은", "는", "이", "가", "을", "를",
+         "에", "의", "도", "만", "와", "과", "로", "랑", "요")
+_WORD = re.compile(r"[가-힣]+|[A-Za-z][A-Za-z0-9_\-]*|[0-9]+")
+
+
+def content_terms(text: str) -> List[str]:
+    """질문에서 검색에 의미 있는 단어만 뽑습니다. (조사 한 번 떼기, 불용어/지시어 제외, 2자 이상)"""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        for josa in _JOSA:
+            if word.endswith(josa) and len(word) - len(josa) >= 2:
+                word = word[:-len(josa)]
+                break
+        if len(word) >= 2 and word not in STOPWORDS and word not in FOLLOWUP_MARKERS:
+            terms.append(word)
+    return list(dict.fromkeys(terms))
+
+
+def new_session(session_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "session_id": session_id or uuid.uuid4().hex,
+        "turn": 0,
+        "indices": [],            # 검색 범위 (인덱스 목록 + "subtree:{page_id}")
+        "docs": [],               # 직전 검색 결과 (컨텍스트 재사용용)
+        "retrieval_query": "",    # 그 검색에 쓴 질문
+        "turns": [],              # 최근 대화 [{"q", "a"}] (답변은 잘라서 보관)
+        "earlier": [],            # 그보다 오래된 질문들
+        "updated_at": time.time(),
+    }
+
+
+def plan_retrieval(session: Dict[str, Any], query: str, indices: List[str]) -> Dict[str, Any]:
+    """
+    후속 질문을 직전 검색 결과로 답할지(reuse) 다시 검색할지 정합니다.
+
+    Returns:
+        {"reuse": bool, "query": 검색에 쓸 질문, "reason": str}
+    """
+    if not session["docs"]:
+        return {"reuse": False, "query": query, "reason": "first_turn"}
+    if session["indices"] != list(indices):
+        return {"reuse": False, "query": query, "reason": "collection_changed"}
+
+    terms = content_terms(query)
+    is_followup = any(marker in query for marker in FOLLOWUP_MARKERS) or len(terms) <= 2
+    known = " ".join(
+        [session["retrieval_query"]] + [t["q"] for t in session["turns"]]
+        + [f"{d.get('title', '')} {d.get('content', '')}" for d in session["docs"]]
+    ).lower()
+    novel = [t for t in terms if t not in known]
+
+    if not novel:
+        return {"reuse": True, "query": session["retrieval_query"], "reason": "covered" if terms else "anaphora"}
+    if is_followup:
+        # "그럼 신청은 어디서 해?" → 앞 주제를 붙여서 검색 (지시어만으로는 검색이 안 됨)
+        return {"reuse": False, "query": f"{session['retrieval_query']} {query}", "reason": "followup"}
+    return {"reuse": False, "query": query, "reason": "new_topic"}
+
+
+def render_history(session: Dict[str, Any]) -> str:
+    """프롬프트에 넣을 짧은 대화 요약 (이전 질문 목록 + 최근 턴)"""
+    lines = []
+    if session["earlier"]:
+        lines.append("이전 질문: " + " / ".join(session["earlier"]))
+    for t in session["turns"]:
+        lines.append(f"Q: {t['q']}\nA: {t['a']}")
+    return "\n".join(lines)
+
+
+class SessionStore:
+    def __init__(
+        self,
+        ttl: float = 1800.0,
+        max_sessions: int = 1000,
+        max_turns: int = 4,
+        answer_chars: int = 400,
+        shared: Optional[SharedState] = None
+    ):
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+        self.max_turns = max(1, max_turns)
+        self.answer_chars = answer_chars
+        self.shared = shared
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # 오래 안 쓴 순
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            ttl=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+            max_sessions=int(os.getenv("SESSION_MAX_COUNT", "1000")),
+            max_turns=int(os.getenv("SESSION_MAX_TURNS", "4")),
+            answer_chars=int(os.getenv("SESSION_ANSWER_CHARS", "400")),
+            shared=get_shared_state(),
+        )
+
+    def get(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """세션을 꺼냅니다. 없거나 만료됐으면 그 id로 새 세션 (id가 없으면 새 id)"""
+        if not session_id:
+            return new_session()
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            local = self._sessions.get(session_id)
+            if local is not None and now - local["updated_at"] >= self.ttl:
+                del self._sessions[session_id]
+                local = None
+            if local is not None:
+                self._sessions.move_to_end(session_id)
+        remote = self.shared.get("session", session_id) if self.shared else None
+        # 다른 워커가 더 최근 턴을 처리했으면 공유 상태 쪽이 최신
+        if remote is not None and (local is None or remote["turn"] >= local["turn"]):
+            return remote
+        return dict(local) if local is not None else new_session(session_id)
+
+    def record_turn(
+        self,
+        session: Dict[str, Any],
+        query: str,
+        answer: str,
+        docs: List[Dict[str, Any]],
+        retrieval_query: str,
+        indices: List[str]
+    ):
+        """한 턴을 세션에 반영하고 저장합니다. (오래된 턴은 질문만 남기고 답변은 버림)"""
+        session["turn"] += 1
+        session["indices"] = list(indices)
+        session["docs"] = docs
+        session["retrieval_query"] = retrieval_query
+        answer = answer if len(answer) <= self.answer_chars else answer[:self.answer_chars] + "…"
+        session["turns"] = session["turns"] + [{"q": query, "a": answer}]
+        while len(session["turns"]) > self.max_turns:
+            session["earlier"] = (session["earlier"] + [session["turns"].pop(0)["q"]])[-self.max_turns * 2:]
+        session["updated_at"] = time.time()
+        self.save(session)
+
+    def save(self, session: Dict[str, Any]):
+        with self._lock:
+            self._sessions[session["session_id"]] = session
+            self._sessions.move_to_end(session["session_id"])
+            self._evict(time.time())
+        if self.shared:
+            self.shared.set("session", session["session_id"], session, ttl=self.ttl)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.shared:
+            self.shared.delete("session", session_id)
+
+    def _evict(self, now: float):
+        # 앞쪽이 가장 오래 안 쓴 세션: TTL이 지난 것부터 지우고, 개수가 넘치면 LRU로 더 지움
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["updated_at"] < self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions), "max_sessions": self.max_sessions,
+                "ttl_s": self.ttl, "evicted": self.evicted,
+            }
+
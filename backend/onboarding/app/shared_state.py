@@ -0,0 +1,294 @@
+"""
+워커 프로세스 간 공유 상태 모듈 (gunicorn/uvicorn --workers 대응)
+- 질문 임베딩/답변 캐시, 문서 구조 스냅샷, 작업(Job) 상태와 스페이스 잠금을 한곳에 보관
+- 기본은 /dev/shm의 SQLite 파일 (메모리 위 mmap + WAL, 추가 설치 불필요)
+- SHARED_STATE_URL=redis://... 를 주면 Redis(호환) 서버 사용 (redis 패키지 필요)
+- 값은 JSON으로 저장하고, 키마다 TTL(초)을 둘 수 있음
+- 공유 저장소 오류는 요청을 실패시키지 않음 (캐시 미스/잠금 없음으로 취급하고 경고만 출력)
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _default_sqlite_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "onboarding_shared_state.sqlite")
+
+
+class SqliteBackend:
+    """한 호스트의 워커들이 같은 파일을 여는 SQLite 키-값 저장소 (스레드마다 연결 하나)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires REAL,"
+            " PRIMARY KEY (ns, key))"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # fork 이전(gunicorn preload 등)에 열린 연결은 자식 프로세스에서 다시 엽니다.
+        if conn is None or self._local.pid != os.getpid():
+            # isolation_level=None: 문장 단위 자동 커밋 (트랜잭션이 필요한 곳만 BEGIN IMMEDIATE)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _expires(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    def get(self, ns: str, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE ns=? AND key=? AND (expires IS NULL OR expires > ?)",
+            (ns, key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, ns: str, key: str, value: str, ttl: Optional[float]):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (ns, key, value, expires) VALUES (?, ?, ?, ?)",
+            (ns, key, value, self._expires(ttl))
+        )
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self.purge_expired()
+
+    def add(self, ns: str, key: str, value: str, ttl: Optional[float]) -> bool:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE ns=? AND key=? AND expires IS NOT NULL AND expires <= ?", (ns, key, time.time()))
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO kv (ns, key, value, expires) VALUES (?, ?, ?, ?)",
+                (ns, key, value, self._expires(ttl))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount == 1
+
+    def replace(self, ns: str, key: str, expected: str, value: str, ttl: Optional[float]) -> bool:
+        cur = self._conn().execute(
+            "UPDATE kv SET value=?, expires=? WHERE ns=? AND key=? AND value=? AND (expires IS NULL OR expires > ?)",
+            (value, self._expires(ttl), ns, key, expected, time.time())
+        )
+        return cur.rowcount == 1
+
+    def delete(self, ns: str, key: str, value: Optional[str] = None):
+        if value is None:
+            self._conn().execute("DELETE FROM kv WHERE ns=? AND key=?", (ns, key))
+        else:
+            self._conn().execute("DELETE FROM kv WHERE ns=? AND key=? AND value=?", (ns, key, value))
+
+    def incr(self, ns: str, key: str) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM kv WHERE ns=? AND key=?", (ns, key)).fetchone()
+            value = int(json.loads(row[0])) + 1 if row else 1
+            conn.execute("INSERT OR REPLACE INTO kv (ns, key, value, expires) VALUES (?, ?, ?, NULL)", (ns, key, json.dumps(value)))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def items(self, ns: str) -> List[Tuple[str, str]]:
+        return self._conn().execute(
+            "SELECT key, value FROM kv WHERE ns=? AND (expires IS NULL OR expires > ?)", (ns, time.time())
+        ).fetchall()
+
+    def clear(self, ns: str):
+        self._conn().execute("DELETE FROM kv WHERE ns=?", (ns,))
+
+    def purge_expired(self):
+        self._conn().execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+
+
+class RedisBackend:
+    """Redis(또는 호환 서버) 저장소. 여러 호스트의 워커가 공유할 때 사용"""
+
+    def __init__(self, url: str, prefix: str = "onboarding:"):
+        import redis  # 선택 의존성 (SHARED_STATE_URL이 redis://일 때만 필요)
+
+        self.client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2.0)
+        self.prefix = prefix
+
+    def _k(self, ns: str, key: str) -> str:
+        return f"{self.prefix}{ns}:{key}"
+
+    def get(self, ns: str, key: str) -> Optional[str]:
+        return self.client.get(self._k(ns, key))
+
+    def set(self, ns: str, key: str, value: str, ttl: Optional[float]):
+        self.client.set(self._k(ns, key), value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, ns: str, key: str, value: str, ttl: Optional[float]) -> bool:
+        return bool(self.client.set(self._k(ns, key), value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def replace(self, ns: str, key: str, expected: str, value: str, ttl: Optional[float]) -> bool:
+        k = self._k(ns, key)
+        if self.client.get(k) != expected:
+            return False
+        return bool(self.client.set(k, value, xx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, ns: str, key: str, value: Optional[str] = None):
+        k = self._k(ns, key)
+        if value is None or self.client.get(k) == value:
+            self.client.delete(k)
+
+    def incr(self, ns: str, key: str) -> int:
+        return int(self.client.incr(self._k(ns, key)))
+
+    def items(self, ns: str) -> List[Tuple[str, str]]:
+        keys = list(self.client.scan_iter(match=self._k(ns, "*"), count=500))
+        if not keys:
+            return []
+        head = len(self._k(ns, ""))
+        return [(k[head:], v) for k, v in zip(keys, self.client.mget(keys)) if v is not None]
+
+    def clear(self, ns: str):
+        keys = list(self.client.scan_iter(match=self._k(ns, "*"), count=500))
+        if keys:
+            self.client.delete(*keys)
+
+    def purge_expired(self):
+        pass  # Redis가 TTL로 직접 만료
+
+
+class SharedState:
+    """JSON 값을 다루는 공유 저장소 래퍼. 저장소 오류는 삼키고 기본값을 돌려줍니다."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._last_warning = 0.0
+
+    @classmethod
+    def from_env(cls) -> "SharedState":
+        url = os.getenv("SHARED_STATE_URL", "")
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            backend = RedisBackend(url)
+        else:
+            path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else (url or _default_sqlite_path())
+            backend = SqliteBackend(path)
+        print(f"🗄️ 공유 상태 저장소: {type(backend).__name__} ({url or getattr(backend, 'path', '')})")
+        return cls(backend)
+
+    def _warn(self, op: str, e: Exception):
+        now = time.time()
+        if now - self._last_warning > 30:
+            self._last_warning = now
+            print(f"⚠️ 공유 상태 저장소 {op} 실패 (무시하고 계속): {e}")
+
+    def get(self, ns: str, key: str, default: Any = None) -> Any:
+        try:
+            raw = self.backend.get(ns, key)
+        except Exception as e:
+            self._warn("get", e)
+            return default
+        return json.loads(raw) if raw is not None else default
+
+    def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            self.backend.set(ns, key, json.dumps(value, ensure_ascii=False), ttl)
+        except Exception as e:
+            self._warn("set", e)
+
+    def add(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> Optional[bool]:
+        """키가 없을 때만 저장. 성공 True, 이미 있으면 False, 저장소 오류면 None"""
+        try:
+            return self.backend.add(ns, key, json.dumps(value, ensure_ascii=False), ttl)
+        except Exception as e:
+            self._warn("add", e)
+            return None
+
+    def replace(self, ns: str, key: str, expected: Any, value: Any, ttl: Optional[float] = None) -> Optional[bool]:
+        """현재 값이 expected일 때만 value로 바꾸고 TTL을 다시 잽니다. (잠금 연장/인수용) 성공 True, 값이 다르면 False, 저장소 오류면 None"""
+        try:
+            return self.backend.replace(
+                ns, key, json.dumps(expected, ensure_ascii=False), json.dumps(value, ensure_ascii=False), ttl
+            )
+        except Exception as e:
+            self._warn("replace", e)
+            return None
+
+    def delete(self, ns: str, key: str, only_if: Any = None):
+        """only_if를 주면 현재 값이 그 값일 때만 지웁니다. (잠금 해제용)"""
+        try:
+            self.backend.delete(ns, key, None if only_if is None else json.dumps(only_if, ensure_ascii=False))
+        except Exception as e:
+            self._warn("delete", e)
+
+    def incr(self, ns: str, key: str) -> Optional[int]:
+        try:
+            return self.backend.incr(ns, key)
+        except Exception as e:
+            self._warn("incr", e)
+            return None
+
+    def items(self, ns: str) -> Dict[str, Any]:
+        try:
+            return {k: json.loads(v) for k, v in self.backend.items(ns)}
+        except Exception as e:
+            self._warn("items", e)
+            return {}
+
+    def clear(self, ns: str):
+        try:
+            self.backend.clear(ns)
+        except Exception as e:
+            self._warn("clear", e)
+
+    # -----------------------------------------------------------------
+    # 색인 세대 번호: 수집이 끝날 때마다 올려 답변/구조 캐시를 한 번에 무효화
+    # -----------------------------------------------------------------
+    def index_generation(self) -> int:
+        return int(self.get("meta", "index_generation", 0) or 0)
+
+    def bump_index_generation(self) -> Optional[int]:
+        return self.incr("meta", "index_generation")
+
+    # -----------------------------------------------------------------
+    # 페이지 → 답변 캐시 역색인: 페이지 하나가 바뀌면 그 페이지를 근거로 한 답변만 지움
+    # -----------------------------------------------------------------
+    def track_answer_pages(self, cache_key: str, page_ids: List[str], ttl: Optional[float] = None):
+        for page_id in set(page_ids):
+            self.set(f"answer_pages:{page_id}", cache_key, 1, ttl=ttl)
+
+    def invalidate_page_answers(self, page_id: str) -> int:
+        """page_id를 근거로 만든 캐시 답변을 지우고 지운 개수를 돌려줍니다."""
+        ns = f"answer_pages:{page_id}"
+        keys = list(self.items(ns))
+        for key in keys:
+            self.delete("answer", key)
+        self.clear(ns)
+        return len(keys)
+
+
+_shared_state: Optional[SharedState] = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """프로세스마다 처음 쓸 때 한 번만 연결합니다. (fork 이후 각 워커에서 생성)"""
+    global _shared_state
+    if _shared_state is None:
+        with _shared_state_lock:
+            if _shared_state is None:
+                _shared_state = SharedState.from_env()
+    return _shared_state
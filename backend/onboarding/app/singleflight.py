@@ -0,0 +1,109 @@
+"""
+단일 비행(single-flight) 요청 합치기 모듈
+- 같은 키(정규화한 질문, top_k, display_k, 인덱스)의 요청이 처리 중이면 새로 돌리지 않고 같은 결과를 기다림
+- 첫 요청(리더)의 작업은 별도 태스크로 돌려, 리더 클라이언트가 끊겨도 뒤따른 요청(팔로워)은 결과를 받음
+- 스트리밍 이벤트는 Flight에 쌓이며, 늦게 합류한 구독자도 처음부터 다시 받은 뒤 실시간으로 이어 받음
+- 작업이 끝나면 바로 잊음 (오래 두는 캐시가 아님, 같은 워커 프로세스 안에서만 합침)
+"""
+
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .metrics import SINGLEFLIGHT_TOTAL
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from metrics import SINGLEFLIGHT_TOTAL
+
+
+def normalize_query(query: str) -> str:
+    """공백/대소문자 차이만 있는 질문을 같은 키로 봅니다."""
+    return " ".join(query.split()).lower()
+
+
+def flight_key(*parts: Any) -> str:
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """처리 중인 작업 하나. 이벤트 로그 + 최종 결과/예외를 보관합니다. (이벤트 루프 스레드에서만 접근)"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.followers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Dict[str, Any]):
+        self.events.append(event)
+        self._wake()
+
+    def _wake(self):
+        # 기다리던 구독자를 모두 깨우고 다음 대기용 이벤트로 교체
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self) -> Any:
+        """최종 결과를 기다립니다. (이 대기자가 취소돼도 작업 자체는 계속됨)"""
+        await asyncio.shield(self.task)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """지금까지의 이벤트를 처음부터 내보낸 뒤, 끝날 때까지 새 이벤트를 이어서 내보냅니다."""
+        i = 0
+        while True:
+            if i < len(self.events):
+                yield self.events[i]
+                i += 1
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, Flight] = {}
+
+    def join(self, key: str, work: Callable[[Flight], Awaitable[Any]]) -> Tuple[Flight, bool]:
+        """
+        key로 처리 중인 작업이 있으면 거기에 합류하고, 없으면 work(flight)를 새 태스크로 시작합니다.
+        태스크는 현재 contextvar(요청 마감 시각 등)를 이어받습니다.
+
+        Returns:
+            (flight, 리더 여부)
+        """
+        flight = self._flights.get(key)
+        if flight is not None and not flight.done:
+            flight.followers += 1
+            SINGLEFLIGHT_TOTAL.labels(self.name, "follower").inc()
+            return flight, False
+
+        flight = Flight(key)
+        self._flights[key] = flight
+        flight.task = asyncio.create_task(self._run(flight, work))
+        SINGLEFLIGHT_TOTAL.labels(self.name, "leader").inc()
+        return flight, True
+
+    async def _run(self, flight: Flight, work: Callable[[Flight], Awaitable[Any]]):
+        try:
+            flight.result = await work(flight)
+        except BaseException as e:  # 예외는 대기자들에게 그대로 전달 (태스크 자체는 조용히 끝냄)
+            flight.error = e
+        finally:
+            flight.done = True
+            flight._wake()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def in_flight(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,367 @@
+"""
+색인 스냅샷 모듈 (Arrow/Parquet 열 기반 파일로 내보내기/가져오기)
+- export: PIT + search_after로 청크 인덱스 전체를 배치 단위로 읽어 파일에 바로 씀 (메모리에는 배치 하나만)
+- 형식은 확장자로 결정: .arrow/.feather = Arrow IPC 파일(기본, 메모리 맵으로 복사 없이 로드) / .parquet = zstd 압축(보관용)
+- embedding은 fixed_size_list<float16, 1024> (float32의 절반 크기, int8_hnsw 색인 정밀도보다 충분히 정밀)
+- import: 레코드 배치를 그대로 Bulk action으로 바꿔 parallel_bulk로 적재 (Confluence 수집/임베딩 서버 호출 없음)
+  적재 중에는 refresh를 꺼 두고 끝나면 원래 값으로 되돌림
+- 계층 필드(ancestor_*, depth, category_path)와 링크 그래프 필드(page_rank, neighbors)도 담아, 가져온 직후부터
+  문서 트리/카테고리/하위 트리 검색과 PageRank 가산점이 동작
+- 페이지 요약/표 행 인덱스는 담지 않으므로 가져올 때 content_hash를 비워 둠 → 다음 동기화가 페이지를 다시 색인하며 채움
+- load_snapshot / embedding_blocks: 분석이나 로컬 벡터 인덱스(faiss/qdrant 등) 시딩용으로 (N, 1024) float16 numpy 뷰 제공
+- pyarrow는 이 모듈을 쓸 때만 필요한 선택 의존성
+
+사용법:
+    python -m onboarding.app.snapshot export snapshot.arrow [--index confluence_docs]
+    python -m onboarding.app.snapshot import snapshot.arrow [--index confluence_docs]
+    python -m onboarding.app.snapshot info snapshot.arrow
+"""
+
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from elasticsearch import helpers
+
+try:
+    from .shared_state import get_shared_state
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from shared_state import get_shared_state
+
+EMBEDDING_DIMS = 1024
+SNAPSHOT_VERSION = "2"
+# 스냅샷에 담는 청크 필드 (embedding 제외, 순서대로 열이 됨)
+SNAPSHOT_FIELDS = [
+    "page_id", "chunk_id", "doc_id", "title", "content", "space", "url", "source",
+    "updated_at", "primary_contributor", "content_hash", "tags",
+    "ancestor_ids", "ancestor_titles", "depth", "category_path", "page_rank", "neighbors",
+]
+_LIST_FIELDS = ("tags", "ancestor_ids", "ancestor_titles", "category_path", "neighbors")
+_NUMBER_FIELDS = ("chunk_id", "depth", "page_rank")
+# 값이 없으면 문서에 넣지 않는 필드 (업로드 파일/링크 그래프 계산 전 문서 등)
+_OPTIONAL_FIELDS = ("ancestor_ids", "ancestor_titles", "depth", "category_path", "page_rank", "neighbors")
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("스냅샷 기능에는 pyarrow가 필요합니다. (pip install pyarrow)")
+    return pa
+
+
+def snapshot_schema(index: str = ""):
+    pa = _pyarrow()
+    return pa.schema(
+        [
+            ("_id", pa.string()),
+            ("page_id", pa.string()),
+            ("chunk_id", pa.int32()),
+            ("doc_id", pa.string()),
+            ("title", pa.string()),
+            ("content", pa.string()),
+            ("space", pa.string()),
+            ("url", pa.string()),
+            ("source", pa.string()),
+            ("updated_at", pa.string()),  # ES에 저장된 문자열 그대로 (다시 넣을 때 형식이 바뀌지 않게)
+            ("primary_contributor", pa.string()),
+            ("content_hash", pa.string()),
+            ("tags", pa.list_(pa.string())),
+            ("ancestor_ids", pa.list_(pa.string())),
+            ("ancestor_titles", pa.list_(pa.string())),
+            ("depth", pa.int32()),
+            ("category_path", pa.list_(pa.string())),
+            ("page_rank", pa.float64()),
+            ("neighbors", pa.list_(pa.string())),
+            ("has_embedding", pa.bool_()),  # False면 embedding 자리는 0 벡터
+            ("embedding", pa.list_(pa.float16(), EMBEDDING_DIMS)),
+        ],
+        metadata={
+            "snapshot_version": SNAPSHOT_VERSION,
+            "index": index,
+            "dims": str(EMBEDDING_DIMS),
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+        },
+    )
+
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+# =================================================================
+# 내보내기
+# =================================================================
+def _hits_to_batch(hits: List[Dict[str, Any]], schema):
+    pa = _pyarrow()
+    sources = [h["_source"] for h in hits]
+    vectors = np.zeros((len(hits), EMBEDDING_DIMS), dtype=np.float16)
+    has_embedding = []
+    for i, s in enumerate(sources):
+        vector = s.get("embedding")
+        ok = bool(vector) and len(vector) == EMBEDDING_DIMS
+        if ok:
+            vectors[i] = vector
+        has_embedding.append(ok)
+
+    columns = [pa.array([h["_id"] for h in hits], pa.string())]
+    for field in SNAPSHOT_FIELDS:
+        values = [s.get(field) for s in sources]
+        if field == "tags":
+            values = [v if isinstance(v, list) else ([] if v is None else [v]) for v in values]
+        elif field in _LIST_FIELDS:
+            values = [None if v is None else (v if isinstance(v, list) else [v]) for v in values]
+        elif field not in _NUMBER_FIELDS:
+            values = [None if v is None else str(v) for v in values]
+        columns.append(pa.array(values, schema.field(field).type))
+    columns.append(pa.array(has_embedding, pa.bool_()))
+    columns.append(pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), EMBEDDING_DIMS))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _open_writer(path: str, schema, parquet: bool):
+    pa = _pyarrow()
+    if parquet:
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    # Arrow IPC 파일은 압축하지 않음 (압축하면 메모리 맵 zero-copy 로드가 안 됨)
+    return pa.ipc.new_file(path, schema)
+
+
+def export_snapshot(
+    es_client,
+    index: str,
+    path: str,
+    batch_size: int = 1000,
+    keep_alive: str = "5m",
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    index의 청크 문서를 PIT + search_after로 끝까지 읽어 path에 씁니다.
+    중간에 실패하면 기존 파일은 그대로 두고 임시 파일만 지웁니다.
+    """
+    schema = snapshot_schema(index)
+    total = es_client.count(index=index)["count"]
+    tmp_path = f"{path}.tmp"
+    started = time.time()
+    written = 0
+
+    pit_id = es_client.open_point_in_time(index=index, keep_alive=keep_alive)["id"]
+    writer = _open_writer(tmp_path, schema, parquet=_is_parquet(path))
+    try:
+        search_after = None
+        while True:
+            body: Dict[str, Any] = {
+                "size": batch_size,
+                "pit": {"id": pit_id, "keep_alive": keep_alive},
+                "sort": [{"_shard_doc": "asc"}],
+                "_source": SNAPSHOT_FIELDS + ["embedding"],
+                "track_total_hits": False,
+            }
+            if search_after is not None:
+                body["search_after"] = search_after
+            res = es_client.search(body=body)
+            pit_id = res.get("pit_id", pit_id)  # ES가 PIT id를 갱신해 줄 수 있음
+            hits = res["hits"]["hits"]
+            if not hits:
+                break
+            writer.write_batch(_hits_to_batch(hits, schema))
+            written += len(hits)
+            search_after = hits[-1]["sort"]
+            if progress_callback:
+                progress_callback("export", written, total)
+        writer.close()
+        writer = None
+        os.replace(tmp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        try:
+            es_client.close_point_in_time(id=pit_id)
+        except Exception as e:
+            print(f"⚠️ PIT 닫기 실패 (만료되면 자동 정리): {e}")
+
+    elapsed = time.time() - started
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"📦 스냅샷 저장 완료: {index} → {path} ({written}개 청크, {size_mb:.1f}MB, {elapsed:.1f}초)")
+    return {"index": index, "path": path, "chunks": written, "bytes": os.path.getsize(path), "seconds": round(elapsed, 2)}
+
+
+# =================================================================
+# 불러오기 (분석/로컬 벡터 인덱스용)
+# =================================================================
+def load_snapshot(path: str):
+    """
+    스냅샷을 pyarrow.Table로 엽니다.
+    Arrow IPC 파일은 메모리 맵으로 열어 데이터를 복사하지 않습니다. (필요한 페이지만 OS가 읽음)
+    """
+    pa = _pyarrow()
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True)
+    source = pa.memory_map(path, "r")  # Table이 버퍼를 참조하는 동안 맵이 유지됨
+    return pa.ipc.open_file(source).read_all()
+
+
+def iter_snapshot_batches(path: str) -> Iterator[Any]:
+    """스냅샷을 레코드 배치 단위로 읽습니다. (전체를 메모리에 올리지 않음)"""
+    pa = _pyarrow()
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path, memory_map=True).iter_batches()
+        return
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    for i in range(reader.num_record_batches):
+        yield reader.get_batch(i)
+
+
+def _vector_view(column) -> np.ndarray:
+    """fixed_size_list<float16> 배열(청크 하나) → (N, dims) numpy 뷰 (Arrow IPC 메모리 맵이면 복사 없음)"""
+    dims = column.type.list_size
+    values = column.values.slice(column.offset * dims, len(column) * dims)
+    return values.to_numpy(zero_copy_only=False).reshape(-1, dims)
+
+
+def embedding_blocks(table) -> Iterator[Tuple[int, np.ndarray]]:
+    """(시작 행 번호, (N, 1024) float16 뷰)를 청크 단위로 내보냅니다. 로컬 벡터 인덱스에 그대로 add하면 됨"""
+    offset = 0
+    for chunk in table.column("embedding").chunks:
+        yield offset, _vector_view(chunk)
+        offset += len(chunk)
+
+
+def embedding_matrix(table) -> np.ndarray:
+    """전체 임베딩을 (N, 1024) 행렬로 (청크가 하나면 뷰, 여러 개면 한 번 복사해서 이어 붙임)"""
+    blocks = [block for _, block in embedding_blocks(table)]
+    if len(blocks) == 1:
+        return blocks[0]
+    return np.concatenate(blocks) if blocks else np.zeros((0, EMBEDDING_DIMS), dtype=np.float16)
+
+
+# =================================================================
+# 가져오기 (ES로 다시 적재)
+# =================================================================
+def _batch_actions(batch, index: str) -> Iterator[Dict[str, Any]]:
+    # 예전 버전 스냅샷에는 없는 열이 있을 수 있음
+    fields = [f for f in SNAPSHOT_FIELDS if f in batch.schema.names]
+    columns = {name: batch.column(name).to_pylist() for name in ["_id", "has_embedding"] + fields}
+    vectors = _vector_view(batch.column("embedding")).astype(np.float32)
+    for i in range(batch.num_rows):
+        source = {
+            field: columns[field][i] for field in fields
+            if not (field in _OPTIONAL_FIELDS and columns[field][i] is None)
+        }
+        # 페이지 요약/표 행 인덱스는 스냅샷에 없으므로 해시를 비워 다음 동기화 때 다시 색인되게 함
+        source["content_hash"] = None
+        if columns["has_embedding"][i]:
+            source["embedding"] = vectors[i].tolist()
+        yield {"_index": index, "_id": columns["_id"][i], "_source": source}
+
+
+def import_snapshot(
+    manager,
+    path: str,
+    thread_count: int = 4,
+    chunk_size: int = 500,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    스냅샷을 manager.index_name 인덱스에 적재합니다. (같은 _id는 덮어씀)
+    임베딩을 다시 계산하지 않으므로 수집보다 훨씬 빠르고, 적재가 끝나면 답변 캐시 세대를 올립니다.
+    청크 검색, 계층(트리/카테고리/하위 트리 검색), PageRank 가산점은 바로 동작합니다.
+    페이지 요약/표 행 인덱스는 스냅샷에 없어 content_hash를 비워 적재하므로, 다음 동기화(강제 아님)가
+    모든 페이지를 다시 색인하며 채웁니다. 그 전까지 2단계 검색, 표 행 검색, 연결 문서는 꺼져 있습니다.
+    """
+    manager.ensure_collection_exists()
+    es = manager.es_client
+    index = manager.index_name
+    total = snapshot_info(path)["rows"]
+    started = time.time()
+
+    settings = es.indices.get_settings(index=index, name="index.refresh_interval")
+    refresh_interval = settings.get(index, {}).get("settings", {}).get("index", {}).get("refresh_interval")
+    es.indices.put_settings(index=index, settings={"index": {"refresh_interval": "-1"}})
+
+    counts = {"ok": 0, "failed": 0}
+
+    def actions() -> Iterator[Dict[str, Any]]:
+        for batch in iter_snapshot_batches(path):
+            yield from _batch_actions(batch, index)
+
+    try:
+        results = helpers.parallel_bulk(
+            es, actions(), thread_count=thread_count, chunk_size=chunk_size, raise_on_error=False
+        )
+        for ok, item in results:
+            counts["ok" if ok else "failed"] += 1
+            done = counts["ok"] + counts["failed"]
+            if progress_callback and done % chunk_size == 0:
+                progress_callback("import", done, total)
+    finally:
+        es.indices.put_settings(index=index, settings={"index": {"refresh_interval": refresh_interval}})
+        es.indices.refresh(index=index)
+
+    if progress_callback:
+        progress_callback("import", counts["ok"] + counts["failed"], total)
+    get_shared_state().bump_index_generation()
+    elapsed = time.time() - started
+    print(f"📥 스냅샷 적재 완료: {path} → {index} ({counts['ok']}개 성공, {counts['failed']}개 실패, {elapsed:.1f}초)")
+    return {"index": index, "path": path, "indexed": counts["ok"], "failed": counts["failed"], "seconds": round(elapsed, 2)}
+
+
+def snapshot_info(path: str) -> Dict[str, Any]:
+    pa = _pyarrow()
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        meta = pq.ParquetFile(path)
+        schema, rows = meta.schema_arrow, meta.metadata.num_rows
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        schema = reader.schema
+        rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    metadata = {k.decode(): v.decode() for k, v in (schema.metadata or {}).items()}
+    return {"path": path, "rows": rows, "bytes": os.path.getsize(path), **metadata}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from dotenv import load_dotenv
+
+    try:
+        from .embedding import EmbeddingManager
+    except ImportError:  # 스크립트로 직접 실행하는 경우
+        from embedding import EmbeddingManager
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="청크 인덱스 스냅샷 (Arrow/Parquet)")
+    parser.add_argument("command", choices=["export", "import", "info"])
+    parser.add_argument("path", help=".arrow/.feather(기본, zero-copy) 또는 .parquet")
+    parser.add_argument("--index", default=os.getenv("ES_INDEX_NAME", "confluence_docs"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(snapshot_info(args.path), ensure_ascii=False, indent=2))
+    else:
+        manager = EmbeddingManager(
+            embedding_api_url=os.getenv("EMBEDDING_API_URL"),
+            elasticsearch_url=os.getenv("ELASTICSEARCH_URL"),
+            elasticsearch_user=os.getenv("ELASTICSEARCH_USER"),
+            elasticsearch_password=os.getenv("ELASTICSEARCH_PASSWORD"),
+            index_name=args.index,
+        )
+        progress = lambda stage, done, total: print(f"  ⏳ {stage} {done}/{total}", end="\r")
+        if args.command == "export":
+            result = export_snapshot(manager.es_client, args.index, args.path, args.batch_size, progress_callback=progress)
+        else:
+            result = import_snapshot(manager, args.path, thread_count=args.threads, progress_callback=progress)
+        print(json.dumps(result, ensure_ascii=False))
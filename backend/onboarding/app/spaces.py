@@ -0,0 +1,156 @@
+"""
+스페이스 레지스트리 모듈 (스페이스별 인덱스 + 주기 동기화)
+- CONFLUENCE_SPACES="HR:360,DEV:30,SALES" 처럼 스페이스마다 인덱스를 따로 두고 따로 재색인
+  (형식: 키[=인덱스][:동기화 주기(분)], 인덱스 기본값은 {ES_INDEX_NAME}_{키 소문자}, 주기 0/생략은 수동)
+- CONFLUENCE_SPACES가 없으면 예전처럼 CONFLUENCE_SPACE_KEY 하나가 ES_INDEX_NAME을 씀
+- 업로드 파일(UPLOAD)은 항상 ES_INDEX_NAME에 색인
+- ChatRequest.collection_name(스페이스 키/인덱스 이름, 쉼표로 여러 개)을 검색할 인덱스 목록으로 바꿔 줌
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    from .shared_state import SharedState, get_shared_state
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from shared_state import SharedState, get_shared_state
+
+UPLOAD_SPACE = "UPLOAD"
+ALL_COLLECTIONS = ("", "*", "all")
+
+
+def parse_spaces(raw: str, base_index: str) -> List[Dict[str, Any]]:
+    """ "HR:360,DEV=dev_docs:30,SALES" → [{"space", "index", "sync_minutes"}, ...] """
+    spaces = []
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        head, _, minutes = part.partition(":")
+        key, _, index = head.partition("=")
+        key = key.strip()
+        spaces.append({
+            "space": key,
+            "index": index.strip() or f"{base_index}_{key.lower()}",
+            "sync_minutes": float(minutes or 0),
+        })
+    return spaces
+
+
+class SpaceRegistry:
+    def __init__(
+        self,
+        base_index: str,
+        spaces: List[Dict[str, Any]],
+        shared: Optional[SharedState] = None,
+        strict: bool = False
+    ):
+        self.base_index = base_index
+        self.shared = shared
+        # strict면 등록된 스페이스만 색인 (아니면 예전처럼 모르는 스페이스도 기본 인덱스에)
+        self.strict = strict
+        self._spaces: Dict[str, Dict[str, Any]] = {s["space"].upper(): s for s in spaces}
+        self._spaces.setdefault(UPLOAD_SPACE, {"space": UPLOAD_SPACE, "index": base_index, "sync_minutes": 0.0})
+        self._managers: Dict[str, Any] = {}
+        self._base_manager = None
+
+    @classmethod
+    def from_env(cls) -> "SpaceRegistry":
+        base_index = os.getenv("ES_INDEX_NAME", "confluence_docs")
+        raw = os.getenv("CONFLUENCE_SPACES", "")
+        if raw.strip():
+            return cls(base_index, parse_spaces(raw, base_index), shared=get_shared_state(), strict=True)
+        # 예전 단일 인덱스 구성
+        key = os.getenv("CONFLUENCE_SPACE_KEY", "")
+        spaces = [{
+            "space": key, "index": base_index, "sync_minutes": float(os.getenv("SPACE_SYNC_MINUTES", "0"))
+        }] if key else []
+        return cls(base_index, spaces, shared=get_shared_state())
+
+    # -----------------------------------------------------------------
+    # 조회
+    # -----------------------------------------------------------------
+    def get(self, space_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        return self._spaces.get((space_key or "").upper())
+
+    def space_keys(self, include_upload: bool = False) -> List[str]:
+        return [s["space"] for s in self._spaces.values() if include_upload or s["space"] != UPLOAD_SPACE]
+
+    def indices(self) -> List[str]:
+        """등록된 인덱스 (중복 제거, 등록 순서)"""
+        return list(dict.fromkeys(s["index"] for s in self._spaces.values()))
+
+    def resolve(self, collection: Optional[str]) -> List[str]:
+        """
+        ChatRequest.collection_name → 검색할 인덱스 목록
+        - 비었거나 "*"/"all"이면 등록된 전체
+        - 스페이스 키(대소문자 무시) 또는 인덱스 이름, 쉼표로 여러 개
+        - 하나도 못 찾으면 전체 (등록 안 된 스페이스 키 호환)
+        - 기본 인덱스 이름(예전 기본값 "confluence_docs")이 업로드 전용이면 전체 (업로드만은 "UPLOAD"로)
+        """
+        names = [n.strip() for n in (collection or "").split(",") if n.strip()]
+        if not names or any(n.lower() in ALL_COLLECTIONS for n in names):
+            return self.indices()
+        upload_only = all(
+            s["index"] != self.base_index for key, s in self._spaces.items() if key != UPLOAD_SPACE
+        )
+        if upload_only and self.base_index in names:
+            return self.indices()
+        known = set(self.indices())
+        selected = []
+        for name in names:
+            space = self.get(name)
+            index = space["index"] if space else (name if name in known else None)
+            if index and index not in selected:
+                selected.append(index)
+        return selected or self.indices()
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """스페이스별 설정 + 마지막 동기화 정보 (관리 API용)"""
+        rows = []
+        for s in self._spaces.values():
+            last = self.shared.get("space_sync", s["space"]) if self.shared else None
+            rows.append({**s, "last_sync": last})
+        return rows
+
+    # -----------------------------------------------------------------
+    # 스페이스별 EmbeddingManager (클라이언트는 공유, 인덱스만 다름)
+    # -----------------------------------------------------------------
+    def bind(self, base_manager):
+        self._base_manager = base_manager
+        self._managers = {index: base_manager.for_index(index) for index in self.indices()}
+
+    def manager_for(self, space_key: Optional[str]):
+        """스페이스의 매니저. 등록되지 않은 스페이스면 strict일 때 None, 아니면 기본 인덱스 매니저"""
+        if self._base_manager is None:
+            return None
+        space = self.get(space_key)
+        if space is None:
+            return None if self.strict else self._managers[self.base_index]
+        return self._managers[space["index"]]
+
+    def managers(self) -> List[Any]:
+        return list(self._managers.values())
+
+    # -----------------------------------------------------------------
+    # 주기 동기화
+    # -----------------------------------------------------------------
+    def claim_due_spaces(self, now: Optional[float] = None) -> List[str]:
+        """
+        동기화 주기가 지난 스페이스를 골라 돌려줍니다.
+        여러 워커가 동시에 확인해도 주기마다 한 워커만 가져가도록 공유 상태에 표시합니다.
+        """
+        now = now or time.time()
+        due = []
+        for s in self._spaces.values():
+            interval = s["sync_minutes"] * 60
+            if interval <= 0 or self.shared is None:
+                continue
+            last = self.shared.get("space_sync", s["space"]) or {}
+            if now - last.get("finished_at", 0) < interval:
+                continue
+            if self.shared.add("once", f"scheduled_sync:{s['space']}", os.getpid(), ttl=interval) is False:
+                continue
+            due.append(s["space"])
+        return due
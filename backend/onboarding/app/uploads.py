@@ -0,0 +1,272 @@
+"""
+업로드 파일 스풀링 + 텍스트 추출 모듈
+- 업로드 본문을 일정 크기(UPLOAD_SPOOL_BYTES)까지만 메모리에 두고, 넘으면 임시 파일로 흘려 씀
+- 받는 동안 SHA-256을 함께 계산 (내용이 같은 파일을 다시 올리면 추출/임베딩을 건너뜀)
+- 텍스트(txt/md/csv)는 줄 묶음 단위, PDF는 페이지 단위, XLSX는 시트 단위, DOCX는 문단 단위로 읽어 파일 전체를 메모리에 올리지 않음
+- 여러 파일은 프로세스 풀(INGEST_PARSE_WORKERS)에서 병렬 추출
+- 추출한 섹션은 파일별 임시 JSONL(섹션 한 줄)로 흘려 쓰고, 색인할 때 한 섹션씩 다시 읽음 (본문 전체를 IPC/메모리에 싣지 않음)
+
+이 모듈은 워커 프로세스에서도 임포트되므로 무거운 의존성(ES, LangChain 등)을 가져오지 않습니다.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".csv", ".pdf", ".xlsx", ".docx")
+
+_READ_CHUNK = 1024 * 1024
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# 추출 결과: (파일 순번, 섹션 스풀 파일 경로 또는 None, 섹션 수, 오류 메시지 또는 None)
+ExtractResult = Tuple[int, Optional[str], int, Optional[str]]
+
+
+class UploadTooLarge(Exception):
+    """UPLOAD_MAX_BYTES를 넘는 업로드"""
+
+
+class SpooledUpload:
+    """
+    요청이 끝난 뒤에도 작업 스레드가 읽을 수 있도록 보관한 업로드 파일.
+    작은 파일은 bytes(data)로, 큰 파일은 임시 파일 경로(path)로 들고 있습니다.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.size = 0
+        self.sha256 = ""
+        self.data: Optional[bytes] = None
+        self.path: Optional[str] = None
+
+    @classmethod
+    async def from_upload(
+        cls,
+        upload,
+        max_memory: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        tmp_dir: Optional[str] = None
+    ) -> "SpooledUpload":
+        """
+        FastAPI UploadFile을 조각 단위로 읽어 스풀링합니다.
+
+        Raises:
+            UploadTooLarge: max_bytes 초과 (이미 쓴 임시 파일은 지움)
+        """
+        max_memory = max_memory if max_memory is not None else int(os.getenv("UPLOAD_SPOOL_BYTES", str(2 * 1024 * 1024)))
+        max_bytes = max_bytes if max_bytes is not None else int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+        tmp_dir = tmp_dir or os.getenv("UPLOAD_TMP_DIR") or None
+
+        spooled = cls(upload.filename or "untitled")
+        digest = hashlib.sha256()
+        buffer = io.BytesIO()
+        out = None
+        try:
+            while True:
+                block = await upload.read(_READ_CHUNK)
+                if not block:
+                    break
+                spooled.size += len(block)
+                if spooled.size > max_bytes:
+                    raise UploadTooLarge(f"{spooled.filename}: 파일이 너무 큽니다. (최대 {max_bytes // (1024 * 1024)}MB)")
+                digest.update(block)
+                if out is None and buffer.tell() + len(block) > max_memory:
+                    # 메모리 한도를 넘으면 지금까지 받은 내용과 함께 임시 파일로 전환
+                    suffix = os.path.splitext(spooled.filename)[1].lower()
+                    out = tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix, dir=tmp_dir, delete=False)
+                    spooled.path = out.name
+                    out.write(buffer.getvalue())
+                    buffer = io.BytesIO()
+                (out or buffer).write(block)
+        except BaseException:
+            if out is not None:
+                out.close()
+            spooled.cleanup()
+            raise
+        if out is not None:
+            out.close()
+        else:
+            spooled.data = buffer.getvalue()
+        spooled.sha256 = digest.hexdigest()
+        return spooled
+
+    @property
+    def source(self) -> Union[str, bytes]:
+        """추출 함수에 넘길 원본 (임시 파일 경로 또는 bytes)"""
+        return self.path if self.path else (self.data or b"")
+
+    def cleanup(self):
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self.data = None
+
+
+# =================================================================
+# 형식별 추출 (섹션 단위 제너레이터)
+# =================================================================
+def _open_source(source: Union[str, bytes]):
+    return open(source, "rb") if isinstance(source, str) else io.BytesIO(source)
+
+
+def _iter_text(source: Union[str, bytes], section_chars: int = 256 * 1024) -> Iterator[str]:
+    """줄 단위로 읽어 section_chars 정도씩 묶어 내보냅니다. (아주 긴 한 줄도 section_chars에서 자름)"""
+    with _open_source(source) as fp:
+        text = io.TextIOWrapper(fp, encoding="utf-8", errors="replace", newline="")
+        lines: List[str] = []
+        size = 0
+        while True:
+            line = text.readline(section_chars)
+            if not line:
+                break
+            lines.append(line)
+            size += len(line)
+            if size >= section_chars:
+                yield "".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield "".join(lines)
+
+
+def _iter_pdf_pages(source: Union[str, bytes]) -> Iterator[str]:
+    from pypdf import PdfReader
+
+    with _open_source(source) as fp:
+        reader = PdfReader(fp)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+def _iter_xlsx_sheets(source: Union[str, bytes]) -> Iterator[str]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source if isinstance(source, str) else io.BytesIO(source), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            lines = [f"# {sheet.title}"]
+            for row in sheet.iter_rows(values_only=True):
+                cells = [str(c) for c in row if c is not None and str(c).strip()]
+                if cells:
+                    lines.append(" | ".join(cells))
+            yield "\n".join(lines)
+    finally:
+        workbook.close()
+
+
+def _iter_docx_paragraphs(source: Union[str, bytes], paragraphs_per_section: int = 200) -> Iterator[str]:
+    """word/document.xml을 스트리밍 파싱해 문단(표 셀 포함) 텍스트를 모읍니다. (python-docx 불필요)"""
+    with zipfile.ZipFile(_open_source(source)) as archive:
+        with archive.open("word/document.xml") as xml:
+            lines: List[str] = []
+            for _, elem in ElementTree.iterparse(xml, events=("end",)):
+                if elem.tag != f"{_DOCX_NS}p":
+                    continue
+                text = "".join(t.text or "" for t in elem.iter(f"{_DOCX_NS}t")).strip()
+                elem.clear()
+                if text:
+                    lines.append(text)
+                if len(lines) >= paragraphs_per_section:
+                    yield "\n".join(lines)
+                    lines = []
+            if lines:
+                yield "\n".join(lines)
+
+
+def iter_file_sections(filename: str, source: Union[str, bytes]) -> Iterator[str]:
+    """파일 확장자에 맞게 본문을 섹션(페이지/시트/문단 묶음) 단위로 내보냅니다."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".txt", ".md", ".csv"):
+        return _iter_text(source)
+    if ext == ".pdf":
+        return _iter_pdf_pages(source)
+    if ext == ".xlsx":
+        return _iter_xlsx_sheets(source)
+    if ext == ".docx":
+        return _iter_docx_paragraphs(source)
+    raise ValueError(f"지원하지 않는 파일 형식입니다: {ext or filename}")
+
+
+# =================================================================
+# 섹션 스풀 파일 (섹션 하나 = JSON 문자열 한 줄)
+# =================================================================
+def iter_spooled_sections(path: str) -> Iterator[str]:
+    """스풀 파일의 섹션을 한 줄씩 읽어 돌려줍니다."""
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            yield json.loads(line)
+
+
+def remove_spool(path: Optional[str]):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _extract_one(index: int, filename: str, source: Union[str, bytes], tmp_dir: Optional[str] = None) -> ExtractResult:
+    """섹션을 하나씩 스풀 파일에 씁니다. 실패하면 스풀 파일을 지우고 오류만 돌려줍니다."""
+    out = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", prefix="extract-", suffix=".jsonl", dir=tmp_dir, delete=False
+    )
+    count = 0
+    try:
+        with out:
+            for section in iter_file_sections(filename, source):
+                if section.strip():
+                    out.write(json.dumps(section, ensure_ascii=False) + "\n")
+                    count += 1
+    except ValueError as e:
+        remove_spool(out.name)
+        return index, None, 0, str(e)
+    except Exception as e:  # 손상된 PDF/ZIP 등
+        remove_spool(out.name)
+        return index, None, 0, f"{type(e).__name__}: {e}"
+    return index, out.name, count, None
+
+
+def iter_extracted(uploads: List[SpooledUpload], workers: int = 0) -> Iterator[ExtractResult]:
+    """
+    업로드 파일들의 섹션을 스풀 파일로 추출해 끝나는 대로 (순번, 스풀 경로, 섹션 수, 오류)를 내보냅니다.
+    workers가 2 이상이고 파일이 여러 개면 프로세스 풀에서 병렬로 처리합니다.
+    받은 스풀 파일은 소비 쪽이 remove_spool로 지웁니다. 소비 쪽에서 중단(예: 작업 취소)하면
+    아직 시작하지 않은 추출은 취소되고, 끝났지만 넘겨주지 못한 스풀 파일은 여기서 지웁니다.
+    """
+    tmp_dir = os.getenv("UPLOAD_TMP_DIR") or None
+    if workers <= 1 or len(uploads) <= 1:
+        for i, upload in enumerate(uploads):
+            yield _extract_one(i, upload.filename, upload.source, tmp_dir)
+        return
+
+    # 수집 스레드/ES 클라이언트가 떠 있는 프로세스에서 fork하지 않도록 spawn 사용
+    ctx = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(uploads)), mp_context=ctx)
+    pending: set = set()
+    try:
+        # 큰 파일부터 배분 (LPT)
+        order = sorted(range(len(uploads)), key=lambda i: uploads[i].size, reverse=True)
+        futures = [pool.submit(_extract_one, i, uploads[i].filename, uploads[i].source, tmp_dir) for i in order]
+        pending.update(futures)
+        for future in as_completed(futures):
+            pending.discard(future)
+            yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in pending:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                remove_spool(future.result()[1])
+
+
+def describe(upload: SpooledUpload) -> Dict[str, Any]:
+    """작업 파라미터/결과에 남길 업로드 요약"""
+    return {"filename": upload.filename, "size": upload.size, "sha256": upload.sha256}
@@ -0,0 +1,172 @@
+"""
+Confluence 웹훅 수신 + 페이지 단위 디바운스 모듈
+- page_created/updated/restored/moved → 그 페이지만 다시 수집 (fetch → parse → embed → upsert)
+- page_removed/trashed → 그 페이지 청크만 삭제 (delete_page_vectors)
+- 같은 페이지 이벤트가 연달아 오면 WEBHOOK_DEBOUNCE_SECONDS 동안 조용해질 때까지 모았다가 한 번만 처리
+  (계속 편집 중이어도 첫 이벤트 후 WEBHOOK_MAX_DELAY_SECONDS 안에는 처리)
+- 대기 중인 이벤트는 공유 상태에 두어, 여러 워커로 나뉘어 들어온 같은 페이지 이벤트도 마지막 워커 하나만 처리
+- WEBHOOK_SECRET의 X-Hub-Signature(sha256=HMAC) 또는 X-Webhook-Token 헤더를 확인
+  (WEBHOOK_SECRET이 없으면 모두 거절, 서명 없이 받으려면 WEBHOOK_ALLOW_UNSIGNED=true를 명시)
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from .shared_state import SharedState, get_shared_state
+    from .metrics import WEBHOOK_EVENTS_TOTAL
+except ImportError:  # 스크립트로 직접 실행하는 경우
+    from shared_state import SharedState, get_shared_state
+    from metrics import WEBHOOK_EVENTS_TOTAL
+
+
+# 이벤트 이름 → (처리, 부모 페이지의 하위 목록이 바뀌는지, 새 페이지인지)
+EVENT_ACTIONS = {
+    "page_created": ("upsert", True, True),
+    "page_restored": ("upsert", True, True),
+    "page_updated": ("upsert", False, False),
+    "page_moved": ("upsert", True, False),
+    "page_removed": ("delete", False, False),
+    "page_trashed": ("delete", False, False),
+}
+
+# 작업을 못 넣은 이벤트(작업 대기열 가득 참/같은 페이지 작업 실행 중)를 포기하기까지의 시간(초)
+MAX_PENDING_SECONDS = 3600
+
+
+def verify_signature(
+    secret: Optional[str], body: bytes, signature: Optional[str], token: Optional[str], allow_unsigned: bool = False
+) -> bool:
+    """
+    공유 토큰 또는 본문 HMAC-SHA256 서명이 맞아야 합니다.
+    secret이 없으면 allow_unsigned(WEBHOOK_ALLOW_UNSIGNED)를 명시한 경우에만 통과합니다.
+    """
+    if not secret:
+        return allow_unsigned
+    if token and hmac.compare_digest(token, secret):
+        return True
+    if signature:
+        algo, _, digest = signature.partition("=")
+        expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return algo.lower() == "sha256" and hmac.compare_digest(digest, expected)
+    return False
+
+
+def parse_event(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Confluence 웹훅 본문에서 필요한 값만 뽑습니다. 페이지 이벤트가 아니면 None
+
+    Returns:
+        {"event", "page_id", "space", "action", "relink", "new_page"}
+    """
+    event = payload.get("event") or payload.get("webhookEvent") or ""
+    if event not in EVENT_ACTIONS:
+        return None
+    page = payload.get("page") or payload.get("content") or {}
+    if not page.get("id"):
+        return None
+    space = page.get("spaceKey") or (page.get("space") or {}).get("key") or ""
+    action, relink, new_page = EVENT_ACTIONS[event]
+    return {
+        "event": event, "page_id": str(page["id"]), "space": space,
+        "action": action, "relink": relink, "new_page": new_page,
+    }
+
+
+class PageDebouncer:
+    """
+    페이지별로 마지막 이벤트만 남기고, 조용해지면 dispatch(page_id, entry)를 부릅니다. (이벤트 루프에서 사용)
+    dispatch가 False를 돌려주면(작업을 못 넣음) 잠시 뒤 다시 시도합니다.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[str, Dict[str, Any]], bool],
+        delay: float = 10.0,
+        max_delay: float = 60.0,
+        shared: Optional[SharedState] = None
+    ):
+        self.dispatch = dispatch
+        self.delay = max(0.0, delay)
+        self.max_delay = max(self.delay, max_delay)
+        self.shared = shared
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._local: Dict[str, Dict[str, Any]] = {}  # 공유 저장소가 안 될 때를 위한 사본
+
+    @classmethod
+    def from_env(cls, dispatch: Callable[[str, Dict[str, Any]], bool]) -> "PageDebouncer":
+        return cls(
+            dispatch,
+            delay=float(os.getenv("WEBHOOK_DEBOUNCE_SECONDS", "10")),
+            max_delay=float(os.getenv("WEBHOOK_MAX_DELAY_SECONDS", "60")),
+            shared=get_shared_state(),
+        )
+
+    def push(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """이벤트를 대기열에 합치고 타이머를 다시 겁니다."""
+        page_id = event["page_id"]
+        now = time.time()
+        prev = self.shared.get("webhook", page_id) if self.shared else None
+        prev = prev or self._local.get(page_id)
+        entry = {
+            "page_id": page_id,
+            "space": event["space"] or (prev or {}).get("space", ""),
+            "action": event["action"],  # 마지막 이벤트 기준 (삭제 후 복원이면 재색인)
+            "relink": event["relink"] or bool(prev and prev["relink"]),
+            "new_page": event["new_page"] or bool(prev and prev["new_page"]),
+            "events": (prev["events"] if prev else 0) + 1,
+            "first": prev["first"] if prev else now,
+            "token": uuid.uuid4().hex,
+        }
+        self._local[page_id] = entry
+        if self.shared:
+            self.shared.set("webhook", page_id, entry, ttl=MAX_PENDING_SECONDS)
+
+        due_in = max(0.0, min(self.delay, entry["first"] + self.max_delay - now))
+        self._schedule(page_id, entry["token"], due_in)
+        return {"page_id": page_id, "action": entry["action"], "events": entry["events"], "due_in": round(due_in, 1)}
+
+    def pending(self) -> int:
+        return len(self._timers)
+
+    def cancel_all(self):
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+
+    def _schedule(self, page_id: str, token: str, delay: float):
+        handle = self._timers.pop(page_id, None)
+        if handle:
+            handle.cancel()
+        self._timers[page_id] = asyncio.get_running_loop().call_later(delay, self._fire, page_id, token)
+
+    def _fire(self, page_id: str, token: str):
+        self._timers.pop(page_id, None)
+        local = self._local.get(page_id)
+        entry = self.shared.get("webhook", page_id) if self.shared else None
+        if entry is None and local and local["token"] == token:
+            entry = local  # 공유 저장소 오류/만료 → 이 워커가 받은 사본으로 처리
+        if not entry or entry["token"] != token:
+            # 이후 이벤트(다른 워커 포함)가 타이머를 새로 걸었으므로 그쪽이 처리
+            if local and local["token"] == token:
+                del self._local[page_id]
+            return
+
+        if self.dispatch(page_id, entry):
+            WEBHOOK_EVENTS_TOTAL.labels("dispatched").inc()
+        elif time.time() - entry["first"] < MAX_PENDING_SECONDS:
+            WEBHOOK_EVENTS_TOTAL.labels("retried").inc()
+            self._schedule(page_id, token, max(self.delay, 1.0))
+            return
+        else:
+            WEBHOOK_EVENTS_TOTAL.labels("dropped").inc()
+            print(f"⚠️ [Webhook] 페이지 {page_id} 처리를 {MAX_PENDING_SECONDS}초 동안 못 넣어 포기합니다.")
+
+        self._local.pop(page_id, None)
+        if self.shared:
+            self.shared.delete("webhook", page_id, only_if=entry)
@@ -3,24 +3,32 @@ Confluence 챗봇 FastAPI 백엔드 서버 (Child App)
 - Elasticsearch 버전으로 완전 교체
 """
 import os
+import hmac
 import json
 import asyncio
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, HTTPException, APIRouter, UploadFile, File
+from fastapi import FastAPI, HTTPException, APIRouter, UploadFile, File, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-# from pypdf import PdfReader # 안 쓰면 주석 처리
-
-# ✅ 데이터 가공을 위해 pandas 필수
-import pandas as pd 
 
 # 내부 모듈 임포트
-from .app.chatbot import ConfluenceChatbot
-from .app.embedding import EmbeddingManager
-from .app.confluence_api import ConfluenceClient
+# ⚡ pandas/langchain/elasticsearch/bs4를 끌어오는 모듈(chatbot, embedding, confluence_api, ingest)은
+#    서버가 뜬 뒤 백그라운드 준비 작업이나 처음 쓰는 곳에서 임포트합니다.
+from .app.request_log import slow_query_log
+from .app.jobs import JobManager, JobConflict, JobQueueFull
+from .app.shared_state import get_shared_state
+from .app.metrics import record_cache, WEBHOOK_EVENTS_TOTAL
+from .app.uploads import SpooledUpload, UploadTooLarge, describe
+from .app.admission import AdmissionController, Overloaded, deadline_scope
+from .app.singleflight import Flight, SingleFlight, flight_key, normalize_query
+from .app.webhooks import PageDebouncer, parse_event, verify_signature
+from .app.spaces import SpaceRegistry, UPLOAD_SPACE
+from .app.sessions import SessionStore
+from .app.hierarchy import build_tree, categories, filter_pages, page_levels
 # from .app.parser import parse_storage_html # 필요시 주석 해제
 
 # .env 로드 (안전장치)
@@ -48,6 +56,18 @@ app.add_middleware(
 confluence_client = None
 embedding_manager = None
 chatbot = None
+# 🧰 수집 작업은 요청 핸들러/이벤트 루프가 아닌 작업 관리자의 워커 스레드에서 실행
+job_manager = JobManager.from_env()
+# 🚦 /chat 동시 처리 수/대기열/사용자별 한도 (넘치면 바로 429/503)
+chat_admission = AdmissionController.from_env()
+# /chat 한 건의 전체 마감 시간(초). 대기열 대기 + 임베딩/ES/LLM 호출이 모두 이 안에 끝나야 함
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "45"))
+# 🛫 같은 질문이 동시에 몰리면 한 번만 처리하고 결과/스트림을 나눠 줌
+chat_flights = SingleFlight("chat")
+# 🗂️ 스페이스별 인덱스 (CONFLUENCE_SPACES가 없으면 ES_INDEX_NAME 하나)
+space_registry = SpaceRegistry.from_env()
+# 💬 멀티턴 세션 (직전 검색 결과 + 짧은 대화 요약, TTL/LRU로 정리)
+session_store = SessionStore.from_env()
 
 # --- 데이터 모델 ---
 class SystemStatus(BaseModel):
@@ -60,53 +80,167 @@ class ChatRequest(BaseModel):
     query: str
     top_k: int = 5
     display_k: int = 3
-    collection_name: Optional[str] = "confluence_docs"
+    collection_name: Optional[str] = None  # 없으면 등록된 전체 인덱스
+    session_id: Optional[str] = None     # 주면 멀티턴 세션으로 처리 (없는 id면 그 id로 새 세션)
+    subtree: Optional[str] = None        # page_id: 이 페이지와 하위 페이지에서만 검색
+
+class CategoryFilterRequest(BaseModel):
+    space_key: Optional[str] = None      # 비우면 CONFLUENCE_SPACE_KEY
+    filters: Dict[str, str] = {}         # {"level_1": "인사", "level_2": "휴가"}
+
+class SyncRequest(BaseModel):
+    space_key: Optional[str] = None      # 비우면 CONFLUENCE_SPACE_KEY
+    root_title: Optional[str] = None     # 지정하면 이 페이지 아래 트리만 수집
+    force_update: bool = False
 
 
 # --- 시작 이벤트 ---
-# --- 시작 이벤트 ---
-@app.on_event("startup")
-async def startup_event():
+# 기본(background)은 무거운 모듈 임포트와 ES/임베딩/LLM 연결을 백그라운드에서 준비하고
+# 서버는 바로 요청을 받습니다. (준비 상태는 /ready, 프로세스 생존은 /live)
+# STARTUP_MODE=blocking이면 예전처럼 준비가 끝난 뒤에 요청을 받습니다.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+# 준비 중에 들어온 요청이 준비 완료를 기다려 줄 최대 시간(초)
+READY_WAIT_SECONDS = float(os.getenv("READY_WAIT_SECONDS", "5"))
+
+# 스페이스별 주기 동기화 확인 간격(초)
+SPACE_SYNC_CHECK_SECONDS = float(os.getenv("SPACE_SYNC_CHECK_SECONDS", "60"))
+
+readiness = {"state": "starting", "checks": {}, "error": None, "attempts": 0, "ready_at": None}
+_warmup_task: Optional[asyncio.Task] = None
+_space_sync_task: Optional[asyncio.Task] = None
+_ready_event: Optional[asyncio.Event] = None
+
+
+def _init_clients():
+    """
+    (스레드에서 실행) 무거운 모듈을 임포트하고 ES/임베딩/LLM 클라이언트를 준비합니다.
+    하나라도 실패하면 예외를 던지고, _warmup_loop가 잠시 뒤 다시 시도합니다.
+    """
     global embedding_manager, chatbot
-    print("\n" + "="*50)
-    print("📢 [ONBOARDING APP] 하위 앱 실행됨 (Elasticsearch + GPT Version)")
-    print("="*50 + "\n")
+    checks = readiness["checks"]
+
+    # 🌟 1. 사내 임베딩 URL과 OpenAI 키를 가져옵니다.
+    embedding_api_url = os.getenv("EMBEDDING_API_URL")
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    es_url = os.getenv("ELASTICSEARCH_URL")
+    es_user = os.getenv("ELASTICSEARCH_USER")
+    es_password = os.getenv("ELASTICSEARCH_PASSWORD")
+
+    # 🌟 2. 필수 값 체크
+    if not embedding_api_url or not es_url or not openai_api_key:
+        raise RuntimeError(
+            "필수 환경변수(GPT, ES, 임베딩)가 누락되었습니다! "
+            f"EMBEDDING: {bool(embedding_api_url)}, ES: {bool(es_url)}, GPT: {bool(openai_api_key)}"
+        )
 
+    # 🌟 3. 무거운 모듈은 여기서 처음 임포트 (pandas, langchain, elasticsearch, bs4 ...)
+    from .app.embedding import EmbeddingManager
+    from .app.chatbot import ConfluenceChatbot
+    from .app import ingest, confluence_api  # noqa: F401 (첫 요청 지연 방지용 미리 임포트)
+    checks["imports"] = "ok"
+
+    if embedding_manager is None:
+        print(f"🔄 사내 임베딩 & ES 접속 시도 중... ({es_url})")
+        manager = EmbeddingManager(
+            embedding_api_url=embedding_api_url,
+            elasticsearch_url=es_url,
+            elasticsearch_user=es_user,
+            elasticsearch_password=es_password
+        )
+        manager.es_client.info()  # 연결 실패면 여기서 예외
+        space_registry.bind(manager)
+        # 인덱스 확인/생성은 워커 여러 개 중 한 곳에서만 (한 시간마다 다시 확인)
+        for m in space_registry.managers():
+            if get_shared_state().add("once", f"ensure_index:{m.index_name}", os.getpid(), ttl=3600) is not False:
+                m.ensure_collection_exists()
+        embedding_manager = manager
+    checks["elasticsearch"] = "ok"
+
+    if not embedding_manager.embedding("warmup"):
+        raise RuntimeError("임베딩 서버 응답 없음")
+    checks["embedding"] = "ok"
+
+    # 🌟 4. GPT 두뇌를 장착한 챗봇 초기화! (ES/임베딩 클라이언트는 매니저와 공유)
+    bot = ConfluenceChatbot(embedding_manager=embedding_manager)
     try:
-        # 🌟 1. Upstage 흔적 삭제! 사내 임베딩 URL과 OpenAI 키를 가져옵니다.
-        embedding_api_url = os.getenv("EMBEDDING_API_URL")
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        es_url = os.getenv("ELASTICSEARCH_URL")
-        es_user = os.getenv("ELASTICSEARCH_USER")
-        es_password = os.getenv("ELASTICSEARCH_PASSWORD")
-
-        # 🌟 2. 필수 값 체크
-        if not embedding_api_url or not es_url or not openai_api_key:
-            print("❌ [Startup 실패] 도커가 .env를 못 읽었거나 필수 키(GPT, ES, 임베딩)가 누락되었습니다!")
-            print(f"👉 확인 - EMBEDDING: {bool(embedding_api_url)}, ES: {bool(es_url)}, GPT: {bool(openai_api_key)}")
-            return # 필수 값이 없으면 여기서 멈춤!
-            
+        # LLM 연결(TLS 핸드셰이크)을 미리 맺어 둠. 실패해도 준비 완료는 막지 않음
+        bot.llm.root_client.models.list()
+        checks["llm"] = "ok"
+    except Exception as e:
+        checks["llm"] = f"warmup skipped: {type(e).__name__}"
+    chatbot = bot
+
+
+async def _space_sync_loop():
+    """동기화 주기(CONFLUENCE_SPACES의 :분)가 지난 스페이스를 작업으로 넣습니다."""
+    while True:
+        await asyncio.sleep(SPACE_SYNC_CHECK_SECONDS)
+        for space_key in space_registry.claim_due_spaces():
+            try:
+                run, params = _space_sync_job(space_key)
+                job = job_manager.submit("confluence_sync", run, lock_key=f"space:{space_key}", scheduled=True, **params)
+                print(f"⏰ [Sync] 스페이스 '{space_key}' 주기 동기화 시작 (job {job.id})")
+            except (JobConflict, JobQueueFull, HTTPException) as e:
+                print(f"⚠️ [Sync] 스페이스 '{space_key}' 주기 동기화 건너뜀: {e}")
+
+
+async def _warmup_loop():
+    global _space_sync_task
+    while True:
+        readiness["attempts"] += 1
         try:
-            print(f"🔄 사내 임베딩 & ES 접속 시도 중... ({es_url})")
-            
-            # 🌟 3. 매니저도 사내 서버 URL을 받도록 초기화!
-            embedding_manager = EmbeddingManager(
-                embedding_api_url=embedding_api_url,
-                elasticsearch_url=es_url,
-                elasticsearch_user=es_user,
-                elasticsearch_password=es_password
-            )
-            embedding_manager.ensure_collection_exists()
-            
-            # 🌟 4. GPT 두뇌를 장착한 챗봇 초기화!
-            chatbot = ConfluenceChatbot() 
-            print("✅ [Startup] Elasticsearch DB 및 GPT 챗봇 연결 성공!")
-            
-        except Exception as db_err:
-            print(f"⚠️ [Startup] 매니저/챗봇 생성 중 에러 발생: {db_err}")
+            await asyncio.to_thread(_init_clients)
+        except Exception as e:
+            readiness["state"], readiness["error"] = "degraded", f"{type(e).__name__}: {e}"
+            print(f"⚠️ [Startup] 준비 실패 ({readiness['attempts']}회차), {WARMUP_RETRY_SECONDS:.0f}초 뒤 재시도: {e}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+            continue
+        readiness.update(state="ready", error=None, ready_at=datetime.now().isoformat(timespec="seconds"))
+        job_manager.start()
+        _space_sync_task = asyncio.create_task(_space_sync_loop())
+        _ready_event.set()
+        print("✅ [Startup] Elasticsearch DB 및 GPT 챗봇 연결 성공!")
+        return
 
-    except Exception as e:
-        print(f"❌ [Startup] 초기화 오류: {e}")
+
+@app.on_event("startup")
+async def startup_event():
+    """준비 작업을 (아직 없으면) 백그라운드로 띄웁니다. blocking 모드면 끝날 때까지 기다립니다."""
+    global _warmup_task, _ready_event
+    if _warmup_task is None:
+        print("\n" + "="*50)
+        print(f"📢 [ONBOARDING APP] 하위 앱 실행됨 (Elasticsearch + GPT Version, 시작 모드: {STARTUP_MODE})")
+        print("="*50 + "\n")
+        _ready_event = asyncio.Event()
+        _warmup_task = asyncio.create_task(_warmup_loop())
+    if STARTUP_MODE == "blocking":
+        await _ready_event.wait()
+
+
+async def wait_until_ready(timeout: float = READY_WAIT_SECONDS) -> bool:
+    """준비가 끝났으면 바로, 아니면 최대 timeout초 기다린 뒤 준비 여부를 돌려줍니다."""
+    if chatbot is not None:
+        return True
+    await startup_event()
+    try:
+        await asyncio.wait_for(asyncio.shield(_ready_event.wait()), timeout)
+    except asyncio.TimeoutError:
+        pass
+    return chatbot is not None
+
+
+def readiness_status() -> dict:
+    """/ready 응답 본문"""
+    return {**readiness, "ready": chatbot is not None, "pid": os.getpid()}
+
+
+def _not_ready() -> HTTPException:
+    return HTTPException(
+        503,
+        {"message": "서버가 아직 준비 중입니다.", **readiness_status()},
+        headers={"Retry-After": str(int(WARMUP_RETRY_SECONDS))},
+    )
 
 # =================================================================
 # ✅ API 엔드포인트
@@ -126,106 +260,111 @@ async def get_system_status():
     return SystemStatus(email=email, confluence_url=url, space_key=space_key, elasticsearch_status=es_status)
 
 
-# 🎯 카테고리 트리 생성 로직 (기존 코드 유지)
-@router.get("/documents/structure")
-async def get_document_structure():
-    print("🌳 [Structure] 문서 구조 조회 시작...")
-    try:
-        base_url = os.getenv("CONFLUENCE_URL")
-        email = os.getenv("CONFLUENCE_EMAIL")
-        api_token = os.getenv("CONFLUENCE_API_TOKEN")
-        space_key = os.getenv("CONFLUENCE_SPACE_KEY")
+# 🎯 카테고리 트리 생성 로직
+# 색인된 스페이스는 계층 필드(hierarchy.py) 집계로 바로 만들고, 아직 계층 필드가 없으면(예전 색인) Confluence를 크롤링
+STRUCTURE_CACHE_TTL = float(os.getenv("STRUCTURE_CACHE_TTL", "300"))
 
-        if not all([base_url, email, api_token, space_key]):
-            return []
+def _space_index(space_key: Optional[str]) -> Tuple[str, str]:
+    """스페이스 키(비우면 CONFLUENCE_SPACE_KEY) → (스페이스 키, 인덱스)"""
+    space_key = space_key or os.getenv("CONFLUENCE_SPACE_KEY", "")
+    space = space_registry.get(space_key)
+    return space_key, space["index"] if space else space_registry.base_index
 
-        if ".atlassian.net" in base_url and not base_url.endswith("/wiki"):
-            base_url = base_url.rstrip("/") + "/wiki"
-        
-        client = ConfluenceClient(base_url, email, api_token)
-        df = client.get_pages_dataframe(space_key)
-        
-        if df.empty:
-            return []
-        
-        tree_structure = []
-        
-        if 'level_1' not in df.columns:
-            df['level_1'] = '전체 문서'
-        else:
-            df['level_1'] = df['level_1'].fillna('미분류').replace('', '미분류')
-
-        if 'level_2' not in df.columns:
-            df['level_2'] = ''
-        else:
-            df['level_2'] = df['level_2'].fillna('').astype(str)
-
-        for l1_title, l1_group in df.groupby('level_1'):
-            l1_node = {
-                "id": f"folder_l1_{l1_title}",
-                "title": l1_title,
-                "type": "folder",
-                "children": []
-            }
-            
-            if 'level_2' in df.columns:
-                for l2_title, l2_df in l1_group.groupby('level_2'):
-                    if not l2_title: continue
-                    
-                    l2_node = {
-                        "id": f"folder_l2_{l1_title}_{l2_title}",
-                        "title": l2_title,
-                        "type": "folder",
-                        "children": []
-                    }
-                    
-                    for _, row in l2_df.iterrows():
-                        l2_node["children"].append({
-                            "id": str(row['id']),
-                            "title": row['title'],
-                            "type": "page",
-                            "children": []
-                        })
-                    l1_node["children"].append(l2_node)
-            
-            direct_pages = l1_group[l1_group['level_2'] == '']
-            for _, row in direct_pages.iterrows():
-                l1_node["children"].append({
-                    "id": str(row['id']),
-                    "title": row['title'],
-                    "type": "page",
-                    "children": []
-                })
-            
-            tree_structure.append(l1_node)
+@router.get("/documents/structure")
+async def get_document_structure(refresh: bool = False, space: Optional[str] = None):
+    # 🌳 트리 스냅샷은 워커끼리 공유 (동기화가 끝나면 세대 번호가 바뀌어 새로 만듦)
+    shared = get_shared_state()
+    space_key, index = _space_index(space)
+    cache_key = f"{space_key}:{shared.index_generation()}"
+    if STRUCTURE_CACHE_TTL > 0 and not refresh:
+        cached = shared.get("structure", cache_key)
+        record_cache("structure", cached is not None)
+        if cached is not None:
+            return cached
 
-        return tree_structure
+    print("🌳 [Structure] 문서 구조 조회 시작...")
+    try:
+        tree = []
+        if embedding_manager:
+            tree = build_tree(await asyncio.to_thread(page_levels, embedding_manager.es_client, index))
+        if not tree:
+            tree = await _crawl_structure(space_key)
+        if STRUCTURE_CACHE_TTL > 0 and tree:
+            shared.set("structure", cache_key, tree, ttl=STRUCTURE_CACHE_TTL)
+        return tree
 
     except Exception as e:
         print(f"❌ [Structure] 구조 조회 실패: {e}")
         return []
 
+async def _crawl_structure(space_key: str) -> List[Dict[str, Any]]:
+    """Confluence 스페이스 전체를 크롤링해 트리를 만듭니다. (계층 필드로 색인하기 전의 예전 방식)"""
+    base_url = os.getenv("CONFLUENCE_URL")
+    email = os.getenv("CONFLUENCE_EMAIL")
+    api_token = os.getenv("CONFLUENCE_API_TOKEN")
+
+    if not all([base_url, email, api_token, space_key]):
+        return []
+
+    if ".atlassian.net" in base_url and not base_url.endswith("/wiki"):
+        base_url = base_url.rstrip("/") + "/wiki"
+
+    from .app.confluence_api import ConfluenceClient
+
+    client = ConfluenceClient(base_url, email, api_token)
+    registry = await asyncio.to_thread(client.get_page_registry, space_key)
+    return registry.tree()
+
+@router.get("/documents/categories")
+async def get_document_categories(space: Optional[str] = None):
+    """레벨별 카테고리 값 {"level_0": [...], "level_1": [...]} (ES 집계)"""
+    if not embedding_manager and not await wait_until_ready():
+        raise _not_ready()
+    _, index = _space_index(space)
+    return await asyncio.to_thread(categories, embedding_manager.es_client, index)
+
+@router.post("/documents/filter")
+async def filter_documents_by_category(request: CategoryFilterRequest):
+    """카테고리 조건(level_N = 값)을 모두 만족하는 page_id 목록 (ES 필터 + 집계)"""
+    if not embedding_manager and not await wait_until_ready():
+        raise _not_ready()
+    _, index = _space_index(request.space_key)
+    page_ids = await asyncio.to_thread(filter_pages, embedding_manager.es_client, index, request.filters)
+    return {"page_ids": page_ids, "count": len(page_ids)}
+
+@router.get("/tables/lookup")
+async def lookup_table_rows(header: str, value: str, space: Optional[str] = None, size: int = 20):
+    """표 행 정확 일치 조회 (헤더 = 값, 임베딩/LLM 호출 없음). space는 스페이스 키/인덱스, 쉼표로 여러 개 (비우면 전체)"""
+    if not chatbot and not await wait_until_ready():
+        raise _not_ready()
+    indices = space_registry.resolve(space)
+    try:
+        rows = await asyncio.to_thread(
+            chatbot.lookup_table_rows, {header: value}, max(1, min(size, 100)), indices
+        )
+    except Overloaded as e:
+        raise _overloaded_http(e)
+    return {"rows": rows, "count": len(rows)}
+
 @router.get("/documents/embedded")
 async def get_embedded_documents():
-    global embedding_manager
-    
-    # 🌟 [해결의 열쇠] 매니저가 없으면? 우리가 강제로 startup_event를 깨워줍니다!
+    # 🌟 준비 중이면 잠시 기다려 봅니다.
     if not embedding_manager:
-        print("🚀 [API 요청] 매니저가 없어서 수동으로 초기화를 시작합니다!")
-        await startup_event()
+        await wait_until_ready()
     
-    # 깨웠는데도 없으면 진짜 환경변수 에러!
+    # 그래도 없으면 준비 실패(ES 다운/환경변수 누락) 상태
     if not embedding_manager:
-        return {"status": "error", "message": "DB 매니저 초기화에 실패했습니다. (.env 확인 필요)"}
+        return {"status": "error", "message": f"DB 매니저 초기화에 실패했습니다. ({readiness['error'] or '준비 중'})"}
 
     try:
         current_es = os.getenv("ELASTICSEARCH_URL") 
         print(f"📡 [API 요청] 현재 찔러보는 ES 주소: {current_es}")
 
-        target_index = embedding_manager.index_name 
+        target_index = ",".join(space_registry.indices())
         
         res = embedding_manager.es_client.search(
             index=target_index,
+            ignore_unavailable=True,
             query={"match_all": {}},
             _source=["page_id", "title", "primary_contributor", "space", "content", "url"],
             size=1000
@@ -257,27 +396,129 @@ async def get_embedded_documents():
         return {"status": "error", "message": str(e)}
         
 
+def _user_key(request: ChatRequest, x_user_id: Optional[str]) -> Optional[str]:
+    """
+    공정 대기열의 사용자 키: X-User-Id(게이트웨이/프론트엔드의 브라우저별 id) → 세션 id
+    둘 다 없으면 None (사용자 한도 없이 입장, 접속 IP는 사무실 NAT 뒤에서 여러 사람이 공유하므로 쓰지 않음)
+    """
+    if x_user_id:
+        return f"user:{x_user_id}"
+    if request.session_id:
+        return f"session:{request.session_id}"
+    return None
+
+def _join_chat(request: ChatRequest, user: Optional[str]) -> Tuple[Flight, bool]:
+    """
+    같은 질문(정규화한 query, top_k, display_k, 인덱스)이 처리 중이면 거기에 합류하고,
+    아니면 입장 제어를 거쳐 ask_stream을 전용 스레드에서 돌리는 작업을 시작합니다.
+    collection_name(스페이스 키/인덱스, 쉼표로 여러 개)으로 검색할 인덱스를 고릅니다.
+    session_id가 있으면 답이 앞 대화에 따라 달라지므로 같은 세션 안에서만 합칩니다. (중복 전송 방지)
+    """
+    indices = space_registry.resolve(request.collection_name)
+    key = flight_key(
+        normalize_query(request.query), request.top_k, request.display_k, ",".join(indices), request.session_id or "",
+        request.subtree or ""
+    )
+    bot = chatbot
+
+    async def work(flight: Flight) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+
+        def produce() -> Dict[str, Any]:
+            session = session_store.get(request.session_id) if request.session_id else None
+            response: Dict[str, Any] = {}
+            for event in bot.ask_stream(
+                request.query, request.top_k, request.display_k, indices=indices, session=session, subtree=request.subtree
+            ):
+                loop.call_soon_threadsafe(flight.publish, event)
+                if event["type"] == "done":
+                    response = event["response"]
+                    if session is not None:
+                        turn = event["turn"]
+                        session_store.record_turn(
+                            session, request.query, response["answer"], turn["docs"], turn["retrieval_query"], turn["scope"]
+                        )
+            return response
+
+        async with chat_admission.admit(user):
+            return await chat_admission.run(produce)
+
+    return chat_flights.join(key, work)
+
+def _overloaded_http(e: Overloaded) -> HTTPException:
+    return HTTPException(e.status_code, e.detail, headers={"Retry-After": str(e.retry_after)})
+
 @router.post("/chat")
-async def chat(request: ChatRequest):
-    global chatbot
-    # 챗봇이 없으면 다시 연결 시도
-    if not chatbot: 
-        await startup_event()
-    
-    if not chatbot: 
-        raise HTTPException(503, "챗봇 시스템이 초기화되지 않았습니다.")
-        
+async def chat(request: ChatRequest, x_user_id: Optional[str] = Header(None)):
+    # 챗봇이 준비 중이면 잠시 기다려 봄
+    if not chatbot and not await wait_until_ready():
+        raise _not_ready()
+
     try:
-        # 질문 던지기
-        return chatbot.ask(
-            query=request.query,
-            top_k=request.top_k,
-            display_k=request.display_k,
-        )
+        with deadline_scope(CHAT_DEADLINE_SECONDS):
+            flight, _ = _join_chat(request, _user_key(request, x_user_id))
+        return await flight.wait()
+    except Overloaded as e:
+        raise _overloaded_http(e)
+    except Exception as e:
+        print(f"Chat Error: {e}")
+        raise HTTPException(500, str(e))
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, x_user_id: Optional[str] = Header(None)):
+    """
+    답변을 Server-Sent Events로 흘려보냅니다. (event: sources → token... → done, 실패 시 error)
+    같은 질문이 처리 중이면 그 스트림을 처음부터 함께 받습니다.
+    """
+    if not chatbot and not await wait_until_ready():
+        raise _not_ready()
+
+    with deadline_scope(CHAT_DEADLINE_SECONDS):
+        flight, leader = _join_chat(request, _user_key(request, x_user_id))
+    events = flight.subscribe()
+
+    # 첫 이벤트 전에 실패(입장 거절 등)하면 스트림 대신 429/503 응답
+    try:
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except Overloaded as e:
+        raise _overloaded_http(e)
     except Exception as e:
         print(f"Chat Error: {e}")
         raise HTTPException(500, str(e))
 
+    async def body():
+        try:
+            if first is not None:
+                yield _sse(first["type"], {k: v for k, v in first.items() if k != "type"})
+            async for event in events:
+                data = {k: v for k, v in event.items() if k != "type"}
+                if event["type"] == "done":
+                    data = {**event["response"], "shared": not leader}
+                yield _sse(event["type"], data)
+        except Overloaded as e:
+            yield _sse("error", {"status": e.status_code, **e.detail})
+        except Exception as e:
+            print(f"Chat Stream Error: {e}")
+            yield _sse("error", {"status": 500, "message": str(e)})
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/chat/sessions", status_code=201)
+async def create_chat_session():
+    """새 대화 세션 id를 발급합니다. (클라이언트가 직접 만든 id를 /chat의 session_id로 써도 됨)"""
+    session = session_store.get(None)
+    return {"session_id": session["session_id"], "ttl_s": session_store.ttl}
+
+@router.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    session_store.delete(session_id)
+    return {"status": "success"}
+
 @router.get("/collection/info")
 async def get_collection_info():
     if not embedding_manager: raise HTTPException(400, "초기화 필요")
@@ -287,9 +528,227 @@ async def get_collection_info():
     except:
         return {"status": "error"}
 
-@router.post("/embedding/upload")
+# =================================================================
+# 🛠️ 관리자 API (X-Admin-Token 헤더가 ADMIN_TOKEN과 같아야 함, ADMIN_TOKEN이 없으면 막힘)
+# =================================================================
+def _check_admin(token: Optional[str]):
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(403, "관리자 API가 꺼져 있습니다. (ADMIN_TOKEN 미설정)")
+    if not token or not hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(403, "관리자 토큰이 필요합니다.")
+
+@router.get("/admin/slow-queries")
+async def get_slow_queries(limit: int = 50, slow_only: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """느린 /chat 요청(+표본) 로그를 최신순으로 돌려줍니다. (이 워커 프로세스 기준)"""
+    _check_admin(x_admin_token)
+    return {
+        "threshold_s": slow_query_log.threshold,
+        "sample_rate": slow_query_log.sample_rate,
+        "pid": os.getpid(),
+        "entries": slow_query_log.entries(limit=limit, slow_only=slow_only),
+    }
+
+@router.get("/admin/admission")
+async def get_admission_stats(x_admin_token: Optional[str] = Header(None)):
+    """/chat 입장 제어 현황 (이 워커 프로세스 기준)"""
+    _check_admin(x_admin_token)
+    return {
+        "pid": os.getpid(), **chat_admission.stats(),
+        "chat_flights": chat_flights.in_flight(), "sessions": session_store.stats(),
+        "llm": chatbot.gateway.stats() if chatbot else None,
+    }
+
+@router.delete("/admin/slow-queries")
+async def clear_slow_queries(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    slow_query_log.clear()
+    return {"status": "success"}
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in (_warmup_task, _space_sync_task):
+        if task is not None and not task.done():
+            task.cancel()
+    page_debouncer.cancel_all()
+    job_manager.shutdown()
+    chat_admission.shutdown()
+
+def _confluence_client():
+    from .app.confluence_api import ConfluenceClient
+
+    base_url = os.getenv("CONFLUENCE_URL")
+    email = os.getenv("CONFLUENCE_EMAIL")
+    api_token = os.getenv("CONFLUENCE_API_TOKEN")
+    if not all([base_url, email, api_token]):
+        raise HTTPException(400, "Confluence 접속 정보(.env)가 없습니다.")
+    if ".atlassian.net" in base_url and not base_url.endswith("/wiki"):
+        base_url = base_url.rstrip("/") + "/wiki"
+    return ConfluenceClient(base_url, email, api_token)
+
+def _space_sync_job(space_key: str, root_title: Optional[str] = None, force_update: bool = False):
+    """스페이스 동기화 작업 함수와 파라미터 (스페이스마다 자기 인덱스에만 색인)"""
+    from .app.ingest import sync_space
+    manager = space_registry.manager_for(space_key)
+    if manager is None:
+        raise HTTPException(404, f"등록되지 않은 스페이스입니다: {space_key} (CONFLUENCE_SPACES 확인)")
+    client = _confluence_client()
+
+    def run(progress_callback):
+        return sync_space(manager, client, space_key, root_title, force_update, progress_callback)
+
+    params = {"space_key": space_key, "index": manager.index_name, "root_title": root_title, "force_update": force_update}
+    return run, params
+
+def _submit_job(kind: str, fn, lock_key: Optional[str] = None, on_finish=None, **params):
+    try:
+        job = job_manager.submit(kind, fn, lock_key=lock_key, on_finish=on_finish, **params)
+    except JobConflict as e:
+        raise HTTPException(409, {"message": str(e), "job_id": e.job_id})
+    except JobQueueFull as e:
+        raise HTTPException(429, str(e))
+    return {"status": "accepted", "job_id": job.id, "job": job.to_dict()}
+
+# =================================================================
+# 📥 수집 작업 API (즉시 job_id 반환, 진행률은 /jobs/{job_id})
+# =================================================================
+@router.post("/sync", status_code=202)
+async def start_sync(request: SyncRequest):
+    if not embedding_manager: await wait_until_ready()
+    if not embedding_manager: raise _not_ready()
+    space_key = request.space_key or os.getenv("CONFLUENCE_SPACE_KEY")
+    if not space_key:
+        raise HTTPException(400, "space_key가 필요합니다.")
+    run, params = _space_sync_job(space_key, request.root_title, request.force_update)
+
+    # 같은 스페이스는 동시에 하나만 동기화 (다른 스페이스는 각자 인덱스라 동시에 가능)
+    return _submit_job("confluence_sync", run, lock_key=f"space:{space_key}", **params)
+
+@router.get("/spaces")
+async def list_spaces():
+    """등록된 스페이스/인덱스와 동기화 주기, 마지막 동기화 결과"""
+    return {"strict": space_registry.strict, "spaces": space_registry.describe()}
+
+@router.post("/embedding/upload", status_code=202)
 async def upload_files(files: List[UploadFile] = File(...)):
-    if not embedding_manager: raise HTTPException(400, "초기화 필요")
-    return {"status": "success", "message": "파일 처리 완료"}
+    if not embedding_manager: await wait_until_ready()
+    if not embedding_manager: raise _not_ready()
+    from .app.ingest import ingest_files
+    # 본문을 통째로 읽지 않고 조각 단위로 스풀링 (큰 파일은 임시 파일로)
+    uploads: List[SpooledUpload] = []
+
+    def cleanup():
+        for u in uploads: u.cleanup()
+
+    try:
+        for f in files:
+            uploads.append(await SpooledUpload.from_upload(f))
+    except UploadTooLarge as e:
+        cleanup()
+        raise HTTPException(413, str(e))
+    except BaseException:
+        # 클라이언트 연결 끊김 등 (이미 스풀링한 파일도 지움)
+        cleanup()
+        raise
+    manager = space_registry.manager_for(UPLOAD_SPACE)
+
+    def run(progress_callback):
+        return ingest_files(manager, uploads, progress_callback)
+
+    try:
+        # 임시 파일은 작업이 어떻게 끝나든(실행 전 취소 포함) on_finish에서 지움
+        return _submit_job("file_ingest", run, on_finish=cleanup, files=[describe(u) for u in uploads])
+    except HTTPException:
+        cleanup()
+        raise
+
+# =================================================================
+# 🪝 Confluence 웹훅 (페이지 생성/수정/삭제/이동 → 그 페이지만 디바운스 후 재색인/삭제)
+# =================================================================
+def _webhook_spaces() -> List[str]:
+    """웹훅을 받아들일 스페이스 (WEBHOOK_SPACES=A,B / *는 전부, 기본은 등록된 스페이스)"""
+    raw = os.getenv("WEBHOOK_SPACES")
+    if raw:
+        return [s.strip() for s in raw.split(",") if s.strip()]
+    return space_registry.space_keys() or ["*"]
+
+def _dispatch_page_event(page_id: str, entry: Dict[str, Any]) -> bool:
+    """디바운스가 끝난 페이지 이벤트를 작업으로 넣습니다. 지금 못 넣으면 False (잠시 뒤 재시도)"""
+    if not embedding_manager:
+        return False
+    from .app.ingest import reindex_page, remove_page
+    manager = space_registry.manager_for(entry["space"] or os.getenv("CONFLUENCE_SPACE_KEY"))
+    if manager is None:
+        print(f"⚠️ [Webhook] 등록되지 않은 스페이스 '{entry['space']}'의 페이지 {page_id} 이벤트는 무시합니다.")
+        return True
+
+    try:
+        # 삭제 이벤트도 Confluence에서 정말 지워졌는지 확인한 뒤에만 지움
+        client = _confluence_client()
+    except HTTPException as e:
+        print(f"⚠️ [Webhook] 페이지 {page_id} 처리 보류: {e.detail}")
+        return False
+
+    if entry["action"] == "delete":
+        def run(progress_callback):
+            return remove_page(manager, client, page_id, progress_callback)
+    else:
+        def run(progress_callback):
+            return reindex_page(
+                manager, client, page_id, entry["space"], entry["relink"], entry["new_page"], progress_callback
+            )
+
+    try:
+        # 같은 페이지 작업은 동시에 하나만 (실행 중이면 끝난 뒤 다시 시도)
+        job_manager.submit(
+            f"page_{entry['action']}", run, lock_key=f"page:{page_id}",
+            page_id=page_id, space=entry["space"], events=entry["events"]
+        )
+    except (JobConflict, JobQueueFull):
+        return False
+    return True
+
+page_debouncer = PageDebouncer.from_env(_dispatch_page_event)
+
+@router.post("/webhooks/confluence", status_code=202)
+async def confluence_webhook(
+    request: Request,
+    x_hub_signature: Optional[str] = Header(None),
+    x_webhook_token: Optional[str] = Header(None)
+):
+    body = await request.body()
+    allow_unsigned = os.getenv("WEBHOOK_ALLOW_UNSIGNED", "false").lower() in ("1", "true", "yes")
+    if not verify_signature(os.getenv("WEBHOOK_SECRET"), body, x_hub_signature, x_webhook_token, allow_unsigned):
+        WEBHOOK_EVENTS_TOTAL.labels("rejected").inc()
+        raise HTTPException(401, "웹훅 서명이 올바르지 않습니다.")
+    try:
+        event = parse_event(json.loads(body))
+    except (ValueError, AttributeError):
+        WEBHOOK_EVENTS_TOTAL.labels("rejected").inc()
+        raise HTTPException(400, "JSON 본문이 필요합니다.")
+
+    spaces = _webhook_spaces()
+    if event is None or ("*" not in spaces and event["space"] and event["space"] not in spaces):
+        WEBHOOK_EVENTS_TOTAL.labels("ignored").inc()
+        return {"status": "ignored"}
+
+    WEBHOOK_EVENTS_TOTAL.labels("accepted").inc()
+    return {"status": "accepted", **page_debouncer.push(event)}
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50):
+    return {"jobs": job_manager.list_jobs(limit)}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get_dict(job_id)
+    if not job: raise HTTPException(404, "작업을 찾을 수 없습니다.")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if not job: raise HTTPException(404, "작업을 찾을 수 없습니다.")
+    return job
 
 app.include_router(router)
\ No newline at end of file
@@ -0,0 +1,14 @@
+"""
+백엔드 단위 테스트 공통 설정
+- backend 디렉터리를 sys.path에 넣어 onboarding / benchmarks 패키지를 바로 임포트
+- 네트워크(ES, 임베딩 서버, Confluence)가 필요 없는 순수 로직만 검사
+
+실행: cd backend && python -m pytest -q tests
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,130 @@
+"""
+AdmissionController 테스트
+- 사용자당 처리+대기 한도(429), 사용자를 모르는 요청은 한도 없음
+- 대기열은 사용자별 라운드 로빈 (한 사람이 연달아 보낸 요청이 다른 사람을 밀어내지 않음)
+- 대기열 가득 참 / 대기 시간 초과 → 503
+"""
+
+import asyncio
+
+import pytest
+
+from onboarding.app.admission import AdmissionController, Overloaded
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _hold(controller: AdmissionController, user, release: asyncio.Event, admitted: list, label=None):
+    async with controller.admit(user):
+        admitted.append(label if label is not None else user)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_per_user_limit_counts_active_and_queued():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=5, per_user=2)
+        release = asyncio.Event()
+        admitted = []
+        tasks = [asyncio.create_task(_hold(controller, "alice", release, admitted)) for _ in range(2)]
+        await _settle()
+        assert controller.stats()["active"] == 1 and controller.stats()["queued"] == 1
+
+        with pytest.raises(Overloaded) as info:
+            async with controller.admit("alice"):
+                pass
+        assert info.value.status_code == 429 and info.value.reason == "user_limit"
+
+        # 다른 사용자는 같은 순간에도 줄을 설 수 있음
+        tasks.append(asyncio.create_task(_hold(controller, "bob", release, admitted)))
+        await _settle()
+        assert controller.stats()["queued"] == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert sorted(admitted) == ["alice", "alice", "bob"]
+        assert controller.stats()["active"] == 0 and controller.stats()["users"] == 0
+        controller.shutdown()
+
+    _run(scenario())
+
+
+def test_anonymous_requests_have_no_user_limit():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=5, per_user=1)
+        release = asyncio.Event()
+        admitted = []
+        tasks = [asyncio.create_task(_hold(controller, None, release, admitted, label=i)) for i in range(4)]
+        await _settle()
+        assert controller.stats()["active"] == 1 and controller.stats()["queued"] == 3
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admitted == [0, 1, 2, 3]
+        controller.shutdown()
+
+    _run(scenario())
+
+
+def test_queue_is_round_robin_across_users():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=5, per_user=5)
+        admitted = []
+        releases = {}
+
+        async def request(user: str, n: int):
+            label = f"{user}{n}"
+            releases[label] = asyncio.Event()
+            async with controller.admit(user):
+                admitted.append(label)
+                await releases[label].wait()
+
+        # alice가 먼저 4개를 연달아 보내고, 그 뒤에 bob과 carol이 하나씩 보냄
+        tasks = [asyncio.create_task(request("alice", i)) for i in range(4)]
+        await _settle()
+        tasks += [asyncio.create_task(request("bob", 0)), asyncio.create_task(request("carol", 0))]
+        await _settle()
+
+        while len(admitted) < 6:
+            releases[admitted[-1]].set()
+            await _settle()
+        releases[admitted[-1]].set()
+        await asyncio.gather(*tasks)
+
+        assert admitted == ["alice0", "alice1", "bob0", "carol0", "alice2", "alice3"]
+        controller.shutdown()
+
+    _run(scenario())
+
+
+def test_full_queue_and_queue_timeout_return_503():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05, per_user=5)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, "alice", release, []))
+        await _settle()
+        waiter = asyncio.create_task(_hold(controller, "bob", release, []))
+        await _settle()
+
+        with pytest.raises(Overloaded) as full:
+            async with controller.admit("carol"):
+                pass
+        assert full.value.status_code == 503 and full.value.reason == "queue_full"
+
+        with pytest.raises(Overloaded) as timeout:
+            await waiter
+        assert timeout.value.status_code == 503 and timeout.value.reason == "queue_timeout"
+        assert controller.stats()["queued"] == 0
+
+        release.set()
+        await holder
+        assert controller.stats()["active"] == 0
+        controller.shutdown()
+
+    _run(scenario())
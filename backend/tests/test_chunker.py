@@ -0,0 +1,88 @@
+"""
+StructureChunker 테스트
+- 어떤 청크도 chunk_tokens를 넘지 않음 (예외: 행 하나짜리 표 청크, 행은 중간에서 자르지 않음)
+- 본문 섹션은 어떻게 묶이든 [섹션: 경로] → # 헤딩 → 본문 순서로 나감
+"""
+
+import random
+
+import pytest
+
+from onboarding.app.chunker import StructureChunker, count_tokens
+
+WORDS = ["온보딩", "가이드", "배포", "서버", "deployment", "pipeline", "12345", "v2.3", "팀장", "승인", "(필수)", "검토합니다."]
+
+
+def _sentence(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def _random_parsed(rng: random.Random):
+    sections = []
+    tables = []
+    for _ in range(rng.randint(1, 8)):
+        level = rng.randint(1, 4)
+        n_lines = rng.choice([1, 2, 5, 20])
+        # 가끔 예산보다 긴 한 줄을 넣어 문장 단위 보조 분할도 거치게 함
+        lines = [_sentence(rng, rng.choice([3, 10, 40, 200])) for _ in range(n_lines)]
+        section = {"heading": _sentence(rng, rng.randint(1, 4)) if rng.random() < 0.9 else "", "level": level,
+                   "text": "\n".join(lines), "tables": []}
+        if rng.random() < 0.3:
+            section["tables"].append(len(tables))
+            tables.append([
+                {"항목": _sentence(rng, rng.randint(1, 3)), "설명": _sentence(rng, rng.choice([2, 8, 120]))}
+                for _ in range(rng.randint(1, 30))
+            ])
+        sections.append(section)
+    children = [{"title": f"하위 문서 {i}", "id": str(1000 + i)} for i in range(rng.choice([0, 0, 3, 60]))]
+    return {"sections": sections, "tables": tables, "child_pages": children}
+
+
+def _table_row_count(chunk: str) -> int:
+    lines = chunk.split("\n")
+    return len(lines) - lines.index("[표]") - 3  # [표], 헤더, 구분선 다음부터가 행
+
+
+@pytest.mark.parametrize("chunk_tokens, overlap_tokens", [(80, 20), (200, 40), (350, 40)])
+def test_chunks_stay_within_budget(chunk_tokens, overlap_tokens):
+    chunker = StructureChunker(chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    for seed in range(50):
+        rng = random.Random(seed)
+        for chunk in chunker.chunk_parsed(_random_parsed(rng), "문서"):
+            tokens = count_tokens(chunk)
+            if tokens <= chunk_tokens:
+                continue
+            assert "\n[표]\n" in chunk and _table_row_count(chunk) == 1, (seed, tokens, chunk[:300])
+
+
+def test_section_layout_is_the_same_in_every_packing_case():
+    chunker = StructureChunker(chunk_tokens=60, overlap_tokens=10)
+    sections = [
+        {"heading": "개요", "level": 1, "text": "짧은 소개", "tables": []},
+        {"heading": "설치", "level": 2, "text": "설치 방법을 설명합니다", "tables": []},
+        {"heading": "긴 절차", "level": 2, "text": "\n".join(f"단계 {i} 서버 배포 승인" for i in range(30)), "tables": []},
+    ]
+    chunks = chunker.chunk_parsed({"sections": sections}, "문서")
+
+    # 1) 작은 두 섹션은 한 청크에 같은 모양으로 이어 붙음
+    assert chunks[0].split("\n") == ["[문서 제목: 문서]", "[섹션: 개요]", "# 개요", "짧은 소개",
+                                     "[섹션: 개요 > 설치]", "## 설치", "설치 방법을 설명합니다"]
+    # 3) 큰 섹션은 조각마다 제목 + 섹션 경로를 머리말로 반복하고, 헤딩은 첫 조각에만
+    pieces = chunks[1:]
+    assert len(pieces) > 1
+    for piece in pieces:
+        assert piece.split("\n")[:2] == ["[문서 제목: 문서]", "[섹션: 개요 > 긴 절차]"]
+    assert pieces[0].split("\n")[2] == "## 긴 절차"
+    body = [line for piece in pieces for line in piece.split("\n")[2:]]
+    assert [line for line in body if line.startswith("단계")][-1] == "단계 29 서버 배포 승인"
+
+
+def test_oversized_table_row_is_kept_whole():
+    chunker = StructureChunker(chunk_tokens=40, overlap_tokens=5)
+    long_cell = _sentence(random.Random(0), 80)
+    parsed = {"sections": [], "tables": [[{"항목": "짧음", "설명": "a"}, {"항목": "김", "설명": long_cell}]]}
+    chunks = chunker.chunk_parsed(parsed, "문서")
+
+    assert len(chunks) == 2
+    assert long_cell in chunks[1]
+    assert _table_row_count(chunks[1]) == 1
@@ -0,0 +1,103 @@
+"""
+AdaptiveEmbeddingClient 테스트
+- bisection으로 거부된 입력만 실패로 보고하고 나머지는 입력 순서대로 벡터를 받음
+- 배치 크기 축소 규칙: 일시 오류는 항상, 입력 거부(4xx)는 원본 배치일 때만
+- HTTP 상태 코드별 일시 오류 분류
+"""
+
+import threading
+
+import pytest
+import requests
+
+from onboarding.app.embedding_client import AdaptiveEmbeddingClient, EmbeddingRequestError
+
+
+class FakeClient(AdaptiveEmbeddingClient):
+    """HTTP 대신 post를 덮어써서 "bad"가 들어간 배치를 거부하는 클라이언트"""
+
+    def __init__(self, **kwargs):
+        super().__init__("http://embedding.invalid/v1/embeddings", **kwargs)
+        self.calls = []
+        self._calls_lock = threading.Lock()
+
+    def post(self, texts, timeout=None):
+        with self._calls_lock:
+            self.calls.append(list(texts))
+        if any(t.startswith("bad") for t in texts):
+            raise EmbeddingRequestError("400 Bad Request")
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_bisection_isolates_rejected_inputs():
+    texts = [f"text {i}" for i in range(40)]
+    texts[7] = "bad 7"
+    texts[31] = "bad 31"
+    client = FakeClient(max_in_flight=3, initial_batch_size=8, single_retries=1)
+
+    result = client.embed_many(texts)
+
+    assert [f["index"] for f in result["failed"]] == [7, 31]
+    for i, vec in enumerate(result["vectors"]):
+        if i in (7, 31):
+            assert vec is None
+        else:
+            assert vec == [float(len(texts[i])), 1.0]
+    # 거부된 입력은 단건으로 (1 + single_retries)번 보내고 포기
+    assert sum(1 for batch in client.calls if batch == ["bad 7"]) == 2
+
+
+def test_rejected_split_batches_do_not_shrink():
+    client = FakeClient(initial_batch_size=32)
+
+    # bisection으로 쪼갠 배치/단건 재시도의 입력 거부는 크기와 무관
+    client._on_failure(16, original=False, transient=False)
+    client._on_failure(1, original=False, transient=False)
+    assert client.batch_size == 32
+
+    # 현재 크기로 보낸 원본 배치가 거부되면 한 번 줄임
+    client._on_failure(32, original=True, transient=False)
+    assert client.batch_size == 16
+
+    # 현재 크기보다 작은 원본 배치(마지막 꼬리 배치)의 거부도 무시
+    client._on_failure(5, original=True, transient=False)
+    assert client.batch_size == 16
+
+
+def test_transient_failures_always_shrink():
+    client = FakeClient(initial_batch_size=32, min_batch_size=4)
+    client._on_failure(1, original=False, transient=True)
+    assert client.batch_size == 16
+    for _ in range(5):
+        client._on_failure(1, original=False, transient=True)
+    assert client.batch_size == 4
+
+
+def _response(status: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.url = "http://embedding.invalid/v1/embeddings"
+    response._content = b"{}"
+    return response
+
+
+@pytest.mark.parametrize("status, transient", [(400, False), (413, False), (429, True), (500, True), (503, True)])
+def test_http_status_classification(monkeypatch, status, transient):
+    client = AdaptiveEmbeddingClient("http://embedding.invalid/v1/embeddings")
+    monkeypatch.setattr(client.session, "post", lambda *args, **kwargs: _response(status))
+
+    with pytest.raises(EmbeddingRequestError) as info:
+        client.post(["hello"])
+    assert info.value.transient is transient
+
+
+def test_timeout_is_transient(monkeypatch):
+    client = AdaptiveEmbeddingClient("http://embedding.invalid/v1/embeddings")
+
+    def timeout(*args, **kwargs):
+        raise requests.Timeout("read timed out")
+
+    monkeypatch.setattr(client.session, "post", timeout)
+    with pytest.raises(EmbeddingRequestError) as info:
+        client.post(["hello"])
+    assert info.value.transient is True
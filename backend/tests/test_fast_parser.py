@@ -0,0 +1,88 @@
+"""
+parse_storage_html 엔진 동등성 테스트 (fast 단일 패스 vs bs4 기준 구현)
+- benchmarks/samples 코퍼스
+- 무작위 Storage HTML 퍼징: Confluence 매크로/링크/표(rowspan, colspan), 닫히지 않은 태그, 엔티티, CDATA, 주석 등
+"""
+
+import random
+
+import pytest
+
+from benchmarks.bench_parser import fake_child_pages, load_corpus
+from onboarding.app.parser import parse_storage_html
+
+TAGS = [
+    "p", "h1", "h2", "h3", "strong", "em", "span", "div", "ul", "li", "table", "tbody", "tr", "td", "th",
+    "ac:link", "ri:page", "ac:structured-macro", "ac:parameter", "ac:rich-text-body", "ac:plain-text-link-body",
+    "ri:attachment", "ac:image", "br", "template", "script", "style", "ri:url", "code", "pre",
+    "ac:layout", "ac:layout-section", "ac:layout-cell", "img", "col", "colgroup", "rt",
+]
+WORDS = [
+    "안녕", "hello", "a&amp;b", "&nbsp;", "&#39;", "&#x41;", "&foo;", "x&lt;y", "  ", "\n", " 팀 ",
+    "line1\nline2", "|pipe|", "\r\n", "값",
+]
+
+
+def _attrs(rng: random.Random, tag: str) -> str:
+    attrs = []
+    if tag == "ri:page":
+        attrs.append(f'ri:content-title="{rng.choice(["Other", "문서 A", ""])}"')
+    if tag == "ri:attachment":
+        attrs.append(f'ri:filename="{rng.choice(["file.pdf", "x.tar.gz", "a"])}"')
+    if tag == "ac:structured-macro":
+        attrs.append(f'ac:name="{rng.choice(["children", "code", "info"])}"')
+    if tag in ("td", "th"):
+        if rng.random() < 0.2:
+            attrs.append(f'rowspan="{rng.randint(1, 3)}"')
+        if rng.random() < 0.2:
+            attrs.append(f'colspan="{rng.randint(1, 3)}"')
+    return (" " + " ".join(attrs)) if attrs else ""
+
+
+def random_storage_html(rng: random.Random, depth: int = 0, stack=None) -> str:
+    stack = [] if stack is None else stack
+    out = []
+    for _ in range(rng.randint(0, 5)):
+        r = rng.random()
+        if r < 0.35 or depth > 5:
+            out.append(rng.choice(WORDS))
+        elif r < 0.4:
+            out.append("<!-- c -->")
+        elif r < 0.45:
+            out.append(f"<![CDATA[{rng.choice(WORDS)}]]>")
+        else:
+            tag = rng.choice(TAGS)
+            if tag == "ac:link" and "ac:link" in stack:
+                tag = "span"
+            if rng.random() < 0.1:
+                out.append(f"<{tag}{_attrs(rng, tag)}/>")
+                continue
+            stack.append(tag)
+            inner = random_storage_html(rng, depth + 1, stack)
+            stack.pop()
+            close = "" if rng.random() < 0.08 else f"</{tag}>"
+            out.append(f"<{tag}{_attrs(rng, tag)}>{inner}{close}")
+    if rng.random() < 0.03:
+        out.append(f"</{rng.choice(TAGS)}>")
+    return "".join(out)
+
+
+def _parse(html: str, engine: str):
+    try:
+        return parse_storage_html("1", html, fake_child_pages, engine=engine)
+    except Exception as e:  # 두 엔진이 같은 입력에서 같은 예외를 내는지도 비교
+        return ("error", type(e).__name__)
+
+
+@pytest.mark.parametrize("name, html", load_corpus())
+def test_engines_agree_on_samples(name, html):
+    assert _parse(html, "fast") == _parse(html, "bs4")
+
+
+def test_engines_agree_on_random_storage_html():
+    mismatches = []
+    for seed in range(1500):
+        html = random_storage_html(random.Random(seed))
+        if _parse(html, "fast") != _parse(html, "bs4"):
+            mismatches.append(seed)
+    assert mismatches == []
@@ -0,0 +1,49 @@
+"""
+멀티 프로세스 파싱/청킹 테스트
+- make_bundles: 모든 페이지를 정확히 한 번씩, 큰 페이지는 단독 작업으로 먼저(LPT), 작은 페이지는 bundle_bytes 안에서 묶음
+- iter_chunked_pages: 프로세스 풀 결과가 단일 프로세스(chunk_page_record) 결과와 같음
+"""
+
+import random
+
+from benchmarks.bench_parser import fake_child_pages, load_corpus
+from onboarding.app.chunker import StructureChunker
+from onboarding.app.ingest_pool import chunk_page_record, iter_chunked_pages, make_bundles
+
+
+def _records(rng: random.Random, n: int):
+    return [(str(i), f"문서 {i}", "x" * rng.choice([0, 10, 500, 3000, 20000])) for i in range(n)]
+
+
+def test_make_bundles_covers_every_page_once():
+    records = _records(random.Random(0), 300)
+    bundles = make_bundles(records, bundle_bytes=4096)
+
+    ids = [rec[0] for bundle in bundles for rec in bundle]
+    assert sorted(ids) == sorted(rec[0] for rec in records)
+    for bundle in bundles:
+        size = sum(len(rec[2]) for rec in bundle)
+        # 묶음은 bundle_bytes를 넘지 않고, 넘는 것은 큰 페이지 하나짜리 묶음뿐
+        assert size <= 4096 or len(bundle) == 1
+
+
+def test_make_bundles_sends_large_pages_first():
+    records = _records(random.Random(1), 200)
+    bundles = make_bundles(records, bundle_bytes=4096)
+
+    sizes = [max(len(rec[2]) for rec in bundle) for bundle in bundles]
+    assert sizes == sorted(sizes, reverse=True)
+    assert all(len(bundle) == 1 for bundle in bundles if len(bundle[0][2]) >= 4096)
+
+
+def test_pool_matches_single_process():
+    corpus = load_corpus()
+    records = [(str(100 + i), name, html) for i, (name, html) in enumerate(corpus)]
+    chunker = StructureChunker(chunk_tokens=120, overlap_tokens=20)
+    expected = {rec[0]: chunk_page_record(rec, chunker, fake_child_pages) for rec in records}
+
+    results = list(iter_chunked_pages(records, workers=2, chunk_tokens=120, overlap_tokens=20,
+                                      get_child_pages_func=fake_child_pages, bundle_bytes=1024))
+
+    assert len(results) == len(records)
+    assert {res[0]: res for res in results} == expected
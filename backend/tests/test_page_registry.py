@@ -0,0 +1,111 @@
+"""
+PageRegistry 테스트
+- categories / filter / tree가 예전 DataFrame 경로(pages_to_dataframe → level_i 열, build_structure_tree)와 같은 결과
+- 자식 목록은 형제 위치(extensions.position) 순서, 위치가 없으면 위치 있는 형제 뒤에 목록 순서
+- ChildPageResolver는 본문 없는 페이지도 자식으로 돌려주고, 범위 밖 페이지만 fallback으로 한 번씩 조회
+"""
+
+import random
+
+import pytest
+
+from onboarding.app.confluence_api import build_structure_tree, pages_to_dataframe
+from onboarding.app.page_registry import ChildPageResolver, PageRegistry
+
+FOLDERS = ["인사", "개발", "운영", "공지", "폴더 1", "폴더 2"]
+
+
+def _space_listing(rng: random.Random, n_pages: int = 400):
+    """Confluence 목록 응답 모양의 무작위 스페이스 (같은 제목의 형제/사촌, 목록에 없는 조상 포함)"""
+    pages = [{"id": "1", "title": "스페이스 홈", "ancestors": [], "extensions": {"position": 0}}]
+    for i in range(2, n_pages + 2):
+        parent = rng.choice(pages[: max(1, len(pages) // 2)] if rng.random() < 0.7 else pages)
+        ancestors = parent["ancestors"] + [{"id": parent["id"], "title": parent["title"]}]
+        title = rng.choice(FOLDERS) if rng.random() < 0.3 else f"문서 {i}"
+        pages.append({"id": str(i), "title": title, "ancestors": ancestors,
+                      "extensions": {"position": rng.randint(0, 50) if rng.random() < 0.9 else "none"}})
+    # 권한 때문에 목록에 안 나오는 페이지 (자손은 조상으로만 그 페이지를 앎)
+    hidden = {p["id"] for p in rng.sample(pages[1:], 20)}
+    return [p for p in pages if p["id"] not in hidden]
+
+
+def _with_paths(pages):
+    """get_pages_with_category와 같은 path 형식"""
+    return [{"id": p["id"], "title": p["title"],
+             "path": " / ".join([a["title"] for a in p["ancestors"]] + [p["title"]])} for p in pages]
+
+
+def _dataframe_filter(df, filters):
+    filtered = df
+    for level, value in filters.items():
+        if level in df.columns:
+            filtered = filtered[filtered[level] == value]
+    return filtered["id"].astype(str).tolist()
+
+
+def _dataframe_categories(df):
+    return {col: sorted(df[col].dropna().unique().tolist()) for col in df.columns if col.startswith("level_")}
+
+
+@pytest.fixture(scope="module", params=[0, 1, 2])
+def space(request):
+    pages = _space_listing(random.Random(request.param))
+    return pages, pages_to_dataframe(_with_paths(pages))
+
+
+@pytest.mark.parametrize("form", ["ancestors", "path"])
+def test_categories_and_tree_match_dataframe(space, form):
+    pages, df = space
+    registry = PageRegistry.from_listing(pages if form == "ancestors" else _with_paths(pages))
+
+    assert registry.categories() == _dataframe_categories(df)
+    assert registry.tree() == build_structure_tree(df.copy())
+
+
+def test_filter_matches_dataframe(space):
+    pages, df = space
+    registry = PageRegistry.from_listing(pages)
+    categories = registry.categories()
+    rng = random.Random(42)
+
+    cases = [{}, {"level_9": "인사"}, {"level_1": "없는 제목"}, {"region": "seoul"}]
+    for _ in range(200):
+        levels = rng.sample(sorted(categories), rng.randint(1, min(3, len(categories))))
+        cases.append({level: rng.choice(categories[level]) for level in levels})
+
+    for filters in cases:
+        assert registry.filter(filters) == _dataframe_filter(df, filters), filters
+
+
+def test_children_follow_sibling_position():
+    pages = [
+        {"id": "1", "title": "홈", "ancestors": []},
+        {"id": "12", "title": "셋째", "ancestors": [{"id": "1", "title": "홈"}], "extensions": {"position": 7}},
+        {"id": "10", "title": "위치 없음", "ancestors": [{"id": "1", "title": "홈"}]},
+        {"id": "11", "title": "첫째", "ancestors": [{"id": "1", "title": "홈"}], "extensions": {"position": 0}},
+        {"id": "13", "title": "둘째", "ancestors": [{"id": "1", "title": "홈"}], "extensions": {"position": 3}},
+    ]
+    registry = PageRegistry.from_listing(pages)
+    assert [c["title"] for c in registry.children_of("1")] == ["첫째", "둘째", "셋째", "위치 없음"]
+    assert registry.subtree("1") == ["1", "11", "13", "12", "10"]
+
+
+def test_child_resolver_keeps_bodiless_pages_and_caches_fallback():
+    listing = [
+        {"id": "1", "title": "홈", "ancestors": [], "position": 0},
+        {"id": "2", "title": "빈 폴더 페이지", "ancestors": [{"id": "1", "title": "홈"}], "position": 1},
+        {"id": "3", "title": "본문", "ancestors": [{"id": "1", "title": "홈"}, {"id": "2", "title": "빈 폴더 페이지"}],
+         "position": 0},
+    ]
+    calls = []
+
+    def fallback(page_id):
+        calls.append(page_id)
+        return [{"id": "99", "title": "범위 밖"}]
+
+    resolver = ChildPageResolver.from_pages(listing, fallback)
+    assert resolver("1") == [{"id": "2", "title": "빈 폴더 페이지"}]
+    assert resolver("2") == [{"id": "3", "title": "본문"}]
+    assert resolver("3") == []
+    assert resolver("500") == resolver("500") == [{"id": "99", "title": "범위 밖"}]
+    assert calls == ["500"]
@@ -0,0 +1,50 @@
+"""
+reciprocal_rank_fusion 테스트
+- 점수 = Σ 가중치 / (k + 순위), 같은 문서(_index, _id)는 목록을 가로질러 합산
+- 다른 인덱스의 같은 _id는 다른 문서
+"""
+
+import pytest
+
+from onboarding.app.chatbot import reciprocal_rank_fusion
+
+
+def _hit(doc_id: str, index: str = "docs"):
+    return {"_index": index, "_id": doc_id}
+
+
+def test_scores_sum_across_lists():
+    fused = reciprocal_rank_fusion([
+        (1.0, [_hit("a"), _hit("b"), _hit("c")]),
+        (1.0, [_hit("c"), _hit("a")]),
+    ], k=60)
+
+    scores = {hit["_id"]: score for hit, score in fused}
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert [hit["_id"] for hit, _ in fused] == ["a", "c", "b"]
+
+
+def test_weights_change_the_winner():
+    lexical = [_hit("keyword"), _hit("semantic")]
+    vector = [_hit("semantic"), _hit("keyword")]
+
+    assert reciprocal_rank_fusion([(1.0, lexical), (1.0, vector)])[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    assert reciprocal_rank_fusion([(2.0, lexical), (1.0, vector)])[0][0]["_id"] == "keyword"
+    assert reciprocal_rank_fusion([(1.0, lexical), (2.0, vector)])[0][0]["_id"] == "semantic"
+
+
+def test_same_id_in_different_indices_stays_separate():
+    fused = reciprocal_rank_fusion([(1.0, [_hit("1", "docs"), _hit("1", "docs_tables")])])
+    assert [(hit["_index"], hit["_id"]) for hit, _ in fused] == [("docs", "1"), ("docs_tables", "1")]
+
+
+def test_first_seen_hit_is_kept_and_empty_input():
+    first = {"_index": "docs", "_id": "a", "_source": {"text": "from lexical"}}
+    second = {"_index": "docs", "_id": "a", "_source": {"text": "from vector"}}
+    fused = reciprocal_rank_fusion([(1.0, [first]), (1.0, [second])])
+    assert len(fused) == 1 and fused[0][0] is first
+
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([(1.0, [])]) == []
@@ -0,0 +1,138 @@
+"""
+SingleFlight 테스트
+- 같은 키의 동시 요청은 작업 한 번으로 합쳐지고 모두 같은 결과를 받음
+- 작업 예외는 리더/팔로워 모두에게 그대로 전달
+- 늦게 합류한 구독자도 이벤트를 처음부터 받음
+- 끝난 작업은 바로 잊음 (다음 요청은 새로 실행)
+"""
+
+import asyncio
+
+import pytest
+
+from onboarding.app.singleflight import SingleFlight, flight_key, normalize_query
+
+
+def test_concurrent_joins_share_one_run():
+    async def scenario():
+        group = SingleFlight("test")
+        calls = []
+        gate = asyncio.Event()
+
+        async def work(flight):
+            calls.append(flight.key)
+            await gate.wait()
+            return {"answer": 42}
+
+        joined = [group.join("k", work) for _ in range(5)]
+        assert [leader for _, leader in joined] == [True, False, False, False, False]
+        assert len({id(flight) for flight, _ in joined}) == 1
+        assert joined[0][0].followers == 4
+        assert group.in_flight() == 1
+
+        gate.set()
+        results = await asyncio.gather(*(flight.wait() for flight, _ in joined))
+        assert results == [{"answer": 42}] * 5
+        assert calls == ["k"]
+        assert group.in_flight() == 0
+
+        # 끝난 뒤 같은 키로 오면 새로 실행
+        flight, leader = group.join("k", work)
+        assert leader
+        await flight.wait()
+        assert calls == ["k", "k"]
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        group = SingleFlight("test")
+        gate = asyncio.Event()
+
+        async def work(flight):
+            await gate.wait()
+            raise RuntimeError("es down")
+
+        flights = [group.join("k", work)[0] for _ in range(3)]
+        gate.set()
+        for flight in flights:
+            with pytest.raises(RuntimeError, match="es down"):
+                await flight.wait()
+        assert group.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_late_subscriber_replays_events():
+    async def scenario():
+        group = SingleFlight("test")
+        step = asyncio.Event()
+
+        async def work(flight):
+            flight.publish({"type": "token", "text": "a"})
+            flight.publish({"type": "token", "text": "b"})
+            await step.wait()
+            flight.publish({"type": "token", "text": "c"})
+            return "abc"
+
+        flight, _ = group.join("k", work)
+        await asyncio.sleep(0)
+        assert len(flight.events) == 2
+
+        late, leader = group.join("k", work)
+        assert late is flight and not leader
+
+        async def collect():
+            return [event["text"] async for event in late.subscribe()]
+
+        collector = asyncio.create_task(collect())
+        await asyncio.sleep(0)
+        step.set()
+        assert await collector == ["a", "b", "c"]
+        assert await flight.wait() == "abc"
+
+    asyncio.run(scenario())
+
+
+def test_subscriber_sees_error_after_events():
+    async def scenario():
+        group = SingleFlight("test")
+
+        async def work(flight):
+            flight.publish({"text": "partial"})
+            raise ValueError("llm failed")
+
+        flight, _ = group.join("k", work)
+        seen = []
+        with pytest.raises(ValueError, match="llm failed"):
+            async for event in flight.subscribe():
+                seen.append(event["text"])
+        assert seen == ["partial"]
+
+    asyncio.run(scenario())
+
+
+def test_follower_cancel_does_not_cancel_work():
+    async def scenario():
+        group = SingleFlight("test")
+        gate = asyncio.Event()
+
+        async def work(flight):
+            await gate.wait()
+            return "done"
+
+        flight, _ = group.join("k", work)
+        follower = asyncio.create_task(group.join("k", work)[0].wait())
+        await asyncio.sleep(0)
+        follower.cancel()
+        gate.set()
+        assert await flight.wait() == "done"
+
+    asyncio.run(scenario())
+
+
+def test_query_normalization_and_keys():
+    assert normalize_query("  How   do I  DEPLOY? ") == "how do i deploy?"
+    assert flight_key(normalize_query("A  b"), 5, "idx") == flight_key(normalize_query("a B"), 5, "idx")
+    assert flight_key("a b", 5, "idx") != flight_key("a b", 6, "idx")
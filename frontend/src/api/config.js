@@ -1,7 +1,24 @@
 // 1. .env에서 서버 주소를 읽어옵니다.
 export const SERVER_URL = import.meta.env.VITE_SERVER_URL || 'http://localhost:8000';
 
+// 브라우저마다 한 번 만들어 두는 id (/chat 공정 대기열에서 사람을 구분하는 데 사용, 같은 사무실 IP여도 따로 셈)
+const getClientId = () => {
+  try {
+    let id = localStorage.getItem('clientId');
+    if (!id) {
+      id = window.crypto?.randomUUID?.() || `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      localStorage.setItem('clientId', id);
+    }
+    return id;
+  } catch {
+    return undefined; // 저장소를 쓸 수 없으면 헤더 없이 보냄 (서버는 사용자 한도 없이 처리)
+  }
+};
+
+const clientId = getClientId();
+
 // 2. 공통으로 쓸 헤더 설정을 정의합니다.
 export const defaultHeaders = {
   'Content-Type': 'application/json',
-};
\ No newline at end of file
+  ...(clientId ? { 'X-User-Id': clientId } : {}),
+};